@@ -0,0 +1,161 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, status
+from fastapi.responses import Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import engine
+
+# Distinguishes ETags across restarts, since the in-process counter starts over
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+
+class DataVersion:
+    """
+    Version stamp that changes on any flashcard or config write.
+
+    Writes through an ORM session in this process bump a counter on commit.
+    Writes by other processes (the Telegram bot) are picked up from the
+    modification time of the SQLite file and its WAL, which costs a stat()
+    rather than a query.
+    """
+
+    def __init__(self, db_path: str | None):
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._changed_at = time.time()
+        self._paths = [db_path, f"{db_path}-wal"] if db_path else []
+
+    def bump(self) -> None:
+        with self._lock:
+            self._counter += 1
+            self._changed_at = time.time()
+
+    def current(self) -> tuple[str, float]:
+        """Returns the version stamp and the time of the last known change."""
+        stamp = [str(self._counter)]
+        changed_at = self._changed_at
+        for path in self._paths:
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            stamp.append(str(mtime_ns))
+            changed_at = max(changed_at, mtime_ns / 1e9)
+        return ".".join(stamp), changed_at
+
+
+data_version = DataVersion(engine.url.database if engine.url.get_backend_name() == "sqlite" else None)
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_flushed_writes(session, flush_context):
+    if session.new or session.dirty or session.deleted:
+        session.info["data_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_statement_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["data_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    if session.info.pop("data_changed", False):
+        data_version.bump()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _clear_on_rollback(session, previous_transaction):
+    session.info.pop("data_changed", None)
+
+
+@dataclass
+class CachedResponse:
+    version: str
+    body: bytes
+    media_type: str | None
+
+
+class ResponseCache:
+    """Small LRU of rendered response bodies, valid for one data version each."""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version: str) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def _is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cached_response(request: Request, render: Callable[[], Response]) -> Response:
+    """
+    Serves `render()` through the response cache with ETag/Last-Modified validation.
+
+    Repeat requests for the same URL and data version return the stored body
+    without calling `render` (so no queries and no template rendering), and
+    conditional requests get a bare 304.
+    """
+    key = str(request.url)
+    version, changed_at = data_version.current()
+    etag = f'"{_BOOT_ID}-{version}-{hashlib.sha1(key.encode()).hexdigest()[:8]}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(changed_at, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+    if _is_not_modified(request, etag, changed_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    entry = response_cache.get(key, version)
+    if entry is None:
+        response = render()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        entry = CachedResponse(version, bytes(response.body), response.media_type)
+        response_cache.put(key, entry)
+    return Response(content=entry.body, media_type=entry.media_type, headers=headers)
@@ -0,0 +1,333 @@
+"""
+`srs` command line entry point for operational tasks.
+
+Only the standard library is imported at start-up. Each subcommand imports
+what it needs when it runs, so `srs --help` and `srs stats` (plain sqlite3)
+never load SQLAlchemy, FastAPI, httpx or python-telegram-bot.
+tests/test_cli.py guards this with `-X importtime`.
+"""
+
+import argparse
+import json
+import sys
+from datetime import UTC, datetime, timedelta
+
+from app.config import DATABASE_URL
+
+# SQLAlchemy's storage format for DateTime columns on SQLite
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _sqlite_path(database_url: str) -> str | None:
+    prefix = "sqlite:///"
+    return database_url[len(prefix):] if database_url.startswith(prefix) else None
+
+
+def _emit(result: dict, as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(result, default=str))
+        return
+    for key, value in result.items():
+        print(f"{key.replace('_', ' ')}: {value}")
+
+
+def collect_stats(path: str, chat_id: int | None = None, now: datetime | None = None) -> dict:
+    """Deck statistics straight from the SQLite file, opened read-only."""
+    import sqlite3
+
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    chat_filter, params = ("WHERE chat_id = ?", [chat_id]) if chat_id is not None else ("", [])
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        by_status = dict(conn.execute(f"SELECT status, count(*) FROM flashcards {chat_filter} GROUP BY status", params))
+        due, unreviewed = conn.execute(
+            f"SELECT sum(due_at <= ?), sum(due_at IS NULL) FROM flashcards {chat_filter}",
+            [now.strftime(SQLITE_DATETIME_FORMAT), *params],
+        ).fetchone()
+        since = (now - timedelta(days=1)).strftime(SQLITE_DATETIME_FORMAT)
+        reviews = conn.execute(
+            f"SELECT count(*) FROM reviews WHERE reviewed_at >= ? {'AND chat_id = ?' if chat_id is not None else ''}",
+            [since, *params],
+        ).fetchone()[0]
+        chats = conn.execute("SELECT count(*) FROM chats WHERE active").fetchone()[0]
+        try:
+            archived = conn.execute(f"SELECT count(*) FROM flashcards_archive {chat_filter}", params).fetchone()[0]
+        except sqlite3.OperationalError:
+            # Files not yet migrated by init_db have no archive table
+            archived = 0
+    finally:
+        conn.close()
+    return {
+        "flashcards": sum(by_status.values()),
+        "pending": by_status.get("pending", 0),
+        "sent": by_status.get("sent", 0),
+        "due_for_review": due or 0,
+        "never_reviewed": unreviewed or 0,
+        "reviews_last_24h": reviews,
+        "active_chats": chats,
+        "archived": archived,
+    }
+
+
+def cmd_stats(args) -> int:
+    import sqlite3
+
+    path = args.database or _sqlite_path(DATABASE_URL)
+    if path is None:
+        print("srs stats reads SQLite databases only; pass --database PATH.", file=sys.stderr)
+        return 2
+    try:
+        _emit(collect_stats(path, args.chat), args.json)
+    except sqlite3.OperationalError as e:
+        print(f"Cannot read {path}: {e}. Start the app or bot once to create/migrate it.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_sync(args) -> int:
+    import asyncio
+
+    from app.database import get_db_session, init_db
+    from app.services import knowledge_service
+
+    init_db()
+    db = get_db_session()
+    try:
+        results = asyncio.run(knowledge_service.fetch_from_all_sources(db))
+    finally:
+        db.close()
+    for source in results["sources"]:
+        if source["status"] == "success":
+            data = source["data"]
+            print(f"{source['name']}: fetched {data['fetched_count']} of {data['total_count']} pages")
+        else:
+            print(f"{source['name']}: {source['error']}", file=sys.stderr)
+    return 0 if results["overall_status"] == "success" else 1
+
+
+def cmd_generate(args) -> int:
+    import asyncio
+
+    from app.database import get_db_session, init_db
+    from app.services import generation_service
+
+    init_db()
+    db = get_db_session()
+    try:
+        report = asyncio.run(generation_service.generate_from_notion(db, args.limit))
+    except (ValueError, RuntimeError) as e:
+        print(f"srs generate: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    _emit(report.as_dict(), args.json)
+    return 0 if not report.failed_requests else 1
+
+
+def cmd_send_due(args) -> int:
+    import asyncio
+
+    from telegram import Bot
+
+    from app.database import get_db_session, init_db
+    from app.services import config_service
+    from app.telegram_bot.delivery import send_due_flashcards
+
+    init_db()
+    db = get_db_session()
+    try:
+        token = config_service.get_config_value(db, "telegram_bot_token")
+    finally:
+        db.close()
+    if not token:
+        print("Telegram Bot Token not found in configuration.", file=sys.stderr)
+        return 1
+
+    async def run():
+        async with Bot(token) as bot:
+            return await send_due_flashcards(bot, args.per_chat)
+
+    report = asyncio.run(run())
+    _emit(report.as_dict(), args.json)
+    return 0 if not report.failed else 1
+
+
+def cmd_export(args) -> int:
+    from app.database import get_db_session
+    from app.services import export_service
+
+    iter_export = export_service.EXPORT_FORMATS[args.format][0]
+    binary = args.format == "apkg"
+    if args.output == "-":
+        out = sys.stdout.buffer if binary else sys.stdout
+        close = False
+    else:
+        out = open(args.output, "wb" if binary else "w", encoding=None if binary else "utf-8", newline=None if binary else "")
+        close = True
+    db = get_db_session()
+    try:
+        for chunk in iter_export(db):
+            out.write(chunk)
+    finally:
+        db.close()
+        if close:
+            out.close()
+    return 0
+
+
+def cmd_archive(args) -> int:
+    import asyncio
+
+    from app.config import app_config
+    from app.database import engine, init_db
+    from app.services import archive_service
+
+    if engine.dialect.name != "sqlite":
+        print("srs archive supports SQLite databases only.", file=sys.stderr)
+        return 2
+    init_db()
+    months = app_config.archive_after_months if args.months is None else args.months
+    if not args.no_vacuum and archive_service.enable_incremental_vacuum(engine):
+        print("Converted the database to incremental auto-vacuum.", file=sys.stderr)
+    result = asyncio.run(
+        archive_service.run_maintenance(engine, months, 0 if args.no_vacuum else app_config.vacuum_step_pages)
+    )
+    _emit({**result, **archive_service.storage_stats(engine).as_dict()}, args.json)
+    return 0
+
+
+def cmd_backup(args) -> int:
+    import sqlite3
+
+    from app.config import app_config
+    from app.services import backup_service
+
+    path = _sqlite_path(DATABASE_URL)
+    if path is None:
+        print("srs backup supports SQLite databases only.", file=sys.stderr)
+        return 2
+    if args.list:
+        snapshots = backup_service.list_snapshots(app_config.backup_dir)
+        if args.json:
+            print(json.dumps([snapshot.as_dict() for snapshot in snapshots]))
+            return 0
+        for snapshot in snapshots:
+            print(f"{snapshot.created_at:%Y-%m-%d %H:%M:%S}  {snapshot.size / 2**20:8.1f} MB  {snapshot.path}")
+        return 0
+    keep = app_config.backup_keep if args.keep is None else args.keep
+    try:
+        result = backup_service.backup_database(path, app_config.backup_dir, keep, app_config.backup_step_pages)
+    except (backup_service.SnapshotError, OSError, sqlite3.Error) as e:
+        print(f"srs backup: {e}", file=sys.stderr)
+        return 1
+    _emit(result.as_dict(), args.json)
+    return 0
+
+
+def cmd_restore(args) -> int:
+    import sqlite3
+    from pathlib import Path
+
+    from app.config import app_config
+    from app.services import backup_service
+
+    path = _sqlite_path(DATABASE_URL)
+    if path is None:
+        print("srs restore supports SQLite databases only.", file=sys.stderr)
+        return 2
+    if args.snapshot == "latest":
+        snapshots = backup_service.list_snapshots(app_config.backup_dir)
+        if not snapshots:
+            print(f"No snapshots in {app_config.backup_dir}.", file=sys.stderr)
+            return 1
+        snapshot = snapshots[0].path
+    else:
+        snapshot = Path(args.snapshot)
+    try:
+        if args.check:
+            scratch = Path(app_config.backup_dir) / f".check-{snapshot.name}.db"
+            try:
+                problems = backup_service.verify_snapshot(snapshot, scratch)
+            finally:
+                scratch.unlink(missing_ok=True)
+            _emit({"snapshot": str(snapshot), "ok": not problems, "problems": problems}, args.json)
+            return 1 if problems else 0
+        result = backup_service.restore_snapshot(snapshot, path, app_config.backup_dir)
+    except (backup_service.SnapshotError, OSError, sqlite3.Error) as e:
+        print(f"srs restore: {e}", file=sys.stderr)
+        return 1
+    _emit(result, args.json)
+    return 0
+
+
+def cmd_bench(args, extra: list[str]) -> int:
+    from benchmarks.run import main as bench_main
+
+    return bench_main(extra)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="srs", description="SRS flashcard operations.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats = subparsers.add_parser("stats", help="Show deck and review statistics.")
+    stats.add_argument("--database", help="SQLite file to read (default: the app database).")
+    stats.add_argument("--chat", type=int, help="Only count this chat's deck.")
+    stats.add_argument("--json", action="store_true", help="Print JSON.")
+
+    subparsers.add_parser("sync", help="Fetch unprocessed pages from the configured knowledge sources.")
+    generate = subparsers.add_parser("generate", help="Generate flashcards from unprocessed Notion pages.")
+    generate.add_argument("--limit", type=int, help="Process at most this many pages.")
+    generate.add_argument("--json", action="store_true", help="Print JSON.")
+
+    send_due = subparsers.add_parser("send-due", help="Deliver pending flashcards to every active chat now.")
+    send_due.add_argument("--per-chat", type=int, help="Cards per chat (default: DELIVERY_CARDS_PER_CHAT).")
+    send_due.add_argument("--json", action="store_true", help="Print JSON.")
+
+    export = subparsers.add_parser("export", help="Export all flashcards.")
+    export.add_argument("--format", choices=("csv", "jsonl", "apkg"), default="csv")
+    export.add_argument("-o", "--output", default="-", help="Output file (default: stdout).")
+
+    archive = subparsers.add_parser("archive", help="Move cards untouched for months to the archive table and vacuum.")
+    archive.add_argument("--months", type=int, help="Inactivity before a card is archived (default: ARCHIVE_AFTER_MONTHS).")
+    archive.add_argument("--no-vacuum", action="store_true", help="Skip the incremental vacuum afterwards.")
+    archive.add_argument("--json", action="store_true", help="Print JSON.")
+
+    backup = subparsers.add_parser("backup", help="Write a compressed snapshot of the database to BACKUP_DIR now.")
+    backup.add_argument("--keep", type=int, help="Snapshots to keep (default: BACKUP_KEEP).")
+    backup.add_argument("--list", action="store_true", help="List the snapshots instead, newest first.")
+    backup.add_argument("--json", action="store_true", help="Print JSON.")
+
+    restore = subparsers.add_parser("restore", help="Replace the database with a snapshot, after checking its integrity.")
+    restore.add_argument("snapshot", nargs="?", default="latest", help="Snapshot file (default: the newest in BACKUP_DIR).")
+    restore.add_argument("--check", action="store_true", help="Only check the snapshot's integrity.")
+    restore.add_argument("--json", action="store_true", help="Print JSON.")
+
+    subparsers.add_parser("bench", help="Run the offline benchmarks; remaining arguments go to benchmarks.run.", add_help=False)
+    return parser
+
+
+COMMANDS = {
+    "stats": cmd_stats,
+    "sync": cmd_sync,
+    "generate": cmd_generate,
+    "send-due": cmd_send_due,
+    "export": cmd_export,
+    "archive": cmd_archive,
+    "backup": cmd_backup,
+    "restore": cmd_restore,
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == "bench":
+        return cmd_bench(args, extra)
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return COMMANDS[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
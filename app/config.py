@@ -1,9 +1,12 @@
-from pydantic_settings import BaseSettings, SettingsConfigDict
-
 LOCAL_DIR = ".local"
 DATABASE_URL = f"sqlite:///{LOCAL_DIR}/flashcards.db"
 
-class AppConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_file=(".env", ".env.prod"), extra="ignore")
 
-app_config = AppConfig()
+def __getattr__(name: str):
+    # Settings pull in pydantic, so they are loaded on first use; entry points
+    # that only need the paths above (the `srs` CLI) skip that import.
+    if name in ("AppConfig", "app_config"):
+        from app import settings
+
+        return getattr(settings, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
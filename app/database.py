@@ -1,16 +1,22 @@
+import logging
 import os
 
 from app import config
+from app.metrics import instrument_engine
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
 
 engine = create_engine(
     config.DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in config.DATABASE_URL else {},
 )
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+logger = logging.getLogger(__name__)
+
 
 def get_db():
     db = SessionLocal()
@@ -22,3 +28,65 @@ def get_db():
 def get_db_session() -> Session:
     """Creates a new database session"""
     return SessionLocal()
+
+def _add_missing_columns(conn, table) -> None:
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = f"{column.type.compile(conn.dialect)}"
+        if column.server_default is not None:
+            ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {ddl}'))
+
+
+def _create_flashcards_view(conn) -> None:
+    """(Re)creates the flashcards_all view so it always has the current flashcards columns."""
+    from app.models import Flashcard, flashcards_all
+
+    columns = ", ".join(f'"{column.name}"' for column in Flashcard.__table__.columns)
+    conn.execute(text(f"DROP VIEW IF EXISTS {flashcards_all.name}"))
+    conn.execute(text(
+        f"CREATE VIEW {flashcards_all.name} AS "
+        f"SELECT {columns}, 0 AS archived FROM flashcards "
+        f"UNION ALL SELECT {columns}, 1 AS archived FROM flashcards_archive"
+    ))
+
+
+def _enable_wal(bind) -> None:
+    # Persistent in the file; it needs a moment without other connections, so a busy file is left for the next start
+    try:
+        with bind.connect() as conn:
+            mode = conn.exec_driver_sql("PRAGMA journal_mode = WAL").scalar()
+    except OperationalError as e:
+        mode = str(e)
+    if mode != "wal":
+        logger.warning("Could not switch %s to WAL (%s); backups will block writers while they copy.", bind.url.database, mode)
+
+
+def init_db(bind=engine) -> None:
+    """
+    Creates missing tables, columns, indexes and the flashcards_all view.
+
+    create_all() leaves existing tables alone, so columns (nullable or with a
+    server default) and indexes added to an existing table's model are
+    created here as well. New SQLite files use incremental auto-vacuum so
+    space freed by archiving can be returned in small steps, and every file
+    is switched to WAL so readers (the online backup among them) never block
+    the writers.
+    """
+    from app.models import Base
+
+    with bind.begin() as conn:
+        if conn.dialect.name == "sqlite" and not inspect(conn).get_table_names():
+            # Only takes effect before the first table exists; older files are converted by `srs archive`
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        Base.metadata.create_all(conn)
+        for table in Base.metadata.sorted_tables:
+            _add_missing_columns(conn, table)
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        _create_flashcards_view(conn)
+    # After the auto_vacuum pragma, which has to come before anything is written to a new file
+    if bind.dialect.name == "sqlite" and bind.url.database not in (None, "", ":memory:"):
+        _enable_wal(bind)
@@ -0,0 +1,156 @@
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+# Events kept for clients that reconnect with Last-Event-ID or fall behind
+EVENT_HISTORY = 512
+# Comment sent on idle streams so proxies and browsers keep the connection open
+HEARTBEAT_SECONDS = 15.0
+# Most frames written in one chunk; the server keeps a client's last chunk until the next
+# one, so this bounds what a caught-up client holds
+BATCH_EVENTS = 32
+# Reconnect delay suggested to browsers, in milliseconds
+RETRY_MS = 3000
+# Streams end after this long and the browser reconnects with Last-Event-ID, losing
+# nothing; uvicorn waits for open responses on shutdown and reload, so endless
+# streams would keep it from exiting
+STREAM_SECONDS = 30.0
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    id: int
+    kind: str
+    # The complete SSE frame, encoded once and shared by every client
+    frame: bytes
+
+
+def _frame(event_id: int, kind: str, data: dict) -> bytes:
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n".encode()
+
+
+class EventBus:
+    """
+    In-process pub/sub for the dashboard's server-sent events.
+
+    Published events go into one bounded ring of encoded frames; a client is
+    just a cursor into it, so a thousand clients cost a thousand cursors, not
+    a thousand queues, and a client that stops reading holds nothing. A
+    client that falls more than `history` events behind (or reconnects after
+    events were dropped) gets a `resync` event and reloads its view.
+
+    `publish` may be called from any thread, e.g. from sync routes running in
+    the thread pool; clients are woken on the event loop they listen on.
+    """
+
+    def __init__(self, history: int = EVENT_HISTORY):
+        self._events: deque[Event] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._subscribers = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._changed: asyncio.Event | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._subscribers
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, kind: str, data: dict) -> int:
+        """Publishes one event; returns its id."""
+        with self._lock:
+            self._last_id += 1
+            if self._subscribers:
+                self._events.append(Event(self._last_id, kind, _frame(self._last_id, kind, data)))
+            else:
+                # Nobody is listening: skip encoding, and make reconnecting clients resync
+                self._events.clear()
+            event_id = self._last_id
+            loop = self._loop
+        if loop is not None and self._subscribers:
+            self._wake(loop)
+        return event_id
+
+    def _wake(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._notify()
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self) -> None:
+        # Waiters hold the old event; a fresh one catches the next publish
+        changed, self._changed = self._changed, asyncio.Event()
+        if changed is not None:
+            changed.set()
+
+    def since(self, cursor: int) -> list[Event] | None:
+        """Events after `cursor`, or None if some of them are no longer kept."""
+        with self._lock:
+            if cursor >= self._last_id:
+                return []
+            if not self._events or self._events[0].id > cursor + 1:
+                return None
+            return list(itertools.islice(self._events, cursor + 1 - self._events[0].id, None))
+
+    async def stream(
+        self,
+        last_event_id: int | None = None,
+        heartbeat: float = HEARTBEAT_SECONDS,
+        max_seconds: float = STREAM_SECONDS,
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields SSE frames for one client until it disconnects or `max_seconds` pass.
+
+        Starts after `last_event_id` when the browser reconnects with one,
+        otherwise with only events published from now on.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_seconds
+        with self._lock:
+            if self._loop is not loop:
+                self._loop = loop
+                self._changed = asyncio.Event()
+            self._subscribers += 1
+            cursor = self._last_id if last_event_id is None else min(last_event_id, self._last_id)
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            while True:
+                changed = self._changed
+                events = self.since(cursor)
+                if events is None:
+                    cursor = self._last_id
+                    yield _frame(cursor, "resync", {})
+                    continue
+                if events:
+                    events = events[:BATCH_EVENTS]
+                    cursor = events[-1].id
+                    # A single frame is shared with every other client rather than copied
+                    yield events[0].frame if len(events) == 1 else b"".join(event.frame for event in events)
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    async with asyncio.timeout(min(heartbeat, remaining)):
+                        await changed.wait()
+                except TimeoutError:
+                    if remaining > heartbeat:
+                        yield b": keep-alive\n\n"
+        finally:
+            with self._lock:
+                self._subscribers -= 1
+
+
+event_bus = EventBus()
@@ -1,10 +1,18 @@
+import asyncio
 import json
 import logging
+import random
+import time
+import weakref
+from contextlib import asynccontextmanager
+
 import httpx
 from pydantic import ValidationError
 
+from app.config import app_config
 from app.database import get_db_session
 from app.knowledge_sources.notion import schemas
+from app.metrics import NOTION_LATENCY, NOTION_RATE_LIMITED, NOTION_REQUESTS
 from app.services import config_service
 
 logger = logging.getLogger(__name__)
@@ -12,9 +20,120 @@ logger = logging.getLogger(__name__)
 NOTION_BASE_URL = "https://api.notion.com/v1"
 SEARCH_ENDPOINT = NOTION_BASE_URL + "/search"
 
+MAX_RATE_LIMIT_RETRIES = 3
+DEFAULT_RETRY_AFTER = 1.0
+
+class RequestBudget:
+    """
+    Token bucket shared by every request to the workspace.
+
+    Notion rate-limits per integration, not per database, so concurrent
+    syncs of many databases draw from one budget instead of each backing off
+    on its own 429s. Callers take tokens one at a time, in order, behind a
+    lock, and the bucket is refilled by the time that actually passed: a
+    stalled event loop then releases at most a burst, where tokens reserved
+    ahead of time would all fall due at once. A 429 pushes the whole bucket
+    into debt, pausing every caller for the Retry-After. The lock belongs to
+    one event loop, so each loop that talks to Notion gets its own.
+    """
+
+    def __init__(self, rate: float | None, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = weakref.WeakKeyDictionary()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def _lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    async def acquire(self) -> None:
+        if not self.rate:
+            return
+        async with self._lock:
+            self._refill()
+            # Re-checked after every sleep, since a 429 may have paused the bucket meanwhile
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Holds back every request for at least `seconds`, e.g. after a 429."""
+        if not self.rate:
+            return
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+workspace_budget = RequestBudget(app_config.notion_requests_per_second, app_config.notion_request_burst)
+
+def _observe_call(endpoint: str, status: int, started: float) -> None:
+    """Records count, latency and rate limiting of one Notion API call."""
+    NOTION_REQUESTS.labels(endpoint, str(status)).inc()
+    NOTION_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+    if status == httpx.codes.TOO_MANY_REQUESTS:
+        NOTION_RATE_LIMITED.labels(endpoint).inc()
+
+async def _send(
+    client: httpx.AsyncClient, method: str, url: str, endpoint: str, **kwargs
+) -> httpx.Response:
+    """
+    Sends one Notion API request, retrying on HTTP 429 after (at least) the advertised Retry-After.
+
+    Every attempt waits for a token of the shared `workspace_budget`. The last
+    429 response is returned once MAX_RATE_LIMIT_RETRIES is exhausted so
+    callers keep handling rate limiting as an error. Network errors propagate.
+    """
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        await workspace_budget.acquire()
+        started = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.RequestError:
+            _observe_call(endpoint, 0, started)
+            raise
+        _observe_call(endpoint, resp.status_code, started)
+
+        if resp.status_code != httpx.codes.TOO_MANY_REQUESTS or attempt == MAX_RATE_LIMIT_RETRIES:
+            return resp
+
+        # Back off exponentially with jitter so concurrent callers don't retry in lockstep
+        retry_after = float(resp.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+        # Other callers would hit the same limit; hold them back too
+        workspace_budget.pause(retry_after)
+        retry_after = retry_after * 2**attempt + random.uniform(0, retry_after)
+        logger.warning(
+            "Notion rate limited %s (attempt %d), retrying in %.2fs", endpoint, attempt + 1, retry_after
+        )
+        await asyncio.sleep(retry_after)
+    return resp
+
+@asynccontextmanager
+async def _client_scope(client: httpx.AsyncClient | None):
+    """Yields `client`, or a short-lived client when the caller didn't pass one."""
+    if client is not None:
+        yield client
+        return
+    async with httpx.AsyncClient() as owned_client:
+        yield owned_client
+
 def construct_headers():
     db = get_db_session()
-    api_key = config_service.get_config_value(db, "notion_api_key")
+    try:
+        api_key = config_service.get_config_value(db, "notion_api_key")
+    finally:
+        db.close()
     return {
         "Authorization": f"Bearer {api_key}",
         "Notion-Version": "2022-06-28",
@@ -25,21 +144,30 @@ async def query_notion_database(
     database_id: str,
     payload: dict | None = None,
     timeout: float = 10.0,
-    headers = construct_headers(),
-) -> schemas.NotionResponse:
+    headers: dict | None = None,
+    client: httpx.AsyncClient | None = None,
+) -> schemas.PageListResponse:
     """
     Query a Notion database and return a parsed Pydantic response.
 
+    Pages are validated only as far as the sync needs them (see
+    schemas.PageSummary); use schemas.ListResponse on the raw body for the
+    fully validated form.
+
     :param database_id:   The Notion database ID to query.
     :param payload:       Optional JSON body to send (e.g. filters, sorts).
     :param timeout:       Request timeout in seconds.
-    :return:              Either ListResponse on 200, or ErrorResponse on 400/429.
+    :param headers:       Request headers; built from the configured API key if omitted.
+    :param client:        Optional httpx.AsyncClient to send the request with.
+    :return:              Either PageList on 200, or ErrorResponse on 400/429.
     """
     url = f"{NOTION_BASE_URL}/databases/{database_id}/query"
+    if headers is None:
+        headers = construct_headers()
 
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(url, json=payload or {}, headers=headers, timeout=timeout)
+        async with _client_scope(client) as http:
+            resp = await _send(http, "POST", url, "databases.query", json=payload or {}, headers=headers, timeout=timeout)
     except httpx.RequestError as e:
         # network-level errors
         return schemas.ErrorResponse(
@@ -58,9 +186,9 @@ async def query_notion_database(
     # for any other HTTP error, raise or wrap
     resp.raise_for_status()
 
-    # at 200, parse into ListResponse
+    # at 200, parse the fields the sync uses straight from the bytes
     try:
-        return schemas.ListResponse(**resp.json())
+        return schemas.parse_page_list(resp.content)
     except ValidationError as ve:
         # if it somehow doesn't match the schema
         return schemas.ErrorResponse(
@@ -70,46 +198,56 @@ async def query_notion_database(
             message=str(ve),
         )
 
-async def fetch_all_blocks_recursive(block_id: str, headers: dict = construct_headers()):
+async def fetch_all_blocks_recursive(
+    block_id: str,
+    headers: dict | None = None,
+    client: httpx.AsyncClient | None = None,
+):
     """
     Recursively fetches all blocks starting from a given block ID.
     If a block has children, it fetches them and adds them under a 'children' key.
+    One HTTP client (and its connection pool) is shared by the whole traversal.
     """
+    if headers is None:
+        headers = construct_headers()
+    if client is None:
+        async with httpx.AsyncClient() as shared_client:
+            return await fetch_all_blocks_recursive(block_id, headers, shared_client)
+
     all_children= []
     start_cursor= None
     url = f"{NOTION_BASE_URL}/blocks/{block_id}/children"
-    async with httpx.AsyncClient() as client:
-        while True:
-            params = {}
-            if start_cursor:
-                params["start_cursor"] = start_cursor
-
-            try:
-                response = await client.get(url, headers=headers, params=params, timeout=30.0)
-                response.raise_for_status()
-                data = response.json()
-
-                results = data.get("results", [])
-                all_children.extend(results)
-
-                if not data.get("has_more"): break 
-
-                start_cursor = data.get("next_cursor")
-
-            except httpx.HTTPStatusError as e:
-                logger.error(f"HTTP error occurred: {e.response.status_code} - {e.response.text}")
-                break
-            except httpx.RequestError as e:
-                logger.error(f"Request error occurred: {e}")
-                break
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to decode JSON response: {e}")
-                break
+    while True:
+        params = {}
+        if start_cursor:
+            params["start_cursor"] = start_cursor
+
+        try:
+            response = await _send(client, "GET", url, "blocks.children", headers=headers, params=params, timeout=30.0)
+            response.raise_for_status()
+            data = response.json()
+
+            results = data.get("results", [])
+            all_children.extend(results)
+
+            if not data.get("has_more"): break 
+
+            start_cursor = data.get("next_cursor")
+
+        except httpx.HTTPStatusError as e:
+            logger.error("HTTP error occurred: %s - %s", e.response.status_code, e.response.text)
+            break
+        except httpx.RequestError as e:
+            logger.error("Request error occurred: %s", e)
+            break
+        except json.JSONDecodeError as e:
+            logger.error("Failed to decode JSON response: %s", e)
+            break
 
     processed_children = []
     for child_block in all_children:
-        if child_block.get("has_more"): 
-            nested_children = await fetch_all_blocks_recursive(child_block["id"], headers)
+        if child_block.get("has_children"):
+            nested_children = await fetch_all_blocks_recursive(child_block["id"], headers, client)
             child_block["children"] = nested_children
             processed_children.append(child_block)
             continue
@@ -118,13 +256,14 @@ async def fetch_all_blocks_recursive(block_id: str, headers: dict = construct_he
 
     return processed_children
 
-async def retrieve_content_by_id(page_id, headers=construct_headers()):
+async def retrieve_content_by_id(page_id, headers=None, client=None):
     """
     Fetches all blocks for a given Notion Page ID recursively.
 
     Args:
         page_id: The UUID of the Notion page.
-        api_key: Optional Notion API key. If None, reads from NOTION_API_KEY env var.
+        headers: Optional request headers. If None, built from the configured API key.
+        client: Optional httpx.AsyncClient to reuse for all block requests.
 
     Returns:
         A dictionary representing the PageContent, containing the page_id
@@ -132,7 +271,7 @@ async def retrieve_content_by_id(page_id, headers=construct_headers()):
         Returns an empty structure on failure.
     """
     try:
-        top_level_blocks = await fetch_all_blocks_recursive(page_id, headers)
+        top_level_blocks = await fetch_all_blocks_recursive(page_id, headers, client)
 
         page_content = {
             "page_id": page_id,
@@ -141,15 +280,23 @@ async def retrieve_content_by_id(page_id, headers=construct_headers()):
         return page_content
 
     except ValueError as e:
-        logger.error(f"Configuration error: {e}")
+        logger.error("Configuration error: %s", e)
         return {"page_id": page_id, "blocks": [], "error": str(e)}
     except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
+        logger.error("An unexpected error occurred: %s", e)
         return {"page_id": page_id, "blocks": [], "error": f"Unexpected error: {e}"}
 
 
-def update_page_properties_by_id(page_id, headers=construct_headers()):
+async def update_page_properties_by_id(
+    page_id: str,
+    properties: dict,
+    headers: dict | None = None,
+    client: httpx.AsyncClient | None = None,
+    timeout: float = 10.0,
+) -> dict | schemas.ErrorResponse:
     """
+    Updates page properties (e.g. marks a page as processed) and returns the updated page.
+
     sample curl:
     curl https://api.notion.com/v1/pages/60bdc8bd-3880-44b8-a9cd-8a145b3ffbd7 \
       -H 'Authorization: Bearer '"$NOTION_API_KEY"'' \
@@ -162,4 +309,18 @@ def update_page_properties_by_id(page_id, headers=construct_headers()):
       }
     }'
     """
+    url = f"{NOTION_BASE_URL}/pages/{page_id}"
+    if headers is None:
+        headers = construct_headers()
+    body = {"properties": properties}
 
+    try:
+        async with _client_scope(client) as http:
+            resp = await _send(http, "PATCH", url, "pages.update", json=body, headers=headers, timeout=timeout)
+    except httpx.RequestError as e:
+        return schemas.ErrorResponse(object="error", status=0, code="request_error", message=str(e))
+
+    if resp.status_code in (400, 404, 429):
+        return schemas.ErrorResponse(**resp.json())
+    resp.raise_for_status()
+    return resp.json()
@@ -1,7 +1,12 @@
+import re
 from datetime import datetime
-from typing import Any, Literal, Union
+from functools import cache, cached_property
+from typing import Any, Literal, NotRequired, TypedDict, Union
 
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, PrivateAttr, TypeAdapter
+from pydantic_core import from_json
+
+UNTITLED = "Untitled Page"
 
 
 class UserRef(BaseModel):
@@ -40,5 +45,122 @@ class ErrorResponse(BaseModel):
     code: str
     message: str
 
+
+class _RichText(TypedDict):
+    plain_text: str
+
+class _TitleProperty(TypedDict):
+    type: str
+    title: NotRequired[list[_RichText]]
+
+def property_text(prop: dict) -> str:
+    """Plain text of a title or rich_text property; empty for other types."""
+    texts = prop.get(prop.get("type"))
+    if not isinstance(texts, list):
+        return ""
+    return " ".join(text_obj.get("plain_text", "") for text_obj in texts)
+
+def title_property_name(properties: dict) -> str | None:
+    """The page's title-type property; every database has exactly one, whatever it is called."""
+    return next((name for name, prop in properties.items() if prop.get("type") == "title"), None)
+
+class RawResults:
+    """The raw body of a query response, decoded only when a page's full properties are read."""
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    @cached_property
+    def results(self) -> list[dict]:
+        return from_json(self.content)["results"]
+
+class PageSummary(BaseModel):
+    """
+    The parts of a database query result the sync uses.
+
+    Only id, url, last_edited_time and the text of title properties are
+    validated; `properties` is decoded from the raw response on first access.
+    """
+    id: str
+    url: str
+    last_edited_time: datetime
+    # Every property, but with only its type and any title text
+    title_properties: dict[str, _TitleProperty] = Field(alias="properties")
+    _raw: RawResults | None = PrivateAttr(None)
+    _index: int = PrivateAttr(0)
+
+    @property
+    def title(self) -> str:
+        return self.title_for()
+
+    def title_for(self, title_property: str | None = None) -> str:
+        """
+        Text of `title_property`, or of the page's title-type property if not
+        given. A mapped property that is not the title (e.g. a rich_text
+        "Question") is read from the full properties.
+        """
+        name = title_property or title_property_name(self.title_properties)
+        prop = self.title_properties.get(name) if name else None
+        if prop is None:
+            return UNTITLED
+        if prop["type"] != "title":
+            prop = self.properties.get(name, {})
+        return property_text(prop) or UNTITLED
+
+    @property
+    def properties(self) -> dict:
+        return self._raw.results[self._index]["properties"] if self._raw else {}
+
+class PageList(BaseModel):
+    object: Literal['list']
+    results: list[PageSummary]
+    next_cursor: str | None
+    has_more: bool
+
+class DatabaseConfig(BaseModel):
+    """One entry of the `notion_databases` setting."""
+    id: str
+    name: str | None = None
+    # Notion filter object, applied on top of the isProcessed filter
+    filter: dict | None = None
+    # Property holding each page's title; the database's title property if unset
+    title_property: str | None = None
+
+    @property
+    def label(self) -> str:
+        return self.name or self.id
+
 NotionResponse = Union[ListResponse, ErrorResponse]
+PageListResponse = PageList | ErrorResponse
+
+@cache
+def type_adapter(tp: Any) -> TypeAdapter:
+    """One TypeAdapter per type; building its validator is far more expensive than using it."""
+    return TypeAdapter(tp)
+
+def parse_page_list(content: bytes) -> PageList:
+    """
+    Validates a database query response straight from its bytes.
+
+    pydantic-core parses the JSON itself and never builds Python objects for
+    fields the schema leaves out, which is most of every page's properties.
+    Raises ValidationError like the full ListResponse.
+    """
+    page_list = type_adapter(PageList).validate_json(content)
+    raw = RawResults(content)
+    for index, page in enumerate(page_list.results):
+        page._raw = raw
+        page._index = index
+    return page_list
+
 
+def parse_database_configs(value: str | None) -> list[DatabaseConfig]:
+    """
+    Reads the `notion_databases` setting: a JSON list of DatabaseConfig
+    objects, or just database IDs separated by commas or newlines.
+    Raises ValidationError on malformed JSON.
+    """
+    value = (value or "").strip()
+    if value.startswith("["):
+        return type_adapter(list[DatabaseConfig]).validate_json(value)
+    return [DatabaseConfig(id=entry.strip()) for entry in re.split(r"[,\n]", value) if entry.strip()]
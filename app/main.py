@@ -1,31 +1,111 @@
+import asyncio
+import time
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
+from starlette.routing import Match
 
-from app.config import LOCAL_DIR
-from app.database import engine
-from app.models import Base
-from app.routers import config, dashboard
+from app.config import LOCAL_DIR, app_config
+from app.database import engine, init_db
+from app.metrics import REQUEST_LATENCY
+from app.profiling import profile
+from app.routers import analytics, chats, config, dashboard, flashcards, metrics
+from app.services import (
+    analytics_service,
+    archive_service,
+    backup_service,
+    live_service,
+    sync_service,
+)
+from app.staticfiles import PrecompressedStaticFiles, precompress
+
+STATIC_DIR = "templates/static"
+# Gzipped copies of the static files, written at startup
+STATIC_GZIP_DIR = f"{LOCAL_DIR}/static-gzip"
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Path(LOCAL_DIR).mkdir(exist_ok=True)
 
-    Base.metadata.create_all(engine)
+    init_db()
+    precompress(STATIC_DIR, STATIC_GZIP_DIR)
+    # So the first dashboard load doesn't compute the deck statistics itself
+    analytics_service.deck_stats_cache.warm(engine)
+    tasks = []
+    if app_config.maintenance_interval_seconds > 0:
+        tasks.append(asyncio.create_task(archive_service.maintenance_loop(
+            engine,
+            app_config.maintenance_interval_seconds,
+            app_config.archive_after_months,
+            app_config.vacuum_step_pages,
+        )))
+    if app_config.backup_interval_seconds > 0 and engine.dialect.name == "sqlite":
+        tasks.append(asyncio.create_task(backup_service.backup_loop(
+            engine.url.database,
+            app_config.backup_dir,
+            app_config.backup_interval_seconds,
+            app_config.backup_keep,
+            app_config.backup_step_pages,
+        )))
+    if app_config.live_poll_interval_seconds > 0:
+        tasks.append(asyncio.create_task(live_service.watch_database(app_config.live_poll_interval_seconds)))
+    if app_config.sync_min_interval_seconds > 0:
+        tasks.append(asyncio.create_task(sync_service.scheduler.loop()))
     yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
 
 
 app = FastAPI(lifespan=lifespan)
-app.mount("/static", StaticFiles(directory="templates/static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory=STATIC_DIR, gzip_directory=STATIC_GZIP_DIR), name="static")
 
 templates = Jinja2Templates(directory="templates")
 
+app.include_router(analytics.router, prefix="/api", tags=["analytics"])
+app.include_router(chats.router, prefix="/api", tags=["chats"])
 app.include_router(config.router, prefix="/api", tags=["config"])
 app.include_router(dashboard.router)
+app.include_router(flashcards.router, prefix="/api", tags=["flashcards"])
+app.include_router(metrics.router)
+
+
+def _route_template(request: Request) -> str:
+    """Labels requests by route template so path parameters don't explode cardinality."""
+    route = request.scope.get("route")
+    if route is None:
+        for candidate in request.app.router.routes:
+            match, _ = candidate.matches(request.scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUEST_LATENCY.labels(
+            request.method, _route_template(request), str(status)
+        ).observe(time.perf_counter() - start)
+
+
+async def profile_requests(request: Request, call_next):
+    with profile(request.url.path):
+        return await call_next(request)
+
+
+if app_config.profiler:
+    app.middleware("http")(profile_requests)
 
 
 from fastapi.responses import RedirectResponse
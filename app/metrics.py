@@ -0,0 +1,131 @@
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Shared latency buckets (seconds), tuned for sub-millisecond DB calls up to slow LLM calls
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+REQUEST_LATENCY = Histogram(
+    "srs_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+NOTION_REQUESTS = Counter(
+    "srs_notion_requests_total",
+    "Notion API calls by endpoint and HTTP status.",
+    ["endpoint", "status"],
+)
+NOTION_LATENCY = Histogram(
+    "srs_notion_request_duration_seconds",
+    "Notion API call latency by endpoint.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+NOTION_RATE_LIMITED = Counter(
+    "srs_notion_rate_limited_total",
+    "Notion API calls rejected with HTTP 429.",
+    ["endpoint"],
+)
+
+LLM_TOKENS = Counter(
+    "srs_llm_tokens_total",
+    "LLM tokens consumed, split into prompt and completion tokens.",
+    ["model", "kind"],
+)
+LLM_LATENCY = Histogram(
+    "srs_llm_request_duration_seconds",
+    "LLM completion latency by model.",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_ATTEMPTS = Counter(
+    "srs_llm_attempts_total",
+    "Routed LLM attempts by model and outcome (won, cancelled after losing a hedge race, error).",
+    ["model", "outcome"],
+)
+LLM_FIRST_CARD_LATENCY = Histogram(
+    "srs_llm_first_card_seconds",
+    "Time from sending a streamed LLM request until its first card is parsed, by model.",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+TELEGRAM_SEND_LATENCY = Histogram(
+    "srs_telegram_api_duration_seconds",
+    "Telegram Bot API call latency by API method (sendMessage, ...).",
+    ["method"],
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_QUERY_LATENCY = Histogram(
+    "srs_db_query_duration_seconds",
+    "Database statement latency by statement verb.",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class Timer:
+    """Context manager observing the elapsed wall time on a histogram child."""
+
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+def _statement_operation(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return verb if verb in {"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA"} else "OTHER"
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Records the duration of every statement executed through `engine`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start_time"].pop()
+        DB_QUERY_LATENCY.labels(_statement_operation(statement)).observe(
+            time.perf_counter() - start
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Returns the Prometheus text exposition and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int, addr: str = "0.0.0.0") -> None:
+    """Serves /metrics from a background thread (used by the bot process)."""
+    start_http_server(port, addr=addr)
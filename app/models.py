@@ -1,4 +1,19 @@
-from sqlalchemy import Column, DateTime, Integer, String, Text, func
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -23,3 +38,160 @@ class Flashcard(Base):
     status = Column(String, nullable=False, default="pending")
     created_at = Column(DateTime, default=func.now())
     sent_at = Column(DateTime, nullable=True)
+    # Owning Telegram chat (deck); NULL for cards not yet assigned to a chat
+    chat_id = Column(BigInteger, nullable=True)
+    # Review scheduling; due_at is NULL until the card is first graded
+    due_at = Column(DateTime, nullable=True)
+    interval_days = Column(Float, nullable=False, default=0.0, server_default="0")
+    ease = Column(Float, nullable=False, default=2.5, server_default="2.5")
+    reps = Column(Integer, nullable=False, default=0, server_default="0")
+    # Delivery worker holding the card (status "claimed") and when its claim lapses
+    claimed_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Duplicate detection for bulk imports
+        Index("ix_flashcards_question", "question"),
+        Index("ix_flashcards_due_at", "due_at"),
+        # Per-chat delivery and review queues
+        Index("ix_flashcards_chat_status", "chat_id", "status"),
+        Index("ix_flashcards_chat_due_at", "chat_id", "due_at"),
+    )
+
+
+class ArchivedFlashcard(Base):
+    """
+    Cold tier: cards moved out of `flashcards` by archive_service after
+    months without activity. Rows keep their original id.
+    """
+
+    __tablename__ = "flashcards_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    knowledge_source_type = Column(String, nullable=False)
+    knowledge_source_id = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    created_at = Column(DateTime)
+    sent_at = Column(DateTime, nullable=True)
+    chat_id = Column(BigInteger, nullable=True)
+    due_at = Column(DateTime, nullable=True)
+    interval_days = Column(Float, nullable=False, server_default="0")
+    ease = Column(Float, nullable=False, server_default="2.5")
+    reps = Column(Integer, nullable=False, server_default="0")
+    claimed_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_flashcards_archive_chat_sent_at", "chat_id", "sent_at"),
+    )
+
+
+# UNION ALL of flashcards and flashcards_archive (with an `archived` flag), created by
+# init_db(). It lives outside Base.metadata so create_all() doesn't create it as a table.
+flashcards_all = Table(
+    "flashcards_all",
+    MetaData(),
+    *(Column(column.name, column.type, primary_key=column.primary_key) for column in Flashcard.__table__.columns),
+    Column("archived", Boolean, nullable=False),
+)
+
+
+class FlashcardHistory(Base):
+    """Read-only view over hot and archived cards, for history queries like /summary."""
+
+    __table__ = flashcards_all
+
+
+class Chat(Base):
+    __tablename__ = "chats"
+
+    chat_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    title = Column(String, nullable=True)
+    active = Column(Boolean, nullable=False, default=True, server_default="1")
+    created_at = Column(DateTime, default=func.now())
+
+
+class Subscription(Base):
+    __tablename__ = "subscriptions"
+
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, ForeignKey("chats.chat_id", ondelete="CASCADE"), nullable=False)
+    knowledge_source_type = Column(String, nullable=False)
+    knowledge_source_id = Column(String, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("chat_id", "knowledge_source_type", "knowledge_source_id", name="uq_subscriptions_chat_source"),
+        Index("ix_subscriptions_source", "knowledge_source_type", "knowledge_source_id"),
+    )
+
+
+class Review(Base):
+    __tablename__ = "reviews"
+
+    id = Column(Integer, primary_key=True)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id", ondelete="CASCADE"), nullable=False, index=True)
+    chat_id = Column(BigInteger, nullable=False)
+    grade = Column(String, nullable=False)  # again | hard | good | easy
+    reviewed_at = Column(DateTime, nullable=False)
+    interval_days = Column(Float, nullable=False)
+
+
+class CardEvent(Base):
+    """
+    Append-only log of what happened to cards; rows are never updated.
+
+    No foreign key to flashcards, so the history of archived cards stays.
+    """
+    __tablename__ = "card_events"
+
+    id = Column(Integer, primary_key=True)
+    flashcard_id = Column(Integer, nullable=False)
+    chat_id = Column(BigInteger, nullable=True)
+    kind = Column(String, nullable=False)  # sent | shown | graded | skipped
+    grade = Column(String, nullable=True)  # set for graded events
+    occurred_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_card_events_occurred_at", "occurred_at"),
+        Index("ix_card_events_flashcard", "flashcard_id", "occurred_at"),
+    )
+
+
+class SourceBlock(Base):
+    """
+    Content hash of every top-level block of a source page as of the last
+    generation run; a re-sync diffs against these to find edited blocks.
+    """
+    __tablename__ = "source_blocks"
+
+    id = Column(Integer, primary_key=True)
+    knowledge_source_type = Column(String, nullable=False)
+    knowledge_source_id = Column(String, nullable=False)
+    block_id = Column(String, nullable=False)
+    position = Column(Integer, nullable=False)
+    content_hash = Column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("knowledge_source_type", "knowledge_source_id", "block_id", name="uq_source_blocks_block"),
+    )
+
+
+class FlashcardBlock(Base):
+    """
+    Provenance: the source blocks a card was written from.
+
+    No foreign key to flashcards, like card_events, so archiving a card
+    keeps its links.
+    """
+    __tablename__ = "flashcard_blocks"
+
+    flashcard_id = Column(Integer, primary_key=True, autoincrement=False)
+    block_id = Column(String, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_flashcard_blocks_block", "block_id"),
+    )
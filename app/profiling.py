@@ -0,0 +1,123 @@
+import cProfile
+import functools
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.config import app_config
+
+logger = logging.getLogger(__name__)
+
+# cProfile hooks the interpreter, which allows one active profiler per process (3.12+)
+_cprofile_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval from a background thread.
+
+    The result is written in the collapsed-stack format understood by
+    flamegraph.pl and speedscope. On an event loop thread the samples include
+    every task that ran while the profiler was active, not just the target.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: Path):
+        with path.open("w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _enabled_for(target: str) -> bool:
+    if app_config.profiler is None:
+        return False
+    targets = [t.strip() for t in app_config.profile_targets.split(",") if t.strip()]
+    return not targets or target in targets
+
+
+def _dump_path(target: str, suffix: str) -> Path:
+    directory = Path(app_config.profile_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    safe_name = target.strip("/").replace("/", "_") or "root"
+    return directory / f"{safe_name}-{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns()}.{suffix}"
+
+
+@contextmanager
+def profile(target: str):
+    """Profiles the enclosed block with the configured profiler, if enabled for `target`."""
+    if not _enabled_for(target):
+        yield
+        return
+
+    if app_config.profiler == "cprofile":
+        # A request overlapping a profiled one runs unprofiled; its time shows up in that profile anyway
+        if not _cprofile_lock.acquire(blocking=False):
+            logger.debug("Not profiling %s: another cProfile run is active", target)
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another profiling tool (a debugger, coverage) holds the hook
+            logger.debug("Not profiling %s: %s", target, e)
+            profiler = None
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                path = _dump_path(target, "prof")
+                profiler.dump_stats(path)
+                logger.info("Wrote cProfile stats for %s to %s", target, path)
+            _cprofile_lock.release()
+        return
+
+    sampler = SamplingProfiler(threading.get_ident())
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        path = _dump_path(target, "folded")
+        sampler.dump(path)
+        logger.info("Wrote %d stack samples for %s to %s", sampler.samples.total(), target, path)
+
+
+def profiled(func):
+    """Wraps an async route or Telegram handler in `profile()` under its own name."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with profile(func.__name__):
+            return await func(*args, **kwargs)
+
+    return wrapper
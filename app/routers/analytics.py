@@ -0,0 +1,29 @@
+from datetime import UTC, datetime, timedelta
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.services import analytics_service
+
+router = APIRouter()
+
+
+@router.get("/analytics/retention")
+def get_retention(
+    days: int | None = Query(None, ge=1, description="only events from the last `days` days"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    since = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=days) if days else None
+    return analytics_service.retention_by_source(db, since=since, limit=limit)
+
+
+@router.get("/analytics/activity")
+def get_activity(days: int = Query(30, ge=1, le=366), db: Session = Depends(get_db)):
+    return analytics_service.daily_activity(db, days=days)
+
+
+@router.get("/analytics/stats")
+def get_stats(db: Session = Depends(get_db)):
+    return analytics_service.deck_stats_cache.get(db)
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models import Chat
+from app.schemas import ChatCreate, SubscriptionCreate
+from app.services import chat_service
+
+router = APIRouter()
+
+
+def _chat_dict(db: Session, chat: Chat) -> dict:
+    return {
+        "chat_id": chat.chat_id,
+        "title": chat.title,
+        "active": chat.active,
+        "subscriptions": [
+            {"knowledge_source_type": s.knowledge_source_type, "knowledge_source_id": s.knowledge_source_id}
+            for s in chat_service.get_subscriptions(db, chat.chat_id)
+        ],
+    }
+
+
+@router.get("/chats")
+def list_chats(db: Session = Depends(get_db)):
+    return [_chat_dict(db, chat) for chat in chat_service.list_chats(db)]
+
+
+@router.post("/chats", status_code=201)
+def register_chat(payload: ChatCreate, db: Session = Depends(get_db)):
+    """Authorizes a Telegram chat and gives it its own deck."""
+    chat = chat_service.register_chat(db, payload.chat_id, payload.title)
+    return _chat_dict(db, chat)
+
+
+@router.delete("/chats/{chat_id}")
+def deactivate_chat(chat_id: int, db: Session = Depends(get_db)):
+    if not chat_service.deactivate_chat(db, chat_id):
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return {"chat_id": chat_id, "active": False}
+
+
+@router.post("/chats/{chat_id}/subscriptions", status_code=201)
+def subscribe(chat_id: int, payload: SubscriptionCreate, db: Session = Depends(get_db)):
+    if db.get(Chat, chat_id) is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    created = chat_service.subscribe(db, chat_id, payload.knowledge_source_type, payload.knowledge_source_id)
+    return {"created": created, **payload.model_dump()}
+
+
+@router.delete("/chats/{chat_id}/subscriptions/{source_type}/{source_id}")
+def unsubscribe(chat_id: int, source_type: str, source_id: str, db: Session = Depends(get_db)):
+    if not chat_service.unsubscribe(db, chat_id, source_type, source_id):
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    return {"deleted": True}
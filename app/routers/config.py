@@ -1,9 +1,11 @@
 from urllib.parse import urlencode
 
-from fastapi import APIRouter, Depends, Form
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, Depends, Form, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, RedirectResponse
 from sqlalchemy.orm import Session
 
+from app.cache import cached_response
 from app.database import get_db
 from app.schemas import ConfigUpdate, NotionConfig, OpenRouterConfig, TelegramConfig
 from app.services import config_service
@@ -11,44 +13,34 @@ from app.services import config_service
 router = APIRouter()
 
 
-@router.get("/config", response_model=dict)
-async def get_config(db: Session = Depends(get_db)):
-    notion_config = NotionConfig()
-    openrouter_config = OpenRouterConfig()
-    telegram_config = TelegramConfig()
+@router.get("/config")
+async def get_config(request: Request, db: Session = Depends(get_db)):
+    def render():
+        return JSONResponse(jsonable_encoder(config_service.get_config(db)))
 
-    for key in notion_config.model_dump().keys():
-        value = config_service.get_config_value(db, f"notion_{key}")
-        setattr(notion_config, key, value)
-
-    for key in openrouter_config.model_dump().keys():
-        value = config_service.get_config_value(db, f"openrouter_{key}")
-        setattr(openrouter_config, key, value)
-
-    for key in telegram_config.model_dump().keys():
-        value = config_service.get_config_value(db, f"telegram_{key}")
-        setattr(telegram_config, key, value)
-
-    return {
-        "notion": notion_config,
-        "openrouter": openrouter_config,
-        "telegram": telegram_config,
-    }
+    return cached_response(request, render)
 
 
 @router.post("/config")
 async def update_config(
     notion_api_key: str = Form(None),
     notion_database_id: str = Form(None),
+    notion_databases: str = Form(None),
     openrouter_api_key: str = Form(None),
+    openrouter_models: str = Form(None),
+    openrouter_latency_budget: str = Form(None),
     telegram_bot_token: str = Form(None),
     telegram_chat_id: str = Form(None),
     db: Session = Depends(get_db),
 ):
     notion_config = NotionConfig(
-        notion_api_key=notion_api_key, notion_database_id=notion_database_id
+        notion_api_key=notion_api_key, notion_database_id=notion_database_id, notion_databases=notion_databases
+    )
+    openrouter_config = OpenRouterConfig(
+        openrouter_api_key=openrouter_api_key,
+        openrouter_models=openrouter_models,
+        openrouter_latency_budget=openrouter_latency_budget,
     )
-    openrouter_config = OpenRouterConfig(openrouter_api_key=openrouter_api_key)
     telegram_config = TelegramConfig(
         telegram_bot_token=telegram_bot_token, telegram_chat_id=telegram_chat_id
     )
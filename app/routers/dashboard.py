@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, Request, Query
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import APIRouter, Depends, Header, Request, Query
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 
+from app.cache import cached_response
 from app.database import get_db
-from app.services import config_service, dashboard_service, knowledge_service
+from app.events import event_bus
+from app.services import config_service, dashboard_service, sync_service
 
 router = APIRouter()
 
@@ -13,21 +15,42 @@ templates = Jinja2Templates(directory="templates")
 
 @router.get("/dashboard", response_class=HTMLResponse)
 async def get_dashboard(request: Request, db: Session = Depends(get_db)):
-    config = config_service.get_config(db)
-    flashcards = dashboard_service.get_flashcards(db)
-    return templates.TemplateResponse(
-        "dashboard.html",
-        {"request": request, "config": config, "flashcards": flashcards},
+    def render():
+        config = config_service.get_config(db)
+        flashcards = dashboard_service.get_flashcards(db)
+        return templates.TemplateResponse(
+            "dashboard.html",
+            {"request": request, "config": config, "flashcards": flashcards},
+        )
+
+    return cached_response(request, render)
+
+
+@router.get("/api/events")
+async def stream_events(last_event_id: int | None = Header(None)):
+    """
+    Server-sent events for the open dashboard: `card` (new card), `status`,
+    `deleted`, `job` (fetch/generate/import/archive progress) and `resync`
+    (reload the card list, e.g. after a bulk import).
+    """
+    return StreamingResponse(
+        event_bus.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 @router.get("/api/fetch", response_class=JSONResponse)
-async def fetch_knowledge(
-    db: Session = Depends(get_db),
-):
+async def fetch_knowledge():
     """
     Fetch knowledge from configured sources.
-    If source is specified, only fetch from that source.
+    Shares the background sync's run if one is in progress.
     """
-    results = await knowledge_service.fetch_from_all_sources(db)
+    results = await sync_service.scheduler.run()
     return results
+
+
+@router.get("/api/sync", response_class=JSONResponse)
+async def get_sync_schedule():
+    """When the background sync runs next, per source, and how long the last runs took."""
+    return sync_service.scheduler.status()
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db, get_db_session
+from app.services import export_service, import_service
+
+router = APIRouter()
+
+
+def _stream_export(iter_export):
+    # The request-scoped session is closed before a streaming body is sent,
+    # so the export owns its session for as long as rows are being read.
+    db = get_db_session()
+    try:
+        yield from iter_export(db)
+    finally:
+        db.close()
+
+
+@router.get("/flashcards/export")
+def export_flashcards(format: str = Query("csv", pattern="^(csv|jsonl|apkg)$")):
+    """Streams every flashcard as CSV, JSONL or an Anki package with constant memory."""
+    iter_export, media_type, filename = export_service.EXPORT_FORMATS[format]
+    return StreamingResponse(
+        _stream_export(iter_export),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/flashcards/import", response_class=JSONResponse)
+async def import_flashcards(
+    file: UploadFile = File(...),
+    format: str | None = Query(None, pattern="^(csv|jsonl)$"),
+    db: Session = Depends(get_db),
+):
+    """Bulk imports a CSV or JSONL upload, skipping cards that already exist."""
+    fmt = format or Path(file.filename or "").suffix.lstrip(".").lower()
+    if fmt not in import_service.IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Upload a .csv or .jsonl file or pass ?format=")
+
+    records = import_service.read_records(file.file, fmt)
+    try:
+        report = await run_in_threadpool(
+            import_service.import_records, db, records, default_source=file.filename or "import"
+        )
+    except import_service.ImportFormatError as e:
+        # Chunks before the bad line stay imported; importing the file again skips them as duplicates
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    return report.as_dict()
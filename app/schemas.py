@@ -4,12 +4,19 @@ from pydantic import BaseModel
 class NotionConfig(BaseModel):
     notion_api_key: str | None = None
     notion_database_id: str | None = None
+    # JSON list of {"id", "name", "filter", "title_property"}, or comma-separated IDs;
+    # replaces notion_database_id when set
+    notion_databases: str | None = None
 
     class Config:
         orm_mode = True
 
 class OpenRouterConfig(BaseModel):
     openrouter_api_key: str | None = None
+    # Comma-separated models in order of preference, each optionally `=max_concurrent`
+    openrouter_models: str | None = None
+    # Seconds a model may take to its first chunk before the request is hedged on the next one
+    openrouter_latency_budget: str | None = None
 
     class Config:
         orm_mode = True
@@ -25,3 +32,11 @@ class ConfigUpdate(BaseModel):
     notion: NotionConfig | None = None
     openrouter: OpenRouterConfig | None = None
     telegram: TelegramConfig | None = None
+
+class ChatCreate(BaseModel):
+    chat_id: int
+    title: str | None = None
+
+class SubscriptionCreate(BaseModel):
+    knowledge_source_id: str
+    knowledge_source_type: str = "notion"
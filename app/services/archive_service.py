@@ -0,0 +1,189 @@
+import asyncio
+import logging
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import DateTime, delete, func, insert, literal, or_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models import ArchivedFlashcard, Flashcard
+from app.services import live_service
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH = 5000
+# Pages returned to the file system per incremental vacuum step (4 MB with 4 KB pages)
+VACUUM_STEP_PAGES = 1000
+# Pause between vacuum steps so other writers get the lock
+VACUUM_STEP_PAUSE = 0.05
+
+_ARCHIVED_COLUMNS = [column.name for column in Flashcard.__table__.columns]
+
+
+@dataclass
+class StorageStats:
+    hot_rows: int
+    archived_rows: int
+    page_size: int
+    page_count: int
+    freelist_count: int
+    auto_vacuum: str
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def archive_cutoff(months: int, now: datetime | None = None) -> datetime:
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    return now - timedelta(days=30 * months)
+
+
+def archive_flashcards(db: Session, months: int, now: datetime | None = None, batch_size: int = ARCHIVE_BATCH) -> int:
+    """
+    Moves cards untouched for `months` into flashcards_archive; returns how many moved.
+
+    Untouched means sent before the cutoff and not due for review after it
+    (a card reviewed since then has a later due_at). Pending cards are never
+    archived. Each batch is copied and deleted in its own transaction to keep
+    write locks short, walking the table by id so no row is scanned twice.
+    """
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    cutoff = archive_cutoff(months, now)
+    # SQLite reuses the highest rowid after it is deleted; keeping it in the hot table means
+    # new cards never get an id that is already in the archive
+    max_id = db.scalar(select(func.max(Flashcard.id))) or 0
+    last_id = 0
+    moved = 0
+    while True:
+        ids = list(db.scalars(
+            select(Flashcard.id)
+            .where(
+                Flashcard.id > last_id,
+                Flashcard.id < max_id,
+                # Retired cards were sent once too; they only wait for their history to age
+                Flashcard.status.in_(("sent", "retired")),
+                Flashcard.sent_at < cutoff,
+                or_(Flashcard.due_at.is_(None), Flashcard.due_at < cutoff),
+            )
+            .order_by(Flashcard.id)
+            .limit(batch_size)
+        ))
+        if not ids:
+            break
+        try:
+            columns = [getattr(Flashcard, name) for name in _ARCHIVED_COLUMNS]
+            db.execute(
+                insert(ArchivedFlashcard).from_select(
+                    [*_ARCHIVED_COLUMNS, "archived_at"],
+                    select(*columns, literal(now, DateTime())).where(Flashcard.id.in_(ids)),
+                )
+            )
+            db.execute(delete(Flashcard).where(Flashcard.id.in_(ids)))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        moved += len(ids)
+        last_id = ids[-1]
+    if moved:
+        logger.info("Archived %d flashcards untouched since %s.", moved, cutoff.date())
+    return moved
+
+
+def storage_stats(bind: Engine) -> StorageStats:
+    with bind.connect() as conn:
+
+        def pragma(name: str) -> int:
+            return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+        return StorageStats(
+            hot_rows=conn.scalar(select(func.count()).select_from(Flashcard)),
+            archived_rows=conn.scalar(select(func.count()).select_from(ArchivedFlashcard)),
+            page_size=pragma("page_size"),
+            page_count=pragma("page_count"),
+            freelist_count=pragma("freelist_count"),
+            auto_vacuum={0: "none", 1: "full", 2: "incremental"}.get(pragma("auto_vacuum"), "unknown"),
+        )
+
+
+def enable_incremental_vacuum(bind: Engine) -> bool:
+    """
+    Switches an SQLite file created before incremental auto-vacuum to it.
+
+    That takes one full VACUUM, which rewrites the whole file and blocks
+    writers meanwhile, so it is only done from `srs archive`. Returns True if
+    the file was converted.
+    """
+    if storage_stats(bind).auto_vacuum == "incremental":
+        return False
+    logger.info("Converting the database to incremental auto-vacuum (one full VACUUM).")
+    raw = bind.raw_connection()
+    try:
+        raw.driver_connection.executescript("PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+    finally:
+        raw.close()
+    return True
+
+
+def vacuum_step(bind: Engine, pages: int = VACUUM_STEP_PAGES) -> int:
+    """Returns up to `pages` free pages to the file system; returns how many are still free."""
+    raw = bind.raw_connection()
+    try:
+        # execute() would step the pragma once and free a single page; executescript() runs it to completion
+        raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        return raw.driver_connection.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        raw.close()
+
+
+async def incremental_vacuum(
+    bind: Engine, pages: int = VACUUM_STEP_PAGES, pause: float = VACUUM_STEP_PAUSE
+) -> int:
+    """Vacuums in steps of `pages` until the free list is empty; returns the pages freed."""
+    stats = await asyncio.to_thread(storage_stats, bind)
+    if stats.auto_vacuum != "incremental" or not stats.freelist_count:
+        return 0
+    remaining = stats.freelist_count
+    while remaining:
+        left = await asyncio.to_thread(vacuum_step, bind, pages)
+        if left >= remaining:
+            break
+        remaining = left
+        await asyncio.sleep(pause)
+    freed = stats.freelist_count - remaining
+    logger.info("Incremental vacuum returned %d pages (%d KB).", freed, freed * stats.page_size // 1024)
+    return freed
+
+
+def _archive(bind: Engine, months: int) -> int:
+    db = Session(bind=bind)
+    try:
+        return archive_flashcards(db, months)
+    finally:
+        db.close()
+
+
+async def run_maintenance(bind: Engine, months: int, vacuum_pages: int = VACUUM_STEP_PAGES) -> dict:
+    """
+    One archival pass followed by a stepped incremental vacuum; `months` or
+    `vacuum_pages` of 0 skips the respective part.
+    """
+    live_service.publish_job("archive", "started")
+    archived = await asyncio.to_thread(_archive, bind, months) if months > 0 else 0
+    if archived:
+        # Archived cards leave the dashboard's table
+        live_service.publish_resync()
+    # incremental_vacuum(0) would free every page in one go, so 0 must not reach it
+    freed = await incremental_vacuum(bind, vacuum_pages) if vacuum_pages > 0 and bind.dialect.name == "sqlite" else 0
+    live_service.publish_job("archive", "done", archived=archived, pages_freed=freed)
+    return {"archived": archived, "pages_freed": freed}
+
+
+async def maintenance_loop(bind: Engine, interval: float, months: int, vacuum_pages: int = VACUUM_STEP_PAGES) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_maintenance(bind, months, vacuum_pages)
+        except Exception as e:
+            logger.error("Scheduled archival failed: %s", e, exc_info=True)
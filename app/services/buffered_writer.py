@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BufferedWriter(Generic[T]):
+    """
+    Collects items in memory and hands them to `flush` in batches.
+
+    A batch is written once `max_items` are pending or `max_delay` seconds
+    after the first pending item, whichever comes first. `flush` is a
+    blocking function (one DB transaction per batch) and runs in a worker
+    thread, so callers on the event loop never wait on the database. Items
+    from a failed flush are kept and retried with the next batch, up to
+    `max_retries` times in a row; a batch that still fails is dropped, so an
+    error that won't go away doesn't hold back everything queued behind it.
+    """
+
+    def __init__(
+        self, flush: Callable[[list[T]], None], max_items: int = 200, max_delay: float = 2.0, max_retries: int = 5
+    ):
+        self._flush = flush
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self._failures = 0
+        self._pending: list[T] = []
+        self._lock = asyncio.Lock()
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.flushed = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, item: T) -> None:
+        self._pending.append(item)
+        if len(self._pending) >= self.max_items:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+
+    def _schedule_flush(self) -> None:
+        task = asyncio.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> None:
+        """Writes everything pending now, `max_items` per batch; concurrent calls are serialized."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            while self._pending:
+                batch, self._pending = self._pending[: self.max_items], self._pending[self.max_items :]
+                try:
+                    await asyncio.to_thread(self._flush, batch)
+                except Exception as e:
+                    self._failures += 1
+                    if self._failures > self.max_retries:
+                        logger.error(
+                            "Dropping %d buffered items after %d failed flushes: %s", len(batch), self._failures, e,
+                            exc_info=True,
+                        )
+                        self._failures = 0
+                        self.dropped += len(batch)
+                        continue
+                    logger.error("Failed to flush %d buffered items, will retry: %s", len(batch), e, exc_info=True)
+                    self._pending[:0] = batch
+                    if self._timer is None:
+                        self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+                    return
+                self._failures = 0
+                self.flushed += len(batch)
+                logger.debug("Flushed %d buffered items", len(batch))
+
+    async def close(self) -> None:
+        """Flushes remaining items; call on shutdown."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.database import get_db_session
+from app.models import Chat, Flashcard, Subscription
+from app.services import config_service
+
+logger = logging.getLogger(__name__)
+
+# How long the bot trusts its copy of the authorized chats before reloading it
+AUTH_CACHE_TTL = 60.0
+
+
+def register_chat(db: Session, chat_id: int, title: str | None = None, claim_unowned: bool = False) -> Chat:
+    """
+    Adds (or reactivates) a chat with its own deck.
+
+    With `claim_unowned`, cards that predate multi-chat support (chat_id NULL)
+    are assigned to this chat; the bot does this for the configured chat.
+    """
+    chat = db.get(Chat, chat_id)
+    if chat is None:
+        chat = Chat(chat_id=chat_id, title=title, active=True)
+        db.add(chat)
+    else:
+        chat.active = True
+        chat.title = title or chat.title
+    if claim_unowned:
+        claimed = db.execute(
+            update(Flashcard).where(Flashcard.chat_id.is_(None)).values(chat_id=chat_id)
+        ).rowcount
+        if claimed:
+            logger.info("Assigned %d unowned flashcards to chat %s.", claimed, chat_id)
+    db.commit()
+    authorized_chats.invalidate()
+    return chat
+
+
+def deactivate_chat(db: Session, chat_id: int) -> bool:
+    chat = db.get(Chat, chat_id)
+    if chat is None:
+        return False
+    chat.active = False
+    db.commit()
+    authorized_chats.invalidate()
+    return True
+
+
+def list_chats(db: Session) -> list[Chat]:
+    return db.query(Chat).order_by(Chat.chat_id).all()
+
+
+def subscribe(db: Session, chat_id: int, source_type: str, source_id: str) -> bool:
+    """Subscribes a registered chat to a knowledge source; returns False if it already was."""
+    exists = db.query(Subscription.id).filter_by(
+        chat_id=chat_id, knowledge_source_type=source_type, knowledge_source_id=source_id
+    ).first()
+    if exists:
+        return False
+    db.add(Subscription(chat_id=chat_id, knowledge_source_type=source_type, knowledge_source_id=source_id))
+    db.commit()
+    return True
+
+
+def unsubscribe(db: Session, chat_id: int, source_type: str, source_id: str) -> bool:
+    deleted = db.query(Subscription).filter_by(
+        chat_id=chat_id, knowledge_source_type=source_type, knowledge_source_id=source_id
+    ).delete()
+    db.commit()
+    return deleted > 0
+
+
+def get_subscriptions(db: Session, chat_id: int) -> list[Subscription]:
+    return db.query(Subscription).filter_by(chat_id=chat_id).order_by(Subscription.id).all()
+
+
+def get_subscribers(db: Session, source_type: str, source_id: str) -> list[int]:
+    """Active chats subscribed to a knowledge source, i.e. the decks its cards belong in."""
+    stmt = (
+        select(Subscription.chat_id)
+        .join(Chat, Chat.chat_id == Subscription.chat_id)
+        .where(
+            Subscription.knowledge_source_type == source_type,
+            Subscription.knowledge_source_id == source_id,
+            Chat.active.is_(True),
+        )
+        .order_by(Subscription.chat_id)
+    )
+    return list(db.scalars(stmt))
+
+
+def deck_chat_ids(db: Session, source_type: str, source_id: str) -> list[int | None]:
+    """
+    Chats whose decks receive cards generated from a source.
+
+    Sources nobody subscribed to go to the configured chat, as they did
+    before per-chat decks; None (unowned) if that isn't set either.
+    """
+    subscribers = get_subscribers(db, source_type, source_id)
+    if subscribers:
+        return subscribers
+    return [configured_chat_id(db)]
+
+
+def configured_chat_id(db: Session) -> int | None:
+    """The chat configured on the dashboard; None if it isn't set (or isn't a number)."""
+    configured = config_service.get_config_value(db, "telegram_chat_id")
+    try:
+        return int(configured) if configured else None
+    except ValueError:
+        return None
+
+
+def load_authorized_chat_ids(db: Session) -> set[int]:
+    """Active chats plus the single chat configured on the dashboard."""
+    chat_ids = set(db.scalars(select(Chat.chat_id).where(Chat.active.is_(True))))
+    configured = config_service.get_config_value(db, "telegram_chat_id")
+    if configured:
+        try:
+            chat_ids.add(int(configured))
+        except ValueError:
+            logger.error("Invalid Telegram Chat ID configured: %s", configured)
+    return chat_ids
+
+
+class AuthorizedChats:
+    """
+    In-memory set of chats the bot answers, reloaded at most every `ttl` seconds.
+
+    Chats are added through the API by the web process, so the bot notices
+    them after at most one TTL; writes in the same process invalidate it.
+    """
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL):
+        self.ttl = ttl
+        self._chat_ids: frozenset[int] = frozenset()
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def cached(self) -> frozenset[int] | None:
+        """The chat ids if they are fresh, None if chat_ids() would query the database."""
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.ttl:
+            return self._chat_ids
+        return None
+
+    def chat_ids(self) -> frozenset[int]:
+        cached = self.cached()
+        if cached is not None:
+            return cached
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+                db = get_db_session()
+                try:
+                    self._chat_ids = frozenset(load_authorized_chat_ids(db))
+                finally:
+                    db.close()
+                self._loaded_at = time.monotonic()
+            return self._chat_ids
+
+    def is_authorized(self, chat_id: int) -> bool:
+        return chat_id in self.chat_ids()
+
+
+authorized_chats = AuthorizedChats()
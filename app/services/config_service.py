@@ -18,25 +18,22 @@ def set_config_value(db: Session, key: str, value: str | None):
     db.add(db_config)
 
 
-def get_config(db: Session):
-    notion_config = NotionConfig()
-    openrouter_config = OpenRouterConfig()
-    telegram_config = TelegramConfig()
-
-    for key in notion_config.model_dump().keys():
-        value = get_config_value(db, key)
-        setattr(notion_config, key, value)
+def get_config_values(db: Session, keys: list[str]) -> dict[str, str | None]:
+    """Loads several config keys in one query; missing keys map to None."""
+    rows = db.query(Config.key, Config.value).filter(Config.key.in_(keys)).all()
+    values = dict.fromkeys(keys)
+    values.update(rows)
+    return values
 
-    for key in openrouter_config.model_dump().keys():
-        value = get_config_value(db, key)
-        setattr(openrouter_config, key, value)
 
-    for key in telegram_config.model_dump().keys():
-        value = get_config_value(db, key)
-        setattr(telegram_config, key, value)
+def get_config(db: Session):
+    notion_keys = list(NotionConfig.model_fields)
+    openrouter_keys = list(OpenRouterConfig.model_fields)
+    telegram_keys = list(TelegramConfig.model_fields)
+    values = get_config_values(db, notion_keys + openrouter_keys + telegram_keys)
 
     return {
-        "notion": notion_config,
-        "openrouter": openrouter_config,
-        "telegram": telegram_config,
+        "notion": NotionConfig(**{key: values[key] for key in notion_keys}),
+        "openrouter": OpenRouterConfig(**{key: values[key] for key in openrouter_keys}),
+        "telegram": TelegramConfig(**{key: values[key] for key in telegram_keys}),
     }
@@ -4,4 +4,5 @@ from app.models import Flashcard
 
 
 def get_flashcards(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Flashcard).offset(skip).limit(limit).all()
+    """Newest cards first, so live updates can prepend new ones."""
+    return db.query(Flashcard).order_by(Flashcard.id.desc()).offset(skip).limit(limit).all()
@@ -0,0 +1,281 @@
+import logging
+from collections import defaultdict, deque
+from collections.abc import Hashable
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Chat, Flashcard
+from app.services import card_event_service, live_service
+
+logger = logging.getLogger(__name__)
+
+# Telegram's documented bot limits: ~30 messages/s overall, ~1 message/s per chat
+GLOBAL_RATE = 30.0
+PER_CHAT_INTERVAL = 1.0
+MARK_SENT_BATCH = 500
+# Lease on claimed cards when the caller does not pass one
+LEASE_SECONDS = 900
+
+
+class FairScheduler:
+    """
+    Round-robin delivery order across chats under a global and a per-chat rate.
+
+    Each call to `next()` takes one message from the chat at the head of the
+    ring and moves that chat to the tail, so every chat with pending messages
+    gets one send per round no matter how much the others have queued. Send
+    times are reserved on a single timeline spaced 1/global_rate apart, and a
+    chat's consecutive messages are at least `per_chat_interval` apart.
+
+    The scheduler does no I/O and takes the clock as an argument, so the same
+    code drives real delivery and the offline simulation benchmark.
+    """
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, per_chat_interval: float = PER_CHAT_INTERVAL):
+        self.spacing = 1.0 / global_rate
+        self.per_chat_interval = per_chat_interval
+        self._queues: dict[Hashable, deque] = {}
+        self._ring: deque[Hashable] = deque()
+        self._chat_ready_at: dict[Hashable, float] = defaultdict(float)
+        self._next_slot = 0.0
+        self._pending = 0
+
+    def __len__(self) -> int:
+        return self._pending
+
+    @property
+    def chats(self) -> int:
+        """Chats that still have messages queued."""
+        return len(self._queues)
+
+    def enqueue(self, chat_id: Hashable, message: Any) -> None:
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+            self._ring.append(chat_id)
+        queue.append(message)
+        self._pending += 1
+
+    def requeue(self, chat_id: Hashable, message: Any) -> None:
+        """Puts a message back at the front of its chat and the chat at the head of the ring (for retries)."""
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+        else:
+            self._ring.remove(chat_id)
+        queue.appendleft(message)
+        self._ring.appendleft(chat_id)
+        self._pending += 1
+
+    def pause_until(self, when: float) -> None:
+        """Holds back every send until `when`, e.g. after a 429 with retry_after."""
+        self._next_slot = max(self._next_slot, when)
+
+    def next(self, now: float) -> tuple[float, Hashable, Any] | None:
+        """Pops the next message in round-robin order as (send_at, chat_id, message), or None when drained."""
+        if not self._ring:
+            return None
+        chat_id = self._ring.popleft()
+        queue = self._queues[chat_id]
+        message = queue.popleft()
+        self._pending -= 1
+
+        send_at = max(now, self._next_slot, self._chat_ready_at[chat_id])
+        self._next_slot = send_at + self.spacing
+        self._chat_ready_at[chat_id] = send_at + self.per_chat_interval
+        if queue:
+            self._ring.append(chat_id)
+        else:
+            del self._queues[chat_id]
+        return send_at, chat_id, message
+
+
+def load_pending_by_chat(db: Session, per_chat: int) -> dict[int, list]:
+    """
+    Up to `per_chat` pending cards for every active chat, oldest first.
+
+    One windowed query over ix_flashcards_chat_status instead of a query per
+    chat; rows are returned as-is (they expose the attributes the formatters read).
+    """
+    ranked = (
+        select(
+            Flashcard.id,
+            Flashcard.chat_id,
+            Flashcard.question,
+            Flashcard.answer,
+            Flashcard.knowledge_source_type,
+            Flashcard.knowledge_source_id,
+            func.row_number().over(partition_by=Flashcard.chat_id, order_by=Flashcard.id).label("position"),
+        )
+        .join(Chat, Chat.chat_id == Flashcard.chat_id)
+        .where(Flashcard.status == "pending", Chat.active.is_(True))
+        .subquery()
+    )
+    stmt = select(ranked).where(ranked.c.position <= per_chat).order_by(ranked.c.chat_id, ranked.c.id)
+    cards_by_chat: dict[int, list] = defaultdict(list)
+    for row in db.execute(stmt):
+        cards_by_chat[row.chat_id].append(row)
+    logger.info(
+        "Loaded %d pending flashcards for %d chats.", sum(map(len, cards_by_chat.values())), len(cards_by_chat)
+    )
+    return cards_by_chat
+
+
+def _utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def _claimable(now: datetime):
+    """Pending cards, and claimed ones whose worker let the lease run out."""
+    return or_(
+        Flashcard.status == "pending",
+        and_(Flashcard.status == "claimed", Flashcard.lease_expires_at < now),
+    )
+
+
+def claim_pending_by_chat(
+    db: Session, per_chat: int, owner: str, lease_seconds: float = LEASE_SECONDS, now: datetime | None = None
+) -> dict[int, list]:
+    """
+    Claims up to `per_chat` deliverable cards for every active chat for
+    `owner`, oldest first, and returns them like load_pending_by_chat.
+
+    The selection and the move to "claimed" are one UPDATE ... RETURNING, so
+    concurrent delivery workers never get the same card; the claim condition
+    is repeated on the outer UPDATE for databases that re-check rows after
+    waiting on a lock. Cards whose lease expired without a confirmation
+    (the worker died mid-delivery) are claimable again.
+    """
+    now = now or _utcnow()
+    ranked = (
+        select(
+            Flashcard.id,
+            func.row_number().over(partition_by=Flashcard.chat_id, order_by=Flashcard.id).label("position"),
+        )
+        .join(Chat, Chat.chat_id == Flashcard.chat_id)
+        .where(_claimable(now), Chat.active.is_(True))
+        .subquery()
+    )
+    stmt = (
+        update(Flashcard)
+        .where(Flashcard.id.in_(select(ranked.c.id).where(ranked.c.position <= per_chat)), _claimable(now))
+        .values(status="claimed", claimed_by=owner, lease_expires_at=now + timedelta(seconds=lease_seconds))
+        .returning(
+            Flashcard.id,
+            Flashcard.chat_id,
+            Flashcard.question,
+            Flashcard.answer,
+            Flashcard.knowledge_source_type,
+            Flashcard.knowledge_source_id,
+        )
+    )
+    try:
+        rows = db.execute(stmt).all()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    cards_by_chat: dict[int, list] = defaultdict(list)
+    # RETURNING comes back in no particular order
+    for row in sorted(rows, key=lambda row: (row.chat_id, row.id)):
+        cards_by_chat[row.chat_id].append(row)
+    logger.info("%s claimed %d pending flashcards for %d chats.", owner, len(rows), len(cards_by_chat))
+    return cards_by_chat
+
+
+def renew_claims(
+    db: Session, owner: str, flashcard_ids: list[int], lease_seconds: float = LEASE_SECONDS, now: datetime | None = None
+) -> list[int]:
+    """
+    Extends `owner`'s leases on the cards it still holds to `lease_seconds`
+    from now; returns their ids. A card left out was confirmed, released or
+    (once its lease ran out) claimed by another worker.
+    """
+    now = now or _utcnow()
+    renewed = []
+    try:
+        for start in range(0, len(flashcard_ids), MARK_SENT_BATCH):
+            renewed += db.scalars(
+                update(Flashcard)
+                .where(
+                    Flashcard.id.in_(flashcard_ids[start : start + MARK_SENT_BATCH]),
+                    Flashcard.status == "claimed",
+                    Flashcard.claimed_by == owner,
+                )
+                .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+                .returning(Flashcard.id)
+            ).all()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return renewed
+
+
+def release_claims(db: Session, owner: str, flashcard_ids: list[int]) -> int:
+    """Puts cards `owner` claimed but could not deliver back to pending; returns how many it still held."""
+    released = 0
+    try:
+        for start in range(0, len(flashcard_ids), MARK_SENT_BATCH):
+            released += db.execute(
+                update(Flashcard)
+                .where(
+                    Flashcard.id.in_(flashcard_ids[start : start + MARK_SENT_BATCH]),
+                    Flashcard.status == "claimed",
+                    Flashcard.claimed_by == owner,
+                )
+                .values(status="pending", claimed_by=None, lease_expires_at=None)
+            ).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return released
+
+
+def mark_sent(
+    db: Session,
+    flashcard_ids: list[int],
+    sent_at: datetime | None = None,
+    chat_ids: dict[int, int] | None = None,
+    owner: str | None = None,
+) -> list[int]:
+    """
+    Marks delivered cards as sent and logs a `sent` event for each, in one
+    transaction. `chat_ids` maps card ids to the chat they went to, if known.
+
+    With `owner`, only cards that worker still holds an unexpired claim on
+    are confirmed (a card retired meanwhile stays retired, and one whose
+    lease ran out is another worker's to deliver). Returns the ids marked sent.
+    """
+    if not flashcard_ids:
+        return []
+    now = _utcnow()
+    sent_at = sent_at or now
+    chat_ids = chat_ids or {}
+    held = [] if owner is None else [
+        Flashcard.status == "claimed", Flashcard.claimed_by == owner, Flashcard.lease_expires_at > now
+    ]
+    try:
+        confirmed = []
+        for start in range(0, len(flashcard_ids), MARK_SENT_BATCH):
+            confirmed += db.scalars(
+                update(Flashcard)
+                .where(Flashcard.id.in_(flashcard_ids[start : start + MARK_SENT_BATCH]), *held)
+                .values(status="sent", sent_at=sent_at, claimed_by=None, lease_expires_at=None)
+                .returning(Flashcard.id)
+            ).all()
+        flashcard_ids = confirmed
+        card_event_service.append_events(
+            db,
+            [card_event_service.event_row(flashcard_id, "sent", chat_ids.get(flashcard_id), at=sent_at) for flashcard_id in flashcard_ids],
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    live_service.publish_status(flashcard_ids, "sent", sent_at)
+    return flashcard_ids
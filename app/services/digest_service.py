@@ -0,0 +1,135 @@
+import html
+import logging
+import tempfile
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TextIO
+
+logger = logging.getLogger(__name__)
+
+# Digest formats with their file extensions
+DIGEST_FORMATS = {"html": ".html", "markdown": ".md"}
+# Bots may upload documents of up to 50 MB; larger digests are split into parts
+DIGEST_MAX_BYTES = 45 * 1024 * 1024
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+body {{ font-family: system-ui, sans-serif; max-width: 46rem; margin: 1.5rem auto; padding: 0 1rem; line-height: 1.5; }}
+details {{ border: 1px solid #ddd; border-radius: 6px; margin: 0.5rem 0; padding: 0.5rem 0.75rem; }}
+summary {{ cursor: pointer; font-weight: 600; }}
+.answer {{ margin-top: 0.5rem; white-space: pre-wrap; }}
+.source {{ color: #777; font-size: 0.85em; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+"""
+
+
+def _source(card) -> str:
+    if card.knowledge_source_id:
+        return f"{card.knowledge_source_type} ({card.knowledge_source_id})"
+    return card.knowledge_source_type
+
+
+def _html_card(card) -> str:
+    return (
+        f"<details><summary>{html.escape(card.question.strip())}</summary>"
+        f'<div class="answer">{html.escape(card.answer.strip())}</div>'
+        f'<div class="source">{html.escape(_source(card))}</div></details>\n'
+    )
+
+
+def _markdown_card(card) -> str:
+    return (
+        f"<details>\n<summary>{html.escape(card.question.strip())}</summary>\n\n"
+        f"{html.escape(card.answer.strip(), quote=False)}\n\n"
+        f"*Source: {html.escape(_source(card), quote=False)}*\n</details>\n\n"
+    )
+
+
+@dataclass(frozen=True)
+class _Layout:
+    head: Callable[[str], str]
+    card: Callable[[object], str]
+    tail: str
+
+
+# Both show one collapsed <details> per card: the question, click for the answer.
+# Markdown viewers render the same HTML blocks.
+_LAYOUTS = {
+    "html": _Layout(lambda title: _HTML_HEAD.format(title=html.escape(title)), _html_card, "</body>\n</html>\n"),
+    "markdown": _Layout(lambda title: f"# {title}\n\n", _markdown_card, ""),
+}
+
+
+def _layout(digest_format: str) -> _Layout:
+    if digest_format not in _LAYOUTS:
+        raise ValueError(f"Unknown digest format: {digest_format}")
+    return _LAYOUTS[digest_format]
+
+
+def write_digest(file: TextIO, title: str, cards: Iterable, digest_format: str = "html") -> int:
+    """Writes the digest of `cards` to `file` as they are iterated; returns how many there were."""
+    layout = _layout(digest_format)
+    file.write(layout.head(title))
+    count = 0
+    for card in cards:
+        file.write(layout.card(card))
+        count += 1
+    file.write(layout.tail)
+    return count
+
+
+def render_digest(
+    title: str,
+    cards: Iterable,
+    digest_format: str = "html",
+    directory: str | Path | None = None,
+    max_bytes: int = DIGEST_MAX_BYTES,
+) -> tuple[list[Path], int]:
+    """
+    Streams the digest into temporary files and returns their paths and the
+    number of cards. Memory stays bounded however many cards there are (pass
+    an iterator over a DB cursor); a digest over `max_bytes` continues in a
+    new file, titled as the next part. The caller deletes the files.
+    """
+    layout = _layout(digest_format)
+    tail_bytes = len(layout.tail.encode())
+    cards = iter(cards)
+    card = next(cards, None)
+    paths: list[Path] = []
+    count = 0
+    try:
+        while card is not None or not paths:
+            part_title = f"{title} (part {len(paths) + 1})" if paths else title
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", suffix=DIGEST_FORMATS[digest_format], prefix="digest-", dir=directory, delete=False
+            ) as file:
+                paths.append(Path(file.name))
+                head = layout.head(part_title)
+                file.write(head)
+                size = len(head.encode()) + tail_bytes
+                written = 0
+                while card is not None:
+                    text = layout.card(card)
+                    size += len(text.encode())
+                    if written and size > max_bytes:
+                        break
+                    file.write(text)
+                    written += 1
+                    card = next(cards, None)
+                file.write(layout.tail)
+            count += written
+    except Exception:
+        for path in paths:
+            path.unlink(missing_ok=True)
+        raise
+    logger.info("Rendered a %s digest of %d cards in %d file(s).", digest_format, count, len(paths))
+    return paths, count
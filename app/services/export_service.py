@@ -0,0 +1,226 @@
+import csv
+import hashlib
+import html
+import io
+import json
+import logging
+import shutil
+import sqlite3
+import tempfile
+import time
+import zipfile
+from collections.abc import Iterator
+from itertools import islice
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Flashcard
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = (
+    "id",
+    "question",
+    "answer",
+    "knowledge_source_type",
+    "knowledge_source_id",
+    "status",
+    "created_at",
+    "sent_at",
+)
+# Rows fetched per round trip from the server-side cursor
+FETCH_SIZE = 2000
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def iter_flashcard_rows(db: Session) -> Iterator[tuple]:
+    """Streams all flashcards as plain tuples in EXPORT_COLUMNS order, FETCH_SIZE rows at a time."""
+    stmt = select(*(getattr(Flashcard, column) for column in EXPORT_COLUMNS)).order_by(Flashcard.id)
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=FETCH_SIZE))
+    for partition in result.partitions():
+        yield from partition
+
+
+def _isoformat(value) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def iter_csv(db: Session) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in iter_flashcard_rows(db):
+        writer.writerow((*row[:6], _isoformat(row[6]), _isoformat(row[7])))
+        if buffer.tell() >= STREAM_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(db: Session) -> Iterator[str]:
+    lines = []
+    size = 0
+    for row in iter_flashcard_rows(db):
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record["created_at"] = _isoformat(record["created_at"])
+        record["sent_at"] = _isoformat(record["sent_at"])
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_BYTES:
+            yield "".join(lines)
+            lines = []
+            size = 0
+    yield "".join(lines)
+
+
+# --- Anki (.apkg) ---
+
+ANKI_SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null, scm integer not null,
+    ver integer not null, dty integer not null, usn integer not null, ls integer not null,
+    conf text not null, models text not null, decks text not null, dconf text not null, tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null, mod integer not null,
+    usn integer not null, tags text not null, flds text not null, sfld integer not null,
+    csum integer not null, flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null, ord integer not null,
+    mod integer not null, usn integer not null, type integer not null, queue integer not null,
+    due integer not null, ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null, odid integer not null,
+    flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null, ease integer not null,
+    ivl integer not null, lastIvl integer not null, factor integer not null, time integer not null,
+    type integer not null
+);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+
+ANKI_MODEL_ID = 1607392319
+ANKI_DECK_ID = 2059400110
+ANKI_DECK_NAME = "SRS"
+
+
+def _anki_collection_json(now: int) -> tuple[str, str, str, str]:
+    conf = {
+        "activeDecks": [ANKI_DECK_ID], "curDeck": ANKI_DECK_ID, "newSpread": 0, "collapseTime": 1200,
+        "timeLim": 0, "estTimes": True, "dueCounts": True, "curModel": str(ANKI_MODEL_ID),
+        "nextPos": 1, "sortType": "noteFld", "sortBackwards": False, "addToCur": True,
+    }
+    models = {
+        str(ANKI_MODEL_ID): {
+            "id": ANKI_MODEL_ID, "name": "SRS Basic", "type": 0, "mod": now, "usn": -1, "sortf": 0,
+            "did": ANKI_DECK_ID, "tags": [], "vers": [], "req": [[0, "all", [0]]],
+            "flds": [
+                {"name": name, "ord": ord_, "font": "Arial", "size": 20, "media": [], "rtl": False, "sticky": False}
+                for ord_, name in enumerate(("Front", "Back", "Source"))
+            ],
+            "tmpls": [{
+                "name": "Card 1", "ord": 0, "did": None, "bqfmt": "", "bafmt": "",
+                "qfmt": "{{Front}}",
+                "afmt": "{{FrontSide}}<hr id=answer>{{Back}}<br><small>{{Source}}</small>",
+            }],
+            "css": ".card { font-family: arial; font-size: 20px; text-align: center; color: black; background-color: white; }",
+            "latexPre": "\\documentclass[12pt]{article}\n\\special{papersize=3in,5in}\n\\usepackage[utf8]{inputenc}\n"
+                        "\\usepackage{amssymb,amsmath}\n\\pagestyle{empty}\n\\setlength{\\parindent}{0in}\n\\begin{document}\n",
+            "latexPost": "\\end{document}",
+        }
+    }
+    deck_defaults = {
+        "collapsed": False, "conf": 1, "desc": "", "dyn": 0, "extendNew": 0, "extendRev": 50,
+        "lrnToday": [0, 0], "newToday": [0, 0], "revToday": [0, 0], "timeToday": [0, 0], "mod": now, "usn": -1,
+    }
+    decks = {
+        "1": {**deck_defaults, "id": 1, "name": "Default"},
+        str(ANKI_DECK_ID): {**deck_defaults, "id": ANKI_DECK_ID, "name": ANKI_DECK_NAME},
+    }
+    dconf = {
+        "1": {
+            "id": 1, "name": "Default", "mod": 0, "usn": 0, "maxTaken": 60, "autoplay": True, "timer": 0, "replayq": True,
+            "new": {"bury": True, "delays": [1, 10], "initialFactor": 2500, "ints": [1, 4, 7], "order": 1, "perDay": 20, "separate": True},
+            "lapse": {"delays": [10], "leechAction": 0, "leechFails": 8, "minInt": 1, "mult": 0},
+            "rev": {"bury": True, "ease4": 1.3, "fuzz": 0.05, "ivlFct": 1, "maxIvl": 36500, "minSpace": 1, "perDay": 100},
+        }
+    }
+    return json.dumps(conf), json.dumps(models), json.dumps(decks), json.dumps(dconf)
+
+
+def _anki_field(text: str) -> str:
+    return html.escape(text).replace("\n", "<br>")
+
+
+def write_anki_collection(db: Session, path: Path) -> int:
+    """Writes all flashcards into an Anki collection file at `path`; returns the card count."""
+    now = int(time.time())
+    base_id = now * 1000
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(ANKI_SCHEMA)
+        conn.execute(
+            "INSERT INTO col VALUES (1, ?, ?, ?, 11, 0, 0, 0, ?, ?, ?, ?, '{}')",
+            (now, base_id, base_id, *_anki_collection_json(now)),
+        )
+        rows = iter_flashcard_rows(db)
+        count = 0
+        while batch := list(islice(rows, FETCH_SIZE)):
+            notes, cards = [], []
+            for card_id, question, answer, source_type, source_id, *_ in batch:
+                note_id = base_id + card_id
+                front = _anki_field(question)
+                checksum = int(hashlib.sha1(question.encode()).hexdigest()[:8], 16)
+                fields = "\x1f".join((front, _anki_field(answer), _anki_field(f"{source_type} {source_id}")))
+                notes.append((note_id, f"srs-{card_id}", ANKI_MODEL_ID, now, -1, "", fields, front, checksum, 0, ""))
+                cards.append((note_id, note_id, ANKI_DECK_ID, 0, now, -1, 0, 0, count + len(cards), 0, 0, 0, 0, 0, 0, 0, 0, ""))
+            conn.executemany("INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", notes)
+            conn.executemany("INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", cards)
+            count += len(batch)
+        conn.commit()
+    finally:
+        conn.close()
+    return count
+
+
+def iter_apkg(db: Session) -> Iterator[bytes]:
+    """
+    Builds an Anki package in a temporary directory and streams it.
+
+    The collection is filled batch by batch and the zip is read back in
+    fixed-size chunks, so memory stays constant regardless of table size.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="srs-apkg-"))
+    try:
+        collection = workdir / "collection.anki2"
+        count = write_anki_collection(db, collection)
+        package = workdir / "flashcards.apkg"
+        with zipfile.ZipFile(package, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.write(collection, "collection.anki2")
+            archive.writestr("media", "{}")
+        logger.info("Built Anki package with %d cards (%d bytes)", count, package.stat().st_size)
+        with package.open("rb") as f:
+            while chunk := f.read(STREAM_CHUNK_BYTES):
+                yield chunk
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+EXPORT_FORMATS = {
+    "csv": (iter_csv, "text/csv; charset=utf-8", "flashcards.csv"),
+    "jsonl": (iter_jsonl, "application/x-ndjson", "flashcards.jsonl"),
+    "apkg": (iter_apkg, "application/octet-stream", "flashcards.apkg"),
+}
@@ -1,23 +1,33 @@
 import logging
+from collections.abc import Iterator
 from datetime import UTC, datetime
 
-from sqlalchemy import func, update
+from sqlalchemy import delete, func, insert, select, update
 from sqlalchemy.orm import Session
 
-from app.models import Flashcard
+from app.models import Flashcard, FlashcardBlock, FlashcardHistory
+from app.services import chat_service, live_service, provenance_service
 
 logger = logging.getLogger(__name__)
 
+# Rows per round trip when streaming sent cards, e.g. into a digest
+SENT_FETCH_SIZE = 1000
 
-def get_pending_flashcards(db: Session, limit: int = 10) -> list[Flashcard]:
+
+def _for_chat(query, chat_id: int | None, model=Flashcard):
+    """Restricts a flashcard query to one chat's deck; None means all decks."""
+    return query if chat_id is None else query.filter(model.chat_id == chat_id)
+
+
+def get_pending_flashcards(db: Session, limit: int = 10, chat_id: int | None = None) -> list[Flashcard]:
     """Retrieves flashcards with 'pending' status."""
-    logger.info(f"Querying for up to {limit} pending flashcards.")
+    logger.info("Querying for up to %d pending flashcards.", limit)
     try:
-        cards = db.query(Flashcard).filter(Flashcard.status == "pending").limit(limit).all()
-        logger.info(f"Found {len(cards)} pending flashcards.")
+        cards = _for_chat(db.query(Flashcard), chat_id).filter(Flashcard.status == "pending").limit(limit).all()
+        logger.info("Found %d pending flashcards.", len(cards))
         return cards
     except Exception as e:
-        logger.error(f"Error querying pending flashcards: {e}", exc_info=True)
+        logger.error("Error querying pending flashcards: %s", e, exc_info=True)
         raise # Re-raise the exception after logging
 
 
@@ -25,7 +35,7 @@ def update_flashcard_status(
     db: Session, flashcard_id: int, new_status: str, sent_at: datetime | None = None
 ) -> bool:
     """Updates the status and optionally sent_at timestamp of a flashcard."""
-    logger.info(f"Updating flashcard ID {flashcard_id} to status '{new_status}'.")
+    logger.info("Updating flashcard ID %s to status '%s'.", flashcard_id, new_status)
     try:
         stmt = (
             update(Flashcard)
@@ -35,31 +45,20 @@ def update_flashcard_status(
         result = db.execute(stmt)
         db.commit()
         if result.rowcount > 0:
-            logger.info(f"Successfully updated flashcard ID {flashcard_id}.")
+            logger.info("Successfully updated flashcard ID %s.", flashcard_id)
+            live_service.publish_status([flashcard_id], new_status, sent_at)
             return True
         else:
-            logger.warning(f"Flashcard ID {flashcard_id} not found for status update.")
+            logger.warning("Flashcard ID %s not found for status update.", flashcard_id)
             return False
     except Exception as e:
-        logger.error(f"Error updating flashcard {flashcard_id} status: {e}", exc_info=True)
+        logger.error("Error updating flashcard %s status: %s", flashcard_id, e, exc_info=True)
         db.rollback()
         return False
 
 
-def get_sent_flashcards_by_period(
-    db: Session, period: str
-) -> list[Flashcard]:
-    """
-    Retrieves flashcards marked as 'sent' within a specific period.
-
-    Args:
-        db: The database session.
-        period: 'today', 'this_month', or 'last_three_months'.
-
-    Returns:
-        A list of Flashcard objects. Returns empty list if period is invalid or no cards found.
-    """
-    logger.info(f"Querying sent flashcards for period: {period}")
+def period_start(period: str) -> datetime | None:
+    """Start of a /summary period ('today', 'this_month' or 'last_three_months'); None if it is invalid."""
     now = datetime.now(UTC)
     start_date = None
 
@@ -80,33 +79,158 @@ def get_sent_flashcards_by_period(
             year=year, month=month, day=1, hour=0, minute=0, second=0, microsecond=0
         )
     else:
-        logger.warning(f"Invalid period specified for summary: {period}")
+        logger.warning("Invalid period specified for summary: %s", period)
+    return start_date
+
+
+def get_sent_flashcards_by_period(
+    db: Session, period: str, chat_id: int | None = None
+) -> list[FlashcardHistory]:
+    """
+    Retrieves flashcards marked as 'sent' within a specific period, including archived ones.
+
+    Args:
+        db: The database session.
+        period: 'today', 'this_month', or 'last_three_months'.
+        chat_id: Only return cards from this chat's deck (all decks if None).
+
+    Returns:
+        A list of FlashcardHistory objects. Returns empty list if period is invalid or no cards found.
+    """
+    logger.info("Querying sent flashcards for period: %s", period)
+    start_date = period_start(period)
+    if start_date is None:
         return []  # Return empty list for invalid period
 
-    logger.info(f"Calculated start date for period '{period}': {start_date}")
+    logger.info("Calculated start date for period '%s': %s", period, start_date)
     try:
         cards = (
-            db.query(Flashcard)
-            .filter(Flashcard.status == "sent", Flashcard.sent_at >= start_date)
-            .order_by(Flashcard.sent_at.asc())
+            _for_chat(db.query(FlashcardHistory), chat_id, FlashcardHistory)
+            .filter(FlashcardHistory.status == "sent", FlashcardHistory.sent_at >= start_date)
+            .order_by(FlashcardHistory.sent_at.asc())
             .all()
         )
-        logger.info(f"Found {len(cards)} sent flashcards for period '{period}'.")
+        logger.info("Found %d sent flashcards for period '%s'.", len(cards), period)
         return cards
     except Exception as e:
-        logger.error(f"Error querying sent flashcards for period '{period}': {e}", exc_info=True)
+        logger.error("Error querying sent flashcards for period '%s': %s", period, e, exc_info=True)
         raise
 
 
-def get_random_flashcards(db: Session, count: int = 3) -> list[Flashcard]:
+def _sent_since(start_date: datetime, chat_id: int | None, *columns):
+    return _for_chat(select(*columns), chat_id, FlashcardHistory).where(
+        FlashcardHistory.status == "sent", FlashcardHistory.sent_at >= start_date
+    )
+
+
+def count_sent_flashcards_by_period(db: Session, period: str, chat_id: int | None = None) -> int:
+    start_date = period_start(period)
+    if start_date is None:
+        return 0
+    return db.scalar(_sent_since(start_date, chat_id, func.count()))
+
+
+def iter_sent_flashcards_by_period(db: Session, period: str, chat_id: int | None = None) -> Iterator:
+    """
+    Streams the cards get_sent_flashcards_by_period returns, SENT_FETCH_SIZE
+    rows at a time from the cursor, as rows with the attributes the
+    formatters read; nothing if the period is invalid.
+    """
+    start_date = period_start(period)
+    if start_date is None:
+        return
+    stmt = _sent_since(
+        start_date,
+        chat_id,
+        FlashcardHistory.id,
+        FlashcardHistory.question,
+        FlashcardHistory.answer,
+        FlashcardHistory.knowledge_source_type,
+        FlashcardHistory.knowledge_source_id,
+        FlashcardHistory.sent_at,
+    ).order_by(FlashcardHistory.sent_at.asc())
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=SENT_FETCH_SIZE))
+    for partition in result.partitions():
+        yield from partition
+
+
+def get_random_flashcards(db: Session, count: int = 3, chat_id: int | None = None) -> list[Flashcard]:
     """Retrieves a specified number of random flashcards (any status)."""
-    logger.info(f"Querying for {count} random flashcards.")
+    logger.info("Querying for %d random flashcards.", count)
     try:
         # Using SQLAlchemy's func.random() which should translate appropriately for supported backends (SQLite, PostgreSQL)
-        cards = db.query(Flashcard).order_by(func.random()).limit(count).all()
-        logger.info(f"Found {len(cards)} random flashcards.")
+        cards = (
+            _for_chat(db.query(Flashcard), chat_id)
+            .filter(Flashcard.status != "retired")
+            .order_by(func.random())
+            .limit(count)
+            .all()
+        )
+        logger.info("Found %d random flashcards.", len(cards))
         return cards
     except Exception as e:
-        logger.error(f"Error querying random flashcards: {e}", exc_info=True)
+        logger.error("Error querying random flashcards: %s", e, exc_info=True)
         raise
 
+
+
+def create_flashcards(db: Session, cards, decks: dict | None = None) -> list[int]:
+    """
+    Stores generated cards (with source_type, source_id, question, answer
+    and optionally block_ids) in the deck of every chat subscribed to their
+    source, with their block provenance, in one transaction.
+
+    `decks` caches the target chats per source across calls, for callers
+    that store cards one at a time as they are generated.
+    """
+    decks = {} if decks is None else decks
+    rows = []
+    row_blocks = []
+    for card in cards:
+        source = (card.source_type, card.source_id)
+        if source not in decks:
+            decks[source] = chat_service.deck_chat_ids(db, *source)
+        row_blocks.extend([getattr(card, "block_ids", ())] * len(decks[source]))
+        rows.extend(
+            {
+                "question": card.question,
+                "answer": card.answer,
+                "knowledge_source_type": card.source_type,
+                "knowledge_source_id": card.source_id,
+                "status": "pending",
+                "chat_id": chat_id,
+            }
+            for chat_id in decks[source]
+        )
+    if not rows:
+        return []
+    try:
+        # RETURNING rows of a multi-row insert only line up with `rows` when sorted by parameter order
+        flashcard_ids = list(db.scalars(insert(Flashcard).returning(Flashcard.id, sort_by_parameter_order=True), rows))
+        provenance_service.link_blocks(db, [
+            {"flashcard_id": flashcard_id, "block_id": block_id}
+            for flashcard_id, block_ids in zip(flashcard_ids, row_blocks, strict=True)
+            for block_id in block_ids
+        ])
+        db.commit()
+    except Exception as e:
+        logger.error("Error storing %d generated flashcards: %s", len(rows), e, exc_info=True)
+        db.rollback()
+        raise
+    live_service.publish_new_cards([{"id": flashcard_id, **row} for flashcard_id, row in zip(flashcard_ids, rows, strict=True)])
+    return flashcard_ids
+
+
+def delete_pending_flashcards(db: Session, flashcard_ids: list[int]) -> int:
+    """Deletes cards that have not been sent yet, e.g. from a generation run that failed half-way."""
+    if not flashcard_ids:
+        return 0
+    deleted = list(db.scalars(
+        delete(Flashcard).where(Flashcard.id.in_(flashcard_ids), Flashcard.status == "pending").returning(Flashcard.id)
+    ))
+    if deleted:
+        # Cards sent meanwhile keep their provenance and stay on the dashboard
+        db.query(FlashcardBlock).filter(FlashcardBlock.flashcard_id.in_(deleted)).delete(synchronize_session=False)
+    db.commit()
+    live_service.publish_deleted(deleted)
+    return len(deleted)
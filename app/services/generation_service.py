@@ -0,0 +1,129 @@
+import logging
+from collections import defaultdict
+from datetime import UTC, datetime
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.config import app_config
+from app.services import (
+    config_service,
+    flashcard_service,
+    knowledge_service,
+    live_service,
+    llm_service,
+    provenance_service,
+)
+from app.services.llm_service import GeneratedCard, GenerationReport
+
+logger = logging.getLogger(__name__)
+
+
+async def generate_from_notion(
+    db: Session,
+    limit: int | None = None,
+    notion_client: httpx.AsyncClient | None = None,
+    llm_client: httpx.AsyncClient | None = None,
+    database_ids: set[str] | None = None,
+) -> GenerationReport:
+    """
+    Turns unprocessed Notion pages into flashcards, and refreshes the cards
+    of processed pages edited since the last sync.
+
+    Pages are packed into as few LLM requests as the context budget allows
+    and routed across the configured models (see llm_service.ModelRouter),
+    and every card is committed as soon as it is parsed from the streamed
+    reply, so delivery can pick it up before generation finishes. Only pages
+    whose requests all succeeded are marked processed; cards already stored
+    for the others are deleted, so they are regenerated whole next run.
+
+    Every page is diffed block by block against the content hashes of its
+    last generation (see provenance_service), and only new or changed
+    blocks are sent to the LLM. Cards written from changed or deleted blocks
+    are retired once the page's new cards are stored.
+
+    `database_ids` restricts the run to those databases, e.g. the ones the
+    background sync saw change.
+    """
+    settings = config_service.get_config_values(
+        db, ["openrouter_api_key", "openrouter_models", "openrouter_latency_budget"]
+    )
+    api_key = settings["openrouter_api_key"]
+    if not api_key:
+        raise ValueError("OpenRouter API key not configured")
+
+    started = datetime.now(UTC).replace(tzinfo=None)
+    skipped: list[str] = []
+    documents = await knowledge_service.load_notion_documents(
+        db, limit, notion_client, skipped=skipped, database_ids=database_ids
+    )
+    unprocessed = {document.source_id for document in documents}
+    edited = await knowledge_service.load_notion_documents(
+        db, limit, notion_client, edited=True, skipped=skipped, database_ids=database_ids
+    )
+    documents.extend(document for document in edited if document.source_id not in unprocessed)
+
+    diffs = []
+    for document in documents:
+        diff = provenance_service.diff_document(db, document)
+        # Pages processed before block provenance existed have no hashes to diff against
+        if diff.known or document.source_id in unprocessed:
+            diffs.append(diff)
+    pending = [diff.document for diff in diffs if diff.document.blocks]
+
+    report = GenerationReport()
+    if pending:
+        decks: dict = {}
+        stored: dict[str, list[int]] = defaultdict(list)
+
+        def store(card: GeneratedCard) -> None:
+            stored[card.source_id].extend(flashcard_service.create_flashcards(db, [card], decks))
+
+        live_service.publish_job("generate", "started", pages=len(pending))
+        try:
+            _, report = await llm_service.generate_flashcards(
+                pending,
+                api_key,
+                budget=app_config.llm_context_budget,
+                concurrency=app_config.llm_concurrency,
+                client=llm_client,
+                on_card=store,
+                router=llm_service.get_router(
+                    settings["openrouter_models"], app_config.llm_model, settings["openrouter_latency_budget"]
+                ),
+            )
+        except Exception as e:
+            live_service.publish_job("generate", "failed", error=str(e))
+            raise
+        discarded = [flashcard_id for source_id in report.failed_sources for flashcard_id in stored.get(source_id, [])]
+        if discarded:
+            flashcard_service.delete_pending_flashcards(db, discarded)
+            logger.info("Discarded %d cards of %d failed pages.", len(discarded), len(report.failed_sources))
+
+    for diff in diffs:
+        if diff.document.source_id not in report.failed_sources:
+            report.retired_cards += provenance_service.apply_diff(db, diff)
+            report.unchanged_blocks += diff.unchanged
+    if not diffs:
+        logger.info("No unprocessed or edited Notion pages.")
+
+    processed = [
+        document.source_id for document in documents
+        if document.source_id in unprocessed and document.source_id not in report.failed_sources
+    ]
+    if processed:
+        await knowledge_service.mark_notion_pages_processed(processed, notion_client)
+    # A later run must still see the edits of pages that failed, were over `limit` or not listed
+    if not report.failed_sources and not limit:
+        databases = knowledge_service.get_notion_databases(db)
+        synced = [
+            database.id for database in databases
+            if database.id not in skipped and (database_ids is None or database.id in database_ids)
+        ]
+        knowledge_service.set_synced_at(db, synced, started)
+    if pending:
+        live_service.publish_job(
+            "generate", "done", pages=len(processed), cards=report.cards,
+            failed=len(report.failed_sources), retired=report.retired_cards,
+        )
+    return report
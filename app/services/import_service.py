@@ -0,0 +1,196 @@
+import csv
+import json
+import logging
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from itertools import islice
+from typing import IO
+
+from sqlalchemy.orm import Session
+
+from app.cache import data_version
+from app.services import chat_service, live_service
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "jsonl")
+CHUNK_SIZE = 20_000
+# SQLAlchemy's storage format for DateTime columns on SQLite
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+_CREATE_STAGING = """
+CREATE TEMP TABLE IF NOT EXISTS flashcard_import (
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    knowledge_source_type TEXT NOT NULL,
+    knowledge_source_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    sent_at TEXT,
+    chat_id INTEGER,
+    UNIQUE (question, answer)
+)
+"""
+_STAGE_ROWS = """
+INSERT OR IGNORE INTO flashcard_import
+    (question, answer, knowledge_source_type, knowledge_source_id, status, created_at, sent_at, chat_id)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_MERGE_STAGED = """
+INSERT INTO flashcards
+    (question, answer, knowledge_source_type, knowledge_source_id, status, created_at, sent_at, chat_id)
+SELECT s.question, s.answer, s.knowledge_source_type, s.knowledge_source_id, s.status, s.created_at, s.sent_at, s.chat_id
+FROM flashcard_import s
+WHERE NOT EXISTS (
+    SELECT 1 FROM flashcards f WHERE f.question = s.question AND f.answer = s.answer
+)
+"""
+
+
+class ImportFormatError(ValueError):
+    """An upload line that can't be read: not UTF-8, malformed JSON or a bad timestamp."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+@dataclass
+class ImportReport:
+    rows_read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "rows_per_second": round(self.rows_per_second, 1)}
+
+
+def _normalize_datetime(value: str | None) -> str | None:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(UTC).replace(tzinfo=None)
+    return parsed.strftime(SQLITE_DATETIME_FORMAT)
+
+
+def _to_row(record: dict, default_source: str, now: str, chat_id: int | None) -> tuple | None:
+    question = (record.get("question") or "").strip()
+    answer = (record.get("answer") or "").strip()
+    if not question or not answer:
+        return None
+    return (
+        question,
+        answer,
+        record.get("knowledge_source_type") or "import",
+        record.get("knowledge_source_id") or default_source,
+        record.get("status") or "pending",
+        _normalize_datetime(record.get("created_at")) or now,
+        _normalize_datetime(record.get("sent_at")),
+        chat_id,
+    )
+
+
+def _checked(record: dict, line: int) -> dict:
+    for field in ("created_at", "sent_at"):
+        try:
+            _normalize_datetime(record.get(field))
+        except (TypeError, ValueError) as e:
+            raise ImportFormatError(line, f"invalid {field} {record.get(field)!r}: {e}") from e
+    return record
+
+
+def _decoded_lines(stream: IO[bytes]) -> Iterator[str]:
+    # Decoded line by line (a newline byte never occurs inside a UTF-8 sequence), so an error has a line number
+    for line, content in enumerate(stream, start=1):
+        try:
+            yield content.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise ImportFormatError(line, "not UTF-8 text") from e
+
+
+def read_records(stream: IO[bytes], fmt: str) -> Iterator[dict]:
+    """
+    Lazily parses an uploaded CSV (with header) or JSONL file into dicts.
+
+    Content that can't be imported raises ImportFormatError with the
+    (1-based) line it was found on; rows before it have been yielded.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(_decoded_lines(stream))
+        for record in reader:
+            yield _checked(record, reader.line_num)
+    elif fmt == "jsonl":
+        for line, content in enumerate(_decoded_lines(stream), start=1):
+            if not content.strip():
+                continue
+            try:
+                record = json.loads(content)
+            except ValueError as e:
+                raise ImportFormatError(line, f"invalid JSON: {e}") from e
+            if not isinstance(record, dict):
+                raise ImportFormatError(line, "expected a JSON object")
+            yield _checked(record, line)
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def import_records(
+    db: Session, records: Iterable[dict], default_source: str = "import", chunk_size: int = CHUNK_SIZE
+) -> ImportReport:
+    """
+    Bulk inserts flashcards, skipping rows whose question and answer already exist.
+
+    Each chunk is staged with one executemany into a temp table (which drops
+    duplicates within the chunk) and merged into `flashcards` in the same
+    transaction, so a failure only loses the chunk being written. The temp
+    table is created in every chunk's transaction: a commit returns the
+    connection to the pool, and the next chunk may get another one. Cards
+    go to the chat configured on the dashboard, like generated cards from
+    sources nobody subscribed to.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    now = datetime.now(UTC).strftime(SQLITE_DATETIME_FORMAT)
+    chat_id = chat_service.configured_chat_id(db)
+    records = iter(records)
+
+    try:
+        while chunk := list(islice(records, chunk_size)):
+            rows = [row for row in (_to_row(record, default_source, now, chat_id) for record in chunk) if row]
+            report.rows_read += len(chunk)
+            report.skipped += len(chunk) - len(rows)
+            if not rows:
+                continue
+
+            conn = db.connection()
+            conn.exec_driver_sql(_CREATE_STAGING)
+            conn.exec_driver_sql(_STAGE_ROWS, rows)
+            inserted = conn.exec_driver_sql(_MERGE_STAGED).rowcount
+            conn.exec_driver_sql("DELETE FROM flashcard_import")
+            db.commit()
+
+            report.inserted += inserted
+            report.duplicates += len(rows) - inserted
+            data_version.bump()
+            live_service.publish_job("import", "running", rows_read=report.rows_read, inserted=report.inserted)
+    except Exception:
+        db.rollback()
+        raise
+
+    if report.inserted:
+        live_service.publish_resync()
+    report.seconds = time.perf_counter() - started
+    logger.info(
+        "Imported %d of %d rows (%d duplicates, %d skipped) at %.0f rows/s",
+        report.inserted, report.rows_read, report.duplicates, report.skipped, report.rows_per_second,
+    )
+    return report
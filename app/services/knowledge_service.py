@@ -1,97 +1,203 @@
+import asyncio
 import logging
+import time
+from datetime import UTC, datetime, timedelta
 from typing import Any, Dict, List
 
+import httpx
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
-from app.knowledge_sources.notion import notion_service
-from app.services import config_service
+from app.knowledge_sources.notion import notion_service, schemas
+from app.services import config_service, live_service
+from app.services.llm_service import SourceDocument
 
 logger = logging.getLogger(__name__)
 
-async def fetch_from_notion(db: Session) -> dict[str, Any]:
-    """
-    Fetch data from Notion based on the configured database ID.
-
-    Args:
-        db: Database session
+UNPROCESSED_FILTER = {
+    "filter": {
+      "property": "isProcessed",
+      "checkbox": {
+        "equals": False
+      }
+    }
+}
+# Pages whose blocks are fetched at the same time when loading documents
+PAGE_FETCH_CONCURRENCY = 8
+# Pages per database whose content /api/fetch previews
+PREVIEW_PAGES = 5
+# Config key of a database's last complete sync, followed by the database id
+SYNCED_AT_KEY = "notion_synced_at:"
+# Overlap of edited-page queries with the previous sync, for clock skew between us and Notion
+EDITED_SLACK = timedelta(minutes=1)
 
-    Returns:
-        Dict containing fetched results or error information
+def get_notion_databases(db: Session) -> list[schemas.DatabaseConfig]:
+    """
+    The databases to sync: the `notion_databases` setting, or the single
+    `notion_database_id` it replaces. Raises ValueError if the setting is malformed.
     """
+    values = config_service.get_config_values(db, ["notion_databases", "notion_database_id"])
     try:
-        notion_api_key = config_service.get_config_value(db, "notion_api_key")
-        notion_database_id = config_service.get_config_value(db, "notion_database_id")
+        databases = schemas.parse_database_configs(values["notion_databases"])
+    except ValidationError as e:
+        raise ValueError(f"Invalid Notion databases setting: {e}") from e
+    if not databases and values["notion_database_id"]:
+        databases = [schemas.DatabaseConfig(id=values["notion_database_id"])]
+    return databases
 
-        if not notion_api_key:
-            return {"status": "error", "message": "Notion API key not configured"}
+def edited_filter(since: datetime) -> dict:
+    """Processed pages edited since `since` (UTC), with EDITED_SLACK to spare."""
+    return {
+        "and": [
+            {"property": "isProcessed", "checkbox": {"equals": True}},
+            {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {"on_or_after": (since - EDITED_SLACK).strftime("%Y-%m-%dT%H:%M:%SZ")},
+            },
+        ]
+    }
 
-        if not notion_database_id:
-            return {"status": "error", "message": "Notion database ID not configured"}
+def query_payload(
+    database: schemas.DatabaseConfig, start_cursor: str | None = None, edited_since: datetime | None = None
+) -> dict:
+    """
+    The unprocessed-pages query of `database`, narrowed by its own filter;
+    with `edited_since`, the query of its processed pages edited since then.
+    """
+    page_filter = edited_filter(edited_since) if edited_since else UNPROCESSED_FILTER["filter"]
+    payload = {"filter": {"and": [page_filter, database.filter]} if database.filter else page_filter}
+    if start_cursor:
+        payload["start_cursor"] = start_cursor
+    return payload
 
-        payload={
-            "filter": {
-              "property": "isProcessed",
-              "checkbox": {
-                "equals": False
-              }
-            }
-        }
+async def list_unprocessed_pages(
+    database: schemas.DatabaseConfig,
+    headers: dict,
+    client: httpx.AsyncClient,
+    limit: int | None = None,
+    edited_since: datetime | None = None,
+) -> list[schemas.PageSummary]:
+    """
+    Follows the database's query cursor until every unprocessed page (or
+    `limit`) is listed; with `edited_since`, lists edited processed pages instead.
+    """
+    pages = []
+    cursor = None
+    while True:
+        response = await notion_service.query_notion_database(
+            database.id, payload=query_payload(database, cursor, edited_since), headers=headers, client=client
+        )
+        if response.object == "error":
+            raise RuntimeError(f"Notion API error: {response.message}")
+        pages.extend(response.results)
+        if not response.has_more or (limit and len(pages) >= limit):
+            break
+        cursor = response.next_cursor
+    return pages[:limit] if limit else pages
+
+async def latest_edit(database: schemas.DatabaseConfig, headers: dict, client: httpx.AsyncClient) -> str | None:
+    """When any page of `database` (processed or not) was last edited, from one page of a sorted query."""
+    payload = {"sorts": [{"timestamp": "last_edited_time", "direction": "descending"}], "page_size": 1}
+    if database.filter:
+        payload["filter"] = database.filter
+    response = await notion_service.query_notion_database(database.id, payload=payload, headers=headers, client=client)
+    if response.object == "error":
+        raise RuntimeError(f"Notion API error: {response.message}")
+    return response.results[0].last_edited_time.isoformat() if response.results else None
 
-        response = await notion_service.query_notion_database(database_id=notion_database_id, payload=payload)
+async def _fetch_database(
+    database: schemas.DatabaseConfig, headers: dict, client: httpx.AsyncClient, semaphore: asyncio.Semaphore
+) -> dict[str, Any]:
+    """Lists one database's unprocessed pages and previews the first few; never raises."""
+    started = time.perf_counter()
+    status = {"id": database.id, "name": database.label}
+    try:
+        pages, last_edited_time = await asyncio.gather(
+            list_unprocessed_pages(database, headers, client), latest_edit(database, headers, client)
+        )
 
-        if hasattr(response, "object") and response.object == "error":
+        async def preview(page) -> dict:
+            async with semaphore:
+                content = await notion_service.retrieve_content_by_id(page.id, headers, client)
+            preview_text = extract_preview_text(content.get("blocks", []))
             return {
-                "status": "error",
-                "message": f"Notion API error: {response.message}",
-                "code": response.code
+                "id": page.id,
+                "url": page.url,
+                "title": page.title_for(database.title_property),
+                "preview": preview_text[:300] + "..." if len(preview_text) > 300 else preview_text,
+                "full_content": content,
             }
 
-        # For each page in results, get its content
-        pages_content = []
-        for page in response.results[:5]:  # Limit to 5 pages to avoid rate limits
-            page_id = page.id
-            page_url = page.url
-            page_title = extract_page_title(page.properties)
+        # Limit previews to avoid spending the request budget on content nobody reads
+        pages_content = await asyncio.gather(*(preview(page) for page in pages[:PREVIEW_PAGES]))
+    except Exception as e:
+        logger.error("Error fetching Notion database %s: %s", database.label, e, exc_info=True)
+        status.update(status="error", message=str(e))
+    else:
+        status.update(
+            status="success",
+            source="notion",
+            pages=list(pages_content),
+            total_count=len(pages),
+            fetched_count=len(pages_content),
+            # Edits to processed pages count too: they are what an incremental sync regenerates
+            last_edited_time=last_edited_time,
+        )
+    status["seconds"] = round(time.perf_counter() - started, 3)
+    live_service.publish_job("fetch", "running", database=database.label, status=status["status"])
+    return status
+
+async def fetch_from_notion(
+    db: Session, client: httpx.AsyncClient | None = None, database_ids: set[str] | None = None
+) -> dict[str, Any]:
+    """
+    Fetch unprocessed pages from every configured Notion database (or only `database_ids`).
 
-            # Fetch blocks for this page
-            content = await notion_service.retrieve_content_by_id(page_id)
+    Databases are queried concurrently, each following its own cursor, and
+    all their requests draw from the one workspace-wide request budget (see
+    notion_service.RequestBudget).
 
-            # Extract text content from blocks for preview
-            preview_text = extract_preview_text(content.get("blocks", []))
+    Args:
+        db: Database session
+        client: Optional httpx.AsyncClient shared by every request
+        database_ids: Only fetch these databases, e.g. the ones the background sync found due
 
-            pages_content.append({
-                "id": page_id,
-                "url": page_url,
-                "title": page_title,
-                "preview": preview_text[:300] + "..." if len(preview_text) > 300 else preview_text,
-                "full_content": content
-            })
+    Returns:
+        Dict with a status per database, or error information
+    """
+    try:
+        notion_api_key = config_service.get_config_value(db, "notion_api_key")
+        if not notion_api_key:
+            return {"status": "error", "message": "Notion API key not configured"}
 
+        databases = get_notion_databases(db)
+        if not databases:
+            return {"status": "error", "message": "Notion database ID not configured"}
+        if database_ids is not None:
+            databases = [database for database in databases if database.id in database_ids]
+
+        if client is None:
+            async with httpx.AsyncClient() as shared_client:
+                return await fetch_from_notion(db, shared_client, database_ids)
+        headers = notion_service.construct_headers()
+        semaphore = asyncio.Semaphore(PAGE_FETCH_CONCURRENCY)
+        statuses = await asyncio.gather(*(_fetch_database(database, headers, client, semaphore) for database in databases))
+
+        failed = sum(status["status"] == "error" for status in statuses)
         return {
-            "status": "success",
-            "source": "notion",
-            "pages": pages_content,
-            "total_count": len(response.results),
-            "fetched_count": len(pages_content)
+            "status": "success" if not failed else "partial" if failed < len(statuses) else "error",
+            "databases": list(statuses),
         }
 
     except Exception as e:
-        logger.error(f"Error fetching from Notion: {str(e)}", exc_info=True)
+        logger.error("Error fetching from Notion: %s", e, exc_info=True)
         return {"status": "error", "message": f"Error fetching from Notion: {str(e)}"}
 
-def extract_page_title(properties: dict) -> str:
-    """Extract a title from page properties"""
-    # Try common property names for titles
-    title_candidates = ["Name", "Title", "name", "title"]
-
-    for candidate in title_candidates:
-        if candidate in properties:
-            prop = properties[candidate]
-            if "title" in prop and prop["title"]:
-                title_parts = [text_obj.get("plain_text", "") for text_obj in prop["title"]]
-                return " ".join(title_parts)
-
-    return "Untitled Page"
+def extract_page_title(properties: dict, title_property: str | None = None) -> str:
+    """Extract a title from page properties: `title_property`, or the title-type property"""
+    name = title_property or schemas.title_property_name(properties)
+    text = schemas.property_text(properties.get(name, {})) if name else ""
+    return text or schemas.UNTITLED
 
 def extract_preview_text(blocks: list[dict]) -> str:
     """Extract plain text from blocks for preview purposes"""
@@ -114,13 +220,129 @@ def extract_preview_text(blocks: list[dict]) -> str:
 
     return " ".join(texts)
 
-async def fetch_from_all_sources(db: Session) -> dict[str, Any]:
+def block_text(block: dict) -> str:
+    """Plain text of a block and its nested children, one line per block."""
+    block_type = block.get("type")
+    rich_text = (block.get(block_type) or {}).get("rich_text", []) if block_type else []
+    lines = ["".join(text_obj.get("plain_text", "") for text_obj in rich_text)]
+    lines.extend(block_text(child) for child in block.get("children", []))
+    return "\n".join(line for line in lines if line)
+
+def get_synced_at(db: Session, databases: list[schemas.DatabaseConfig]) -> dict[str, datetime | None]:
+    """When each database was last synced completely (naive UTC), None if never."""
+    values = config_service.get_config_values(db, [SYNCED_AT_KEY + database.id for database in databases])
+    return {
+        database.id: datetime.fromisoformat(value) if (value := values[SYNCED_AT_KEY + database.id]) else None
+        for database in databases
+    }
+
+def set_synced_at(db: Session, database_ids: list[str], at: datetime) -> None:
+    """Records a complete sync of the databases that started at `at`; edits after it are picked up next run."""
+    for database_id in database_ids:
+        config_service.set_config_value(db, SYNCED_AT_KEY + database_id, at.isoformat())
+    db.commit()
+
+async def load_notion_documents(
+    db: Session,
+    limit: int | None = None,
+    client: httpx.AsyncClient | None = None,
+    edited: bool = False,
+    skipped: list[str] | None = None,
+    database_ids: set[str] | None = None,
+) -> list[SourceDocument]:
+    """
+    Loads every unprocessed page of the configured databases as a SourceDocument.
+
+    Databases are listed concurrently and pages fetched over one shared
+    client, all within the workspace request budget; a database that fails
+    is logged and skipped unless they all do. Each top-level block (with
+    its children) becomes one entry in `blocks`, which is where the LLM
+    packer is allowed to split long pages, with its id in `block_ids`.
+
+    With `edited`, loads the processed pages edited since their database's
+    last complete sync instead (see set_synced_at); databases never synced
+    are skipped. The ids of databases that failed are appended to `skipped`.
+    `database_ids` restricts the load to those databases.
+    """
+    databases = get_notion_databases(db)
+    if not databases:
+        raise ValueError("Notion database ID not configured")
+    if database_ids is not None:
+        databases = [database for database in databases if database.id in database_ids]
+    if client is None:
+        async with httpx.AsyncClient() as shared_client:
+            return await load_notion_documents(db, limit, shared_client, edited, skipped, database_ids)
+    headers = notion_service.construct_headers()
+    synced_at = get_synced_at(db, databases) if edited else {}
+    if edited:
+        databases = [database for database in databases if synced_at[database.id]]
+        if not databases:
+            return []
+
+    listed = await asyncio.gather(
+        *(
+            list_unprocessed_pages(database, headers, client, limit, synced_at.get(database.id))
+            for database in databases
+        ),
+        return_exceptions=True,
+    )
+    pages = []
+    errors = []
+    for database, result in zip(databases, listed, strict=True):
+        if isinstance(result, BaseException):
+            logger.error("Skipping Notion database %s: %s", database.label, result)
+            errors.append(result)
+            if skipped is not None:
+                skipped.append(database.id)
+        else:
+            pages.extend((page, database) for page in result)
+    if errors and len(errors) == len(databases):
+        raise errors[0]
+    pages = pages[:limit] if limit else pages
+
+    semaphore = asyncio.Semaphore(PAGE_FETCH_CONCURRENCY)
+
+    async def load(page, database: schemas.DatabaseConfig) -> SourceDocument:
+        async with semaphore:
+            blocks = await notion_service.fetch_all_blocks_recursive(page.id, headers, client)
+        return SourceDocument(
+            source_type="notion",
+            source_id=page.id,
+            title=page.title_for(database.title_property),
+            blocks=[block_text(block) for block in blocks],
+            block_ids=[block["id"] for block in blocks],
+        )
+
+    return list(await asyncio.gather(*(load(page, database) for page, database in pages)))
+
+async def mark_notion_pages_processed(page_ids: list[str], client: httpx.AsyncClient | None = None) -> int:
+    """Sets isProcessed on the given pages; returns how many updates succeeded."""
+    if client is None:
+        async with httpx.AsyncClient() as shared_client:
+            return await mark_notion_pages_processed(page_ids, shared_client)
+    headers = notion_service.construct_headers()
+    semaphore = asyncio.Semaphore(PAGE_FETCH_CONCURRENCY)
+
+    async def mark(page_id: str) -> bool:
+        async with semaphore:
+            result = await notion_service.update_page_properties_by_id(
+                page_id, {"isProcessed": {"checkbox": True}}, headers=headers, client=client
+            )
+        if getattr(result, "object", None) == "error":
+            logger.error("Failed to mark Notion page %s processed: %s", page_id, result.message)
+            return False
+        return True
+
+    return sum(await asyncio.gather(*(mark(page_id) for page_id in page_ids)))
+
+async def fetch_from_all_sources(db: Session, database_ids: set[str] | None = None) -> dict[str, Any]:
     """
     Fetch data from all configured knowledge sources.
     Currently only supports Notion, but designed to be extended.
 
     Args:
         db: Database session
+        database_ids: Only fetch these Notion databases (all if None)
 
     Returns:
         Dict containing all fetched results
@@ -129,21 +351,35 @@ async def fetch_from_all_sources(db: Session) -> dict[str, Any]:
         "sources": [],
         "overall_status": "success"
     }
+    live_service.publish_job("fetch", "started")
 
-    # Fetch from Notion
-    notion_results = await fetch_from_notion(db)
-    if notion_results["status"] == "success":
-        results["sources"].append({
-            "name": "Notion",
-            "status": "success",
-            "data": notion_results
-        })
-    else:
+    # Fetch from Notion, one source entry per database
+    notion_results = await fetch_from_notion(db, database_ids=database_ids)
+    if "databases" not in notion_results:
         results["sources"].append({
             "name": "Notion",
             "status": "error",
             "error": notion_results["message"]
         })
         results["overall_status"] = "partial"
+    for database in notion_results.get("databases", []):
+        if database["status"] == "success":
+            results["sources"].append({
+                "name": f"Notion: {database['name']}",
+                "database_id": database["id"],
+                "status": "success",
+                "seconds": database["seconds"],
+                "data": database
+            })
+        else:
+            results["sources"].append({
+                "name": f"Notion: {database['name']}",
+                "database_id": database["id"],
+                "status": "error",
+                "seconds": database["seconds"],
+                "error": database["message"]
+            })
+            results["overall_status"] = "partial"
 
+    live_service.publish_job("fetch", "done", status=results["overall_status"])
     return results
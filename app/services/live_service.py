@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.cache import data_version
+from app.database import get_db_session
+from app.events import event_bus
+from app.models import Flashcard
+
+logger = logging.getLogger(__name__)
+
+# More new cards than this in one poll (e.g. a bulk import) are sent as one resync
+MAX_CARD_EVENTS = 200
+_CARD_COLUMNS = (
+    Flashcard.id,
+    Flashcard.question,
+    Flashcard.answer,
+    Flashcard.status,
+    Flashcard.knowledge_source_type,
+    Flashcard.chat_id,
+)
+
+
+@dataclass
+class Watermarks:
+    """What the dashboard has already been told about; None until the first poll."""
+    card_id: int | None = None
+    sent_at: datetime | None = None
+
+
+watermarks = Watermarks()
+
+
+def _card_data(row) -> dict:
+    return {
+        "id": row["id"],
+        "question": row["question"],
+        "answer": row["answer"],
+        "status": row["status"],
+        "source": row["knowledge_source_type"],
+        "chat_id": row["chat_id"],
+    }
+
+
+def publish_new_cards(rows: list[dict]) -> None:
+    """Announces stored cards, given as mappings with at least the Flashcard columns above."""
+    if not event_bus.subscriber_count:
+        return
+    if len(rows) > MAX_CARD_EVENTS:
+        event_bus.publish("resync", {})
+    else:
+        for row in rows:
+            event_bus.publish("card", _card_data(row))
+    if rows and watermarks.card_id is not None:
+        watermarks.card_id = max(watermarks.card_id, *(row["id"] for row in rows))
+
+
+def publish_status(flashcard_ids: list[int], status: str, sent_at: datetime | None = None) -> None:
+    if not event_bus.subscriber_count:
+        return
+    for flashcard_id in flashcard_ids:
+        event_bus.publish("status", {"id": flashcard_id, "status": status})
+    if sent_at is not None and watermarks.sent_at is not None:
+        watermarks.sent_at = max(watermarks.sent_at, sent_at)
+
+
+def publish_deleted(flashcard_ids: list[int]) -> None:
+    if flashcard_ids and event_bus.subscriber_count:
+        event_bus.publish("deleted", {"ids": list(flashcard_ids)})
+
+
+def publish_resync() -> None:
+    """Tells clients to reload their view, for writes too large to send as deltas."""
+    if event_bus.subscriber_count:
+        event_bus.publish("resync", {})
+
+
+def publish_job(name: str, state: str, **progress) -> None:
+    """Progress of a long-running job; `state` is started, running, done or failed."""
+    if event_bus.subscriber_count:
+        event_bus.publish("job", {"name": name, "state": state, **progress})
+
+
+def poll_changes(db: Session) -> None:
+    """
+    Publishes cards added or sent since the last poll, by any process.
+
+    The first poll only records where the table is; writes from this process
+    have already been published and advance the watermarks, so they are not
+    sent twice.
+    """
+    if watermarks.card_id is None:
+        watermarks.card_id = db.scalar(select(func.max(Flashcard.id))) or 0
+        watermarks.sent_at = db.scalar(select(func.max(Flashcard.sent_at))) or datetime.min
+        return
+
+    new_cards = db.execute(
+        select(*_CARD_COLUMNS)
+        .where(Flashcard.id > watermarks.card_id)
+        .order_by(Flashcard.id)
+        .limit(MAX_CARD_EVENTS + 1)
+    ).mappings().all()
+    if len(new_cards) > MAX_CARD_EVENTS:
+        event_bus.publish("resync", {})
+        watermarks.card_id = db.scalar(select(func.max(Flashcard.id)))
+        watermarks.sent_at = db.scalar(select(func.max(Flashcard.sent_at))) or watermarks.sent_at
+        return
+    for row in new_cards:
+        event_bus.publish("card", _card_data(row))
+    if new_cards:
+        watermarks.card_id = new_cards[-1]["id"]
+
+    sent = db.execute(
+        select(Flashcard.id, Flashcard.sent_at)
+        .where(Flashcard.sent_at > watermarks.sent_at, Flashcard.id <= watermarks.card_id)
+        .order_by(Flashcard.sent_at)
+        .limit(MAX_CARD_EVENTS + 1)
+    ).all()
+    if not sent:
+        return
+    # A delivery run stamps all its cards with one sent_at, so a partial batch can't be resumed
+    if len(sent) > MAX_CARD_EVENTS:
+        event_bus.publish("resync", {})
+        watermarks.sent_at = db.scalar(select(func.max(Flashcard.sent_at)))
+        return
+    for row in sent:
+        event_bus.publish("status", {"id": row.id, "status": "sent"})
+    watermarks.sent_at = sent[-1].sent_at
+
+
+def _poll() -> None:
+    db = get_db_session()
+    try:
+        poll_changes(db)
+    finally:
+        db.close()
+
+
+async def watch_database(interval: float) -> None:
+    """
+    Polls for writes by other processes (the Telegram bot) while anyone is listening.
+
+    Checking costs a stat() of the SQLite file per interval (see
+    app.cache.DataVersion); the database is queried only when it changed.
+    """
+    last_version = None
+    while True:
+        await asyncio.sleep(interval)
+        if not event_bus.subscriber_count:
+            # Writes made while nobody listened are covered by the clients' resync
+            watermarks.card_id = watermarks.sent_at = last_version = None
+            continue
+        version, _ = data_version.current()
+        if version == last_version:
+            continue
+        try:
+            await asyncio.to_thread(_poll)
+            last_version = version
+        except Exception as e:
+            logger.error("Polling for dashboard changes failed: %s", e, exc_info=True)
@@ -0,0 +1,760 @@
+import asyncio
+import html
+import json
+import logging
+import re
+import time
+import weakref
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from dataclasses import asdict, dataclass, field
+
+import httpx
+
+from app.metrics import LLM_ATTEMPTS, LLM_FIRST_CARD_LATENCY, LLM_LATENCY, LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+DEFAULT_MODEL = "openai/gpt-4o-mini"
+# Source-text tokens per request, leaving room for the instructions and the reply
+DEFAULT_CONTEXT_BUDGET = 6000
+# Tag and title tokens wrapped around every segment in a prompt
+SEGMENT_OVERHEAD_TOKENS = 12
+DEFAULT_MAX_CONCURRENT = 4
+# Latency budget: how long a model may take to its first chunk before it is hedged, and the hedge
+# delay until it has MIN_LATENCY_SAMPLES first-chunk latencies to take a (shorter) p95 from
+DEFAULT_HEDGE_AFTER = 10.0
+MIN_LATENCY_SAMPLES = 20
+STATS_WINDOW = 200
+# Models failing at least this share of recent attempts are tried last
+UNHEALTHY_ERROR_RATE = 0.5
+
+SYSTEM_PROMPT = """You write flashcards for spaced repetition.
+The user message contains one or more sources, each wrapped in <source id="..."> tags.
+For every source, write question/answer flashcards covering its key facts and ideas.
+Reply with JSON Lines only: one object per line, no prose and no code fences, e.g.
+{"source": "S1", "blocks": ["b2"], "question": "...", "answer": "..."}
+The "source" field must be the id of the source the card was written from.
+Paragraphs of a source may start with a marker like [b2]; list the markers of the
+paragraphs each card is based on in "blocks"."""
+
+
+# --- Token estimation ---
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximates a BPE token count without a tokenizer model.
+
+    Punctuation counts as one token, ASCII words as one token per six
+    characters (common words are single tokens, long ones split) and non-ASCII
+    words as one token per character. This errs on the high side for English
+    prose, which keeps packed prompts under the real context limit.
+    """
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        word = match.group()
+        if word.isascii():
+            tokens += 1 + (len(word) - 1) // 6
+        else:
+            tokens += len(word)
+    return tokens
+
+
+SYSTEM_PROMPT_TOKENS = estimate_tokens(SYSTEM_PROMPT)
+
+
+# --- Packing ---
+
+@dataclass
+class SourceDocument:
+    """Plain text of one knowledge source page, one entry per top-level block."""
+
+    source_type: str
+    source_id: str
+    title: str
+    blocks: list[str]
+    # Ids of `blocks` in the source; when given, blocks are marked [b1], [b2], ... in
+    # prompts and cards record the blocks they were written from
+    block_ids: list[str] | None = None
+
+
+@dataclass
+class Segment:
+    """A whole document, or one part of a document split at block boundaries."""
+
+    document: SourceDocument
+    text: str
+    tokens: int
+    part: int = 1
+    parts: int = 1
+    # Indexes into document.blocks of the blocks in `text`
+    blocks: list[int] = field(default_factory=list)
+
+
+@dataclass
+class PromptBatch:
+    """Segments sent together in one request; labels S1..Sn map cards back to their segment."""
+
+    segments: list[Segment] = field(default_factory=list)
+    tokens: int = 0
+
+    def labels(self) -> dict[str, Segment]:
+        return {f"S{i}": segment for i, segment in enumerate(self.segments, start=1)}
+
+    def prompt(self) -> str:
+        parts = []
+        for label, segment in self.labels().items():
+            title = segment.document.title
+            if segment.parts > 1:
+                title = f"{title} (part {segment.part} of {segment.parts})"
+            parts.append(f'<source id="{label}" title="{html.escape(title, quote=True)}">\n{segment.text}\n</source>')
+        return "\n\n".join(parts)
+
+
+def _split_oversized_block(text: str, budget: int) -> list[str]:
+    """Last resort for a single block over budget: split at sentence, then word, boundaries."""
+    pieces, current, current_tokens = [], [], 0
+    for unit in re.split(r"(?<=[.!?])\s+|\n+", text):
+        unit_tokens = estimate_tokens(unit)
+        if unit_tokens > budget:
+            words = unit.split()
+            step = max(1, len(words) * budget // unit_tokens)
+            units = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        else:
+            units = [unit]
+        for piece in units:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > budget:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def block_marker(index: int) -> str:
+    """Prompt label of document.blocks[index]."""
+    return f"b{index + 1}"
+
+
+def split_document(document: SourceDocument, budget: int) -> list[Segment]:
+    """Splits a document into segments of at most `budget` tokens, at block boundaries where possible."""
+    segment_budget = budget - SEGMENT_OVERHEAD_TOKENS
+    chunks: list[tuple[str, int, list[int]]] = []
+    current, current_tokens, current_blocks = [], 0, []
+    for index, block in enumerate(document.blocks):
+        if not block.strip():
+            continue
+        block_tokens = estimate_tokens(block)
+        pieces = [(block, block_tokens)] if block_tokens <= segment_budget else [
+            (piece, estimate_tokens(piece)) for piece in _split_oversized_block(block, segment_budget)
+        ]
+        for piece, piece_tokens in pieces:
+            text, tokens = piece, piece_tokens
+            if document.block_ids is not None:
+                marker = f"[{block_marker(index)}] "
+                text, tokens = marker + piece, piece_tokens + estimate_tokens(marker)
+            if current and current_tokens + tokens > segment_budget:
+                chunks.append(("\n".join(current), current_tokens, current_blocks))
+                current, current_tokens, current_blocks = [], 0, []
+            current.append(text)
+            current_tokens += tokens
+            if not current_blocks or current_blocks[-1] != index:
+                current_blocks.append(index)
+    if current:
+        chunks.append(("\n".join(current), current_tokens, current_blocks))
+
+    return [
+        Segment(document, text, tokens + SEGMENT_OVERHEAD_TOKENS, part=i, parts=len(chunks), blocks=blocks)
+        for i, (text, tokens, blocks) in enumerate(chunks, start=1)
+    ]
+
+
+def pack_segments(segments: list[Segment], budget: int) -> list[PromptBatch]:
+    """First-fit decreasing bin packing of segments into batches of at most `budget` tokens."""
+    batches: list[PromptBatch] = []
+    for segment in sorted(segments, key=lambda s: s.tokens, reverse=True):
+        for batch in batches:
+            if batch.tokens + segment.tokens <= budget:
+                break
+        else:
+            batch = PromptBatch()
+            batches.append(batch)
+        batch.segments.append(segment)
+        batch.tokens += segment.tokens
+    return batches
+
+
+def pack_documents(documents: list[SourceDocument], budget: int = DEFAULT_CONTEXT_BUDGET) -> list[PromptBatch]:
+    return pack_segments([segment for document in documents for segment in split_document(document, budget)], budget)
+
+
+# --- Generation ---
+
+@dataclass
+class GeneratedCard:
+    source_type: str
+    source_id: str
+    question: str
+    answer: str
+    # Source blocks the card was written from, if the document had block ids
+    block_ids: list[str] = field(default_factory=list)
+
+
+@dataclass
+class GenerationReport:
+    documents: int = 0
+    segments: int = 0
+    requests: int = 0
+    # One request per page (or per part of a page over budget), the unpacked baseline
+    naive_requests: int = 0
+    # Estimated with estimate_tokens(), including the system prompt of every request
+    prompt_tokens: int = 0
+    naive_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cards: int = 0
+    failed_requests: int = 0
+    # Set by incremental syncs: cards of changed or deleted blocks, and blocks left as they were
+    retired_cards: int = 0
+    unchanged_blocks: int = 0
+    # From the start of the run until the first card was handed to the caller
+    first_card_seconds: float | None = None
+    seconds: float = 0.0
+    failed_sources: set = field(default_factory=set)
+
+    @property
+    def requests_saved(self) -> int:
+        return self.naive_requests - self.requests
+
+    @property
+    def tokens_per_card(self) -> float:
+        return (self.prompt_tokens + self.completion_tokens) / self.cards if self.cards else 0.0
+
+    @property
+    def naive_tokens_per_card(self) -> float:
+        """Estimate for the same cards without packing: only the prompt overhead differs."""
+        return (self.naive_prompt_tokens + self.completion_tokens) / self.cards if self.cards else 0.0
+
+    def as_dict(self) -> dict:
+        result = asdict(self)
+        result["failed_sources"] = sorted(self.failed_sources)
+        result.update(
+            requests_saved=self.requests_saved,
+            tokens_per_card=round(self.tokens_per_card, 1),
+            naive_tokens_per_card=round(self.naive_tokens_per_card, 1),
+        )
+        return result
+
+
+class CardStreamParser:
+    """
+    Pulls complete top-level JSON objects out of text that arrives in pieces.
+
+    Braces are tracked outside string literals, so an object is emitted as
+    soon as its closing brace arrives, whether the model answers in JSON
+    Lines, a JSON array or inside a code fence; anything between objects is
+    ignored.
+    """
+
+    def __init__(self):
+        self._current: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> list[dict]:
+        objects = []
+        for char in text:
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._current = [char]
+                continue
+            self._current.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and (obj := self._finish()) is not None:
+                    objects.append(obj)
+        return objects
+
+    def _finish(self) -> dict | None:
+        """The object just closed, or None if it isn't a valid JSON object."""
+        raw = "".join(self._current)
+        try:
+            obj = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.warning("Skipping unparsable card: %.80s", raw)
+            return None
+        return obj if isinstance(obj, dict) else None
+
+
+def parse_cards(content: str) -> list[dict]:
+    """Reads cards from a complete reply (JSON Lines, a JSON array or either inside a code fence)."""
+    return CardStreamParser().feed(content)
+
+
+def resolve_card(labels: dict[str, Segment], raw: dict) -> GeneratedCard | None:
+    """Maps a card back to the source it was written from via its segment label."""
+    question, answer = str(raw.get("question") or "").strip(), str(raw.get("answer") or "").strip()
+    if not question or not answer:
+        return None
+    segment = labels.get(str(raw.get("source", "")).strip())
+    if segment is None and len(labels) == 1:
+        segment = next(iter(labels.values()))
+    if segment is None:
+        logger.warning("Dropping card with unknown source label %r", raw.get("source"))
+        return None
+    document = segment.document
+    return GeneratedCard(document.source_type, document.source_id, question, answer, _card_blocks(segment, raw))
+
+
+def _card_blocks(segment: Segment, raw: dict) -> list[str]:
+    """
+    Block ids the card cites, among the segment's blocks. A card citing
+    none gets no provenance: tying it to every block of its segment would
+    retire it (and, with it, most of a page's cards) on any edit there.
+    """
+    block_ids = segment.document.block_ids
+    if block_ids is None:
+        return []
+    markers = {block_marker(index): index for index in segment.blocks}
+    cited = raw.get("blocks")
+    cited = [markers[str(marker).strip("[] ")] for marker in cited if str(marker).strip("[] ") in markers] if isinstance(cited, list) else []
+    return [block_ids[index] for index in dict.fromkeys(cited)]
+
+
+def resolve_cards(batch: PromptBatch, raw_cards: list[dict]) -> list[GeneratedCard]:
+    labels = batch.labels()
+    return [card for raw in raw_cards if (card := resolve_card(labels, raw)) is not None]
+
+
+def _messages(batch: PromptBatch) -> list[dict]:
+    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": batch.prompt()}]
+
+
+class CompletionStream:
+    """
+    One streamed chat completion through OpenRouter.
+
+    Iterating yields the text deltas as the server-sent events arrive;
+    `usage` is filled from the final chunk and recorded in LLM_TOKENS.
+    """
+
+    def __init__(
+        self, client: httpx.AsyncClient, api_key: str, model: str, messages: list[dict], timeout: float = 120.0
+    ):
+        self.client = client
+        self.api_key = api_key
+        self.model = model
+        self.messages = messages
+        self.timeout = timeout
+        self.usage: dict = {}
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._deltas()
+
+    async def _deltas(self) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        async with self.client.stream(
+            "POST",
+            OPENROUTER_URL,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={"model": self.model, "messages": self.messages, "stream": True},
+            timeout=self.timeout,
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                # Blank lines separate events; lines starting with ":" are keep-alive comments
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    raise ValueError(f"LLM stream error: {chunk['error'].get('message')}")
+                if chunk.get("usage"):
+                    self.usage = chunk["usage"]
+                for choice in chunk.get("choices", []):
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+        LLM_LATENCY.labels(self.model).observe(time.perf_counter() - started)
+        LLM_TOKENS.labels(self.model, "prompt").inc(self.usage.get("prompt_tokens", 0))
+        LLM_TOKENS.labels(self.model, "completion").inc(self.usage.get("completion_tokens", 0))
+
+
+# --- Routing ---
+
+@dataclass
+class ModelRoute:
+    model: str
+    max_concurrent: int = DEFAULT_MAX_CONCURRENT
+
+
+def parse_model_routes(value: str | None, default_model: str = DEFAULT_MODEL) -> list[ModelRoute]:
+    """
+    Reads the `openrouter_models` setting: models in order of preference,
+    comma- or newline-separated, each optionally `=N` to cap its concurrent
+    requests, e.g. "openai/gpt-4o-mini=4, google/gemini-2.0-flash-001=2".
+    """
+    routes = []
+    for entry in re.split(r"[,\n]", value or ""):
+        model, _, cap = entry.strip().partition("=")
+        if not model.strip():
+            continue
+        try:
+            max_concurrent = int(cap) if cap.strip() else DEFAULT_MAX_CONCURRENT
+        except ValueError:
+            logger.error("Invalid concurrency cap in model setting %r; using %d.", entry, DEFAULT_MAX_CONCURRENT)
+            max_concurrent = DEFAULT_MAX_CONCURRENT
+        routes.append(ModelRoute(model.strip(), max(1, max_concurrent)))
+    return routes or [ModelRoute(default_model)]
+
+
+class ModelStats:
+    """Rolling first-chunk latencies and outcomes of a model's recent attempts."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.hedges = 0
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+
+    def record_error(self) -> None:
+        self.outcomes.append(False)
+
+    def quantile(self, q: float) -> float | None:
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "samples": len(self.latencies),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "error_rate": round(self.error_rate, 3),
+            "hedges": self.hedges,
+        }
+
+
+@dataclass
+class _Attempt:
+    model: str
+    stream: "CompletionStream"
+    deltas: AsyncIterator[str]
+    started: float
+    task: asyncio.Task | None = None
+
+
+async def _first_delta(deltas: AsyncIterator[str]) -> str | None:
+    return await anext(deltas, None)
+
+
+class RoutedCompletion:
+    """The attempt that produced output first; iterating it yields the whole reply."""
+
+    def __init__(self, router: "ModelRouter", attempt: _Attempt, first: str | None):
+        self._router = router
+        self._attempt = attempt
+        self._first = first
+        self.model = attempt.model
+
+    @property
+    def usage(self) -> dict:
+        return self._attempt.stream.usage
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._deltas()
+
+    async def _deltas(self) -> AsyncIterator[str]:
+        try:
+            if self._first is None:
+                return
+            yield self._first
+            async for delta in self._attempt.deltas:
+                yield delta
+        except Exception:
+            # Cards may already be out, so a stream failing after it won is not retried elsewhere
+            self._router.stats[self.model].record_error()
+            LLM_ATTEMPTS.labels(self.model, "error").inc()
+            raise
+        finally:
+            await self._router._finish(self._attempt)
+
+
+class ModelRouter:
+    """
+    Picks a model for each request from rolling per-model stats.
+
+    Models are tried in order of health, then median time to first chunk
+    (models with too few samples count as fastest so they get measured),
+    then configured order. If the chosen model has produced nothing after its
+    p95 first-chunk latency, a hedged duplicate goes to the next model with
+    spare capacity; whichever streams first wins and the other is cancelled.
+    Errors before the first chunk fall back to the next model. Each model
+    has its own concurrency cap.
+
+    A router lives for the whole process, so its stats carry over between
+    runs, but the semaphores behind the caps belong to one event loop: each
+    loop that routes requests (the web app's, a CLI run's) gets its own set.
+    """
+
+    def __init__(self, routes: list[ModelRoute], hedge_after: float = DEFAULT_HEDGE_AFTER):
+        self.routes = routes
+        self.hedge_after = hedge_after
+        self.stats = {route.model: ModelStats() for route in routes}
+        self._loop_slots: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def _slots(self) -> dict[str, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        slots = self._loop_slots.get(loop)
+        if slots is None:
+            slots = self._loop_slots[loop] = {route.model: asyncio.Semaphore(route.max_concurrent) for route in self.routes}
+        return slots
+
+    def ranked(self) -> list[str]:
+        def key(item):
+            index, route = item
+            stats = self.stats[route.model]
+            return (stats.error_rate >= UNHEALTHY_ERROR_RATE, stats.quantile(0.5) or 0.0, index)
+
+        return [route.model for _, route in sorted(enumerate(self.routes), key=key)]
+
+    def hedge_delay(self, model: str) -> float:
+        p95 = self.stats[model].quantile(0.95)
+        return self.hedge_after if p95 is None else min(p95, self.hedge_after)
+
+    def _start(self, model: str, start: Callable[[str], "CompletionStream"]) -> _Attempt:
+        stream = start(model)
+        attempt = _Attempt(model, stream, aiter(stream), time.perf_counter())
+        attempt.task = asyncio.create_task(_first_delta(attempt.deltas))
+        return attempt
+
+    async def _finish(self, attempt: _Attempt) -> None:
+        await attempt.deltas.aclose()
+        self._slots[attempt.model].release()
+
+    async def _cancel(self, attempt: _Attempt) -> None:
+        attempt.task.cancel()
+        await asyncio.gather(attempt.task, return_exceptions=True)
+        LLM_ATTEMPTS.labels(attempt.model, "cancelled").inc()
+        await self._finish(attempt)
+
+    async def open(self, start: Callable[[str], "CompletionStream"]) -> RoutedCompletion:
+        """
+        Races `start(model)` streams until one yields its first chunk.
+
+        Raises the last error if every model failed before producing output.
+        """
+        candidates = self.ranked()
+        running: list[_Attempt] = []
+        hedged = False
+        last_error: BaseException | None = None
+        try:
+            while True:
+                if not running:
+                    if not candidates:
+                        raise last_error or ValueError("no models configured")
+                    # Prefer a model with a free slot; if all are at their cap, wait for the preferred one
+                    model = next((model for model in candidates if not self._slots[model].locked()), candidates[0])
+                    candidates.remove(model)
+                    await self._slots[model].acquire()
+                    running.append(self._start(model, start))
+
+                timeout = None
+                if not hedged and candidates:
+                    primary = running[0]
+                    timeout = max(0.0, primary.started + self.hedge_delay(primary.model) - time.perf_counter())
+                done, _ = await asyncio.wait(
+                    [attempt.task for attempt in running], timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    hedged = True
+                    spare = next((model for model in candidates if not self._slots[model].locked()), None)
+                    if spare is not None:
+                        candidates.remove(spare)
+                        await self._slots[spare].acquire()
+                        self.stats[running[0].model].hedges += 1
+                        logger.info("Hedging %s with %s after %.2fs without output.", running[0].model, spare, timeout)
+                        running.append(self._start(spare, start))
+                    continue
+
+                for attempt in [attempt for attempt in running if attempt.task in done]:
+                    running.remove(attempt)
+                    error = attempt.task.exception()
+                    if error is None:
+                        self.stats[attempt.model].record_success(time.perf_counter() - attempt.started)
+                        LLM_ATTEMPTS.labels(attempt.model, "won").inc()
+                        for loser in running:
+                            await self._cancel(loser)
+                        running.clear()
+                        return RoutedCompletion(self, attempt, attempt.task.result())
+                    logger.warning("LLM request to %s failed: %s", attempt.model, error)
+                    self.stats[attempt.model].record_error()
+                    LLM_ATTEMPTS.labels(attempt.model, "error").inc()
+                    last_error = error
+                    await self._finish(attempt)
+        finally:
+            # Only left over if we are being cancelled ourselves
+            for attempt in running:
+                await self._cancel(attempt)
+
+    def as_dict(self) -> dict:
+        return {model: stats.as_dict() for model, stats in self.stats.items()}
+
+
+_routers: dict[str, ModelRouter] = {}
+
+
+def parse_latency_budget(value: str | None) -> float:
+    """Reads the `openrouter_latency_budget` setting (seconds); DEFAULT_HEDGE_AFTER if unset or invalid."""
+    if not value or not value.strip():
+        return DEFAULT_HEDGE_AFTER
+    try:
+        budget = float(value)
+    except ValueError:
+        budget = 0.0
+    if budget <= 0:
+        logger.error("Invalid latency budget %r; using %.0fs.", value, DEFAULT_HEDGE_AFTER)
+        return DEFAULT_HEDGE_AFTER
+    return budget
+
+
+def get_router(
+    models_setting: str | None, default_model: str = DEFAULT_MODEL, latency_budget: str | None = None
+) -> ModelRouter:
+    """
+    The process-wide router for a model setting, so stats carry over between
+    generation runs; changing the models starts from fresh stats, changing
+    the latency budget does not.
+    """
+    key = models_setting or default_model
+    router = _routers.get(key)
+    if router is None:
+        router = _routers[key] = ModelRouter(parse_model_routes(models_setting, default_model))
+    router.hedge_after = parse_latency_budget(latency_budget)
+    return router
+
+
+async def generate_flashcards(
+    documents: list[SourceDocument],
+    api_key: str,
+    model: str = DEFAULT_MODEL,
+    budget: int = DEFAULT_CONTEXT_BUDGET,
+    concurrency: int = 4,
+    client: httpx.AsyncClient | None = None,
+    pack: bool = True,
+    on_card: Callable[[GeneratedCard], None] | None = None,
+    router: ModelRouter | None = None,
+) -> tuple[list[GeneratedCard], GenerationReport]:
+    """
+    Generates cards for `documents` with as few requests as the context budget allows.
+
+    Small pages share a request and oversized ones are split at block
+    boundaries (see pack_documents); `pack=False` sends one request per
+    segment instead, for comparison. With a `router`, each request goes to
+    the model it picks (with hedging and fallback) instead of `model`.
+
+    Replies are streamed and every card is passed to `on_card` as soon as
+    its closing brace arrives, so callers can store or deliver it before the
+    rest of the reply is written. Sources whose request failed are listed in
+    the report's `failed_sources`; cards already passed to `on_card` for
+    them are not in the returned list, and callers should discard them.
+    """
+    started = time.perf_counter()
+    segments = [segment for document in documents for segment in split_document(document, budget)]
+    if pack:
+        batches = pack_segments(segments, budget)
+    else:
+        batches = [PromptBatch([segment], segment.tokens) for segment in segments]
+    report = GenerationReport(
+        documents=len(documents),
+        segments=len(segments),
+        requests=len(batches),
+        naive_requests=len(segments),
+        # Both sides are estimated the same way so the comparison holds; actual usage goes to LLM_TOKENS
+        prompt_tokens=sum(batch.tokens for batch in batches) + len(batches) * SYSTEM_PROMPT_TOKENS,
+        naive_prompt_tokens=sum(segment.tokens for segment in segments) + len(segments) * SYSTEM_PROMPT_TOKENS,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    router = router or ModelRouter([ModelRoute(model, concurrency)])
+
+    async def run(http: httpx.AsyncClient, batch: PromptBatch) -> list[GeneratedCard]:
+        labels = batch.labels()
+        messages = _messages(batch)
+        parser = CardStreamParser()
+        cards: list[GeneratedCard] = []
+        completion_chars = 0
+        async with semaphore:
+            request_started = time.perf_counter()
+            try:
+                stream = await router.open(lambda routed_model: CompletionStream(http, api_key, routed_model, messages))
+                async for delta in stream:
+                    completion_chars += len(delta)
+                    for raw in parser.feed(delta):
+                        card = resolve_card(labels, raw)
+                        if card is None:
+                            continue
+                        if not cards:
+                            LLM_FIRST_CARD_LATENCY.labels(stream.model).observe(time.perf_counter() - request_started)
+                        if report.first_card_seconds is None:
+                            report.first_card_seconds = time.perf_counter() - started
+                        cards.append(card)
+                        if on_card is not None:
+                            on_card(card)
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                logger.error("LLM request for %d segments failed: %s", len(batch.segments), e)
+                report.failed_requests += 1
+                report.failed_sources.update(segment.document.source_id for segment in batch.segments)
+                return []
+        # Roughly four characters per token when the provider sends no usage
+        report.completion_tokens += stream.usage.get("completion_tokens") or completion_chars // 4
+        return cards
+
+    if client is None:
+        async with httpx.AsyncClient() as owned_client:
+            results = await asyncio.gather(*(run(owned_client, batch) for batch in batches))
+    else:
+        results = await asyncio.gather(*(run(client, batch) for batch in batches))
+
+    # A source with any failed part is retried as a whole later, so none of its cards are kept
+    cards = [card for batch_cards in results for card in batch_cards if card.source_id not in report.failed_sources]
+    report.cards = len(cards)
+    report.seconds = time.perf_counter() - started
+    logger.info(
+        "Generated %d cards from %d documents in %d requests (%d saved by packing); first card after %s s.",
+        report.cards, report.documents, report.requests, report.requests_saved,
+        f"{report.first_card_seconds:.2f}" if report.first_card_seconds is not None else "-",
+    )
+    return cards, report
@@ -0,0 +1,143 @@
+import hashlib
+import logging
+from dataclasses import dataclass, field
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Flashcard, FlashcardBlock, SourceBlock
+from app.services import live_service
+from app.services.llm_service import SourceDocument
+
+logger = logging.getLogger(__name__)
+
+
+def block_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+@dataclass
+class BlockDiff:
+    """
+    A synced page compared with the blocks its cards were generated from.
+
+    `document` keeps only the blocks that need new cards: new blocks, blocks
+    whose text changed and the unchanged blocks the stale cards also cite,
+    whose content would otherwise leave the deck with them. `stale_card_ids`
+    are the cards written from changed or deleted blocks, retired once the
+    new cards are stored.
+    """
+    document: SourceDocument
+    # Every block of the page as synced now: (block_id, content hash)
+    hashes: list[tuple[str, str]]
+    # False if the page was never generated with provenance
+    known: bool
+    changed_blocks: list[str] = field(default_factory=list)
+    deleted_blocks: list[str] = field(default_factory=list)
+    stale_card_ids: list[int] = field(default_factory=list)
+
+    @property
+    def unchanged(self) -> int:
+        return len(self.hashes) - len(self.document.blocks)
+
+
+def diff_document(db: Session, document: SourceDocument) -> BlockDiff:
+    """Diffs a freshly synced page's blocks against the hashes stored by the last run."""
+    stored = dict(db.execute(
+        select(SourceBlock.block_id, SourceBlock.content_hash).where(
+            SourceBlock.knowledge_source_type == document.source_type,
+            SourceBlock.knowledge_source_id == document.source_id,
+        )
+    ).all())
+    block_ids = document.block_ids or []
+    hashes = [(block_id, block_hash(text)) for block_id, text in zip(block_ids, document.blocks, strict=True)]
+    dirty = [index for index, (block_id, content_hash) in enumerate(hashes) if stored.get(block_id) != content_hash]
+    current = set(block_ids)
+    changed = [block_ids[index] for index in dirty if block_ids[index] in stored]
+    deleted = [block_id for block_id in stored if block_id not in current]
+
+    stale = []
+    if changed or deleted:
+        stale = list(db.scalars(
+            select(FlashcardBlock.flashcard_id.distinct()).where(FlashcardBlock.block_id.in_(changed + deleted))
+        ))
+    if stale:
+        cited = set(db.scalars(select(FlashcardBlock.block_id).where(FlashcardBlock.flashcard_id.in_(stale))))
+        regenerate = set(dirty)
+        dirty = [index for index, block_id in enumerate(block_ids) if index in regenerate or block_id in cited]
+    return BlockDiff(
+        document=SourceDocument(
+            document.source_type,
+            document.source_id,
+            document.title,
+            blocks=[document.blocks[index] for index in dirty],
+            block_ids=[block_ids[index] for index in dirty],
+        ),
+        hashes=hashes,
+        known=bool(stored),
+        changed_blocks=changed,
+        deleted_blocks=deleted,
+        stale_card_ids=stale,
+    )
+
+
+def link_blocks(db: Session, links: list[dict]) -> None:
+    """Adds {flashcard_id, block_id} provenance rows to the caller's transaction."""
+    if links:
+        db.execute(insert(FlashcardBlock).prefix_with("OR IGNORE"), links)
+
+
+def retire_flashcards(db: Session, flashcard_ids: list[int]) -> int:
+    """
+    Takes cards out of rotation: pending ones were never seen and are
+    deleted, the rest keep their review history with status "retired".
+    """
+    if not flashcard_ids:
+        return 0
+    try:
+        deleted = list(db.scalars(
+            delete(Flashcard).where(Flashcard.id.in_(flashcard_ids), Flashcard.status == "pending").returning(Flashcard.id)
+        ))
+        retired = db.execute(
+            update(Flashcard).where(Flashcard.id.in_(flashcard_ids), Flashcard.status != "pending").values(status="retired")
+        ).rowcount
+        db.execute(delete(FlashcardBlock).where(FlashcardBlock.flashcard_id.in_(flashcard_ids)))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    live_service.publish_deleted(deleted)
+    removed = set(deleted)
+    live_service.publish_status([flashcard_id for flashcard_id in flashcard_ids if flashcard_id not in removed], "retired")
+    logger.info("Retired %d cards (%d pending ones deleted).", len(deleted) + retired, len(deleted))
+    return len(deleted) + retired
+
+
+def apply_diff(db: Session, diff: BlockDiff) -> int:
+    """
+    Once a page's new cards are stored: retires the stale cards and records
+    the page's blocks as generated. Returns how many cards were retired.
+    """
+    retired = retire_flashcards(db, diff.stale_card_ids)
+    source = diff.document
+    try:
+        db.execute(delete(SourceBlock).where(
+            SourceBlock.knowledge_source_type == source.source_type,
+            SourceBlock.knowledge_source_id == source.source_id,
+        ))
+        if diff.hashes:
+            db.execute(insert(SourceBlock), [
+                {
+                    "knowledge_source_type": source.source_type,
+                    "knowledge_source_id": source.source_id,
+                    "block_id": block_id,
+                    "position": position,
+                    "content_hash": content_hash,
+                }
+                for position, (block_id, content_hash) in enumerate(diff.hashes)
+            ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return retired
@@ -0,0 +1,169 @@
+import logging
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import insert, nulls_last, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Flashcard, Review
+from app.services import card_event_service
+
+logger = logging.getLogger(__name__)
+
+GRADES = ("again", "hard", "good", "easy")
+MIN_EASE = 1.3
+# A card graded "again" comes back after this long
+RELEARN_DELAY = timedelta(minutes=10)
+
+
+@dataclass
+class ReviewCard:
+    """Detached snapshot of a flashcard and its schedule, held in a review session."""
+
+    id: int
+    question: str
+    answer: str
+    source: str
+    interval_days: float = 0.0
+    ease: float = 2.5
+    reps: int = 0
+
+
+@dataclass
+class GradeEvent:
+    flashcard_id: int
+    chat_id: int
+    grade: str
+    reviewed_at: datetime
+    interval_days: float
+    ease: float
+    reps: int
+    due_at: datetime
+
+
+def _utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def schedule(card: ReviewCard, grade: str, chat_id: int, now: datetime | None = None) -> GradeEvent:
+    """Applies an SM-2 style update for `grade` to `card` in place and returns the write to persist."""
+    if grade not in GRADES:
+        raise ValueError(f"Unknown grade: {grade}")
+    now = now or _utcnow()
+
+    if grade == "again":
+        card.ease = max(MIN_EASE, card.ease - 0.2)
+        card.interval_days = 0.0
+        card.reps = 0
+        due_at = now + RELEARN_DELAY
+    else:
+        if grade == "hard":
+            card.ease = max(MIN_EASE, card.ease - 0.15)
+            interval = card.interval_days * 1.2
+        elif grade == "good":
+            interval = card.interval_days * card.ease if card.reps else 1.0
+        else:
+            card.ease += 0.15
+            interval = card.interval_days * card.ease * 1.3 if card.reps else 4.0
+        card.interval_days = round(max(1.0, interval), 2)
+        card.reps += 1
+        due_at = now + timedelta(days=card.interval_days)
+
+    return GradeEvent(
+        flashcard_id=card.id,
+        chat_id=chat_id,
+        grade=grade,
+        reviewed_at=now,
+        interval_days=card.interval_days,
+        ease=card.ease,
+        reps=card.reps,
+        due_at=due_at,
+    )
+
+
+def get_review_queue(
+    db: Session, limit: int = 20, now: datetime | None = None, chat_id: int | None = None
+) -> list[ReviewCard]:
+    """Returns due cards (most overdue first), then cards that have never been reviewed."""
+    now = now or _utcnow()
+    stmt = (
+        select(
+            Flashcard.id,
+            Flashcard.question,
+            Flashcard.answer,
+            Flashcard.knowledge_source_type,
+            Flashcard.knowledge_source_id,
+            Flashcard.interval_days,
+            Flashcard.ease,
+            Flashcard.reps,
+        )
+        .where(or_(Flashcard.due_at.is_(None), Flashcard.due_at <= now), Flashcard.status != "retired")
+        .order_by(nulls_last(Flashcard.due_at.asc()), Flashcard.id)
+        .limit(limit)
+    )
+    if chat_id is not None:
+        stmt = stmt.where(Flashcard.chat_id == chat_id)
+    cards = [
+        ReviewCard(
+            id=row.id,
+            question=row.question,
+            answer=row.answer,
+            source=f"{row.knowledge_source_type} ({row.knowledge_source_id})" if row.knowledge_source_id else row.knowledge_source_type,
+            interval_days=row.interval_days,
+            ease=row.ease,
+            reps=row.reps,
+        )
+        for row in db.execute(stmt)
+    ]
+    logger.info("Loaded %d cards for review.", len(cards))
+    return cards
+
+
+def record_grades(db: Session, events: list[GradeEvent]) -> None:
+    """
+    Persists a batch of grades in one transaction: one executemany each for
+    the review log, the card event log and the schedule.
+
+    Grades for cards that no longer exist (archived or deleted while the
+    session was open) are dropped: their schedule update would match no row.
+    """
+    if not events:
+        return
+    try:
+        graded = {e.flashcard_id for e in events}
+        existing = set(db.scalars(select(Flashcard.id).where(Flashcard.id.in_(graded))))
+        if existing != graded:
+            logger.warning("Dropping grades for %d cards that no longer exist.", len(graded - existing))
+            events = [e for e in events if e.flashcard_id in existing]
+            if not events:
+                return
+        db.execute(
+            insert(Review),
+            [
+                {
+                    "flashcard_id": e.flashcard_id,
+                    "chat_id": e.chat_id,
+                    "grade": e.grade,
+                    "reviewed_at": e.reviewed_at,
+                    "interval_days": e.interval_days,
+                }
+                for e in events
+            ],
+        )
+        card_event_service.append_events(
+            db, [card_event_service.event_row(e.flashcard_id, "graded", e.chat_id, e.grade, e.reviewed_at) for e in events]
+        )
+        # Later grades for the same card win, so only the last one is applied
+        latest = {e.flashcard_id: e for e in events}
+        db.execute(
+            update(Flashcard),
+            [
+                {"id": e.flashcard_id, "due_at": e.due_at, "interval_days": e.interval_days, "ease": e.ease, "reps": e.reps}
+                for e in latest.values()
+            ],
+        )
+        db.commit()
+        logger.info("Recorded %d grades for %d cards.", len(events), len(latest))
+    except Exception:
+        db.rollback()
+        raise
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from app.config import app_config
+from app.database import get_db_session
+from app.services import generation_service, knowledge_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SourceSchedule:
+    """Polling state of one knowledge source (a Notion database)."""
+
+    source_id: str
+    name: str
+    interval: float
+    next_run: float
+    # What the last sync saw: unprocessed pages and the newest edit to any page
+    fingerprint: tuple | None = None
+    last_run_at: datetime | None = None
+    last_duration: float | None = None
+    last_changed: bool | None = None
+
+
+class SyncScheduler:
+    """
+    Runs fetch_from_all_sources in the background, each source on its own
+    interval, and, if `generate` is set, generates cards from the sources
+    it found changed.
+
+    A source that changed since its previous sync (pages added, processed or
+    edited) is synced again after `min_interval`; each sync that finds it
+    unchanged multiplies its interval by `backoff`, up to `max_interval`.
+    Due times are spread by +/- `jitter` so sources and app instances don't
+    hit Notion in lockstep. Sources due together are synced in one run, and
+    every source at least once per `max_interval` so newly configured
+    databases are picked up.
+
+    Runs are single-flight: a caller arriving while a run is in progress
+    (the loop, or GET /api/fetch) waits for that run's result instead of
+    starting another. Runs only fetch; cards are generated by the loop
+    after its run, so GET /api/fetch stays read-only.
+    """
+
+    def __init__(
+        self,
+        min_interval: float | None = None,
+        max_interval: float | None = None,
+        jitter: float | None = None,
+        backoff: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+        rng: random.Random | None = None,
+        generate: bool | None = None,
+    ):
+        self.min_interval = app_config.sync_min_interval_seconds if min_interval is None else min_interval
+        self.max_interval = max(self.min_interval, app_config.sync_max_interval_seconds if max_interval is None else max_interval)
+        self.jitter = app_config.sync_jitter if jitter is None else jitter
+        self.backoff = backoff
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.generate = app_config.sync_generate_cards if generate is None else generate
+        self.sources: dict[str, SourceSchedule] = {}
+        # Whether loop() is running; without it only GET /api/fetch syncs
+        self.scheduled = False
+        self.last_run_at: datetime | None = None
+        self.last_duration: float | None = None
+        self.last_generation: dict[str, Any] | None = None
+        # Sources found changed by any run (the loop's or GET /api/fetch's) and not yet generated from
+        self._changed: set[str] = set()
+        self._next_full_run = clock() + self._jittered(self.min_interval)
+        self._inflight: asyncio.Task | None = None
+        self._inflight_ids: set[str] | None = None
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    @property
+    def running(self) -> bool:
+        return self._inflight is not None and not self._inflight.done()
+
+    def next_run(self) -> float:
+        """Clock time of the next run: the earliest due source, or the next full run."""
+        return min([self._next_full_run, *(schedule.next_run for schedule in self.sources.values())])
+
+    def due(self) -> set[str] | None:
+        """Ids of the sources due now; None when it is time to sync every source."""
+        now = self.clock()
+        if now >= self._next_full_run:
+            return None
+        return {source_id for source_id, schedule in self.sources.items() if schedule.next_run <= now}
+
+    def observe(self, results: dict[str, Any], duration: float, full: bool) -> set[str]:
+        """
+        Adapts each synced source's interval to whether it changed, and schedules its next sync.
+
+        Returns the ids of the sources whose fingerprint is new, the first
+        sync of each included: those have pages to generate cards from.
+        """
+        now = self.clock()
+        fresh = set()
+        run_at = datetime.now(UTC)
+        self.last_run_at, self.last_duration = run_at, duration
+        seen = set()
+        for source in results["sources"]:
+            source_id = source.get("database_id")
+            if source_id is None:
+                continue
+            seen.add(source_id)
+            schedule = self.sources.get(source_id)
+            if schedule is None:
+                schedule = self.sources[source_id] = SourceSchedule(source_id, source["name"], self.min_interval, now)
+            data = source.get("data") or {}
+            fingerprint = (data["total_count"], data["last_edited_time"]) if source["status"] == "success" else None
+            # Failed syncs and the first one are treated as idle, so a broken source backs off too
+            changed = fingerprint is not None and schedule.fingerprint is not None and fingerprint != schedule.fingerprint
+            if fingerprint is not None and fingerprint != schedule.fingerprint:
+                fresh.add(source_id)
+            if changed:
+                schedule.interval = self.min_interval
+            elif schedule.fingerprint is not None or fingerprint is None:
+                schedule.interval = min(self.max_interval, schedule.interval * self.backoff)
+            schedule.fingerprint = fingerprint or schedule.fingerprint
+            schedule.name = source["name"]
+            schedule.last_changed = changed
+            schedule.last_run_at = run_at
+            schedule.last_duration = source.get("seconds")
+            schedule.next_run = now + self._jittered(schedule.interval)
+        if full:
+            for source_id in set(self.sources) - seen:
+                # No longer configured
+                del self.sources[source_id]
+            self._next_full_run = now + self._jittered(self.max_interval)
+        return fresh
+
+    async def _run(self, database_ids: set[str] | None) -> dict[str, Any]:
+        started = time.perf_counter()
+        db = get_db_session()
+        try:
+            results = await knowledge_service.fetch_from_all_sources(db, database_ids)
+            changed = self.observe(results, time.perf_counter() - started, full=database_ids is None)
+            if self.generate:
+                self._changed |= changed
+        finally:
+            db.close()
+        return results
+
+    async def _generate(self, database_ids: set[str]) -> dict[str, Any]:
+        """Generates cards from the changed sources; a failure is reported, not raised, so the schedule holds."""
+        db = get_db_session()
+        try:
+            report = await generation_service.generate_from_notion(db, database_ids=database_ids)
+        except Exception as e:
+            logger.error("Generating cards from %d changed sources failed: %s", len(database_ids), e, exc_info=True)
+            return {"status": "error", "message": str(e)}
+        finally:
+            db.close()
+        return {
+            "status": "success",
+            "cards": report.cards,
+            "retired_cards": report.retired_cards,
+            "failed_sources": len(report.failed_sources),
+        }
+
+    async def run(self, database_ids: set[str] | None = None) -> dict[str, Any]:
+        """
+        Syncs `database_ids` (every source if None) and returns the fetch results.
+
+        Joins the run in progress if it covers the same sources; otherwise
+        waits for it to finish first, so runs never overlap.
+        """
+        while self.running:
+            task = self._inflight
+            if self._inflight_ids is None or (database_ids is not None and database_ids <= self._inflight_ids):
+                # Shielded: a caller that goes away (a closed request) doesn't cancel the run others wait on
+                return await asyncio.shield(task)
+            await asyncio.gather(asyncio.shield(task), return_exceptions=True)
+        self._inflight_ids = database_ids
+        self._inflight = asyncio.create_task(self._run(database_ids))
+        return await asyncio.shield(self._inflight)
+
+    async def loop(self) -> None:
+        if not self.sources:
+            self._next_full_run = self.clock() + self._jittered(self.min_interval)
+        self.scheduled = True
+        try:
+            while True:
+                await asyncio.sleep(max(0.0, self.next_run() - self.clock()))
+                database_ids = self.due()
+                if database_ids is not None and not database_ids:
+                    continue
+                try:
+                    await self.run(database_ids=database_ids)
+                    if self._changed:
+                        changed, self._changed = self._changed, set()
+                        self.last_generation = await self._generate(changed)
+                except Exception as e:
+                    logger.error("Background sync failed: %s", e, exc_info=True)
+                    retry_at = self.clock() + self._jittered(self.min_interval)
+                    self._next_full_run = max(self._next_full_run, retry_at) if database_ids else retry_at
+                    for schedule in self.sources.values():
+                        schedule.next_run = max(schedule.next_run, retry_at)
+        finally:
+            self.scheduled = False
+            if self.running:
+                self._inflight.cancel()
+                await asyncio.gather(self._inflight, return_exceptions=True)
+
+    def status(self) -> dict[str, Any]:
+        """The schedule for the dashboard, with clock times converted to wall-clock UTC."""
+        now, wall = self.clock(), datetime.now(UTC)
+
+        def at(when: float) -> datetime:
+            return wall + timedelta(seconds=when - now)
+
+        return {
+            "scheduled": self.scheduled,
+            "running": self.running,
+            "last_run_at": self.last_run_at,
+            "last_duration": self.last_duration,
+            "last_generation": self.last_generation,
+            "next_run_at": at(self.next_run()),
+            "sources": [
+                {
+                    "id": schedule.source_id,
+                    "name": schedule.name,
+                    "interval": round(schedule.interval),
+                    "next_run_at": at(schedule.next_run),
+                    "last_run_at": schedule.last_run_at,
+                    "last_duration": schedule.last_duration,
+                    "last_changed": schedule.last_changed,
+                }
+                for schedule in sorted(self.sources.values(), key=lambda schedule: schedule.next_run)
+            ],
+        }
+
+
+scheduler = SyncScheduler()
@@ -0,0 +1,74 @@
+from typing import Literal
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from app.config import LOCAL_DIR
+
+
+class AppConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_file=(".env", ".env.prod"), extra="ignore")
+
+    # Port of the Prometheus endpoint exposed by the Telegram bot process
+    bot_metrics_port: int = 9101
+    # Updates the bot handles at once (a chat's own updates always run in order); 1 handles them one by one
+    bot_concurrent_updates: int = 64
+    # Threads the bot's blocking DB calls run on
+    bot_db_threads: int = 8
+
+    # Opt-in profiling of routes and bot handlers: "cprofile" or "sampling"
+    profiler: Literal["cprofile", "sampling"] | None = None
+    # Comma-separated route paths or handler names to profile; empty profiles all
+    profile_targets: str = ""
+    profile_dir: str = f"{LOCAL_DIR}/profiles"
+
+    # Periodic delivery of pending cards to every active chat; 0 disables it
+    delivery_interval_seconds: int = 3600
+    delivery_cards_per_chat: int = 5
+    # Claimed cards a worker has not confirmed as sent within this lease go back to the other workers
+    delivery_lease_seconds: int = 900
+    # Telegram allows ~30 messages/s per bot and about one per second per chat
+    telegram_global_rate: float = 30.0
+    telegram_per_chat_interval: float = 1.0
+    # Deliveries and /summary replies of at least this many cards go out as one document; 0 disables it
+    digest_threshold: int = 0
+    digest_format: Literal["html", "markdown"] = "html"
+
+    # Requests per second shared by every call to the Notion workspace (Notion averages 3); 0 disables pacing
+    notion_requests_per_second: float = 3.0
+    notion_request_burst: int = 10
+
+    # Flashcard generation through OpenRouter
+    llm_model: str = "openai/gpt-4o-mini"
+    # Source-text tokens packed into one request
+    llm_context_budget: int = 6000
+    llm_concurrency: int = 4
+
+    # Cards sent and not reviewed for this many months move to flashcards_archive; 0 disables it
+    archive_after_months: int = 12
+    # How often the web app archives and then returns freed pages in vacuum steps; 0 disables it
+    maintenance_interval_seconds: int = 86400
+    # Pages freed per vacuum step; 0 skips vacuuming
+    vacuum_step_pages: int = 1000
+
+    # How often the web app writes a compressed snapshot of the SQLite database to backup_dir; 0 disables it
+    backup_interval_seconds: int = 86400
+    backup_dir: str = f"{LOCAL_DIR}/backups"
+    # Snapshots kept; older ones are deleted after each backup
+    backup_keep: int = 7
+    # Pages copied per step of the online backup; writers can commit between steps
+    backup_step_pages: int = 1000
+
+    # Background sync of the knowledge sources in the web app: a source that changed is synced again
+    # after the minimum interval, an idle one backs off to the maximum; a minimum of 0 disables it
+    sync_min_interval_seconds: int = 300
+    sync_max_interval_seconds: int = 3600
+    # Due times are spread by this fraction either way
+    sync_jitter: float = 0.1
+    # Whether the background sync also generates cards from the sources it found changed, which spends
+    # LLM tokens and marks their pages processed in Notion
+    sync_generate_cards: bool = False
+
+    # How often the web app checks the database for the bot's writes while dashboards are open; 0 disables it
+    live_poll_interval_seconds: float = 1.0
+
+app_config = AppConfig()
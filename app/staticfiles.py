@@ -0,0 +1,77 @@
+import gzip
+import logging
+import mimetypes
+import os
+import stat
+from pathlib import Path
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Scope
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".html", ".svg", ".json", ".txt"}
+
+
+def precompress(directory: str | os.PathLike, target: str | os.PathLike) -> int:
+    """
+    Writes a gzipped copy of every compressible file under `directory` to
+    the same relative path (plus .gz) under `target`, unless an up-to-date
+    one is already there. The source tree itself is never written to.
+    """
+    source, target = Path(directory), Path(target)
+    written = 0
+    for path in source.rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        gz_path = target / path.relative_to(source).with_name(path.name + ".gz")
+        if gz_path.exists() and gz_path.stat().st_mtime >= path.stat().st_mtime:
+            continue
+        gz_path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("rb") as src, gzip.open(gz_path, "wb", compresslevel=9) as dst:
+            dst.write(src.read())
+        written += 1
+    if written:
+        logger.info("Precompressed %d static files from %s into %s", written, directory, target)
+    return written
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves `<file>.gz` from `gzip_directory` (see
+    precompress) when the client accepts gzip and the copy is at least as
+    new as the file.
+    """
+
+    def __init__(self, *, gzip_directory: str | os.PathLike, **kwargs):
+        super().__init__(**kwargs)
+        # Path lookups in the cache get the same traversal checks as the files themselves
+        self.gzipped = StaticFiles(directory=gzip_directory, check_dir=False)
+
+    def lookup_gzipped(self, path: str) -> tuple[str, os.stat_result | None]:
+        _, stat_result = self.lookup_path(path)
+        full_path, gz_stat = self.gzipped.lookup_path(path + ".gz")
+        if stat_result is None or gz_stat is None or gz_stat.st_mtime < stat_result.st_mtime:
+            return "", None
+        return full_path, gz_stat
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        request_headers = Headers(scope=scope)
+        if scope["method"] in ("GET", "HEAD") and "gzip" in request_headers.get("accept-encoding", ""):
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_gzipped, path)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                media_type = mimetypes.guess_type(path)[0] or "text/plain"
+                response = FileResponse(full_path, stat_result=stat_result, media_type=media_type)
+                response.headers["Content-Encoding"] = "gzip"
+                response.headers["Vary"] = "Accept-Encoding"
+                if self.is_not_modified(response.headers, request_headers):
+                    return NotModifiedResponse(response.headers)
+                return response
+
+        response = await super().get_response(path, scope)
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
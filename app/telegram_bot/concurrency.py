@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from telegram import Update
+from telegram.ext import Application, BaseUpdateProcessor
+
+from app.config import app_config
+
+logger = logging.getLogger(__name__)
+
+DB_EXECUTOR_KEY = "db_executor"
+
+
+class ChatOrderedProcessor(BaseUpdateProcessor):
+    """
+    Handles up to `max_concurrent_updates` updates at once, but a chat's
+    updates one at a time and in the order they arrived.
+
+    The Application starts a task per update in fetch order. Each task first
+    queues on its chat's lock (asyncio locks wake waiters first in, first
+    out) and only then takes one of the shared slots, so updates stuck
+    behind a slow one in the same chat don't hold slots other chats could
+    use. Updates without a chat are not ordered.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._chat_locks: dict[Hashable, asyncio.Lock] = {}
+        # Updates holding or waiting for each chat's lock; the lock is dropped at zero
+        self._chat_updates: dict[Hashable, int] = {}
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._chat_locks)
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await super().process_update(update, coroutine)
+            return
+        lock = self._chat_locks.get(chat.id)
+        if lock is None:
+            lock = self._chat_locks[chat.id] = asyncio.Lock()
+        self._chat_updates[chat.id] = self._chat_updates.get(chat.id, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self._chat_updates[chat.id] -= 1
+            if not self._chat_updates[chat.id]:
+                del self._chat_updates[chat.id]
+                del self._chat_locks[chat.id]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+async def start_db_executor(application: Application) -> None:
+    """
+    Bounds the threads handlers offload blocking DB calls to.
+
+    Handlers, writers and delivery use asyncio.to_thread, which runs on the
+    loop's default executor; replacing it caps concurrent DB work (and
+    SQLite connections) at BOT_DB_THREADS however many updates are in flight.
+    """
+    executor = ThreadPoolExecutor(max_workers=app_config.bot_db_threads, thread_name_prefix="bot-db")
+    asyncio.get_running_loop().set_default_executor(executor)
+    application.bot_data[DB_EXECUTOR_KEY] = executor
+
+
+async def stop_db_executor(application: Application) -> None:
+    executor = application.bot_data.pop(DB_EXECUTOR_KEY, None)
+    if executor is not None:
+        # Called after the writers' final flushes, so nothing is left to wait for
+        executor.shutdown()
@@ -0,0 +1,275 @@
+import asyncio
+import functools
+import logging
+import os
+import socket
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from telegram import Bot
+from telegram.error import Forbidden, RetryAfter
+from telegram.ext import Application
+
+from app.config import app_config
+from app.database import get_db_session
+from app.services import chat_service, delivery_service, digest_service
+from app.services.buffered_writer import BufferedWriter
+from app.services.delivery_service import FairScheduler
+from app.telegram_bot.handlers import group_flashcard_messages, send_digest
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_TASK_KEY = "delivery_task"
+# Bot API requests in flight at once; pacing itself comes from the scheduler
+SEND_CONCURRENCY = 32
+
+
+@dataclass
+class DeliveryReport:
+    chats: int = 0
+    messages: int = 0
+    cards: int = 0
+    failed: int = 0
+    retried: int = 0
+    seconds: float = 0.0
+    blocked_chats: list = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+async def deliver(
+    scheduler: FairScheduler,
+    send: Callable[[Hashable, Any], Awaitable[None]],
+    on_sent: Callable[[Hashable, Any], None] | None = None,
+    concurrency: int = SEND_CONCURRENCY,
+    clock: Callable[[], float] = time.monotonic,
+) -> DeliveryReport:
+    """
+    Sends everything in `scheduler` at the times it reserves.
+
+    Sends run concurrently (up to `concurrency`) so Bot API latency does not
+    eat into the 30 msg/s budget. A RetryAfter pauses the whole schedule and
+    puts the message back at the head; a Forbidden (bot blocked or removed)
+    drops the chat's remaining messages and reports it in `blocked_chats`.
+    """
+    report = DeliveryReport(chats=scheduler.chats)
+    started = clock()
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks: set[asyncio.Task] = set()
+    blocked: set[Hashable] = set()
+
+    async def send_one(chat_id, message):
+        try:
+            await send(chat_id, message)
+        except RetryAfter as e:
+            logger.warning("Rate limited by Telegram for %ss; pausing delivery.", e.retry_after)
+            scheduler.pause_until(clock() + float(e.retry_after))
+            scheduler.requeue(chat_id, message)
+            report.retried += 1
+        except Forbidden as e:
+            logger.warning("Chat %s is unreachable (%s); skipping its remaining messages.", chat_id, e)
+            blocked.add(chat_id)
+            report.failed += 1
+        except Exception as e:
+            logger.error("Failed to deliver to chat %s: %s", chat_id, e, exc_info=True)
+            report.failed += 1
+        else:
+            report.messages += 1
+            if on_sent is not None:
+                on_sent(chat_id, message)
+        finally:
+            semaphore.release()
+
+    while True:
+        entry = scheduler.next(clock())
+        if entry is None:
+            if not tasks:
+                break
+            # In-flight sends may hand messages back after a RetryAfter
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            continue
+
+        send_at, chat_id, message = entry
+        if chat_id in blocked:
+            continue
+        delay = send_at - clock()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await semaphore.acquire()
+        task = asyncio.create_task(send_one(chat_id, message))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    report.blocked_chats = sorted(blocked)
+    report.seconds = clock() - started
+    return report
+
+
+def lease_owner() -> str:
+    """Identifies this delivery worker in the claims it holds; evaluated per call so forked workers differ."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _claim_pending(cards_per_chat: int, owner: str) -> dict[int, list]:
+    db = get_db_session()
+    try:
+        return delivery_service.claim_pending_by_chat(db, cards_per_chat, owner, app_config.delivery_lease_seconds)
+    finally:
+        db.close()
+
+
+def _renew_claims(owner: str, flashcard_ids: list[int]) -> list[int]:
+    db = get_db_session()
+    try:
+        return delivery_service.renew_claims(db, owner, flashcard_ids, app_config.delivery_lease_seconds)
+    finally:
+        db.close()
+
+
+def _release_claims(owner: str, flashcard_ids: list[int]) -> None:
+    db = get_db_session()
+    try:
+        delivery_service.release_claims(db, owner, flashcard_ids)
+    finally:
+        db.close()
+
+
+def _deactivate_chats(chat_ids: list[int]) -> None:
+    db = get_db_session()
+    try:
+        for chat_id in chat_ids:
+            chat_service.deactivate_chat(db, chat_id)
+    finally:
+        db.close()
+
+
+def _mark_sent(sent: list[tuple[int, int]], owner: str, confirmed: list[int]) -> None:
+    """Flushes (flashcard_id, chat_id) pairs of delivered cards, confirming `owner`'s claims; adds the confirmed ids to `confirmed`."""
+    db = get_db_session()
+    try:
+        ids = delivery_service.mark_sent(db, [flashcard_id for flashcard_id, _ in sent], chat_ids=dict(sent), owner=owner)
+    finally:
+        db.close()
+    if len(ids) < len(sent):
+        logger.warning("%s sent %d cards whose claims it no longer held.", owner, len(sent) - len(ids))
+    confirmed.extend(ids)
+
+
+def _schedule(cards_by_chat: dict[int, list]) -> FairScheduler:
+    """Queues each chat's cards as a digest (at least `digest_threshold` of them) or as messages of a few cards."""
+    scheduler = FairScheduler(app_config.telegram_global_rate, app_config.telegram_per_chat_interval)
+    for chat_id, cards in cards_by_chat.items():
+        if app_config.digest_threshold and len(cards) >= app_config.digest_threshold:
+            scheduler.enqueue(chat_id, (cards, [card.id for card in cards]))
+            continue
+        for text, group in group_flashcard_messages(cards):
+            scheduler.enqueue(chat_id, (text, [card.id for card in group]))
+    return scheduler
+
+
+async def send_due_flashcards(bot: Bot, cards_per_chat: int | None = None) -> DeliveryReport:
+    """
+    Delivers up to `cards_per_chat` pending cards to every active chat, fairly interleaved.
+
+    The cards are claimed under a lease first, so several bot processes can
+    deliver side by side without sending a card twice. The leases are
+    renewed every third of their length for as long as the run takes, and a
+    card whose lease was lost anyway (another worker claimed it) is not
+    sent from here. Sent cards are confirmed in batches; claimed cards that
+    could not be sent go back to pending at the end. Only confirmed cards
+    count towards the report's `cards`.
+
+    A chat with at least `digest_threshold` cards gets them all in one
+    document (see digest_service) instead of a message per few cards.
+    """
+    owner = lease_owner()
+    cards_by_chat = await asyncio.to_thread(_claim_pending, cards_per_chat or app_config.delivery_cards_per_chat, owner)
+
+    scheduler = _schedule(cards_by_chat)
+
+    confirmed: list[int] = []
+    writer = BufferedWriter(
+        functools.partial(_mark_sent, owner=owner, confirmed=confirmed), max_items=delivery_service.MARK_SENT_BATCH
+    )
+    claimed = sorted(card.id for cards in cards_by_chat.values() for card in cards)
+    unsent = set(claimed)
+    lost: set[int] = set()
+
+    async def keep_leases():
+        while True:
+            await asyncio.sleep(app_config.delivery_lease_seconds / 3)
+            # Sent cards waiting in the writer are still claimed and need their lease until confirmed
+            try:
+                renewed = set(await asyncio.to_thread(_renew_claims, owner, claimed))
+            except Exception as e:
+                logger.error("Renewing delivery leases failed: %s", e, exc_info=True)
+                continue
+            gone = {flashcard_id for flashcard_id in unsent if flashcard_id not in renewed}
+            if gone:
+                logger.warning("%s lost the lease on %d unsent cards; leaving them to their new holder.", owner, len(gone))
+                lost.update(gone)
+                unsent.difference_update(gone)
+
+    async def send(chat_id, message):
+        content, flashcard_ids = message
+        if lost.intersection(flashcard_ids):
+            return
+        if isinstance(content, str):
+            await bot.send_message(chat_id=chat_id, text=content)
+            return
+        # Rendered at send time, so a retry after RetryAfter starts from a fresh file
+        paths, count = await asyncio.to_thread(
+            digest_service.render_digest, "New flashcards", content, app_config.digest_format
+        )
+        await send_digest(bot, chat_id, paths, "flashcards", f"{count} new flashcards")
+
+    def on_sent(chat_id, message):
+        if lost.intersection(message[1]):
+            return
+        for flashcard_id in message[1]:
+            unsent.discard(flashcard_id)
+            writer.add((flashcard_id, chat_id))
+
+    renewal = asyncio.create_task(keep_leases())
+    try:
+        report = await deliver(scheduler, send, on_sent)
+    finally:
+        renewal.cancel()
+        await asyncio.gather(renewal, return_exceptions=True)
+        await writer.close()
+    report.cards = len(confirmed)
+
+    if unsent:
+        await asyncio.to_thread(_release_claims, owner, sorted(unsent))
+    if report.blocked_chats:
+        await asyncio.to_thread(_deactivate_chats, report.blocked_chats)
+    logger.info("Delivery finished: %s", report.as_dict())
+    return report
+
+
+async def delivery_loop(interval: float, bot: Bot) -> None:
+    while True:
+        try:
+            await send_due_flashcards(bot)
+        except Exception as e:
+            logger.error("Scheduled delivery failed: %s", e, exc_info=True)
+        await asyncio.sleep(interval)
+
+
+async def start_delivery(application: Application) -> None:
+    if app_config.delivery_interval_seconds <= 0:
+        logger.info("Scheduled delivery is disabled.")
+        return
+    application.bot_data[DELIVERY_TASK_KEY] = asyncio.create_task(
+        delivery_loop(app_config.delivery_interval_seconds, application.bot)
+    )
+
+
+async def stop_delivery(application: Application) -> None:
+    task = application.bot_data.pop(DELIVERY_TASK_KEY, None)
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
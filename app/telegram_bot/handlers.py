@@ -1,10 +1,14 @@
+import asyncio
 import logging
+from pathlib import Path
 
-from telegram import Update
+from telegram import Bot, Update
 from telegram.ext import ContextTypes
 
+from app.config import app_config
 from app.database import get_db_session
-from app.services import config_service, flashcard_service
+from app.models import Chat
+from app.services import chat_service, digest_service, flashcard_service
 
 logger = logging.getLogger(__name__)
 
@@ -18,59 +22,118 @@ def format_flashcard(flashcard) -> str:
     source_info = f"{flashcard.knowledge_source_type} ({flashcard.knowledge_source_id})" if flashcard.knowledge_source_id else flashcard.knowledge_source_type
     return f"Q: {q}\nA: {a}\nSource: {source_info}"
 
-async def check_chat_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    """Checks if the message comes from the configured chat ID."""
-    db = get_db_session()
+MAX_MSG_LEN = 4096 # Telegram message length limit
+
+def group_flashcard_messages(flashcards, max_len: int = MAX_MSG_LEN) -> list[tuple[str, list]]:
+    """Packs formatted flashcards into as few messages as fit under Telegram's length limit, keeping the cards of each."""
+    messages = []
+    parts = []
+    cards = []
+    current_len = 0
+    for card in flashcards:
+        card_text = format_flashcard(card) + "\n\n"
+        if parts and current_len + len(card_text) > max_len - 50: # Leave buffer
+            messages.append(("".join(parts), cards))
+            parts = []
+            cards = []
+            current_len = 0
+        parts.append(card_text)
+        cards.append(card)
+        current_len += len(card_text)
+
+    if parts: # The last batch
+        messages.append(("".join(parts).strip(), cards))
+    return messages
+
+def chunk_flashcard_messages(flashcards, max_len: int = MAX_MSG_LEN) -> list[str]:
+    """Packs formatted flashcards into as few messages as fit under Telegram's length limit."""
+    return [text for text, _ in group_flashcard_messages(flashcards, max_len)]
+
+DIGEST_ARG = "digest"
+
+def digest_filename(name: str) -> str:
+    return name + digest_service.DIGEST_FORMATS[app_config.digest_format]
+
+async def send_digest(bot: Bot, chat_id: int, paths: list[Path], name: str, caption: str | None = None) -> None:
+    """
+    Uploads a rendered digest with one send_document call (one per part if it
+    had to be split), then deletes its files.
+    """
     try:
-        configured_chat_id_str = config_service.get_config_value(db, "telegram_chat_id")
-        if not configured_chat_id_str:
-            logger.warning("Telegram Chat ID not configured in database.")
-            # Avoid replying in chats that are not the configured one
-            # await update.message.reply_text("Bot not configured. Please set the Telegram Chat ID via the dashboard.")
-            return False
+        for part, path in enumerate(paths, start=1):
+            filename = digest_filename(f"{name}-{part}" if len(paths) > 1 else name)
+            with path.open("rb") as document:
+                await bot.send_document(
+                    chat_id=chat_id, document=document, filename=filename, caption=caption if part == 1 else None
+                )
+    finally:
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+def _read(db, query, *args, **kwargs):
+    """
+    Runs `query` on a DB thread, then closes the session so its connection is
+    back in the pool while the replies are sent; the loaded rows stay readable.
+    """
+    try:
+        return query(db, *args, **kwargs)
+    finally:
+        db.close()
 
-        try:
-            configured_chat_id = int(configured_chat_id_str)
-        except ValueError:
-            logger.error(f"Invalid Telegram Chat ID configured: {configured_chat_id_str}")
-            return False
+def _render_summary(period: str, chat_id: int) -> tuple[list[Path], int]:
+    db = get_db_session()
+    try:
+        cards = flashcard_service.iter_sent_flashcards_by_period(db, period, chat_id=chat_id)
+        return digest_service.render_digest(f"Flashcards sent: {period}", cards, app_config.digest_format)
+    finally:
+        db.close()
 
-        if update.effective_chat.id != configured_chat_id:
-            logger.warning(f"Ignoring message from unauthorized chat ID: {update.effective_chat.id}. Expected: {configured_chat_id}")
+async def check_chat_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Checks if the message comes from a registered (or the configured) chat ID."""
+    try:
+        authorized = chat_service.authorized_chats
+        # Reloading the chat list is a DB query; keep it off the event loop
+        chat_ids = authorized.cached()
+        if chat_ids is None:
+            chat_ids = await asyncio.to_thread(authorized.chat_ids)
+        if update.effective_chat.id not in chat_ids:
+            logger.warning("Ignoring message from unauthorized chat ID: %s", update.effective_chat.id)
             return False
-        logger.debug(f"Message received from authorized chat ID: {update.effective_chat.id}")
+        logger.debug("Message received from authorized chat ID: %s", update.effective_chat.id)
         return True
     except Exception as e:
-        logger.error(f"Error checking chat ID: {e}", exc_info=True)
+        logger.error("Error checking chat ID: %s", e, exc_info=True)
         return False # Fail safe
-    finally:
-        db.close()
 
 
 # --- Command Handlers ---
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Sends a welcome message when the /start command is issued."""
-    logger.info(f"Received /start command from chat ID: {update.effective_chat.id}")
+    logger.info("Received /start command from chat ID: %s", update.effective_chat.id)
     if not await check_chat_id(update, context):
         return
     await update.message.reply_text(
         "Hello! I'm the Flashcard Bot.\n\n"
         "I will send you new flashcards periodically.\n\n"
         "Available commands:\n"
-        "/summary <today|this_month|last_three_months> - Review recently sent flashcards.\n"
-        "/random [N] - Get N random flashcards (default 3, max 20)."
+        "/summary <today|this_month|last_three_months> [digest] - Review recently sent flashcards, optionally as one document.\n"
+        "/random [N] - Get N random flashcards (default 3, max 20).\n"
+        "/review [N] - Review up to N due flashcards and grade your recall (default 20).\n"
+        "/subscribe <source_id> [type] - Add a knowledge source (default type: notion) to this chat's deck.\n"
+        "/unsubscribe <source_id> [type] - Remove a knowledge source.\n"
+        "/subscriptions - List this chat's knowledge sources."
     )
 
 
 async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handles the /summary command."""
-    logger.info(f"Received /summary command from chat ID: {update.effective_chat.id} with args: {context.args}")
+    logger.info("Received /summary command from chat ID: %s with args: %s", update.effective_chat.id, context.args)
     if not await check_chat_id(update, context):
         return
 
     if not context.args:
-        await update.message.reply_text("Usage: /summary <period>\nPeriods: today, this_month, last_three_months")
+        await update.message.reply_text("Usage: /summary <period> [digest]\nPeriods: today, this_month, last_three_months")
         return
 
     period = context.args[0].lower()
@@ -79,32 +142,39 @@ async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_text(f"Invalid period '{period}'. Use one of: {', '.join(valid_periods)}")
         return
 
+    chat_id = update.effective_chat.id
+    digest = DIGEST_ARG in (arg.lower() for arg in context.args[1:])
     db = get_db_session()
     try:
-        flashcards = flashcard_service.get_sent_flashcards_by_period(db, period)
+        if not digest and app_config.digest_threshold:
+            count = await asyncio.to_thread(_read, db, flashcard_service.count_sent_flashcards_by_period, period, chat_id=chat_id)
+            digest = count >= app_config.digest_threshold
+        if digest:
+            # One document streamed from the cursor instead of a message per few cards
+            paths, count = await asyncio.to_thread(_render_summary, period, chat_id)
+            if not count:
+                for path in paths:
+                    path.unlink(missing_ok=True)
+                await update.message.reply_text(f"No flashcards found for the period: {period}.")
+                return
+            caption = f"Flashcards sent for period '{period}' ({count} total)"
+            await send_digest(context.bot, chat_id, paths, f"summary-{period}", caption)
+            return
+
+        flashcards = await asyncio.to_thread(_read, db, flashcard_service.get_sent_flashcards_by_period, period, chat_id=chat_id)
         if not flashcards:
             await update.message.reply_text(f"No flashcards found for the period: {period}.")
             return
 
         response_header = f"Flashcards sent for period '{period}' ({len(flashcards)} total):\n{'-'*20}\n"
-        response_message = ""
-        MAX_MSG_LEN = 4096 # Telegram message length limit
 
         await update.message.reply_text(response_header) # Send header first
 
-        for card in flashcards:
-            card_text = format_flashcard(card) + "\n\n"
-            if len(response_message) + len(card_text) > MAX_MSG_LEN - 50: # Leave buffer
-                await update.message.reply_text(response_message)
-                response_message = card_text # Start new message
-            else:
-                response_message += card_text
-
-        if response_message:
-             await update.message.reply_text(response_message.strip())
+        for response_message in chunk_flashcard_messages(flashcards):
+            await update.message.reply_text(response_message)
 
     except Exception as e:
-        logger.error(f"Error processing /summary command for period '{period}': {e}", exc_info=True)
+        logger.error("Error processing /summary command for period '%s': %s", period, e, exc_info=True)
         await update.message.reply_text("An error occurred while fetching the summary. Please check the logs.")
 
     finally:
@@ -113,7 +183,7 @@ async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def random_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handles the /random command."""
-    logger.info(f"Received /random command from chat ID: {update.effective_chat.id} with args: {context.args}")
+    logger.info("Received /random command from chat ID: %s with args: %s", update.effective_chat.id, context.args)
     if not await check_chat_id(update, context):
         return
 
@@ -131,37 +201,114 @@ async def random_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     db = get_db_session()
     try:
-        flashcards = flashcard_service.get_random_flashcards(db, count)
+        flashcards = await asyncio.to_thread(
+            _read, db, flashcard_service.get_random_flashcards, count, chat_id=update.effective_chat.id
+        )
         if not flashcards:
             await update.message.reply_text("No flashcards found in the database yet.")
             return
 
         response_header = f"Here are {len(flashcards)} random flashcard(s):\n{'-'*20}\n"
-        response_message = ""
-        MAX_MSG_LEN = 4096
 
         await update.message.reply_text(response_header) # Send header first
 
-        for card in flashcards:
-            card_text = format_flashcard(card) + "\n\n"
-            if len(response_message) + len(card_text) > MAX_MSG_LEN - 50: # Leave buffer
-                await update.message.reply_text(response_message)
-                response_message = card_text # Start new message
-            else:
-                response_message += card_text
-
-        if response_message: # Send the last batch
-             await update.message.reply_text(response_message.strip())
+        for response_message in chunk_flashcard_messages(flashcards):
+            await update.message.reply_text(response_message)
 
     except Exception as e:
-        logger.error(f"Error processing /random command for count {count}: {e}", exc_info=True)
+        logger.error("Error processing /random command for count %d: %s", count, e, exc_info=True)
         await update.message.reply_text("An error occurred while fetching random flashcards. Please check the logs.")
     finally:
         db.close()
 
+# /subscribe and /unsubscribe take a source id and, optionally, its type
+SOURCE_ARGS_WITH_TYPE = 2
+
+def _source_args(args) -> tuple[str, str] | None:
+    if not args or len(args) > SOURCE_ARGS_WITH_TYPE:
+        return None
+    return (args[1].lower() if len(args) == SOURCE_ARGS_WITH_TYPE else "notion"), args[0]
+
+
+def _subscribe(db, chat_id: int, title: str | None, source: tuple[str, str]) -> bool:
+    if db.get(Chat, chat_id) is None:
+        # The configured chat is authorized before it has a chats row
+        chat_service.register_chat(db, chat_id, title=title)
+    return chat_service.subscribe(db, chat_id, *source)
+
+
+async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles the /subscribe command."""
+    logger.info("Received /subscribe command from chat ID: %s with args: %s", update.effective_chat.id, context.args)
+    if not await check_chat_id(update, context):
+        return
+
+    source = _source_args(context.args)
+    if source is None:
+        await update.message.reply_text("Usage: /subscribe <source_id> [type]")
+        return
+
+    db = get_db_session()
+    try:
+        chat = update.effective_chat
+        if await asyncio.to_thread(_subscribe, db, chat.id, chat.title, source):
+            await update.message.reply_text(f"Subscribed to {source[0]} source {source[1]}.")
+        else:
+            await update.message.reply_text(f"Already subscribed to {source[0]} source {source[1]}.")
+    except Exception as e:
+        logger.error("Error processing /subscribe command: %s", e, exc_info=True)
+        await update.message.reply_text("An error occurred while subscribing. Please check the logs.")
+    finally:
+        db.close()
+
+
+async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles the /unsubscribe command."""
+    logger.info("Received /unsubscribe command from chat ID: %s with args: %s", update.effective_chat.id, context.args)
+    if not await check_chat_id(update, context):
+        return
+
+    source = _source_args(context.args)
+    if source is None:
+        await update.message.reply_text("Usage: /unsubscribe <source_id> [type]")
+        return
+
+    db = get_db_session()
+    try:
+        if await asyncio.to_thread(chat_service.unsubscribe, db, update.effective_chat.id, *source):
+            await update.message.reply_text(f"Unsubscribed from {source[0]} source {source[1]}.")
+        else:
+            await update.message.reply_text(f"This chat is not subscribed to {source[0]} source {source[1]}.")
+    except Exception as e:
+        logger.error("Error processing /unsubscribe command: %s", e, exc_info=True)
+        await update.message.reply_text("An error occurred while unsubscribing. Please check the logs.")
+    finally:
+        db.close()
+
+
+async def subscriptions_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles the /subscriptions command."""
+    logger.info("Received /subscriptions command from chat ID: %s", update.effective_chat.id)
+    if not await check_chat_id(update, context):
+        return
+
+    db = get_db_session()
+    try:
+        subscriptions = await asyncio.to_thread(_read, db, chat_service.get_subscriptions, update.effective_chat.id)
+        if not subscriptions:
+            await update.message.reply_text("This chat has no subscriptions yet. Use /subscribe <source_id>.")
+            return
+        lines = [f"- {s.knowledge_source_type}: {s.knowledge_source_id}" for s in subscriptions]
+        await update.message.reply_text("Subscribed knowledge sources:\n" + "\n".join(lines))
+    except Exception as e:
+        logger.error("Error processing /subscriptions command: %s", e, exc_info=True)
+        await update.message.reply_text("An error occurred while listing subscriptions. Please check the logs.")
+    finally:
+        db.close()
+
 async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handles unknown commands."""
-    logger.info(f"Received unknown command from chat ID: {update.effective_chat.id}")
+    logger.info("Received unknown command from chat ID: %s", update.effective_chat.id)
     if not await check_chat_id(update, context):
         return
     # Check if it's a message or command; only reply to commands we didn't understand
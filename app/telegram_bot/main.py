@@ -3,38 +3,60 @@ import logging
 from telegram import Update
 from telegram.ext import (
     Application,
+    CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
     MessageHandler,
     filters,
 )
 
-from app.database import SessionLocal
-from app.services import config_service
+from app.config import app_config
+from app.database import SessionLocal, init_db
+from app.metrics import start_metrics_server
+from app.profiling import profiled
+from app.services import chat_service, config_service
+from app.telegram_bot.concurrency import (
+    ChatOrderedProcessor,
+    start_db_executor,
+    stop_db_executor,
+)
+from app.telegram_bot.delivery import start_delivery, stop_delivery
 from app.telegram_bot.handlers import (
     random_command,
     start_command,
+    subscribe_command,
+    subscriptions_command,
     summary_command,
     unknown_command,
+    unsubscribe_command,
 )
-
-# Configure logging more robustly
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-    handlers=[logging.StreamHandler()]
+from app.telegram_bot.request import InstrumentedRequest
+from app.telegram_bot.review import (
+    review_callback,
+    review_command,
+    start_review_writers,
+    stop_review_writers,
 )
-# Reduce verbosity from libraries
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("telegram.vendor.ptb_urllib3.urllib3").setLevel(logging.WARNING)
-logging.getLogger("telegram.ext").setLevel(logging.INFO)
 
 logger = logging.getLogger(__name__)
 
 
+def configure_logging() -> None:
+    """Configures logging for the bot process; not on import, so tools reusing the handlers keep their own."""
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+        handlers=[logging.StreamHandler()]
+    )
+    # Reduce verbosity from libraries
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("telegram.vendor.ptb_urllib3.urllib3").setLevel(logging.WARNING)
+    logging.getLogger("telegram.ext").setLevel(logging.INFO)
+
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log Errors caused by Updates."""
-    logger.error(f"Exception while handling an update: {context.error}", exc_info=context.error)
+    logger.error("Exception while handling an update: %s", context.error, exc_info=context.error)
 
     # Optionally, send a message to the chat where the error occurred or to a developer chat
     # Be cautious about sending detailed errors to users.
@@ -50,18 +72,56 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
                 text="Sorry, an internal error occurred while processing your request."
             )
         except Exception as e:
-            logger.error(f"Failed to send error message to chat {update.effective_chat.id}: {e}")
+            logger.error("Failed to send error message to chat %s: %s", update.effective_chat.id, e)
+
+
+async def post_init(application: Application) -> None:
+    await start_db_executor(application)
+    await start_review_writers(application)
+    await start_delivery(application)
+
+
+async def post_shutdown(application: Application) -> None:
+    await stop_delivery(application)
+    await stop_review_writers(application)
+    await stop_db_executor(application)
+
+
+def register_handlers(application: Application) -> None:
+    # Handlers are only wrapped when PROFILER is set, keeping the default path untouched
+    wrap = profiled if app_config.profiler else (lambda handler: handler)
+
+    # Register command handlers
+    application.add_handler(CommandHandler("start", wrap(start_command)))
+    application.add_handler(CommandHandler("summary", wrap(summary_command)))
+    application.add_handler(CommandHandler("random", wrap(random_command)))
+    application.add_handler(CommandHandler("review", wrap(review_command)))
+    application.add_handler(CommandHandler("subscribe", wrap(subscribe_command)))
+    application.add_handler(CommandHandler("unsubscribe", wrap(unsubscribe_command)))
+    application.add_handler(CommandHandler("subscriptions", wrap(subscriptions_command)))
+    application.add_handler(
+        CallbackQueryHandler(wrap(review_callback), pattern=r"^review:(show|skip|again|hard|good|easy):\d+$")
+    )
+
+    # Handler for unknown commands - filters.COMMAND ensures it only catches commands
+    application.add_handler(MessageHandler(filters.COMMAND, wrap(unknown_command)))
 
 
 def run_bot():
     """Configures and runs the Telegram bot using polling."""
+    configure_logging()
     logger.info("Attempting to start Telegram bot...")
 
+    init_db()
     db = SessionLocal()
     try:
         token = config_service.get_config_value(db, "telegram_bot_token")
-        # We don't strictly need the chat_id here, as handlers check it, but good to verify it exists.
         chat_id_str = config_service.get_config_value(db, "telegram_chat_id")
+        if chat_id_str:
+            # The configured chat owns every card created before per-chat decks existed
+            chat_service.register_chat(db, int(chat_id_str), claim_unowned=True)
+    except ValueError:
+        logger.error("Invalid Telegram Chat ID configured: %s", chat_id_str)
     finally:
         db.close()
 
@@ -69,26 +129,29 @@ def run_bot():
         logger.critical("CRITICAL: Telegram Bot Token not found in configuration. Bot cannot start.")
         return # Exit if no token
     if not chat_id_str:
-        logger.critical("CRITICAL: Telegram Chat ID not found in configuration. Bot will run but only respond if configured later.")
-        return # Exit if no token
+        logger.warning("Telegram Chat ID not configured; the bot only answers chats registered via /api/chats.")
 
     try:
-        application = Application.builder().token(token).build()
-
-        # Register command handlers
-        application.add_handler(CommandHandler("start", start_command))
-        application.add_handler(CommandHandler("summary", summary_command))
-        application.add_handler(CommandHandler("random", random_command))
-
-        # Handler for unknown commands - filters.COMMAND ensures it only catches commands
-        application.add_handler(MessageHandler(filters.COMMAND, unknown_command))
+        start_metrics_server(app_config.bot_metrics_port)
+        logger.info("Serving bot metrics on port %d", app_config.bot_metrics_port)
+
+        application = (
+            Application.builder()
+            .token(token)
+            .request(InstrumentedRequest(connection_pool_size=256))
+            .concurrent_updates(ChatOrderedProcessor(app_config.bot_concurrent_updates))
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            .build()
+        )
+        register_handlers(application)
 
         # Start the Bot using polling
         logger.info("Starting bot polling...")
         application.run_polling(allowed_updates=Update.ALL_TYPES) # Listen for all update types
 
     except Exception as e:
-        logger.critical(f"CRITICAL: Failed to initialize or run the Telegram bot: {e}", exc_info=True)
+        logger.critical("CRITICAL: Failed to initialize or run the Telegram bot: %s", e, exc_info=True)
 
 
 if __name__ == "__main__":
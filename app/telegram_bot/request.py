@@ -0,0 +1,12 @@
+from telegram.request import HTTPXRequest
+
+from app.metrics import TELEGRAM_SEND_LATENCY, Timer
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records Bot API latency per API method (sendMessage, ...)."""
+
+    async def do_request(self, url: str, method: str, request_data=None, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        with Timer(TELEGRAM_SEND_LATENCY.labels(api_method)):
+            return await super().do_request(url, method, request_data, *args, **kwargs)
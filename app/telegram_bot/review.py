@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import Application, ContextTypes
+
+from app.database import get_db_session
+from app.services import card_event_service, review_service
+from app.services.buffered_writer import BufferedWriter
+from app.services.review_service import GradeEvent, ReviewCard
+from app.telegram_bot.handlers import check_chat_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_SIZE = 20
+MAX_SESSION_SIZE = 100
+SESSION_KEY = "review"
+WRITER_KEY = "grade_writer"
+EVENT_WRITER_KEY = "card_event_writer"
+CALLBACK_PREFIX = "review"
+
+
+@dataclass
+class ReviewSession:
+    """A chat's review in progress; lives in chat_data, so callbacks never touch the DB."""
+
+    queue: deque[ReviewCard]
+    current: ReviewCard | None = None
+    grades: Counter = field(default_factory=Counter)
+    skipped: int = 0
+
+    def next_card(self) -> ReviewCard | None:
+        self.current = self.queue.popleft() if self.queue else None
+        return self.current
+
+
+def _question_text(session: ReviewSession) -> str:
+    card = session.current
+    return f"Q: {card.question.strip()}\n\n({len(session.queue)} more after this)"
+
+
+def _answer_text(session: ReviewSession) -> str:
+    card = session.current
+    return f"Q: {card.question.strip()}\nA: {card.answer.strip()}\nSource: {card.source}"
+
+
+def _show_keyboard(card: ReviewCard) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("Show answer", callback_data=f"{CALLBACK_PREFIX}:show:{card.id}"),
+        InlineKeyboardButton("Skip", callback_data=f"{CALLBACK_PREFIX}:skip:{card.id}"),
+    ]])
+
+
+def _grade_keyboard(card: ReviewCard) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(grade.capitalize(), callback_data=f"{CALLBACK_PREFIX}:{grade}:{card.id}")
+        for grade in review_service.GRADES
+    ]])
+
+
+def _summary_text(session: ReviewSession) -> str:
+    total = sum(session.grades.values())
+    breakdown = ", ".join(f"{grade} {session.grades[grade]}" for grade in review_service.GRADES if session.grades[grade])
+    skipped = f", {session.skipped} skipped" if session.skipped else ""
+    return f"Review complete: {total} grade(s) ({breakdown}){skipped}.\nSend /review to start another session."
+
+
+def write_grades(events: list[GradeEvent]) -> None:
+    db = get_db_session()
+    try:
+        review_service.record_grades(db, events)
+    finally:
+        db.close()
+
+
+async def start_review_writers(application: Application) -> None:
+    application.bot_data[WRITER_KEY] = BufferedWriter(write_grades)
+    # Shown and skipped cards; grades are logged as events together with the schedule
+    application.bot_data[EVENT_WRITER_KEY] = BufferedWriter(
+        card_event_service.write_events, max_items=card_event_service.EVENT_BATCH
+    )
+
+
+async def stop_review_writers(application: Application) -> None:
+    for key in (WRITER_KEY, EVENT_WRITER_KEY):
+        writer = application.bot_data.pop(key, None)
+        if writer is not None:
+            await writer.close()
+
+
+async def review_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles the /review command: starts a session over due cards."""
+    logger.info("Received /review command from chat ID: %s with args: %s", update.effective_chat.id, context.args)
+    if not await check_chat_id(update, context):
+        return
+
+    count = DEFAULT_SESSION_SIZE
+    if context.args:
+        try:
+            count = int(context.args[0])
+        except ValueError:
+            count = 0
+        if count <= 0 or count > MAX_SESSION_SIZE:
+            await update.message.reply_text(f"Usage: /review [N] with N between 1 and {MAX_SESSION_SIZE}.")
+            return
+
+    db = get_db_session()
+    try:
+        cards = await asyncio.to_thread(review_service.get_review_queue, db, count, chat_id=update.effective_chat.id)
+    except Exception as e:
+        logger.error("Error loading review queue: %s", e, exc_info=True)
+        await update.message.reply_text("An error occurred while loading cards for review. Please check the logs.")
+        return
+    finally:
+        db.close()
+
+    if not cards:
+        context.chat_data.pop(SESSION_KEY, None)
+        await update.message.reply_text("Nothing to review right now.")
+        return
+
+    session = ReviewSession(queue=deque(cards))
+    session.next_card()
+    context.chat_data[SESSION_KEY] = session
+    await update.message.reply_text(_question_text(session), reply_markup=_show_keyboard(session.current))
+
+
+async def review_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handles the Show answer, Skip and grade buttons of a review session."""
+    query = update.callback_query
+    _, action, card_id = query.data.split(":")
+    session: ReviewSession | None = context.chat_data.get(SESSION_KEY)
+
+    # Sessions only exist for authorized chats; anything else is a stale or foreign button
+    if session is None or session.current is None or str(session.current.id) != card_id:
+        await query.answer("This card is no longer part of an active review.")
+        return
+    await query.answer()
+
+    card = session.current
+    chat_id = update.effective_chat.id
+    if action == "show":
+        context.bot_data[EVENT_WRITER_KEY].add(card_event_service.event_row(card.id, "shown", chat_id))
+        await query.edit_message_text(_answer_text(session), reply_markup=_grade_keyboard(card))
+        return
+
+    if action == "skip":
+        # Left unscheduled, so it is still due next session
+        context.bot_data[EVENT_WRITER_KEY].add(card_event_service.event_row(card.id, "skipped", chat_id))
+        session.skipped += 1
+    else:
+        event = review_service.schedule(card, action, chat_id=chat_id)
+        context.bot_data[WRITER_KEY].add(event)
+        session.grades[action] += 1
+        if action == "again":
+            # Relearn within the session: the card comes back at the end
+            session.queue.append(card)
+
+    if session.next_card() is None:
+        context.chat_data.pop(SESSION_KEY, None)
+        await query.edit_message_text(_summary_text(session))
+        return
+    await query.edit_message_text(_question_text(session), reply_markup=_show_keyboard(session.current))
@@ -0,0 +1,79 @@
+import asyncio
+import shutil
+import statistics
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app.models import Flashcard
+from app.services import archive_service, flashcard_service
+from benchmarks.fixtures import flashcard_database
+from benchmarks.harness import BenchContext, BenchmarkResult, benchmark, measure
+
+# Three years of cards with a one-year archive threshold moves about half the table
+HISTORY_DAYS = 3 * 365
+ARCHIVE_AFTER_MONTHS = 12
+
+
+def _query_medians(db: Session, repeat: int) -> dict[str, float]:
+    queries = {
+        "random_20": lambda: flashcard_service.get_random_flashcards(db, 20),
+        "status_counts": lambda: db.execute(select(Flashcard.status, func.count()).group_by(Flashcard.status)).all(),
+        "pending_count": lambda: db.scalar(select(func.count()).where(Flashcard.status == "pending")),
+        "summary_this_month": lambda: flashcard_service.get_sent_flashcards_by_period(db, "this_month"),
+    }
+    return {name: round(statistics.median(measure(query, repeat)) * 1000, 2) for name, query in queries.items()}
+
+
+@benchmark("archive.hot_cold")
+def bench_hot_cold(ctx: BenchContext) -> BenchmarkResult:
+    """
+    Query times on a table with three years of cards before and after archiving
+    the ones untouched for a year, plus the cost of archiving and vacuuming.
+    Use --rows 5000000 for the figures quoted in the README.
+    """
+    source = flashcard_database(ctx.rows, ctx.workdir, history_days=HISTORY_DAYS)
+    path = ctx.workdir / "archive-work.db"
+    shutil.copyfile(source, path)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        started = time.perf_counter()
+        archive_service.enable_incremental_vacuum(engine)
+        convert_seconds = time.perf_counter() - started
+        size_before = path.stat().st_size
+
+        db = Session(engine)
+        try:
+            before = _query_medians(db, ctx.repeat)
+            started = time.perf_counter()
+            archived = archive_service.archive_flashcards(db, ARCHIVE_AFTER_MONTHS)
+            archive_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            freed = asyncio.run(archive_service.incremental_vacuum(engine, pause=0))
+            vacuum_seconds = time.perf_counter() - started
+            after = _query_medians(db, ctx.repeat)
+        finally:
+            db.close()
+        stats = archive_service.storage_stats(engine)
+    finally:
+        engine.dispose()
+        size_after = path.stat().st_size
+        path.unlink(missing_ok=True)
+
+    return BenchmarkResult(
+        "archive.hot_cold",
+        [archive_seconds],
+        {
+            "rows": ctx.rows,
+            "archived": archived,
+            "hot_rows": stats.hot_rows,
+            "before_ms": before,
+            "after_ms": after,
+            "convert_seconds": round(convert_seconds, 1),
+            "vacuum_seconds": round(vacuum_seconds, 1),
+            "pages_freed": freed,
+            "file_mb_before": round(size_before / 2**20, 1),
+            "file_mb_after": round(size_after / 2**20, 1),
+        },
+    )
@@ -0,0 +1,124 @@
+"""
+Write stalls during an online backup: a writer commits a card every
+WRITE_INTERVAL (like the bot recording deliveries and grades) while a
+BACKUP_MB database is snapshotted. Commit latencies are reported for the
+page copy, for the whole backup (integrity check and compression
+included) and, as the baseline, for BASELINE_SECONDS before it.
+"""
+
+import shutil
+import sqlite3
+import statistics
+import threading
+import time
+
+from sqlalchemy import create_engine
+
+from app.database import init_db
+from app.services import backup_service
+from benchmarks.harness import BenchContext, BenchmarkResult, benchmark
+
+BACKUP_MB = 2048
+WRITE_INTERVAL = 0.02
+BASELINE_SECONDS = 5
+# Rows of hex text, which compresses about as well as card text does
+PAYLOAD_BYTES = 3600
+
+
+def _backup_database(workdir):
+    workdir.mkdir(parents=True, exist_ok=True)
+    path = workdir / f"backup-{BACKUP_MB}mb.db"
+    if path.exists():
+        return path
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+    engine = create_engine(f"sqlite:///{tmp_path}")
+    init_db(engine)
+    engine.dispose()
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE payload (id INTEGER PRIMARY KEY, data TEXT)")
+        conn.execute(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "INSERT INTO payload (data) SELECT hex(randomblob(?)) FROM n",
+            (BACKUP_MB * 2**20 // (PAYLOAD_BYTES + 200), PAYLOAD_BYTES // 2),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    tmp_path.rename(path)
+    return path
+
+
+class _Writer(threading.Thread):
+    """Commits one card every WRITE_INTERVAL and records how long each commit took."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        # (start, seconds) of every commit
+        self.latencies: list[tuple[float, float]] = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            while not self.stopped.is_set():
+                started = time.perf_counter()
+                conn.execute(
+                    "INSERT INTO flashcards (question, answer, knowledge_source_type, knowledge_source_id, status) "
+                    "VALUES ('Question?', 'Answer', 'notion', 'bench', 'pending')"
+                )
+                conn.commit()
+                self.latencies.append((started, time.perf_counter() - started))
+                self.stopped.wait(WRITE_INTERVAL)
+        finally:
+            conn.close()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+
+    def report(self, since: float = 0.0, until: float = float("inf")) -> dict:
+        """Commit latencies of the writes started between `since` and `until` (perf_counter times)."""
+        latencies = [seconds for started, seconds in self.latencies if since <= started < until]
+        cuts = statistics.quantiles(latencies, n=100)
+        return {
+            "writes": len(latencies),
+            "p50_ms": round(cuts[49] * 1000, 2),
+            "p99_ms": round(cuts[98] * 1000, 2),
+            "max_ms": round(max(latencies) * 1000, 1),
+        }
+
+
+@benchmark("backup.write_stall")
+def bench_write_stall(ctx: BenchContext) -> BenchmarkResult:
+    """One backup of a BACKUP_MB database under a steady writer; --repeat does not apply."""
+    path = _backup_database(ctx.workdir)
+    backup_dir = ctx.workdir / "backup-snapshots"
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    try:
+        writer = _Writer(path)
+        writer.start()
+        try:
+            time.sleep(BASELINE_SECONDS)
+            started = time.perf_counter()
+            result = backup_service.backup_database(path, backup_dir, keep=1)
+        finally:
+            writer.stop()
+    finally:
+        shutil.rmtree(backup_dir, ignore_errors=True)
+
+    return BenchmarkResult(
+        "backup.write_stall",
+        [result.seconds],
+        {
+            "database_mb": result.database_bytes >> 20,
+            "compressed_mb": result.compressed_bytes >> 20,
+            "step_pages": backup_service.BACKUP_STEP_PAGES,
+            "copy_seconds": result.copy_seconds,
+            "idle_writer": writer.report(until=started),
+            "writer_during_copy": writer.report(started, started + result.copy_seconds),
+            "writer_during_backup": writer.report(started),
+        },
+    )
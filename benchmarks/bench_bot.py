@@ -0,0 +1,139 @@
+"""
+Load harness for the Telegram bot: injects thousands of fabricated /random
+updates from hundreds of chats into a real Application (the production
+handlers, the SQLite deck, a fake Bot API answering after a fixed round
+trip) and reports throughput and tail latency from enqueue to the last reply.
+
+Compares the chat-ordered concurrent processor against handling updates one
+at a time, python-telegram-bot's default.
+"""
+
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+from unittest import mock
+
+from sqlalchemy import create_engine, insert
+from telegram.ext import Application, SimpleUpdateProcessor, TypeHandler
+
+from app.config import app_config
+from app.database import init_db
+from app.models import Chat, Flashcard
+from app.services import chat_service
+from app.telegram_bot import handlers
+from app.telegram_bot.concurrency import (
+    ChatOrderedProcessor,
+    start_db_executor,
+    stop_db_executor,
+)
+from app.telegram_bot.main import register_handlers
+from benchmarks.fixtures import session_factory
+from benchmarks.harness import BenchContext, BenchmarkResult, benchmark, measure
+from tests.fakes.telegram_api import TOKEN, FakeBotAPI, command_update
+
+CHATS = 500
+CARDS_PER_CHAT = 40
+UPDATES_PER_CHAT = 10
+# Updates handled one at a time take a round trip each; a slice is enough to measure them
+SEQUENTIAL_UPDATES = 200
+API_LATENCY = 0.02
+
+
+def _bot_database(workdir):
+    workdir.mkdir(parents=True, exist_ok=True)
+    path = workdir / f"bot-{CHATS}x{CARDS_PER_CHAT}.db"
+    if path.exists():
+        return path
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Chat), [{"chat_id": chat_id, "title": f"Chat {chat_id}"} for chat_id in range(1, CHATS + 1)])
+        conn.execute(
+            insert(Flashcard),
+            [
+                {
+                    "question": f"Question {chat_id}.{i}?",
+                    "answer": f"Answer {chat_id}.{i}",
+                    "knowledge_source_type": "notion",
+                    "knowledge_source_id": f"page-{i % 4}",
+                    "status": "sent",
+                    "chat_id": chat_id,
+                }
+                for chat_id in range(1, CHATS + 1)
+                for i in range(CARDS_PER_CHAT)
+            ],
+        )
+    engine.dispose()
+    return path
+
+
+async def _drive(processor, count: int) -> dict:
+    api = FakeBotAPI(latency=API_LATENCY)
+    application = (
+        Application.builder().token(TOKEN).request(api).get_updates_request(api)
+        .updater(None).concurrent_updates(processor).build()
+    )
+    register_handlers(application)
+    enqueued: dict[int, float] = {}
+    latencies: list[float] = []
+    order: dict[int, list[int]] = defaultdict(list)
+    done = asyncio.Event()
+
+    async def handled(update, context):
+        # Group 1 runs once the command handler in group 0 has replied
+        latencies.append(time.perf_counter() - enqueued[update.update_id])
+        order[update.effective_chat.id].append(update.update_id)
+        if len(latencies) == count:
+            done.set()
+
+    application.add_handler(TypeHandler(object, handled), group=1)
+    async with application:
+        await start_db_executor(application)
+        await application.start()
+        updates = [command_update(application.bot, 1 + i % CHATS, "/random 3") for i in range(count)]
+        started = time.perf_counter()
+        for update in updates:
+            enqueued[update.update_id] = time.perf_counter()
+            await application.update_queue.put(update)
+        await done.wait()
+        elapsed = time.perf_counter() - started
+        await application.stop()
+        await stop_db_executor(application)
+
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        "updates": count,
+        "updates_per_s": round(count / elapsed, 1),
+        "latency_ms": {"p50": round(cuts[49] * 1000, 1), "p99": round(cuts[98] * 1000, 1), "max": round(max(latencies) * 1000, 1)},
+        "chat_order_kept": all(ids == sorted(ids) for ids in order.values()),
+        "api_calls": sum(api.calls.values()) - api.calls["getMe"],
+    }
+
+
+@benchmark("bot.concurrent_updates")
+def bench_concurrent_updates(ctx: BenchContext) -> BenchmarkResult:
+    factory = session_factory(_bot_database(ctx.workdir))
+    reports = []
+    with mock.patch.object(handlers, "get_db_session", factory), mock.patch.object(chat_service, "get_db_session", factory):
+        chat_service.authorized_chats.invalidate()
+        try:
+            timings = measure(
+                lambda: reports.append(asyncio.run(_drive(ChatOrderedProcessor(app_config.bot_concurrent_updates), CHATS * UPDATES_PER_CHAT))),
+                ctx.repeat,
+            )
+            sequential = asyncio.run(_drive(SimpleUpdateProcessor(1), SEQUENTIAL_UPDATES))
+        finally:
+            chat_service.authorized_chats.invalidate()
+    return BenchmarkResult(
+        "bot.concurrent_updates",
+        timings,
+        {
+            "chats": CHATS,
+            "api_latency_ms": API_LATENCY * 1000,
+            "concurrent_updates": app_config.bot_concurrent_updates,
+            "db_threads": app_config.bot_db_threads,
+            "chat_ordered": reports[-1],
+            "sequential": sequential,
+        },
+    )
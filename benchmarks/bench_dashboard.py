@@ -0,0 +1,127 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.cache import data_version, response_cache
+from app.database import get_db
+from app.main import app
+from app.services import analytics_service
+from benchmarks.fixtures import flashcard_database, session_factory
+from benchmarks.harness import BenchContext, BenchmarkResult, benchmark, measure
+
+STATS_TARGET_MS = 200
+
+
+@contextmanager
+def dashboard_client(ctx: BenchContext):
+    SessionLocal = session_factory(flashcard_database(ctx.rows, ctx.workdir))
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    response_cache.clear()
+    try:
+        # No context manager: the lifespan would initialise the real database
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        response_cache.clear()
+
+
+@benchmark("dashboard.render")
+def bench_dashboard_render(ctx: BenchContext) -> BenchmarkResult:
+    """Cold render: config + flashcard queries and the Jinja template."""
+    with dashboard_client(ctx) as client:
+
+        def render():
+            response_cache.clear()
+            assert client.get("/dashboard").status_code == status.HTTP_200_OK
+
+        timings = measure(render, ctx.repeat)
+    return BenchmarkResult("dashboard.render", timings, {"rows": ctx.rows})
+
+
+@benchmark("dashboard.cached")
+def bench_dashboard_cached(ctx: BenchContext) -> BenchmarkResult:
+    """Repeat load served from the response cache."""
+    with dashboard_client(ctx) as client:
+        timings = measure(lambda: client.get("/dashboard"), ctx.repeat)
+    return BenchmarkResult("dashboard.cached", timings, {"rows": ctx.rows})
+
+
+@benchmark("dashboard.not_modified")
+def bench_dashboard_not_modified(ctx: BenchContext) -> BenchmarkResult:
+    """Conditional reload answered with 304."""
+    with dashboard_client(ctx) as client:
+        etag = client.get("/dashboard").headers["etag"]
+
+        def revalidate():
+            assert client.get("/dashboard", headers={"If-None-Match": etag}).status_code == status.HTTP_304_NOT_MODIFIED
+
+        timings = measure(revalidate, ctx.repeat)
+    return BenchmarkResult("dashboard.not_modified", timings, {"rows": ctx.rows})
+
+
+@benchmark("dashboard.stats")
+def bench_dashboard_stats(ctx: BenchContext) -> BenchmarkResult:
+    """
+    Deck statistics (due forecast, counts by source and status, card ages)
+    loaded right after a write, as while the bot is delivering, against the
+    200 ms target, with the cache warm as after startup. How long the
+    background refresh takes to catch up is reported alongside;
+    dashboard.stats_cold measures loads with nothing cached.
+    """
+    with dashboard_client(ctx) as client:
+        analytics_service.deck_stats_cache.invalidate()
+        stats = client.get("/api/analytics/stats").json()
+
+        def load_after_write():
+            data_version.bump()
+            assert client.get("/api/analytics/stats").status_code == status.HTTP_200_OK
+
+        timings = measure(load_after_write, ctx.repeat)
+        started = time.perf_counter()
+        while client.get("/api/analytics/stats").json()["stale"]:
+            time.sleep(0.01)
+        refresh = time.perf_counter() - started
+    analytics_service.deck_stats_cache.invalidate()
+    median_ms = statistics.median(timings) * 1000
+    return BenchmarkResult(
+        "dashboard.stats",
+        timings,
+        {
+            "rows": ctx.rows,
+            "cards": stats["total"],
+            "sources": stats["sources"],
+            "due_next_30_days": sum(day["due"] for day in stats["forecast"]),
+            "median_ms": round(median_ms, 2),
+            "within_200ms": median_ms < STATS_TARGET_MS,
+            # Until the last write shows: the refresh already under way plus the one it triggers
+            "refresh_wait_ms": round(refresh * 1000, 1),
+        },
+    )
+
+
+@benchmark("dashboard.stats_cold")
+def bench_dashboard_stats_cold(ctx: BenchContext) -> BenchmarkResult:
+    """
+    Deck statistics loaded with nothing cached, as a request arriving before
+    the startup computation finishes: the whole deck_stats computation.
+    """
+    with dashboard_client(ctx) as client:
+
+        def cold_load():
+            analytics_service.deck_stats_cache.invalidate()
+            assert client.get("/api/analytics/stats").status_code == status.HTTP_200_OK
+
+        timings = measure(cold_load, ctx.repeat)
+    analytics_service.deck_stats_cache.invalidate()
+    return BenchmarkResult("dashboard.stats_cold", timings, {"rows": ctx.rows})
@@ -0,0 +1,179 @@
+"""
+Offline simulation of one delivery run: 10k chats with 1-5 messages each,
+scheduled on a virtual clock under Telegram's 30 msg/s and 1 msg/s/chat
+limits. Reports delivery lag percentiles for the fair round-robin scheduler
+against draining chats one after another (FIFO by chat).
+
+delivery.claim_workers drains a pending table with several worker processes
+claiming leased batches, and checks that no card is delivered twice.
+"""
+
+import multiprocessing
+import random
+import shutil
+import statistics
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import init_db
+from app.models import Chat, Flashcard
+from app.services import delivery_service
+from app.services.delivery_service import FairScheduler
+from benchmarks.harness import BenchContext, BenchmarkResult, benchmark, measure
+
+CHATS = 10_000
+GLOBAL_RATE = 30.0
+PER_CHAT_INTERVAL = 1.0
+
+
+def _workload(seed: int = 0) -> list[tuple[int, int]]:
+    """(chat_id, message_index) pairs; most chats get one message, a few get five."""
+    rng = random.Random(seed)
+    counts = rng.choices([1, 2, 3, 5], weights=[60, 25, 10, 5], k=CHATS)
+    return [(chat_id, i) for chat_id, count in enumerate(counts) for i in range(count)]
+
+
+def _fair_schedule(workload) -> list[tuple[float, int]]:
+    scheduler = FairScheduler(GLOBAL_RATE, PER_CHAT_INTERVAL)
+    for chat_id, index in workload:
+        scheduler.enqueue(chat_id, index)
+    sent = []
+    while (entry := scheduler.next(0.0)) is not None:
+        sent.append((entry[0], entry[1]))
+    return sent
+
+
+def _fifo_schedule(workload) -> list[tuple[float, int]]:
+    """Baseline: each chat's messages go out back to back before the next chat starts."""
+    spacing = 1.0 / GLOBAL_RATE
+    next_slot = 0.0
+    ready_at: dict[int, float] = {}
+    sent = []
+    for chat_id, _ in workload:
+        send_at = max(next_slot, ready_at.get(chat_id, 0.0))
+        next_slot = send_at + spacing
+        ready_at[chat_id] = send_at + PER_CHAT_INTERVAL
+        sent.append((send_at, chat_id))
+    return sent
+
+
+def _percentiles(values: list[float]) -> dict:
+    cuts = statistics.quantiles(values, n=100)
+    return {"p50": round(cuts[49], 2), "p95": round(cuts[94], 2), "p99": round(cuts[98], 2), "max": round(max(values), 2)}
+
+
+def _lag_report(sent: list[tuple[float, int]]) -> dict:
+    first: dict[int, float] = {}
+    for send_at, chat_id in sent:
+        first.setdefault(chat_id, send_at)
+    return {
+        "messages_lag_s": _percentiles([send_at for send_at, _ in sent]),
+        "first_message_lag_s": _percentiles(list(first.values())),
+        "makespan_s": round(max(send_at for send_at, _ in sent), 2),
+    }
+
+
+@benchmark("delivery.fair_scheduler_10k_chats")
+def bench_fair_scheduler(ctx: BenchContext) -> BenchmarkResult:
+    workload = _workload()
+    timings = measure(lambda: _fair_schedule(workload), ctx.repeat)
+    fair = _fair_schedule(workload)
+    times = sorted(send_at for send_at, _ in fair)
+    return BenchmarkResult(
+        "delivery.fair_scheduler_10k_chats",
+        timings,
+        {
+            "chats": CHATS,
+            "messages": len(workload),
+            "min_spacing_ms": round(min(b - a for a, b in zip(times, times[1:])) * 1000, 3),
+            "fair": _lag_report(fair),
+            "fifo": _lag_report(_fifo_schedule(workload)),
+        },
+    )
+
+
+CLAIM_CHATS = 200
+CLAIM_CARDS_PER_CHAT = 50
+CLAIM_PER_CHAT = 5
+CLAIM_WORKERS = 4
+# Stand-in for sending claimed cards to Telegram, per card
+SEND_SECONDS = 0.001
+
+
+def _pending_database(workdir):
+    workdir.mkdir(parents=True, exist_ok=True)
+    path = workdir / f"pending-{CLAIM_CHATS}x{CLAIM_CARDS_PER_CHAT}.db"
+    if path.exists():
+        return path
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Chat), [{"chat_id": chat_id} for chat_id in range(1, CLAIM_CHATS + 1)])
+        conn.execute(
+            insert(Flashcard),
+            [
+                {"question": f"Q{chat_id}.{i}", "answer": "A", "knowledge_source_type": "notion", "knowledge_source_id": "page", "chat_id": chat_id}
+                for chat_id in range(1, CLAIM_CHATS + 1)
+                for i in range(CLAIM_CARDS_PER_CHAT)
+            ],
+        )
+    engine.dispose()
+    return path
+
+
+def _claim_worker(path: str, owner: str) -> tuple[float, float, list[int]]:
+    """Claims, "sends" and confirms batches until nothing is left; returns its start and end (epoch seconds) and the cards it delivered."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 60})
+    db = sessionmaker(bind=engine)()
+    delivered = []
+    started = time.time()
+    try:
+        while cards := delivery_service.claim_pending_by_chat(db, CLAIM_PER_CHAT, owner):
+            ids = [card.id for rows in cards.values() for card in rows]
+            time.sleep(SEND_SECONDS * len(ids))
+            delivered += delivery_service.mark_sent(db, ids, owner=owner)
+    finally:
+        db.close()
+        engine.dispose()
+    return started, time.time(), delivered
+
+
+def _drain(template, workdir, workers: int) -> dict:
+    path = workdir / f"claims-{workers}.db"
+    shutil.copyfile(template, path)
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        results = pool.starmap(_claim_worker, [(str(path), f"worker-{n}") for n in range(workers)])
+    path.unlink()
+    # From the first claim to the last confirmation, leaving out process start-up
+    elapsed = max(end for _, end, _ in results) - min(start for start, _, _ in results)
+    delivered = [ids for _, _, ids in results]
+    ids = [card_id for worker in delivered for card_id in worker]
+    return {
+        "workers": workers,
+        "cards": len(ids),
+        "duplicates": len(ids) - len(set(ids)),
+        "cards_per_s": round(len(ids) / elapsed),
+        "cards_per_worker": [len(worker) for worker in delivered],
+    }
+
+
+@benchmark("delivery.claim_workers")
+def bench_claim_workers(ctx: BenchContext) -> BenchmarkResult:
+    """Leased claims drained by CLAIM_WORKERS processes against a single worker (timings include process start-up)."""
+    template = _pending_database(ctx.workdir)
+    reports = []
+    timings = measure(lambda: reports.append(_drain(template, ctx.workdir, CLAIM_WORKERS)), ctx.repeat)
+    single = _drain(template, ctx.workdir, 1)
+    return BenchmarkResult(
+        "delivery.claim_workers",
+        timings,
+        {
+            "chats": CLAIM_CHATS,
+            "per_chat": CLAIM_PER_CHAT,
+            "send_ms_per_card": SEND_SECONDS * 1000,
+            "scaled_out": reports[-1],
+            "single": single,
+        },
+    )
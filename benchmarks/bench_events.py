@@ -0,0 +1,103 @@
+"""
+Write throughput of the card event log through the bot's BufferedWriter, and
+the vectorized analytics over a large log.
+"""
+
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database import init_db
+from app.services import analytics_service, card_event_service
+from app.services.buffered_writer import BufferedWriter
+from app.services.card_event_service import EVENT_BATCH, EVENT_KINDS
+from benchmarks.harness import BenchContext, BenchmarkResult, benchmark, measure
+
+WRITE_EVENTS = 100_000
+START = datetime(2024, 1, 1)
+
+
+def _events(count: int, cards: int, seed: int = 0, offset: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        kind = rng.choice(EVENT_KINDS)
+        rows.append({
+            "flashcard_id": rng.randrange(1, cards + 1),
+            "chat_id": 1,
+            "kind": kind,
+            "grade": rng.choice(("again", "hard", "good", "easy")) if kind == "graded" else None,
+            "occurred_at": START + timedelta(seconds=(offset + i) * 30),
+        })
+    return rows
+
+
+def _engine(ctx: BenchContext, name: str):
+    path = ctx.workdir / name
+    path.unlink(missing_ok=True)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    init_db(engine)
+    return engine
+
+
+@benchmark("events.write_throughput")
+def bench_write_throughput(ctx: BenchContext) -> BenchmarkResult:
+    """Events added one at a time, as the bot does, and flushed in batches of EVENT_BATCH."""
+    engine = _engine(ctx, "events-write.db")
+    rows = _events(WRITE_EVENTS, cards=10_000)
+
+    def flush(batch: list[dict]) -> None:
+        with Session(engine) as db:
+            card_event_service.record_events(db, batch)
+
+    async def run() -> None:
+        writer = BufferedWriter(flush, max_items=EVENT_BATCH, max_delay=1.0)
+        for row in rows:
+            writer.add(row)
+            if writer.pending >= EVENT_BATCH:
+                # Yield so the size-triggered flush runs, as it would between bot updates
+                await asyncio.sleep(0)
+        await writer.close()
+
+    timings = []
+    try:
+        for _ in range(ctx.repeat):
+            started = time.perf_counter()
+            asyncio.run(run())
+            timings.append(time.perf_counter() - started)
+    finally:
+        engine.dispose()
+    return BenchmarkResult(
+        "events.write_throughput",
+        timings,
+        {"events": WRITE_EVENTS, "batch": EVENT_BATCH, "events_per_second": round(WRITE_EVENTS / statistics.median(timings))},
+    )
+
+
+@benchmark("events.analytics")
+def bench_analytics(ctx: BenchContext) -> BenchmarkResult:
+    """Retention curves and 30-day activity over a log of --rows events."""
+    engine = _engine(ctx, "events-analytics.db")
+    try:
+        with Session(engine) as db:
+            for start in range(0, ctx.rows, 100_000):
+                card_event_service.record_events(db, _events(min(100_000, ctx.rows - start), cards=50_000, seed=start, offset=start))
+            now = START + timedelta(seconds=ctx.rows * 30)
+            retention = measure(lambda: analytics_service.retention_by_source(db), ctx.repeat)
+            activity = measure(lambda: analytics_service.daily_activity(db, days=30, now=now), ctx.repeat)
+    finally:
+        engine.dispose()
+    return BenchmarkResult(
+        "events.analytics",
+        retention,
+        {
+            "events": ctx.rows,
+            "retention_median_ms": round(statistics.median(retention) * 1000, 1),
+            "activity_median_ms": round(statistics.median(activity) * 1000, 1),
+        },
+    )
@@ -0,0 +1,34 @@
+from app.services import flashcard_service
+from benchmarks.fixtures import flashcard_database, session_factory
+from benchmarks.harness import BenchContext, BenchmarkResult, benchmark, measure
+
+
+def _session(ctx: BenchContext):
+    return session_factory(flashcard_database(ctx.rows, ctx.workdir))()
+
+
+@benchmark("flashcards.get_random_flashcards")
+def bench_get_random_flashcards(ctx: BenchContext) -> BenchmarkResult:
+    db = _session(ctx)
+    try:
+        timings = measure(lambda: flashcard_service.get_random_flashcards(db, 20), ctx.repeat)
+    finally:
+        db.close()
+    return BenchmarkResult("flashcards.get_random_flashcards", timings, {"rows": ctx.rows, "count": 20})
+
+
+@benchmark("flashcards.get_sent_flashcards_by_period")
+def bench_get_sent_flashcards_by_period(ctx: BenchContext) -> BenchmarkResult:
+    db = _session(ctx)
+    try:
+        timings = measure(
+            lambda: flashcard_service.get_sent_flashcards_by_period(db, "this_month"), ctx.repeat
+        )
+        found = len(flashcard_service.get_sent_flashcards_by_period(db, "this_month"))
+    finally:
+        db.close()
+    return BenchmarkResult(
+        "flashcards.get_sent_flashcards_by_period",
+        timings,
+        {"rows": ctx.rows, "period": "this_month", "found": found},
+    )
@@ -0,0 +1,211 @@
+import asyncio
+import random
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database import init_db
+from app.services import flashcard_service, llm_service, provenance_service
+from app.services.llm_service import SourceDocument
+from benchmarks.harness import BenchContext, BenchmarkResult, benchmark, measure
+from tests.fakes.notion_api import sentence
+from tests.fakes.openrouter import FakeOpenRouter
+
+PAGES = 300
+# Share of pages that are long enough to need splitting at the default budget
+LONG_PAGE_SHARE = 0.1
+REQUEST_LATENCY = 0.05
+# Streamed reply pacing: 16 characters every 2 ms, roughly 2000 tokens/s
+CHUNK_DELAY = 0.002
+
+
+def synthetic_documents(pages: int, seed: int = 0) -> list[SourceDocument]:
+    """Mostly short notes (a few blocks) with some long pages, like a typical Notion database."""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(pages):
+        blocks = rng.randint(80, 400) if rng.random() < LONG_PAGE_SHARE else rng.randint(2, 8)
+        documents.append(
+            SourceDocument("notion", f"page-{i}", sentence(rng, 2, 5), [sentence(rng, 10, 40) for _ in range(blocks)])
+        )
+    return documents
+
+
+def _generate(documents: list[SourceDocument], pack: bool) -> llm_service.GenerationReport:
+    fake = FakeOpenRouter(latency=REQUEST_LATENCY, chunk_delay=CHUNK_DELAY)
+
+    async def run():
+        async with fake.client() as client:
+            return await llm_service.generate_flashcards(documents, "bench", client=client, pack=pack)
+
+    return asyncio.run(run())[1]
+
+
+def _bench(name: str, ctx: BenchContext, pack: bool) -> BenchmarkResult:
+    documents = synthetic_documents(PAGES)
+    reports = []
+    timings = measure(lambda: reports.append(_generate(documents, pack)), ctx.repeat)
+    report = reports[-1]
+    return BenchmarkResult(
+        name,
+        timings,
+        {
+            "pages": PAGES,
+            "budget": llm_service.DEFAULT_CONTEXT_BUDGET,
+            "request_latency": REQUEST_LATENCY,
+            "chunk_delay": CHUNK_DELAY,
+            "first_card_seconds": round(report.first_card_seconds, 3),
+            "total_seconds": round(report.seconds, 3),
+            "requests": report.requests,
+            "naive_requests": report.naive_requests,
+            "requests_saved": report.requests_saved,
+            "cards": report.cards,
+            "tokens_per_card": round(report.tokens_per_card, 1),
+            "naive_tokens_per_card": round(report.naive_tokens_per_card, 1),
+        },
+    )
+
+
+@benchmark("llm.generate_packed")
+def bench_generate_packed(ctx: BenchContext) -> BenchmarkResult:
+    """Card generation for a mixed corpus with token-aware packing, against a fake with fixed latency."""
+    return _bench("llm.generate_packed", ctx, pack=True)
+
+
+@benchmark("llm.generate_per_page")
+def bench_generate_per_page(ctx: BenchContext) -> BenchmarkResult:
+    """The same corpus with one request per page (per part for split pages)."""
+    return _bench("llm.generate_per_page", ctx, pack=False)
+
+
+HEDGE_REQUESTS = 200
+STALL_SHARE = 0.05
+STALL_SECONDS = 2.0
+HEDGE_CONCURRENCY = 6
+
+
+def _routed_latencies(router: llm_service.ModelRouter, seed: int = 0) -> list[float]:
+    """Per-request latency of HEDGE_REQUESTS single-page requests where the primary model sometimes stalls."""
+    rng = random.Random(seed)
+    fake = FakeOpenRouter(
+        model_latency={
+            "primary": lambda: STALL_SECONDS if rng.random() < STALL_SHARE else rng.uniform(0.02, 0.05),
+            "secondary": lambda: rng.uniform(0.04, 0.08),
+        }
+    )
+    documents = synthetic_documents(HEDGE_REQUESTS, seed)
+    latencies = []
+    # Fewer requests in flight than the primary's cap, so latency is the model's, not queueing
+    in_flight = asyncio.Semaphore(HEDGE_CONCURRENCY)
+
+    async def one(client, document):
+        async with in_flight:
+            started = time.perf_counter()
+            await llm_service.generate_flashcards([document], "bench", client=client, router=router)
+            latencies.append(time.perf_counter() - started)
+
+    async def run():
+        async with fake.client() as client:
+            await asyncio.gather(*(one(client, document) for document in documents))
+
+    asyncio.run(run())
+    return sorted(latencies)
+
+
+@benchmark("llm.hedged_tail_latency")
+def bench_hedged_tail_latency(ctx: BenchContext) -> BenchmarkResult:
+    """p99 request latency when the preferred model stalls on 5% of requests, with and without hedging."""
+    single = _routed_latencies(llm_service.ModelRouter([llm_service.ModelRoute("primary", 8)]))
+    timings = []
+    for _ in range(ctx.repeat):
+        router = llm_service.ModelRouter(
+            [llm_service.ModelRoute("primary", 8), llm_service.ModelRoute("secondary", 8)], hedge_after=0.2
+        )
+        started = time.perf_counter()
+        hedged = _routed_latencies(router)
+        timings.append(time.perf_counter() - started)
+
+    def p99(latencies: list[float]) -> float:
+        return round(latencies[min(len(latencies) - 1, round(0.99 * (len(latencies) - 1)))], 3)
+
+    return BenchmarkResult(
+        "llm.hedged_tail_latency",
+        timings,
+        {
+            "requests": HEDGE_REQUESTS,
+            "stall_share": STALL_SHARE,
+            "stall_seconds": STALL_SECONDS,
+            "p99_single_model": p99(single),
+            "p99_hedged": p99(hedged),
+            "hedges": router.stats["primary"].hedges,
+        },
+    )
+
+
+EDIT_PAGE_BLOCKS = 200
+
+
+def _sync_page(db: Session, document: SourceDocument, fake: FakeOpenRouter) -> llm_service.GenerationReport:
+    """What generate_from_notion does for one page: diff, generate the dirty blocks, retire stale cards."""
+    diff = provenance_service.diff_document(db, document)
+    report = llm_service.GenerationReport()
+    if diff.document.blocks:
+        decks: dict = {}
+
+        async def run():
+            async with fake.client() as client:
+                return await llm_service.generate_flashcards(
+                    [diff.document], "bench", client=client,
+                    on_card=lambda card: flashcard_service.create_flashcards(db, [card], decks),
+                )
+
+        report = asyncio.run(run())[1]
+    report.retired_cards = provenance_service.apply_diff(db, diff)
+    report.unchanged_blocks = diff.unchanged
+    return report
+
+
+@benchmark("llm.incremental_edit")
+def bench_incremental_edit(ctx: BenchContext) -> BenchmarkResult:
+    """Re-sync of a 200-block page after a one-paragraph edit, against generating the page whole."""
+    rng = random.Random(0)
+    blocks = [sentence(rng, 10, 40) for _ in range(EDIT_PAGE_BLOCKS)]
+    block_ids = [f"block-{i}" for i in range(EDIT_PAGE_BLOCKS)]
+    path = ctx.workdir / "incremental-edit.db"
+    path.unlink(missing_ok=True)
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    fake = FakeOpenRouter(cards_per_block=1)
+    reports = []
+    with Session(engine) as db:
+        full = _sync_page(db, SourceDocument("notion", "page", "Long page", list(blocks), block_ids), fake)
+
+        def edit() -> None:
+            index = len(reports) % EDIT_PAGE_BLOCKS
+            blocks[index] = sentence(rng, 10, 40)
+            reports.append(_sync_page(db, SourceDocument("notion", "page", "Long page", list(blocks), block_ids), fake))
+
+        timings = measure(edit, ctx.repeat)
+    engine.dispose()
+    report = reports[-1]
+    return BenchmarkResult(
+        "llm.incremental_edit",
+        timings,
+        {
+            "blocks": EDIT_PAGE_BLOCKS,
+            "full_prompt_tokens": full.prompt_tokens,
+            "full_cards": full.cards,
+            "full_completion_tokens": full.completion_tokens,
+            "edit_prompt_tokens": report.prompt_tokens,
+            "edit_completion_tokens": report.completion_tokens,
+            "edit_cards": report.cards,
+            "retired_cards": report.retired_cards,
+            "unchanged_blocks": report.unchanged_blocks,
+            # What is left of an edit's prompt is mostly the fixed system prompt
+            "prompt_tokens_saved": round(full.prompt_tokens / report.prompt_tokens, 1),
+            "total_tokens_saved": round(
+                (full.prompt_tokens + full.completion_tokens) / (report.prompt_tokens + report.completion_tokens), 1
+            ),
+        },
+    )
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import random
+import time
+from contextlib import contextmanager
+
+from app.knowledge_sources.notion import notion_service, schemas
+from app.knowledge_sources.notion.schemas import DatabaseConfig
+from app.services import knowledge_service
+from benchmarks.harness import (
+    BenchContext,
+    BenchmarkResult,
+    benchmark,
+    measure,
+    measure_async,
+)
+from tests.fakes.notion_api import FakeNotionAPI, list_response, synthetic_page
+
+TREE_DEPTH = 3
+TREE_WIDTH = 12
+
+SYNC_PAGES = 50
+SYNC_LATENCY = 0.02
+SYNC_CONCURRENCY = 8
+
+# Databases synced at once against a fake workspace limit, scaled down from Notion's 3 req/s
+MULTI_DATABASES = 12
+MULTI_PAGES = 10
+WORKSPACE_RATE = 60.0
+
+# A full page of database query results, parsed this many times per timing
+PARSE_PAGES = 100
+PARSE_RESPONSES = 50
+
+
+@contextmanager
+def _workspace_budget(rate: float | None, burst: int = 1):
+    """Swaps the shared request budget; the other benchmarks measure the client unpaced."""
+    previous = notion_service.workspace_budget
+    notion_service.workspace_budget = notion_service.RequestBudget(rate, burst)
+    try:
+        yield
+    finally:
+        notion_service.workspace_budget = previous
+
+
+@benchmark("notion.fetch_all_blocks_recursive")
+def bench_fetch_all_blocks_recursive(ctx: BenchContext) -> BenchmarkResult:
+    fake = FakeNotionAPI()
+    blocks = fake.add_page_tree("root", depth=TREE_DEPTH, width=TREE_WIDTH)
+
+    async def run():
+        async with fake.client() as client:
+            return await notion_service.fetch_all_blocks_recursive("root", headers={}, client=client)
+
+    with _workspace_budget(None):
+        timings = measure_async(run, ctx.repeat)
+    return BenchmarkResult(
+        "notion.fetch_all_blocks_recursive",
+        timings,
+        {"depth": TREE_DEPTH, "width": TREE_WIDTH, "blocks": blocks},
+    )
+
+
+def _sync_database(fake: FakeNotionAPI, database_id: str) -> dict:
+    """Queries `database_id` and fetches all page contents, SYNC_CONCURRENCY pages at a time."""
+
+    async def run():
+        semaphore = asyncio.Semaphore(SYNC_CONCURRENCY)
+
+        async def retrieve(page_id, client):
+            async with semaphore:
+                return await notion_service.retrieve_content_by_id(page_id, headers={}, client=client)
+
+        async with fake.client() as client:
+            response = await notion_service.query_notion_database(database_id, headers={}, client=client)
+            return await asyncio.gather(*(retrieve(page.id, client) for page in response.results))
+
+    requests_before = fake.request_count
+    limited_before = sum(fake.rate_limited.values())
+    start = time.perf_counter()
+    with _workspace_budget(None):
+        asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    requests = fake.request_count - requests_before
+    return {
+        "requests": requests,
+        "rate_limited": sum(fake.rate_limited.values()) - limited_before,
+        "requests_per_second": requests / elapsed,
+    }
+
+
+@benchmark("notion.sync_throughput")
+def bench_sync_throughput(ctx: BenchContext) -> BenchmarkResult:
+    """Full database sync against an unthrottled fake with fixed per-call latency."""
+    fake = FakeNotionAPI(latency=SYNC_LATENCY, jitter=SYNC_LATENCY / 2)
+    fake.populate("bench-db", pages=SYNC_PAGES, depth=2, width=8)
+    stats = []
+    timings = measure(lambda: stats.append(_sync_database(fake, "bench-db")), ctx.repeat)
+    return BenchmarkResult(
+        "notion.sync_throughput",
+        timings,
+        {"pages": SYNC_PAGES, "latency": SYNC_LATENCY, "concurrency": SYNC_CONCURRENCY, **stats[-1]},
+    )
+
+
+@benchmark("notion.sync_rate_limited")
+def bench_sync_rate_limited(ctx: BenchContext) -> BenchmarkResult:
+    """Same sync against a token bucket, measuring 429s and retry overhead."""
+    fake = FakeNotionAPI(requests_per_second=200, burst=20, retry_after=0.05)
+    fake.populate("bench-db", pages=SYNC_PAGES, depth=2, width=8)
+    stats = []
+    timings = measure(lambda: stats.append(_sync_database(fake, "bench-db")), ctx.repeat)
+    return BenchmarkResult(
+        "notion.sync_rate_limited",
+        timings,
+        {"pages": SYNC_PAGES, "requests_per_second_limit": 200, "concurrency": SYNC_CONCURRENCY, **stats[-1]},
+    )
+
+
+def _sync_databases(fake: FakeNotionAPI, databases: list[DatabaseConfig], rate: float | None) -> dict:
+    """Loads every database's documents concurrently, as generation does, under a budget of `rate`."""
+
+    async def run():
+        async with fake.client() as client:
+            listed = await asyncio.gather(
+                *(knowledge_service.list_unprocessed_pages(database, {}, client) for database in databases)
+            )
+            semaphore = asyncio.Semaphore(SYNC_CONCURRENCY * 2)
+
+            async def retrieve(page_id):
+                async with semaphore:
+                    return await notion_service.fetch_all_blocks_recursive(page_id, {}, client)
+
+            return await asyncio.gather(*(retrieve(page.id) for pages in listed for page in pages))
+
+    requests_before = fake.request_count
+    limited_before = sum(fake.rate_limited.values())
+    start = time.perf_counter()
+    with _workspace_budget(rate, burst=10):
+        asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": round(elapsed, 2),
+        "requests": fake.request_count - requests_before,
+        "rate_limited": sum(fake.rate_limited.values()) - limited_before,
+    }
+
+
+@benchmark("notion.sync_many_databases")
+def bench_sync_many_databases(ctx: BenchContext) -> BenchmarkResult:
+    """
+    Twelve databases synced at once against a workspace-wide token bucket,
+    with every request drawing from the shared budget versus each request
+    only retrying its own 429s.
+    """
+    fake = FakeNotionAPI(page_size=5, latency=0.005, requests_per_second=WORKSPACE_RATE, burst=10, retry_after=0.5)
+    databases = []
+    for i in range(MULTI_DATABASES):
+        fake.populate(f"bench-db-{i}", pages=MULTI_PAGES, depth=2, width=3)
+        databases.append(DatabaseConfig(id=f"bench-db-{i}"))
+    budgeted = []
+    timings = measure(lambda: budgeted.append(_sync_databases(fake, databases, WORKSPACE_RATE * 0.95)), ctx.repeat, warmup=0)
+    unbudgeted = _sync_databases(fake, databases, None)
+    return BenchmarkResult(
+        "notion.sync_many_databases",
+        timings,
+        {
+            "databases": MULTI_DATABASES,
+            "workspace_rate": WORKSPACE_RATE,
+            "shared_budget": budgeted[-1],
+            "retry_only": unbudgeted,
+        },
+    )
+
+
+def _query_response_bodies() -> list[bytes]:
+    rng = random.Random(0)
+    return [
+        json.dumps(list_response([synthetic_page(rng, "bench-db") for _ in range(PARSE_PAGES)], "cursor", "page_or_database")).encode()
+        for _ in range(PARSE_RESPONSES)
+    ]
+
+
+def _bench_parse(name: str, parse, ctx: BenchContext) -> BenchmarkResult:
+    bodies = _query_response_bodies()
+    timings = measure(lambda: [parse(body) for body in bodies], ctx.repeat)
+    best = min(timings)
+    return BenchmarkResult(
+        name,
+        timings,
+        {"pages_per_response": PARSE_PAGES, "responses": PARSE_RESPONSES, "us_per_response": round(best / PARSE_RESPONSES * 1e6)},
+    )
+
+
+@benchmark("notion.parse_full")
+def bench_parse_full(ctx: BenchContext) -> BenchmarkResult:
+    """The previous query path: json.loads, then every Page field validated (URLs, datetimes, properties)."""
+    return _bench_parse("notion.parse_full", lambda body: schemas.ListResponse(**json.loads(body)), ctx)
+
+
+@benchmark("notion.parse_fast")
+def bench_parse_fast(ctx: BenchContext) -> BenchmarkResult:
+    """query_notion_database's path: validate_json on the bytes with only the synced fields."""
+    return _bench_parse("notion.parse_fast", schemas.parse_page_list, ctx)
+
+
+@benchmark("notion.parse_fast_with_properties")
+def bench_parse_fast_with_properties(ctx: BenchContext) -> BenchmarkResult:
+    """The fast path when a caller also reads every page's full properties."""
+
+    def parse(body: bytes):
+        pages = schemas.parse_page_list(body)
+        return [page.properties for page in pages.results]
+
+    return _bench_parse("notion.parse_fast_with_properties", parse, ctx)
@@ -0,0 +1,75 @@
+import itertools
+import tracemalloc
+
+from app.services import digest_service, flashcard_service
+from app.telegram_bot.handlers import chunk_flashcard_messages
+from benchmarks.fixtures import (
+    flashcard_database,
+    session_factory,
+    synthetic_flashcards,
+)
+from benchmarks.harness import BenchContext, BenchmarkResult, benchmark, measure
+
+CARD_COUNT = 10_000
+SUMMARY_PERIOD = "last_three_months"
+
+
+@benchmark("telegram.chunk_flashcard_messages")
+def bench_chunk_flashcard_messages(ctx: BenchContext) -> BenchmarkResult:
+    cards = synthetic_flashcards(CARD_COUNT)
+    timings = measure(lambda: chunk_flashcard_messages(cards), ctx.repeat)
+    messages = len(chunk_flashcard_messages(cards))
+    return BenchmarkResult(
+        "telegram.chunk_flashcard_messages", timings, {"cards": CARD_COUNT, "messages": messages}
+    )
+
+
+def _peak_mb(func) -> tuple[object, float]:
+    tracemalloc.start()
+    try:
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, round(peak / 2**20, 1)
+
+
+@benchmark("telegram.summary_digest")
+def bench_summary_digest(ctx: BenchContext) -> BenchmarkResult:
+    """`/summary last_three_months` over --rows cards: streamed documents against a message per chunk."""
+    db = session_factory(flashcard_database(ctx.rows, ctx.workdir))()
+    paths = []
+
+    def render():
+        cards = flashcard_service.iter_sent_flashcards_by_period(db, SUMMARY_PERIOD)
+        parts, count = digest_service.render_digest("Summary", cards, directory=ctx.workdir)
+        paths.append(parts)
+        return count
+
+    def messages():
+        return chunk_flashcard_messages(flashcard_service.get_sent_flashcards_by_period(db, SUMMARY_PERIOD))
+
+    try:
+        timings = measure(render, ctx.repeat)
+        cards, digest_peak = _peak_mb(render)
+        chunks, messages_peak = _peak_mb(messages)
+        parts = paths[-1]
+        digest_bytes = sum(path.stat().st_size for path in parts)
+    finally:
+        db.close()
+        for path in itertools.chain.from_iterable(paths):
+            path.unlink(missing_ok=True)
+    return BenchmarkResult(
+        "telegram.summary_digest",
+        timings,
+        {
+            "cards": cards,
+            # The header message plus one per chunk, against a single send_document
+            "reply_text_calls": len(chunks) + 1,
+            # One per DIGEST_MAX_BYTES part
+            "send_document_calls": len(parts),
+            "digest_mb": round(digest_bytes / 2**20, 1),
+            "digest_peak_mb": digest_peak,
+            "messages_peak_mb": messages_peak,
+        },
+    )
@@ -0,0 +1,72 @@
+import json
+import tracemalloc
+from pathlib import Path
+
+from app.database import init_db
+from app.services import export_service, import_service
+from benchmarks.fixtures import (
+    flashcard_database,
+    session_factory,
+    synthetic_flashcards,
+)
+from benchmarks.harness import BenchContext, BenchmarkResult, benchmark, measure
+
+
+def _import_file(ctx: BenchContext) -> Path:
+    """A JSONL file with ctx.rows cards, 1% of them duplicated."""
+    path = ctx.workdir / f"import-{ctx.rows}.jsonl"
+    if path.exists():
+        return path
+    ctx.workdir.mkdir(parents=True, exist_ok=True)
+    unique = synthetic_flashcards(1000)
+    with path.open("w") as f:
+        for i in range(ctx.rows):
+            card = unique[i % len(unique)]
+            suffix = "" if i % 100 == 0 else f" #{i}"
+            f.write(json.dumps({"question": card.question + suffix, "answer": card.answer, "knowledge_source_id": card.knowledge_source_id}) + "\n")
+    return path
+
+
+@benchmark("transfer.import_jsonl")
+def bench_import_jsonl(ctx: BenchContext) -> BenchmarkResult:
+    source = _import_file(ctx)
+    target = ctx.workdir / "import-target.db"
+    reports = []
+
+    def run():
+        target.unlink(missing_ok=True)
+        SessionLocal = session_factory(target)
+        init_db(SessionLocal.kw["bind"])
+        db = SessionLocal()
+        try:
+            with source.open("rb") as f:
+                reports.append(import_service.import_records(db, import_service.read_records(f, "jsonl")))
+        finally:
+            db.close()
+            SessionLocal.kw["bind"].dispose()
+
+    timings = measure(run, min(ctx.repeat, 3), warmup=0)
+    target.unlink(missing_ok=True)
+    return BenchmarkResult("transfer.import_jsonl", timings, {"rows": ctx.rows, **reports[-1].as_dict()})
+
+
+@benchmark("transfer.export_csv")
+def bench_export_csv(ctx: BenchContext) -> BenchmarkResult:
+    SessionLocal = session_factory(flashcard_database(ctx.rows, ctx.workdir))
+
+    def run():
+        db = SessionLocal()
+        try:
+            return sum(len(chunk) for chunk in export_service.iter_csv(db))
+        finally:
+            db.close()
+
+    timings = measure(run, min(ctx.repeat, 3), warmup=0)
+
+    tracemalloc.start()
+    size = run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return BenchmarkResult(
+        "transfer.export_csv", timings, {"rows": ctx.rows, "bytes": size, "peak_traced_bytes": peak}
+    )
@@ -0,0 +1,101 @@
+"""
+Synthetic flashcard data shared by the benchmarks. Notion data comes from
+tests.fakes.notion_api; nothing here touches the network.
+"""
+
+import random
+import sqlite3
+import uuid
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import init_db
+from tests.fakes.notion_api import WORDS, sentence
+
+STATUSES = ("pending", "sent", "sent", "sent")
+HISTORY_DAYS = 200
+
+
+def synthetic_flashcards(count: int, seed: int = 0) -> list[SimpleNamespace]:
+    """In-memory flashcard stand-ins with the attributes the formatters read."""
+    rng = random.Random(seed)
+    return [
+        SimpleNamespace(
+            question=sentence(rng) + "?",
+            answer=sentence(rng, 10, 40),
+            knowledge_source_type="notion",
+            knowledge_source_id=str(uuid.UUID(int=rng.getrandbits(128))),
+        )
+        for _ in range(count)
+    ]
+
+
+def flashcard_database(rows: int, workdir: Path, seed: int = 0, history_days: int = HISTORY_DAYS) -> Path:
+    """
+    Creates (or reuses) an SQLite file with `rows` flashcards.
+
+    Cards are created over the last `history_days` (about six months by
+    default) relative to today, so the file name includes the date to keep
+    period queries meaningful.
+    """
+    workdir.mkdir(parents=True, exist_ok=True)
+    history = "" if history_days == HISTORY_DAYS else f"-{history_days}d"
+    path = workdir / f"flashcards-{rows}{history}-{date.today().isoformat()}.db"
+    if path.exists():
+        # Bring files cached by an older schema up to date
+        engine = create_engine(f"sqlite:///{path}")
+        init_db(engine)
+        engine.dispose()
+        return path
+
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+    engine = create_engine(f"sqlite:///{tmp_path}")
+    init_db(engine)
+    engine.dispose()
+
+    rng = random.Random(seed)
+    now = datetime.now(UTC).replace(tzinfo=None)
+    source_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(max(1, rows // 20))]
+
+    def generate():
+        for i in range(rows):
+            status = STATUSES[i % len(STATUSES)]
+            created = now - timedelta(seconds=rng.randint(0, history_days * 86400))
+            sent_at = created + timedelta(seconds=rng.randint(0, 86400)) if status == "sent" else None
+            # Graded cards come due again up to two months after they were sent
+            due_at = sent_at + timedelta(seconds=rng.randint(86400, 60 * 86400)) if sent_at and i % 2 else None
+            yield (
+                f"Question {i}: {rng.choice(WORDS)} {rng.choice(WORDS)}?",
+                f"Answer {i}: {rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(WORDS)}",
+                "notion",
+                rng.choice(source_ids),
+                status,
+                created.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                sent_at.strftime("%Y-%m-%d %H:%M:%S.%f") if sent_at else None,
+                due_at.strftime("%Y-%m-%d %H:%M:%S.%f") if due_at else None,
+            )
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executemany(
+            "INSERT INTO flashcards (question, answer, knowledge_source_type, knowledge_source_id, status, created_at, sent_at, due_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            generate(),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    tmp_path.rename(path)
+    return path
+
+
+def session_factory(path: Path) -> sessionmaker:
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
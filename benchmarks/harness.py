@@ -0,0 +1,95 @@
+import asyncio
+import json
+import platform
+import statistics
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+
+
+@dataclass
+class BenchContext:
+    rows: int
+    repeat: int
+    workdir: Path
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    timings: list[float]
+    params: dict = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.timings)
+        return {
+            "runs": len(ordered),
+            "min": ordered[0],
+            "median": statistics.median(ordered),
+            "mean": statistics.fmean(ordered),
+            "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+            "max": ordered[-1],
+            "params": self.params,
+        }
+
+
+BENCHMARKS: dict[str, Callable[[BenchContext], BenchmarkResult]] = {}
+
+
+def benchmark(name: str):
+    """Registers a benchmark function under `name`."""
+
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+def measure(func: Callable[[], object], repeat: int, warmup: int = 1) -> list[float]:
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def measure_async(factory: Callable[[], object], repeat: int, warmup: int = 1) -> list[float]:
+    """Like measure(), for a coroutine factory; every run gets a fresh event loop."""
+    return measure(lambda: asyncio.run(factory()), repeat, warmup)
+
+
+def write_results(results: list[BenchmarkResult], path: Path, rows: int) -> dict:
+    report = {
+        "meta": {
+            "timestamp": datetime.now(UTC).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rows": rows,
+        },
+        "results": {result.name: result.summary() for result in results},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return report
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """Returns the names of benchmarks whose median regressed by more than `threshold`."""
+    regressions = []
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            print(f"{name:40s} {current['median'] * 1000:10.2f} ms   (new)")
+            continue
+        ratio = current["median"] / previous["median"] if previous["median"] else float("inf")
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:40s} {current['median'] * 1000:10.2f} ms   x{ratio:5.2f} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
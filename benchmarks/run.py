@@ -0,0 +1,76 @@
+"""
+Runs the offline benchmark suite and writes the results as JSON.
+
+    python -m benchmarks.run                       # everything, 1M-row flashcard table
+    python -m benchmarks.run --rows 100000 -k flashcards
+    python -m benchmarks.run --compare baseline.json --fail-on-regression
+"""
+
+import argparse
+import fnmatch
+import json
+import logging
+import sys
+from pathlib import Path
+
+from app.config import LOCAL_DIR
+from benchmarks import (
+    bench_archive,
+    bench_backup,
+    bench_bot,
+    bench_dashboard,
+    bench_delivery,
+    bench_events,
+    bench_flashcards,
+    bench_llm,
+    bench_notion,
+    bench_telegram,
+    bench_transfer,
+)
+from benchmarks.harness import BENCHMARKS, BenchContext, compare, write_results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", default="*", help="glob or substring selecting benchmarks")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="size of the synthetic flashcard table")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workdir", type=Path, default=Path(LOCAL_DIR) / "bench")
+    parser.add_argument("--output", type=Path, default=Path(LOCAL_DIR) / "bench" / "results.json")
+    parser.add_argument("--compare", type=Path, help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed median slowdown ratio")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    # Per-query INFO logs would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.list:
+        print("\n".join(sorted(BENCHMARKS)))
+        return 0
+
+    pattern = args.filter if any(c in args.filter for c in "*?[") else f"*{args.filter}*"
+    selected = [name for name in sorted(BENCHMARKS) if fnmatch.fnmatch(name, pattern)]
+    ctx = BenchContext(rows=args.rows, repeat=args.repeat, workdir=args.workdir)
+
+    results = []
+    for name in selected:
+        print(f"running {name} ...", file=sys.stderr)
+        results.append(BENCHMARKS[name](ctx))
+
+    report = write_results(results, args.output, args.rows)
+    print(f"wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    else:
+        for name, summary in report["results"].items():
+            print(f"{name:40s} {summary['median'] * 1000:10.2f} ms  (p95 {summary['p95'] * 1000:.2f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
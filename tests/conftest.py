@@ -1,15 +1,17 @@
 import logging
 import os
+from pathlib import Path
 
 import pytest
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
-from app.models import Base
+from app.database import init_db
 
 load_dotenv(dotenv_path=".env.integration.test")
 
 TEST_DATABASE_URL = "sqlite:///.local/test_flashcards.db"
+Path(".local").mkdir(exist_ok=True)
 
 test_engine = create_engine(
     TEST_DATABASE_URL,
@@ -19,7 +21,7 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_
 
 @pytest.fixture(scope="session")
 def init_db_tables():
-    Base.metadata.create_all(test_engine)
+    init_db(test_engine)
     yield
 
 # Fixture to provide a test database session
@@ -56,6 +58,11 @@ def override_get_db_session(monkeypatch, db_session):
     except AttributeError:
         logging.warning("Warning: Could not patch get_db_session in app.services.config_service.")
 
+@pytest.fixture(autouse=True)
+def unpaced_notion_requests(monkeypatch):
+    """Hermetic tests talk to in-process fakes; don't pace them like the real workspace."""
+    monkeypatch.setattr("app.knowledge_sources.notion.notion_service.workspace_budget.rate", None)
+
 # Fixture to load Notion API key and other test IDs
 @pytest.fixture(scope="session")
 def notion_test_config():
@@ -77,8 +84,9 @@ def notion_test_config():
         }
     }
 
-# Fixture to ensure the API key is in the test DB before tests run
-@pytest.fixture(scope="function", autouse=True)
+# Fixture to ensure the API key is in the test DB before integration tests run.
+# Not autouse: hermetic tests must not be skipped for missing credentials.
+@pytest.fixture(scope="function")
 def setup_notion_config_in_db(db_session: Session, notion_test_config):
     """Inserts the Notion API key into the test database."""
     from app.services import config_service  # Import locally to use patched DB
@@ -0,0 +1,296 @@
+"""
+In-process fake of the Notion API endpoints used by notion_service.
+
+Serves POST /databases/{id}/query with cursors, GET /blocks/{id}/children with
+has_more/has_children and PATCH /pages/{id} from generated data, with
+configurable latency and HTTP 429 injection. Plug it into notion_service
+through `client=fake.client()`; no network is involved.
+"""
+
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import UTC, datetime, timedelta
+
+import httpx
+
+WORDS = (
+    "spaced repetition memory retrieval practice interval recall card deck "
+    "notion page block paragraph heading database query cursor sync token"
+).split()
+
+
+def sentence(rng: random.Random, min_words: int = 6, max_words: int = 18) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))).capitalize()
+
+
+def _rich_text(text: str) -> list[dict]:
+    return [{"type": "text", "text": {"content": text}, "plain_text": text}]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128)))
+
+
+def synthetic_page(rng: random.Random, database_id: str) -> dict:
+    """A Notion page object as returned by POST /databases/{id}/query."""
+    page_id = _uuid(rng)
+    edited = datetime(2025, 1, 1, tzinfo=UTC) + timedelta(minutes=rng.randint(0, 500_000))
+    timestamp = edited.isoformat().replace("+00:00", "Z")
+    return {
+        "object": "page",
+        "id": page_id,
+        "created_time": timestamp,
+        "last_edited_time": timestamp,
+        "created_by": {"object": "user", "id": "user-1"},
+        "last_edited_by": {"object": "user", "id": "user-1"},
+        "cover": None,
+        "icon": None,
+        "parent": {"type": "database_id", "database_id": database_id},
+        "archived": False,
+        "properties": {
+            "Name": {"id": "title", "type": "title", "title": _rich_text(sentence(rng, 2, 6))},
+            "isProcessed": {"id": "proc", "type": "checkbox", "checkbox": False},
+            "Tags": {
+                "id": "tags",
+                "type": "multi_select",
+                "multi_select": [{"id": str(i), "name": rng.choice(WORDS), "color": "default"} for i in range(3)],
+            },
+        },
+        "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+    }
+
+
+def synthetic_block_tree(depth: int, width: int, seed: int = 0, root_id: str = "root") -> dict[str, list[dict]]:
+    """
+    Generates a block tree where every block above `depth` has `width` children.
+
+    Returns a mapping of block ID to its list of child blocks, which is what the
+    /blocks/{id}/children endpoint serves.
+    """
+    rng = random.Random(seed)
+    tree: dict[str, list[dict]] = {}
+    frontier = [root_id]
+    for level in range(depth):
+        next_frontier = []
+        for parent_id in frontier:
+            children = []
+            for _ in range(width):
+                block_id = _uuid(rng)
+                has_children = level < depth - 1
+                block_type = rng.choice(("paragraph", "heading_2", "bulleted_list_item", "toggle"))
+                children.append({
+                    "object": "block",
+                    "id": block_id,
+                    "type": block_type,
+                    "has_children": has_children,
+                    block_type: {"rich_text": _rich_text(sentence(rng))},
+                })
+                if has_children:
+                    next_frontier.append(block_id)
+            tree[parent_id] = children
+        frontier = next_frontier
+    return tree
+
+
+def list_response(results: list[dict], next_cursor: str | None, list_type: str) -> dict:
+    return {
+        "object": "list",
+        "results": results,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+        "type": list_type,
+        list_type: {},
+    }
+
+
+def error_response(status: int, code: str, message: str) -> dict:
+    return {"object": "error", "status": status, "code": code, "message": message}
+
+
+def _matches(page: dict, page_filter: dict) -> bool:
+    """
+    Evaluates the subset of Notion filters the app sends: and/or, checkbox
+    and select equality, and last_edited_time on_or_after.
+    """
+    if "and" in page_filter:
+        return all(_matches(page, f) for f in page_filter["and"])
+    if "or" in page_filter:
+        return any(_matches(page, f) for f in page_filter["or"])
+    if page_filter.get("timestamp") == "last_edited_time":
+        edited = datetime.fromisoformat(page["last_edited_time"])
+        return edited >= datetime.fromisoformat(page_filter["last_edited_time"]["on_or_after"])
+    prop = page["properties"].get(page_filter["property"], {})
+    if "checkbox" in page_filter:
+        return prop.get("checkbox") == page_filter["checkbox"]["equals"]
+    if "select" in page_filter:
+        return (prop.get("select") or {}).get("name") == page_filter["select"]["equals"]
+    raise ValueError(f"Unsupported filter: {page_filter}")
+
+
+class FakeNotionAPI:
+    """
+    Fake Notion workspace.
+
+    :param latency:           Seconds added to every response.
+    :param jitter:            Extra uniformly distributed latency in seconds.
+    :param page_size:         Results per page for paginated endpoints.
+    :param rate_limit_every:  Reject every Nth request with 429 (0 disables).
+    :param requests_per_second: Token-bucket limit like Notion's ~3 req/s average
+                              (None disables); requests over budget get 429.
+    :param burst:             Bucket capacity for `requests_per_second`.
+    :param retry_after:       Value of the Retry-After header sent with 429s.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        page_size: int = 100,
+        rate_limit_every: int = 0,
+        requests_per_second: float | None = None,
+        burst: int = 10,
+        retry_after: float = 0.01,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.page_size = page_size
+        self.rate_limit_every = rate_limit_every
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+
+        self.databases: dict[str, list[dict]] = {}
+        self.blocks: dict[str, list[dict]] = {}
+        self.pages: dict[str, dict] = {}
+
+        self.calls: Counter[str] = Counter()
+        self.rate_limited: Counter[str] = Counter()
+        self.request_count = 0
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+
+    # --- Data generation ---
+
+    def add_database(self, database_id: str, pages: int) -> list[dict]:
+        """Generates `pages` pages in a new database and returns them."""
+        results = [synthetic_page(self.rng, database_id) for _ in range(pages)]
+        self.databases[database_id] = results
+        for page in results:
+            self.pages[page["id"]] = page
+        return results
+
+    def add_page_tree(self, page_id: str, depth: int, width: int) -> int:
+        """Gives `page_id` a block tree of the given depth and width; returns the block count."""
+        tree = synthetic_block_tree(depth, width, seed=self.rng.getrandbits(32), root_id=page_id)
+        self.blocks.update(tree)
+        return sum(len(children) for children in tree.values())
+
+    def populate(self, database_id: str, pages: int, depth: int, width: int) -> list[dict]:
+        """A database whose every page has a block tree."""
+        results = self.add_database(database_id, pages)
+        for page in results:
+            self.add_page_tree(page["id"], depth, width)
+        return results
+
+    def edit_block(self, page_id: str, block_id: str, text: str | None) -> None:
+        """Rewrites a top-level block of a page, or deletes it if `text` is None, as a user edit would."""
+        children = self.blocks[page_id]
+        index = next(i for i, block in enumerate(children) if block["id"] == block_id)
+        if text is None:
+            del children[index]
+        else:
+            block = children[index]
+            block[block["type"]] = {"rich_text": _rich_text(text)}
+        self.pages[page_id]["last_edited_time"] = datetime.now(UTC).isoformat().replace("+00:00", "Z")
+
+    # --- HTTP ---
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=self.transport())
+
+    def _over_budget(self) -> bool:
+        if self.rate_limit_every and self.request_count % self.rate_limit_every == 0:
+            return True
+        if self.requests_per_second is None:
+            return False
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.requests_per_second)
+        self._last_refill = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.request_count += 1
+        parts = request.url.path.strip("/").split("/")
+        # /v1/<resource>/<id>[/<action>]
+        resource, object_id, action = parts[1], parts[2], "/".join(parts[3:])
+        endpoint = f"{request.method} {resource}/{action}" if action else f"{request.method} {resource}"
+        self.calls[endpoint] += 1
+
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self._over_budget():
+            self.rate_limited[endpoint] += 1
+            return httpx.Response(
+                429,
+                headers={"Retry-After": str(self.retry_after)},
+                json=error_response(429, "rate_limited", "You have been rate limited."),
+            )
+
+        if resource == "databases" and action == "query" and request.method == "POST":
+            return self._query_database(object_id, request)
+        if resource == "blocks" and action == "children" and request.method == "GET":
+            return self._block_children(object_id, request)
+        if resource == "pages" and not action and request.method == "PATCH":
+            return self._update_page(object_id, request)
+        return httpx.Response(400, json=error_response(400, "invalid_request_url", "Invalid request URL."))
+
+    def _paginate(self, items: list[dict], cursor: str | None, size: int | None = None) -> tuple[list[dict], str | None]:
+        start = int(cursor) if cursor else 0
+        end = start + min(size or self.page_size, self.page_size)
+        return items[start:end], str(end) if end < len(items) else None
+
+    def _query_database(self, database_id: str, request: httpx.Request) -> httpx.Response:
+        if database_id not in self.databases:
+            return httpx.Response(
+                400, json=error_response(400, "validation_error", f"path.database_id should be a valid uuid, instead was `\"{database_id}\"`.")
+            )
+        payload = json.loads(request.content) if request.content else {}
+        pages = self.databases[database_id]
+        if "filter" in payload:
+            pages = [p for p in pages if _matches(p, payload["filter"])]
+        for sort in reversed(payload.get("sorts", [])):
+            pages = sorted(
+                pages, key=lambda p: datetime.fromisoformat(p[sort["timestamp"]]), reverse=sort["direction"] == "descending"
+            )
+        results, next_cursor = self._paginate(pages, payload.get("start_cursor"), payload.get("page_size"))
+        return httpx.Response(200, json=list_response(results, next_cursor, "page_or_database"))
+
+    def _block_children(self, block_id: str, request: httpx.Request) -> httpx.Response:
+        if block_id not in self.blocks and block_id not in self.pages:
+            return httpx.Response(404, json=error_response(404, "object_not_found", f"Could not find block with ID: {block_id}."))
+        results, next_cursor = self._paginate(self.blocks.get(block_id, []), request.url.params.get("start_cursor"))
+        return httpx.Response(200, json=list_response(results, next_cursor, "block"))
+
+    def _update_page(self, page_id: str, request: httpx.Request) -> httpx.Response:
+        page = self.pages.get(page_id)
+        if page is None:
+            return httpx.Response(404, json=error_response(404, "object_not_found", f"Could not find page with ID: {page_id}."))
+        body = json.loads(request.content)
+        for name, value in body.get("properties", {}).items():
+            page["properties"].setdefault(name, {}).update(value)
+        page["last_edited_time"] = datetime.now(UTC).isoformat().replace("+00:00", "Z")
+        return httpx.Response(200, json=page)
@@ -0,0 +1,201 @@
+"""
+In-process fake of the OpenRouter chat completions endpoint.
+
+Answers POST /api/v1/chat/completions by writing `cards_per_source` JSONL
+cards for every <source id="..."> in the user message (or `cards_per_block`
+for every [bN]-marked block in it, citing the block), with a usage block,
+configurable latency and failure injection. Requests with "stream": true get
+the reply as server-sent events in small chunks, paced by `chunk_delay`, like
+OpenRouter's streaming API. Plug it into llm_service through
+`client=fake.client()`; no network is involved.
+"""
+
+import asyncio
+import json
+import re
+import time
+from collections import Counter
+
+import httpx
+
+from app.services.llm_service import estimate_tokens
+
+SOURCE_PATTERN = re.compile(r'<source id="([^"]+)" title="[^"]*">\n(.*?)\n</source>', re.DOTALL)
+BLOCK_PATTERN = re.compile(r"^\[(b\d+)\] (.*)$", re.MULTILINE)
+
+
+class FakeOpenRouter:
+    """
+    Fake OpenRouter deployment.
+
+    :param latency:          Seconds added to every response.
+    :param cards_per_source: Cards written for each source in a prompt.
+    :param cards_per_block:  If set, cards written for each marked block of a
+                             source instead, each citing its block.
+    :param fail_every:       Answer every Nth request with HTTP 500 (0 disables).
+    :param fail_sources:     Titles; any prompt containing one gets HTTP 500.
+    :param fail_mid_stream:  Fail streamed `fail_sources` requests half-way
+                             through the reply (connection dropped) instead.
+    :param chunk_size:       Characters of reply text per streamed event.
+    :param chunk_delay:      Seconds between streamed events.
+    :param model_latency:    Per-model latency overriding `latency`; values may
+                             be callables returning seconds, to vary it per request.
+    :param failing_models:   Models whose requests get HTTP 503.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        cards_per_source: int = 2,
+        cards_per_block: int = 0,
+        fail_every: int = 0,
+        fail_sources: tuple[str, ...] = (),
+        fail_mid_stream: bool = False,
+        chunk_size: int = 16,
+        chunk_delay: float = 0.0,
+        model_latency: dict | None = None,
+        failing_models: tuple[str, ...] = (),
+    ):
+        self.latency = latency
+        self.cards_per_source = cards_per_source
+        self.cards_per_block = cards_per_block
+        self.fail_every = fail_every
+        self.fail_sources = fail_sources
+        self.fail_mid_stream = fail_mid_stream
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.model_latency = model_latency or {}
+        self.failing_models = failing_models
+        self.request_count = 0
+        # perf_counter() when the last streamed event of any reply was sent
+        self.last_chunk_at: float | None = None
+        self.models: Counter[str] = Counter()
+        # Requests abandoned by the client (e.g. the losing side of a hedge) per model
+        self.cancelled: Counter[str] = Counter()
+        self.in_flight: Counter[str] = Counter()
+        self.max_in_flight: Counter[str] = Counter()
+        # Source ids seen per request, in arrival order
+        self.prompts: list[list[str]] = []
+        # Texts of the marked blocks seen, over all requests
+        self.blocks: list[str] = []
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=self.transport())
+
+    def cards_for(self, prompt: str) -> list[dict]:
+        cards = []
+        for label, text in SOURCE_PATTERN.findall(prompt):
+            blocks = BLOCK_PATTERN.findall(text) if self.cards_per_block else []
+            for marker, block in blocks:
+                for n in range(1, self.cards_per_block + 1):
+                    cards.append({"source": label, "blocks": [marker], "question": f"What does {label} {marker} say ({n})?", "answer": block[:80]})
+            if blocks:
+                continue
+            first_line = text.splitlines()[0] if text else ""
+            for n in range(1, self.cards_per_source + 1):
+                cards.append({"source": label, "question": f"What does {label} say ({n})?", "answer": first_line[:80]})
+        return cards
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.request_count += 1
+        if request.url.path != "/api/v1/chat/completions" or request.method != "POST":
+            return httpx.Response(404, json={"error": {"message": "Not found", "code": 404}})
+        payload = json.loads(request.content)
+        model = payload["model"]
+        self.models[model] += 1
+        self.in_flight[model] += 1
+        self.max_in_flight[model] = max(self.max_in_flight[model], self.in_flight[model])
+        streaming = False
+        try:
+            response = await self._respond(payload)
+            streaming = response.headers.get("Content-Type") == "text/event-stream"
+            return response
+        except asyncio.CancelledError:
+            self.cancelled[model] += 1
+            raise
+        finally:
+            # A streamed reply stays in flight until its last event
+            if not streaming:
+                self.in_flight[model] -= 1
+
+    async def _respond(self, payload: dict) -> httpx.Response:
+        model = payload["model"]
+        prompt = "\n".join(message["content"] for message in payload["messages"] if message["role"] == "user")
+        self.prompts.append([label for label, _ in SOURCE_PATTERN.findall(prompt)])
+        self.blocks.extend(block for _, block in BLOCK_PATTERN.findall(prompt))
+
+        latency = self.model_latency.get(model, self.latency)
+        latency = latency() if callable(latency) else latency
+        if latency:
+            await asyncio.sleep(latency)
+
+        if model in self.failing_models:
+            return httpx.Response(503, json={"error": {"message": f"{model} is unavailable", "code": 503}})
+        failing_source = any(f'title="{title}' in prompt for title in self.fail_sources)
+        stream = payload.get("stream", False)
+        if (self.fail_every and self.request_count % self.fail_every == 0) or (
+            failing_source and not (stream and self.fail_mid_stream)
+        ):
+            return httpx.Response(500, json={"error": {"message": "Internal Server Error", "code": 500}})
+
+        content = "\n".join(json.dumps(card) for card in self.cards_for(prompt))
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in payload["messages"])
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": estimate_tokens(content),
+            "total_tokens": prompt_tokens + estimate_tokens(content),
+        }
+        if stream:
+            return httpx.Response(
+                200,
+                headers={"Content-Type": "text/event-stream"},
+                content=self._events(model, content, usage, drop_half_way=failing_source),
+            )
+        return httpx.Response(
+            200,
+            json={
+                "id": f"gen-{self.request_count}",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            },
+        )
+
+    async def _events(self, model: str, content: str, usage: dict, drop_half_way: bool):
+        generation_id = f"gen-{self.request_count}"
+
+        def event(delta: dict, finish_reason: str | None = None, usage: dict | None = None) -> bytes:
+            chunk = {
+                "id": generation_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage is not None:
+                chunk["usage"] = usage
+            return f"data: {json.dumps(chunk)}\n\n".encode()
+
+        finished = False
+        try:
+            # OpenRouter sends keep-alive comments while the model is queued
+            yield b": OPENROUTER PROCESSING\n\n"
+            yield event({"role": "assistant", "content": ""})
+            pieces = [content[i:i + self.chunk_size] for i in range(0, len(content), self.chunk_size)]
+            for n, piece in enumerate(pieces):
+                if drop_half_way and n == len(pieces) // 2:
+                    raise httpx.RemoteProtocolError("peer closed connection without sending complete message body")
+                if self.chunk_delay:
+                    await asyncio.sleep(self.chunk_delay)
+                self.last_chunk_at = time.perf_counter()
+                yield event({"content": piece})
+            # The client may stop reading after [DONE] without closing the generator
+            finished = True
+            self.in_flight[model] -= 1
+            yield event({}, finish_reason="stop", usage=usage) + b"data: [DONE]\n\n"
+        finally:
+            if not finished:
+                self.in_flight[model] -= 1
@@ -0,0 +1,86 @@
+"""
+In-process fake of the Telegram Bot API, used as python-telegram-bot's request
+backend (`Application.builder().request(fake)`), so an Application can be
+initialized and driven without a network.
+
+Answers getMe and every method the bot sends (sendMessage, sendDocument,
+editMessageText, answerCallbackQuery, ...) with plausible objects, after a
+configurable latency, and records what was sent to each chat.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+
+from telegram import Bot, Update
+from telegram.request import BaseRequest
+
+TOKEN = "123456:FAKE-TOKEN"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Flashcards", "username": "srs_test_bot"}
+USER = {"id": 1, "is_bot": False, "first_name": "Reader"}
+
+_update_ids = itertools.count(1)
+
+
+def command_update(bot: Bot, chat_id: int, text: str) -> Update:
+    """A fabricated update carrying a bot command (e.g. "/random 3") from a private chat, bound to `bot`."""
+    update_id = next(_update_ids)
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": USER,
+        "text": text,
+        "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+    }
+    return Update.de_json({"update_id": update_id, "message": message}, bot)
+
+
+class FakeBotAPI(BaseRequest):
+    """
+    Fake Bot API endpoint.
+
+    :param latency: Seconds added to every call, like the round trip to Telegram.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        # (perf_counter(), chat_id, method, text) of every call with a chat
+        self.sent: list[tuple[float, int, str, str | None]] = []
+        self._message_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data=None, *args, **kwargs) -> tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        self.calls[api_method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        params = request_data.parameters if request_data is not None else {}
+
+        if api_method == "getMe":
+            result = BOT_USER
+        elif "chat_id" in params:
+            chat_id = int(params["chat_id"])
+            self.sent.append((time.perf_counter(), chat_id, api_method, params.get("text")))
+            result = {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
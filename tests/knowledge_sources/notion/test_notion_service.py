@@ -10,6 +10,7 @@ from tests.conftest import (
     init_db_tables,
     notion_test_config,
     override_get_db_session,
+    setup_notion_config_in_db,
 )
 
 # Set up DEBUG flag from environment variable
@@ -18,6 +19,7 @@ DEBUG = os.environ.get('DEBUG', 'False') == 'True'
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+@pytest.mark.usefixtures("setup_notion_config_in_db")
 class TestNotionService:
 
     @pytest.mark.asyncio
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from app.knowledge_sources.notion import notion_service, schemas
+from tests.fakes.notion_api import FakeNotionAPI, list_response
+
+
+def count_blocks(blocks: list[dict]) -> int:
+    return sum(1 + count_blocks(block.get("children", [])) for block in blocks)
+
+
+class TestNotionServiceAgainstFake:
+
+    @pytest.mark.asyncio
+    async def test_query_notion_database_paginates_with_cursor(self):
+        fake = FakeNotionAPI(page_size=10)
+        pages = fake.add_database("db-1", 25)
+
+        async with fake.client() as client:
+            first = await notion_service.query_notion_database("db-1", headers={}, client=client)
+            second = await notion_service.query_notion_database(
+                "db-1", {"start_cursor": first.next_cursor}, headers={}, client=client
+            )
+
+        assert first.object == "list"
+        assert first.has_more is True
+        assert [page.id for page in first.results] == [page["id"] for page in pages[:10]]
+        assert [page.id for page in second.results] == [page["id"] for page in pages[10:20]]
+
+    @pytest.mark.asyncio
+    async def test_query_results_match_fully_validated_pages(self):
+        fake = FakeNotionAPI(page_size=5)
+        pages = fake.add_database("db-1", 5)
+
+        async with fake.client() as client:
+            result = await notion_service.query_notion_database("db-1", headers={}, client=client)
+
+        full = schemas.ListResponse(**list_response(pages, None, "page_or_database"))
+        for page, expected in zip(result.results, full.results, strict=True):
+            assert (page.id, page.url, page.last_edited_time) == (expected.id, str(expected.url), expected.last_edited_time)
+            assert page.properties == expected.properties
+            assert page.title == expected.properties["Name"]["title"][0]["plain_text"]
+
+    def test_malformed_page_fails_validation(self):
+        body = json.dumps({"object": "list", "results": [{"id": "p", "url": "u"}], "next_cursor": None, "has_more": False})
+
+        with pytest.raises(ValidationError):
+            schemas.parse_page_list(body.encode())
+
+    @pytest.mark.asyncio
+    async def test_query_notion_database_unknown_database_is_error(self):
+        fake = FakeNotionAPI()
+
+        async with fake.client() as client:
+            result = await notion_service.query_notion_database("missing", headers={}, client=client)
+
+        assert result.object == "error"
+        assert result.status == 400
+
+    @pytest.mark.asyncio
+    async def test_fetch_all_blocks_recursive_follows_cursors_and_children(self):
+        fake = FakeNotionAPI(page_size=3)
+        total = fake.add_page_tree("page-1", depth=3, width=4)
+
+        async with fake.client() as client:
+            blocks = await notion_service.fetch_all_blocks_recursive("page-1", headers={}, client=client)
+
+        assert len(blocks) == 4
+        assert all(len(block["children"]) == 4 for block in blocks)
+        assert count_blocks(blocks) == total
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_requests_are_retried(self):
+        fake = FakeNotionAPI(rate_limit_every=3, retry_after=0.001)
+        total = fake.add_page_tree("page-1", depth=2, width=5)
+
+        async with fake.client() as client:
+            content = await notion_service.retrieve_content_by_id("page-1", headers={}, client=client)
+
+        assert sum(fake.rate_limited.values()) > 0
+        assert count_blocks(content["blocks"]) == total
+
+    @pytest.mark.asyncio
+    async def test_persistent_rate_limit_returns_error_response(self):
+        fake = FakeNotionAPI(rate_limit_every=1, retry_after=0.001)
+        fake.add_database("db-1", 3)
+
+        async with fake.client() as client:
+            result = await notion_service.query_notion_database("db-1", headers={}, client=client)
+
+        assert result.object == "error"
+        assert result.code == "rate_limited"
+        assert fake.request_count == notion_service.MAX_RATE_LIMIT_RETRIES + 1
+
+    @pytest.mark.asyncio
+    async def test_update_page_properties_by_id(self):
+        fake = FakeNotionAPI()
+        page = fake.add_database("db-1", 1)[0]
+
+        async with fake.client() as client:
+            updated = await notion_service.update_page_properties_by_id(
+                page["id"], {"isProcessed": {"checkbox": True}}, headers={}, client=client
+            )
+            remaining = await notion_service.query_notion_database(
+                "db-1",
+                {"filter": {"property": "isProcessed", "checkbox": {"equals": False}}},
+                headers={},
+                client=client,
+            )
+
+        assert updated["properties"]["isProcessed"]["checkbox"] is True
+        assert remaining.results == []
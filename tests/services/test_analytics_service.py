@@ -0,0 +1,191 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.models import CardEvent, Flashcard
+from app.services import analytics_service, card_event_service, delivery_service
+from app.services.card_event_service import event_row
+from tests.conftest import db_session, init_db_tables
+
+NOW = datetime(2025, 3, 1, 12, 0)
+
+
+def _cards(db, *sources: str) -> list[int]:
+    cards = [Flashcard(question="Q", answer="A", knowledge_source_type="notion", knowledge_source_id=source) for source in sources]
+    db.add_all(cards)
+    db.commit()
+    return [card.id for card in cards]
+
+
+class TestEventLog:
+
+    def test_mark_sent_logs_an_event_per_card(self, init_db_tables, db_session):
+        ids = _cards(db_session, "a", "a")
+
+        delivery_service.mark_sent(db_session, ids, sent_at=NOW, chat_ids={ids[0]: 7})
+
+        events = db_session.execute(select(CardEvent.flashcard_id, CardEvent.kind, CardEvent.chat_id).order_by(CardEvent.id)).all()
+        assert events == [(ids[0], "sent", 7), (ids[1], "sent", None)]
+
+    def test_rejects_unknown_kind(self):
+        with pytest.raises(ValueError):
+            event_row(1, "deleted")
+
+
+class TestRetention:
+
+    def test_buckets_grades_by_days_since_previous_exposure(self, init_db_tables, db_session):
+        a, b = _cards(db_session, "a", "b")
+        card_event_service.record_events(db_session, [
+            event_row(a, "sent", at=NOW),
+            event_row(a, "shown", at=NOW + timedelta(hours=1)),
+            event_row(a, "graded", grade="good", at=NOW + timedelta(hours=2)),  # 0-1 days
+            event_row(a, "graded", grade="again", at=NOW + timedelta(days=3)),  # 2-4 days
+            event_row(b, "graded", grade="good", at=NOW),  # first exposure: not scored
+            event_row(b, "graded", grade="hard", at=NOW + timedelta(days=10)),  # 7-14 days
+        ])
+
+        curves = {curve["source"]: curve for curve in analytics_service.retention_by_source(db_session)}
+
+        buckets_a = {point["days"]: point for point in curves["notion:a"]["curve"]}
+        assert buckets_a["0-1"] == {"days": "0-1", "reviews": 1, "retention": 1.0}
+        assert buckets_a["2-4"] == {"days": "2-4", "reviews": 1, "retention": 0.0}
+        assert buckets_a["7-14"]["retention"] is None
+        assert curves["notion:b"]["reviews"] == 1
+        assert {point["days"]: point["retention"] for point in curves["notion:b"]["curve"]}["7-14"] == 1.0
+
+    def test_deleted_cards_count_as_unknown_source(self, init_db_tables, db_session):
+        card_event_service.record_events(db_session, [
+            event_row(999_999, "sent", at=NOW),
+            event_row(999_999, "graded", grade="good", at=NOW + timedelta(days=1)),
+        ])
+
+        curves = analytics_service.retention_by_source(db_session)
+
+        assert [(curve["source"], curve["reviews"]) for curve in curves] == [(analytics_service.UNKNOWN_SOURCE, 1)]
+
+
+class TestDailyActivity:
+
+    def test_counts_events_per_day_and_kind(self, init_db_tables, db_session):
+        (card,) = _cards(db_session, "a")
+        card_event_service.record_events(db_session, [
+            event_row(card, "sent", at=NOW - timedelta(days=1)),
+            event_row(card, "shown", at=NOW),
+            event_row(card, "skipped", at=NOW),
+            event_row(card, "sent", at=NOW - timedelta(days=10)),  # before the window
+        ])
+
+        days = analytics_service.daily_activity(db_session, days=3, now=NOW)
+
+        assert days == [
+            {"date": "2025-02-27", "sent": 0, "shown": 0, "graded": 0, "skipped": 0},
+            {"date": "2025-02-28", "sent": 1, "shown": 0, "graded": 0, "skipped": 0},
+            {"date": "2025-03-01", "sent": 0, "shown": 1, "graded": 0, "skipped": 1},
+        ]
+
+
+class TestDeckStats:
+
+    def _deck(self, db):
+        db.add_all([
+            Flashcard(question="Q", answer="A", knowledge_source_type="notion", knowledge_source_id="a", status="pending", created_at=NOW),
+            Flashcard(
+                question="Q", answer="A", knowledge_source_type="notion", knowledge_source_id="a", status="sent",
+                created_at=NOW - timedelta(days=40), due_at=NOW - timedelta(days=2),  # overdue
+            ),
+            Flashcard(
+                question="Q", answer="A", knowledge_source_type="import", knowledge_source_id="b", status="sent",
+                created_at=NOW - timedelta(days=3), due_at=NOW + timedelta(days=2),
+            ),
+            Flashcard(
+                question="Q", answer="A", knowledge_source_type="notion", knowledge_source_id="a", status="sent",
+                created_at=NOW - timedelta(days=400), due_at=NOW + timedelta(days=45),  # beyond the forecast
+            ),
+            Flashcard(
+                question="Q", answer="A", knowledge_source_type="notion", knowledge_source_id="c", status="retired",
+                created_at=NOW - timedelta(days=400), due_at=NOW + timedelta(days=1),
+            ),
+        ])
+        db.commit()
+
+    def test_forecast_counts_and_ages(self, init_db_tables, db_session):
+        self._deck(db_session)
+
+        stats = analytics_service.deck_stats(db_session, now=NOW)
+
+        assert stats["total"] == 5
+        assert (stats["overdue"], stats["unscheduled"]) == (1, 1)
+        assert len(stats["forecast"]) == analytics_service.FORECAST_DAYS
+        assert stats["forecast"][0] == {"date": "2025-03-01", "due": 1}
+        assert stats["forecast"][2] == {"date": "2025-03-03", "due": 1}
+        assert sum(day["due"] for day in stats["forecast"]) == 2
+        assert stats["by_status"] == {"pending": 1, "claimed": 0, "sent": 3, "retired": 1, "other": 0}
+        assert [(source["source"], source["total"], source["sent"]) for source in stats["by_source"]] == [
+            ("notion:a", 3, 2), ("import:b", 1, 1), ("notion:c", 1, 0)
+        ]
+        assert stats["sources"] == 3
+        ages = {bucket["days"]: bucket for bucket in stats["age"]}
+        assert (ages["0-1"]["pending"], ages["1-7"]["sent"], ages["30-90"]["sent"]) == (1, 1, 1)
+        assert (ages["365+"]["sent"], ages["365+"]["retired"]) == (1, 1)
+
+    def test_lists_the_sources_with_the_most_cards(self, init_db_tables, db_session, monkeypatch):
+        self._deck(db_session)
+        monkeypatch.setattr(analytics_service, "TOP_SOURCES", 1)
+
+        stats = analytics_service.deck_stats(db_session, now=NOW)
+
+        assert [source["source"] for source in stats["by_source"]] == ["notion:a"]
+        assert stats["sources"] == 3
+
+    def test_empty_deck(self, init_db_tables, db_session):
+        stats = analytics_service.deck_stats(db_session, now=NOW)
+
+        assert stats["total"] == 0
+        assert stats["by_source"] == []
+        assert all(day["due"] == 0 for day in stats["forecast"])
+
+    def test_serves_the_previous_result_while_refreshing(self, init_db_tables, db_session, monkeypatch):
+        cache = analytics_service.DeckStatsCache()
+        computed = []
+        release = threading.Event()
+
+        def deck_stats(db, now):
+            computed.append(now)
+            if len(computed) > 1:
+                release.wait(5)
+            return {"run": len(computed)}
+
+        monkeypatch.setattr(analytics_service, "deck_stats", deck_stats)
+
+        assert cache.get(db_session) == cache.get(db_session) == {"run": 1, "stale": False}
+        _cards(db_session, "a")
+
+        # One background refresh, however many requests arrive meanwhile
+        assert cache.get(db_session) == cache.get(db_session) == {"run": 1, "stale": True}
+        release.set()
+        for thread in threading.enumerate():
+            if thread.name == "deck-stats":
+                thread.join(5)
+
+        assert cache.get(db_session) == {"run": 2, "stale": False}
+        assert len(computed) == 2
+
+    def test_first_request_waits_for_the_startup_computation(self, init_db_tables, db_session, monkeypatch):
+        cache = analytics_service.DeckStatsCache()
+        computed = []
+        release = threading.Event()
+
+        def deck_stats(db, now):
+            release.wait(5)
+            computed.append(threading.current_thread().name)
+            return {"run": len(computed)}
+
+        monkeypatch.setattr(analytics_service, "deck_stats", deck_stats)
+        cache.warm(db_session.get_bind())
+        threading.Timer(0.05, release.set).start()
+
+        assert cache.get(db_session) == {"run": 1, "stale": False}
+        assert computed == ["deck-stats"]
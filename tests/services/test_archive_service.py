@@ -0,0 +1,107 @@
+import sqlite3
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.database import init_db
+from app.models import ArchivedFlashcard, Flashcard, FlashcardHistory
+from app.services import archive_service, flashcard_service
+
+NOW = datetime.now(UTC).replace(tzinfo=None)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    init_db(engine)
+    yield engine
+    engine.dispose()
+
+
+def _card(id: int, status: str = "sent", sent_days_ago: int | None = 400, due_in_days: int | None = None, **extra) -> dict:
+    return {
+        "id": id,
+        "question": extra.pop("question", f"Q{id}"),
+        "answer": f"A{id}",
+        "knowledge_source_type": "notion",
+        "knowledge_source_id": "page",
+        "status": status,
+        "created_at": NOW - timedelta(days=500),
+        "sent_at": NOW - timedelta(days=sent_days_ago) if sent_days_ago is not None else None,
+        "due_at": NOW + timedelta(days=due_in_days) if due_in_days is not None else None,
+        "chat_id": 1,
+        **extra,
+    }
+
+
+class TestArchiveFlashcards:
+
+    def test_moves_only_untouched_cards(self, engine):
+        with Session(engine) as db:
+            db.execute(insert(Flashcard), [
+                _card(1),                                   # sent long ago, never reviewed
+                _card(2, due_in_days=-380),                 # last review long ago
+                _card(3, due_in_days=10),                   # reviewed recently
+                _card(4, sent_days_ago=30),                 # sent recently
+                _card(5, status="pending", sent_days_ago=None),
+                _card(6),                                   # highest id stays so it is never reused
+            ])
+            db.commit()
+
+            moved = archive_service.archive_flashcards(db, months=12, batch_size=1)
+
+            assert moved == 2
+            assert sorted(db.scalars(db.query(Flashcard.id).statement)) == [3, 4, 5, 6]
+            archived = db.query(ArchivedFlashcard).order_by(ArchivedFlashcard.id).all()
+            assert [card.id for card in archived] == [1, 2]
+            assert archived[0].question == "Q1" and archived[0].archived_at is not None
+            assert archive_service.archive_flashcards(db, months=12) == 0
+
+    def test_history_view_keeps_archived_cards_in_summaries(self, engine):
+        with Session(engine) as db:
+            db.execute(insert(Flashcard), [_card(1, sent_days_ago=40), _card(2, sent_days_ago=5), _card(3, sent_days_ago=1)])
+            db.commit()
+            archive_service.archive_flashcards(db, months=1)
+
+            cards = flashcard_service.get_sent_flashcards_by_period(db, "last_three_months", chat_id=1)
+
+            assert [(card.id, card.archived) for card in cards] == [(1, True), (2, False), (3, False)]
+            assert db.query(FlashcardHistory).count() == 3
+
+
+class TestVacuum:
+
+    @pytest.mark.asyncio
+    async def test_incremental_vacuum_returns_archived_space(self, engine):
+        with Session(engine) as db:
+            db.execute(insert(Flashcard), [_card(i, question=f"Question {i} " + "x" * 500) for i in range(1, 2001)])
+            db.commit()
+            archive_service.archive_flashcards(db, months=12)
+        before = archive_service.storage_stats(engine)
+        # The archive keeps the rows but not the hot table's indexes, so their pages are free now
+        assert before.auto_vacuum == "incremental"
+        assert before.freelist_count > 100
+
+        freed = await archive_service.incremental_vacuum(engine, pages=50, pause=0)
+
+        after = archive_service.storage_stats(engine)
+        assert freed == before.freelist_count
+        assert after.freelist_count == 0
+        # Pointer-map pages of the freed pages go as well
+        assert after.page_count <= before.page_count - freed
+
+    def test_older_files_are_converted_once(self, tmp_path):
+        path = tmp_path / "old.db"
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE legacy (x)")
+        conn.close()
+        engine = create_engine(f"sqlite:///{path}")
+        init_db(engine)
+        assert archive_service.storage_stats(engine).auto_vacuum == "none"
+
+        assert archive_service.enable_incremental_vacuum(engine) is True
+        assert archive_service.enable_incremental_vacuum(engine) is False
+        assert archive_service.storage_stats(engine).auto_vacuum == "incremental"
+        engine.dispose()
@@ -0,0 +1,112 @@
+import gzip
+import sqlite3
+import threading
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.database import init_db
+from app.services import backup_service
+from app.services.backup_service import SnapshotError
+
+NOW = datetime(2025, 3, 1, 12, 0, tzinfo=UTC)
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "flashcards.db"
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    engine.dispose()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO flashcards (question, answer, knowledge_source_type, knowledge_source_id, status) VALUES (?, ?, 'notion', 'p', 'pending')",
+        [(f"Question {i} " + "x" * 500, f"Answer {i}") for i in range(2000)],
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _count(path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM flashcards").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class TestBackup:
+
+    def test_snapshot_is_consistent_while_writers_commit(self, database, tmp_path):
+        stop = threading.Event()
+        writes = []
+
+        def writer():
+            conn = sqlite3.connect(database, timeout=5)
+            while not stop.is_set():
+                conn.execute(
+                    "INSERT INTO flashcards (question, answer, knowledge_source_type, knowledge_source_id, status) VALUES ('q', 'a', 'notion', 'w', 'pending')"
+                )
+                conn.commit()
+                writes.append(1)
+            conn.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            # One page per step: without a snapshot every commit would restart the copy
+            result = backup_service.backup_database(database, tmp_path / "backups", keep=3, pages=1, pause=0.001, now=NOW)
+        finally:
+            stop.set()
+            thread.join()
+
+        assert writes
+        assert result.pages > 100
+        restored = tmp_path / "restored.db"
+        assert backup_service.verify_snapshot(result.path, restored) == []
+        assert 2000 <= _count(restored) <= 2000 + len(writes)
+        assert [path.name for path in (tmp_path / "backups").iterdir()] == ["flashcards-20250301T120000Z.db.gz"]
+
+    def test_keeps_the_newest_snapshots(self, database, tmp_path):
+        backups = tmp_path / "backups"
+        for hours in range(4):
+            result = backup_service.backup_database(database, backups, keep=2, now=NOW + timedelta(hours=hours))
+
+        snapshots = backup_service.list_snapshots(backups)
+        assert [snapshot.created_at for snapshot in snapshots] == [NOW + timedelta(hours=3), NOW + timedelta(hours=2)]
+        assert result.removed == 1
+        assert result.compressed_bytes < result.database_bytes
+
+
+class TestRestore:
+
+    def test_restores_contents_and_saves_the_current_database_first(self, database, tmp_path):
+        backups = tmp_path / "backups"
+        snapshot = backup_service.backup_database(database, backups, keep=1, now=NOW).path
+        conn = sqlite3.connect(database)
+        conn.execute("DELETE FROM flashcards WHERE id > 10")
+        conn.commit()
+
+        result = backup_service.restore_snapshot(snapshot, database, backups)
+
+        # Seen by a connection that was open before the restore
+        assert conn.execute("SELECT count(*) FROM flashcards").fetchone()[0] == 2000
+        conn.close()
+        assert backup_service.check_integrity(database) == []
+        assert len(backup_service.list_snapshots(backups)) == 2
+        previous = tmp_path / "previous.db"
+        assert backup_service.verify_snapshot(result["previous"], previous) == []
+        assert _count(previous) == 10
+
+    def test_damaged_snapshot_is_rejected(self, database, tmp_path):
+        snapshot = tmp_path / "flashcards-20250301T120000Z.db.gz"
+        with gzip.open(snapshot, "wb") as f:
+            f.write(b"SQLite format 3\x00" + b"\x00" * 4000)
+
+        with pytest.raises(SnapshotError):
+            backup_service.restore_snapshot(snapshot, database, tmp_path / "backups")
+
+        assert _count(database) == 2000
+        assert not (tmp_path / "backups").exists()
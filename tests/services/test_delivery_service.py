@@ -0,0 +1,198 @@
+import multiprocessing
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import init_db
+from app.models import Chat, Flashcard
+from app.services import chat_service, config_service, delivery_service
+from app.services.delivery_service import FairScheduler
+from tests.conftest import db_session, init_db_tables
+
+
+def _drain(scheduler: FairScheduler, now: float = 0.0) -> list[tuple[float, int, str]]:
+    sent = []
+    while (entry := scheduler.next(now)) is not None:
+        sent.append(entry)
+    return sent
+
+
+class TestFairScheduler:
+
+    def test_round_robin_across_chats(self):
+        scheduler = FairScheduler(global_rate=30, per_chat_interval=0)
+        for i in range(5):
+            scheduler.enqueue("busy", f"busy-{i}")
+        scheduler.enqueue("quiet-1", "q1")
+        scheduler.enqueue("quiet-2", "q2")
+
+        order = [message for _, _, message in _drain(scheduler)]
+
+        assert order == ["busy-0", "q1", "q2", "busy-1", "busy-2", "busy-3", "busy-4"]
+
+    def test_respects_global_and_per_chat_limits(self):
+        scheduler = FairScheduler(global_rate=30, per_chat_interval=1.0)
+        for chat in range(100):
+            for i in range(3):
+                scheduler.enqueue(chat, i)
+
+        sent = _drain(scheduler)
+
+        times = [send_at for send_at, _, _ in sent]
+        assert times == sorted(times)
+        assert min(b - a for a, b in zip(times, times[1:])) >= 1 / 30 - 1e-9
+        by_chat: dict[int, list[float]] = {}
+        for send_at, chat, _ in sent:
+            by_chat.setdefault(chat, []).append(send_at)
+        assert all(b - a >= 1.0 - 1e-9 for chat_times in by_chat.values() for a, b in zip(chat_times, chat_times[1:]))
+
+    def test_pause_and_requeue_after_retry_after(self):
+        scheduler = FairScheduler(global_rate=10, per_chat_interval=0)
+        scheduler.enqueue("a", "a0")
+        scheduler.enqueue("b", "b0")
+        _, chat, message = scheduler.next(0.0)
+
+        scheduler.pause_until(5.0)
+        scheduler.requeue(chat, message)
+
+        assert [(t, m) for t, _, m in _drain(scheduler)] == [(5.0, "a0"), (5.1, "b0")]
+
+
+class TestPendingByChat:
+
+    def test_limits_per_chat_and_skips_inactive_chats(self, init_db_tables, db_session):
+        for chat_id in (101, 102, 103):
+            chat_service.register_chat(db_session, chat_id)
+        chat_service.deactivate_chat(db_session, 103)
+        db_session.add_all(
+            Flashcard(question=f"{chat_id}-{i}", answer="a", knowledge_source_type="t", knowledge_source_id="s", chat_id=chat_id)
+            for chat_id in (101, 102, 103)
+            for i in range(3)
+        )
+        db_session.add(Flashcard(question="unowned", answer="a", knowledge_source_type="t", knowledge_source_id="s"))
+        db_session.commit()
+
+        cards = delivery_service.load_pending_by_chat(db_session, per_chat=2)
+
+        assert {chat: [card.question for card in rows] for chat, rows in cards.items()} == {
+            101: ["101-0", "101-1"],
+            102: ["102-0", "102-1"],
+        }
+
+        delivery_service.mark_sent(db_session, [card.id for card in cards[101]])
+        assert [card.question for card in delivery_service.load_pending_by_chat(db_session, per_chat=2)[101]] == ["101-2"]
+
+
+def _claim_until_empty(path: str, owner: str) -> list[int]:
+    """A delivery worker process: claims and confirms small batches until nothing is left."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+    db = sessionmaker(bind=engine)()
+    delivered = []
+    try:
+        while cards := delivery_service.claim_pending_by_chat(db, 3, owner):
+            ids = [card.id for rows in cards.values() for card in rows]
+            delivery_service.mark_sent(db, ids, owner=owner)
+            delivered += ids
+    finally:
+        db.close()
+        engine.dispose()
+    return delivered
+
+
+class TestClaims:
+
+    @pytest.fixture
+    def cards(self, init_db_tables, db_session):
+        chat_service.register_chat(db_session, 201)
+        cards = [Flashcard(question=f"201-{i}", answer="a", knowledge_source_type="t", knowledge_source_id="s", chat_id=201) for i in range(4)]
+        db_session.add_all(cards)
+        db_session.commit()
+        return [card.id for card in cards]
+
+    def test_claims_are_exclusive_until_released(self, cards, db_session):
+        first = delivery_service.claim_pending_by_chat(db_session, 3, "worker-a")
+        second = delivery_service.claim_pending_by_chat(db_session, 3, "worker-b")
+
+        assert [card.id for card in first[201]] == cards[:3]
+        assert [card.id for card in second[201]] == cards[3:]
+        assert delivery_service.claim_pending_by_chat(db_session, 3, "worker-c") == {}
+
+        assert delivery_service.release_claims(db_session, "worker-a", cards[:2]) == 2
+        # Another worker's claims are left alone
+        assert delivery_service.release_claims(db_session, "worker-a", cards[3:]) == 0
+        assert [card.id for card in delivery_service.claim_pending_by_chat(db_session, 3, "worker-c")[201]] == cards[:2]
+
+    def test_expired_leases_are_reclaimed_and_only_the_holder_confirms(self, cards, db_session):
+        past = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=1)
+        delivery_service.claim_pending_by_chat(db_session, 4, "crashed", lease_seconds=60, now=past)
+
+        reclaimed = delivery_service.claim_pending_by_chat(db_session, 4, "worker-b")
+
+        assert [card.id for card in reclaimed[201]] == cards
+        assert delivery_service.mark_sent(db_session, cards, owner="crashed") == []
+        assert sorted(delivery_service.mark_sent(db_session, cards, owner="worker-b")) == cards
+        assert {card.status for card in db_session.query(Flashcard).filter(Flashcard.id.in_(cards))} == {"sent"}
+        assert db_session.query(Flashcard).filter(Flashcard.id.in_(cards), Flashcard.claimed_by.is_not(None)).count() == 0
+
+    def test_renewed_leases_outlive_their_first_term(self, cards, db_session):
+        now = datetime.now(UTC).replace(tzinfo=None)
+        delivery_service.claim_pending_by_chat(db_session, 2, "worker-a", lease_seconds=60, now=now - timedelta(seconds=50))
+        delivery_service.claim_pending_by_chat(db_session, 2, "worker-b", lease_seconds=60, now=now - timedelta(seconds=50))
+
+        assert sorted(delivery_service.renew_claims(db_session, "worker-a", cards)) == cards[:2]
+        later = now + timedelta(seconds=30)
+        # worker-b's leases ran out unrenewed, so worker-c may take its cards
+        assert [card.id for card in delivery_service.claim_pending_by_chat(db_session, 4, "worker-c", now=later)[201]] == cards[2:]
+
+    def test_holder_cannot_confirm_after_its_lease_ran_out(self, cards, db_session):
+        past = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=1)
+        delivery_service.claim_pending_by_chat(db_session, 4, "slow", lease_seconds=60, now=past)
+
+        assert delivery_service.mark_sent(db_session, cards, owner="slow") == []
+        assert {card.status for card in db_session.query(Flashcard).filter(Flashcard.id.in_(cards))} == {"claimed"}
+
+    def test_concurrent_workers_never_deliver_a_card_twice(self, tmp_path):
+        path = tmp_path / "claims.db"
+        engine = create_engine(f"sqlite:///{path}")
+        init_db(engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Chat), [{"chat_id": chat_id} for chat_id in range(20)])
+            conn.execute(
+                insert(Flashcard),
+                [
+                    {"question": f"{chat_id}-{i}", "answer": "a", "knowledge_source_type": "t", "knowledge_source_id": "s", "chat_id": chat_id}
+                    for chat_id in range(20)
+                    for i in range(50)
+                ],
+            )
+        engine.dispose()
+
+        with multiprocessing.get_context("spawn").Pool(4) as pool:
+            delivered = pool.starmap(_claim_until_empty, [(str(path), f"worker-{n}") for n in range(4)])
+
+        ids = [card_id for worker in delivered for card_id in worker]
+        assert len(ids) == len(set(ids)) == 1000
+
+
+class TestAuthorizedChats:
+
+    def test_registered_and_configured_chats_are_authorized(self, init_db_tables, db_session):
+        config_service.set_config_value(db_session, "telegram_chat_id", "7")
+        chat_service.register_chat(db_session, 8)
+        chat_service.register_chat(db_session, 9)
+        chat_service.deactivate_chat(db_session, 9)
+
+        assert chat_service.load_authorized_chat_ids(db_session) >= {7, 8}
+        assert 9 not in chat_service.load_authorized_chat_ids(db_session)
+
+    def test_claims_unowned_cards_for_configured_chat(self, init_db_tables, db_session):
+        card = Flashcard(question="legacy", answer="a", knowledge_source_type="t", knowledge_source_id="s")
+        db_session.add(card)
+        db_session.commit()
+
+        chat_service.register_chat(db_session, 7, claim_unowned=True)
+
+        db_session.refresh(card)
+        assert card.chat_id == 7
@@ -0,0 +1,61 @@
+import io
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import digest_service
+
+
+def _cards(count: int):
+    for i in range(count):
+        yield SimpleNamespace(
+            question=f"What is <{i}>?", answer=f"Answer {i} & more " * 20, knowledge_source_type="notion", knowledge_source_id=f"page-{i}"
+        )
+
+
+class TestDigest:
+
+    def test_html_has_one_collapsed_card_per_flashcard(self):
+        out = io.StringIO()
+
+        count = digest_service.write_digest(out, "Today", _cards(3))
+
+        page = out.getvalue()
+        assert count == 3
+        assert page.count("<details>") == 3
+        assert "<summary>What is &lt;1&gt;?</summary>" in page
+        assert "notion (page-2)" in page and page.endswith("</html>\n")
+
+    def test_markdown_digest(self):
+        out = io.StringIO()
+
+        digest_service.write_digest(out, "Today", _cards(2), "markdown")
+
+        assert out.getvalue().startswith("# Today\n")
+        assert out.getvalue().count("<summary>") == 2
+        with pytest.raises(ValueError):
+            digest_service.render_digest("Today", _cards(1), "pdf")
+
+    def test_render_streams_with_bounded_memory(self, tmp_path):
+        tracemalloc.start()
+        try:
+            [path], count = digest_service.render_digest("Everything", _cards(50_000), directory=tmp_path)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        assert count == 50_000
+        # The file holds ~20 MB of cards; rendering keeps only a card and the file buffer
+        assert path.stat().st_size > 20 * 1024 * 1024
+        assert peak < 1024 * 1024
+        assert path.suffix == ".html"
+
+    def test_splits_digests_over_the_upload_limit(self, tmp_path):
+        paths, count = digest_service.render_digest("Big", _cards(100), directory=tmp_path, max_bytes=20_000)
+
+        assert count == 100 and len(paths) > 1
+        pages = [path.read_text() for path in paths]
+        assert all(len(page.encode()) <= 20_000 and page.endswith("</html>\n") for page in pages)
+        assert sum(page.count("<details>") for page in pages) == 100
+        assert "<h1>Big (part 2)</h1>" in pages[1]
@@ -0,0 +1,128 @@
+import time
+
+import pytest
+
+from app.knowledge_sources.notion import notion_service
+from app.services import config_service, knowledge_service
+from tests.conftest import db_session, init_db_tables
+from tests.fakes.notion_api import FakeNotionAPI
+
+
+def _configure(db, databases: str) -> None:
+    config_service.set_config_value(db, "notion_api_key", "key")
+    config_service.set_config_value(db, "notion_databases", databases)
+    db.flush()
+
+
+class TestNotionDatabases:
+
+    def test_falls_back_to_single_database_id(self, init_db_tables, db_session):
+        config_service.set_config_value(db_session, "notion_database_id", "db-1")
+        db_session.flush()
+
+        assert [database.id for database in knowledge_service.get_notion_databases(db_session)] == ["db-1"]
+
+        config_service.set_config_value(db_session, "notion_databases", "db-2, db-3")
+        db_session.flush()
+        assert [database.id for database in knowledge_service.get_notion_databases(db_session)] == ["db-2", "db-3"]
+
+    def test_malformed_setting_is_value_error(self, init_db_tables, db_session):
+        config_service.set_config_value(db_session, "notion_databases", '[{"name": "no id"}]')
+        db_session.flush()
+
+        with pytest.raises(ValueError):
+            knowledge_service.get_notion_databases(db_session)
+
+    @pytest.mark.asyncio
+    async def test_fetch_reports_status_per_database(self, init_db_tables, db_session):
+        fake = FakeNotionAPI(page_size=2)
+        fake.populate("papers", pages=5, depth=1, width=2)
+        fake.populate("books", pages=1, depth=1, width=2)
+        _configure(db_session, '[{"id": "papers", "name": "Papers"}, {"id": "books"}, {"id": "missing", "name": "Gone"}]')
+
+        async with fake.client() as client:
+            result = await knowledge_service.fetch_from_notion(db_session, client)
+
+        statuses = {database["name"]: database for database in result["databases"]}
+        assert result["status"] == "partial"
+        # Papers needed three queries, following its own cursor
+        assert (statuses["Papers"]["total_count"], statuses["Papers"]["fetched_count"]) == (5, knowledge_service.PREVIEW_PAGES)
+        assert statuses["books"]["status"] == "success" and statuses["books"]["total_count"] == 1
+        assert statuses["Gone"]["status"] == "error"
+
+    @pytest.mark.asyncio
+    async def test_edits_to_processed_pages_move_the_last_edit(self, init_db_tables, db_session):
+        fake = FakeNotionAPI()
+        pages = fake.populate("papers", pages=3, depth=1, width=2)
+        for page in pages:
+            page["properties"]["isProcessed"] = {"type": "checkbox", "checkbox": True}
+        _configure(db_session, "papers")
+
+        async with fake.client() as client:
+            before = (await knowledge_service.fetch_from_notion(db_session, client))["databases"][0]
+            fake.edit_block(pages[1]["id"], fake.blocks[pages[1]["id"]][0]["id"], "Edited")
+            after = (await knowledge_service.fetch_from_notion(db_session, client))["databases"][0]
+
+        assert before["total_count"] == after["total_count"] == 0
+        assert before["last_edited_time"] != after["last_edited_time"]
+        assert after["last_edited_time"] == pages[1]["last_edited_time"].replace("Z", "+00:00")
+
+    @pytest.mark.asyncio
+    async def test_documents_use_each_databases_filter_and_title_property(self, init_db_tables, db_session):
+        fake = FakeNotionAPI()
+        papers = fake.populate("papers", pages=3, depth=1, width=1)
+        for page, (status, question) in zip(papers, [("Read", "Q1"), ("Read", "Q2"), ("Queued", "Q3")], strict=True):
+            page["properties"]["Status"] = {"type": "select", "select": {"name": status}}
+            page["properties"]["Question"] = {"type": "rich_text", "rich_text": [{"plain_text": question}]}
+        notes = fake.populate("notes", pages=2, depth=1, width=1)
+        for page in notes:
+            page["properties"]["Topic"] = page["properties"].pop("Name")
+        _configure(db_session, """[
+            {"id": "papers", "filter": {"property": "Status", "select": {"equals": "Read"}}, "title_property": "Question"},
+            {"id": "notes"}
+        ]""")
+
+        async with fake.client() as client:
+            documents = await knowledge_service.load_notion_documents(db_session, client=client)
+
+        titles = {document.source_id: document.title for document in documents}
+        assert [titles.get(page["id"]) for page in papers] == ["Q1", "Q2", None]
+        # A title property under another name is found by its type
+        assert [titles[page["id"]] for page in notes] == [page["properties"]["Topic"]["title"][0]["plain_text"] for page in notes]
+
+    @pytest.mark.asyncio
+    async def test_databases_share_one_request_budget(self, init_db_tables, db_session, monkeypatch):
+        # The fake workspace allows 100 req/s; twelve databases syncing at once would exceed it alone
+        fake = FakeNotionAPI(page_size=5, requests_per_second=100, burst=5, retry_after=0.05)
+        ids = [f"db-{i}" for i in range(12)]
+        for database_id in ids:
+            fake.populate(database_id, pages=3, depth=1, width=1)
+        _configure(db_session, ",".join(ids))
+        monkeypatch.setattr(notion_service, "workspace_budget", notion_service.RequestBudget(90, burst=5))
+
+        started = time.perf_counter()
+        async with fake.client() as client:
+            result = await knowledge_service.fetch_from_notion(db_session, client)
+        elapsed = time.perf_counter() - started
+
+        assert result["status"] == "success"
+        assert sum(fake.rate_limited.values()) == 0
+        # 12 queries + 36 pages of content, paced at 90/s after a burst of 5
+        assert elapsed >= (fake.request_count - 5) / 90 * 0.9
+
+
+class TestRequestBudget:
+
+    @pytest.mark.asyncio
+    async def test_paces_after_burst_and_pauses_everyone(self):
+        budget = notion_service.RequestBudget(100, burst=5)
+
+        started = time.perf_counter()
+        for _ in range(15):
+            await budget.acquire()
+        assert time.perf_counter() - started >= 0.09
+
+        budget.pause(0.1)
+        started = time.perf_counter()
+        await budget.acquire()
+        assert time.perf_counter() - started >= 0.1
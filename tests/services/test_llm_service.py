@@ -0,0 +1,402 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.models import Flashcard
+from app.services import config_service, generation_service, llm_service
+from app.services.llm_service import (
+    SEGMENT_OVERHEAD_TOKENS,
+    CardStreamParser,
+    CompletionStream,
+    ModelRoute,
+    ModelRouter,
+    PromptBatch,
+    SourceDocument,
+    estimate_tokens,
+    pack_documents,
+    parse_cards,
+    parse_model_routes,
+    resolve_cards,
+    split_document,
+)
+from tests.conftest import db_session, init_db_tables
+from tests.fakes.notion_api import FakeNotionAPI
+from tests.fakes.openrouter import FakeOpenRouter
+
+
+def _document(source_id: str, blocks: int, words_per_block: int = 20) -> SourceDocument:
+    return SourceDocument(
+        "notion",
+        source_id,
+        f"Page {source_id}",
+        [" ".join(f"word{b}x{w}" for w in range(words_per_block)) for b in range(blocks)],
+    )
+
+
+class TestEstimateTokens:
+
+    def test_counts_words_punctuation_and_long_words(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("hello world") == 2
+        assert estimate_tokens("hello, world!") == 4
+        assert estimate_tokens("internationalization") == 4
+
+    def test_non_ascii_counts_per_character(self):
+        assert estimate_tokens("間隔反復") == 4
+
+
+class TestPacking:
+
+    def test_small_documents_share_requests(self):
+        documents = [_document(f"p{i}", blocks=2) for i in range(30)]
+
+        batches = pack_documents(documents, budget=1000)
+
+        assert len(batches) < len(documents)
+        assert all(batch.tokens <= 1000 for batch in batches)
+        packed = sorted(segment.document.source_id for batch in batches for segment in batch.segments)
+        assert packed == sorted(document.source_id for document in documents)
+
+    def test_oversized_document_is_split_at_block_boundaries(self):
+        document = _document("long", blocks=40)
+
+        segments = split_document(document, budget=300)
+
+        assert len(segments) > 1
+        assert all(segment.tokens <= 300 for segment in segments)
+        assert [segment.part for segment in segments] == list(range(1, len(segments) + 1))
+        assert all(segment.parts == len(segments) for segment in segments)
+        # Every block lands whole in exactly one segment, in order
+        assert "\n".join(segment.text for segment in segments).split("\n") == document.blocks
+
+    def test_single_block_over_budget_is_split_by_sentence(self):
+        block = " ".join(f"Sentence number {i} is here." for i in range(200))
+        document = SourceDocument("notion", "huge", "Huge", [block])
+
+        segments = split_document(document, budget=200)
+
+        assert len(segments) > 1
+        assert all(segment.tokens <= 200 for segment in segments)
+        assert segments[0].text.startswith("Sentence number 0 is here.")
+
+    def test_empty_blocks_are_ignored(self):
+        document = SourceDocument("notion", "p", "P", ["", "  ", "text"])
+
+        segments = split_document(document, budget=100)
+
+        assert [segment.text for segment in segments] == ["text"]
+        assert segments[0].tokens == 1 + SEGMENT_OVERHEAD_TOKENS
+
+
+class TestParseAndResolve:
+
+    def test_parse_cards_accepts_jsonl_fences_and_arrays(self):
+        jsonl = '{"source": "S1", "question": "q1", "answer": "a1"}\nnot json\n{"source": "S2", "question": "q2", "answer": "a2"}'
+        fenced = f"```jsonl\n{jsonl}\n```"
+        array = '[{"source": "S1", "question": "q1", "answer": "a1"}]'
+
+        assert [card["question"] for card in parse_cards(jsonl)] == ["q1", "q2"]
+        assert [card["question"] for card in parse_cards(fenced)] == ["q1", "q2"]
+        assert parse_cards(array) == [{"source": "S1", "question": "q1", "answer": "a1"}]
+
+    def test_stream_parser_emits_each_card_when_it_closes(self):
+        cards = [{"source": "S1", "question": "What is {x}?", "answer": 'A "quoted" } brace'}, {"source": "S2", "question": "q", "answer": "a\\"}]
+        text = "[" + ",\n".join(json.dumps(card) for card in cards) + "]"
+        parser = CardStreamParser()
+
+        emitted_at = []
+        for i, char in enumerate(text):
+            for card in parser.feed(char):
+                emitted_at.append((i, card))
+
+        assert [card for _, card in emitted_at] == cards
+        first_end = text.index("}", text.index("brace")) + 1
+        assert emitted_at[0][0] == first_end - 1
+
+    def test_cards_map_back_to_their_source(self):
+        batch = pack_documents([_document("a", 1), _document("b", 1)], budget=1000)[0]
+        labels = {segment.document.source_id: label for label, segment in batch.labels().items()}
+        raw = [
+            {"source": labels["a"], "question": "qa", "answer": "aa"},
+            {"source": labels["b"], "question": "qb", "answer": "ab"},
+            {"source": "S99", "question": "lost", "answer": "x"},
+            {"source": labels["a"], "question": "", "answer": "empty question"},
+        ]
+
+        cards = resolve_cards(batch, raw)
+
+        assert [(card.source_id, card.question) for card in cards] == [("a", "qa"), ("b", "qb")]
+
+    def test_cards_record_the_blocks_they_cite(self):
+        document = SourceDocument("notion", "page", "Page", ["first", "", "third"], block_ids=["x", "y", "z"])
+        batch = PromptBatch(split_document(document, 1000))
+        assert "[b1] first\n[b3] third" in batch.prompt()
+
+        cards = resolve_cards(batch, [
+            {"question": "q1", "answer": "a", "blocks": ["b3"]},
+            {"question": "q2", "answer": "a", "blocks": ["b2", "b9"]},
+        ])
+
+        # Citing nothing in the segment records no provenance
+        assert [card.block_ids for card in cards] == [["z"], []]
+
+    def test_single_segment_batch_tolerates_missing_label(self):
+        document = _document("only", 1)
+        batch = PromptBatch(split_document(document, 1000))
+
+        cards = resolve_cards(batch, [{"question": "q", "answer": "a"}])
+
+        assert [card.source_id for card in cards] == ["only"]
+
+
+class TestGenerateFlashcards:
+
+    @pytest.mark.asyncio
+    async def test_packed_generation_saves_requests(self):
+        fake = FakeOpenRouter(cards_per_source=2)
+        documents = [_document(f"p{i}", blocks=3) for i in range(20)] + [_document("long", blocks=60)]
+
+        async with fake.client() as client:
+            cards, report = await llm_service.generate_flashcards(documents, "key", budget=800, client=client)
+
+        assert report.requests == fake.request_count
+        assert report.requests < report.naive_requests
+        assert report.requests_saved == report.naive_requests - report.requests
+        assert report.naive_requests == report.segments > len(documents)
+        assert report.tokens_per_card < report.naive_tokens_per_card
+        assert all(len(set(labels)) == len(labels) for labels in fake.prompts)
+        # Two cards per segment, each attributed to the page it came from
+        assert report.cards == len(cards) == 2 * report.segments
+        assert {card.source_id for card in cards} == {document.source_id for document in documents}
+
+    @pytest.mark.asyncio
+    async def test_unpacked_generation_sends_one_request_per_segment(self):
+        fake = FakeOpenRouter()
+        documents = [_document(f"p{i}", blocks=2) for i in range(5)]
+
+        async with fake.client() as client:
+            _, report = await llm_service.generate_flashcards(documents, "key", client=client, pack=False)
+
+        assert report.requests == report.naive_requests == fake.request_count == 5
+
+    @pytest.mark.asyncio
+    async def test_failed_request_drops_all_cards_of_its_sources(self):
+        fake = FakeOpenRouter(fail_sources=("Page long",))
+        # Large enough that "ok" never shares a request with a part of "long"
+        documents = [_document("ok", blocks=5), _document("long", blocks=60)]
+
+        async with fake.client() as client:
+            cards, report = await llm_service.generate_flashcards(documents, "key", budget=300, client=client)
+
+        assert report.failed_sources == {"long"}
+        assert report.failed_requests >= 1
+        assert {card.source_id for card in cards} == {"ok"}
+
+
+    @pytest.mark.asyncio
+    async def test_first_card_is_handed_over_before_the_reply_finishes(self):
+        fake = FakeOpenRouter(cards_per_source=3, chunk_size=8, chunk_delay=0.005)
+        documents = [_document(f"p{i}", blocks=2) for i in range(4)]
+        received = []
+
+        async with fake.client() as client:
+            cards, report = await llm_service.generate_flashcards(
+                documents, "key", client=client, on_card=lambda card: received.append((time.perf_counter(), card))
+            )
+
+        assert [card for _, card in received] == cards
+        assert len(cards) == 12
+        assert received[0][0] < fake.last_chunk_at
+        assert 0 < report.first_card_seconds < report.seconds
+        assert report.completion_tokens > 0
+
+    @pytest.mark.asyncio
+    async def test_stream_dropped_half_way_fails_its_sources(self):
+        fake = FakeOpenRouter(cards_per_source=4, fail_sources=("Page bad",), fail_mid_stream=True)
+        documents = [_document("ok", blocks=2), _document("bad", blocks=2)]
+        received = []
+
+        async with fake.client() as client:
+            cards, report = await llm_service.generate_flashcards(
+                documents, "key", client=client, pack=False, on_card=received.append
+            )
+
+        assert report.failed_sources == {"bad"}
+        assert {card.source_id for card in cards} == {"ok"}
+        # Cards streamed before the connection dropped were already handed over
+        assert any(card.source_id == "bad" for card in received)
+
+
+async def _route(router: ModelRouter, client) -> tuple[str, list[dict]]:
+    """One routed request; returns the winning model and the cards it streamed."""
+    messages = [{"role": "user", "content": PromptBatch(split_document(_document("p", 1), 1000)).prompt()}]
+    stream = await router.open(lambda model: CompletionStream(client, "key", model, messages))
+    return stream.model, parse_cards("".join([delta async for delta in stream]))
+
+
+class TestModelRouter:
+
+    def test_parse_model_routes(self):
+        routes = parse_model_routes("fast/a=2, slow/b\nfree/c:free=x,")
+
+        assert routes == [ModelRoute("fast/a", 2), ModelRoute("slow/b", 4), ModelRoute("free/c:free", 4)]
+        assert parse_model_routes("", "default/m") == [ModelRoute("default/m", 4)]
+
+    def test_latency_budget_caps_the_hedge_delay(self, monkeypatch):
+        monkeypatch.setattr(llm_service, "_routers", {})
+        router = llm_service.get_router("a, b", latency_budget="2.5")
+        router.stats["a"].latencies.extend([5.0] * 20)
+
+        assert router.hedge_delay("a") == 2.5
+        assert llm_service.get_router("a, b", latency_budget="not a number") is router
+        assert router.hedge_delay("b") == llm_service.DEFAULT_HEDGE_AFTER
+
+    def test_router_is_shared_across_event_loops(self):
+        fake = FakeOpenRouter(model_latency={"a": 0.01})
+        router = ModelRouter([ModelRoute("a", max_concurrent=1)])
+        documents = [_document(f"p{i}", blocks=1) for i in range(3)]
+
+        async def run():
+            async with fake.client() as client:
+                _, report = await llm_service.generate_flashcards(
+                    documents, "key", client=client, pack=False, concurrency=3, router=router
+                )
+            return report
+
+        # Each run contends for the cap on a loop of its own, as successive CLI runs do
+        assert [asyncio.run(run()).failed_requests for _ in range(2)] == [0, 0]
+        assert fake.max_in_flight["a"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stalled_model_is_hedged_and_the_loser_cancelled(self):
+        fake = FakeOpenRouter(model_latency={"a": 5.0, "b": 0.01})
+        router = ModelRouter([ModelRoute("a"), ModelRoute("b")], hedge_after=0.05)
+
+        started = time.perf_counter()
+        async with fake.client() as client:
+            model, cards = await _route(router, client)
+
+        assert time.perf_counter() - started < 1.0
+        assert model == "b"
+        assert len(cards) == 2
+        assert fake.cancelled["a"] == 1
+        assert fake.in_flight == {"a": 0, "b": 0}
+        assert router.stats["a"].hedges == 1
+
+    @pytest.mark.asyncio
+    async def test_hedges_after_the_models_own_p95(self):
+        latencies = iter([0.005] * 20 + [5.0])
+        fake = FakeOpenRouter(model_latency={"a": lambda: next(latencies), "b": 0.01})
+        # The static delay is never reached once "a" has enough samples for a p95
+        router = ModelRouter([ModelRoute("a"), ModelRoute("b")], hedge_after=30.0)
+
+        async with fake.client() as client:
+            for _ in range(20):
+                await _route(router, client)
+            assert router.hedge_delay("a") < 0.1
+            router.stats["b"].latencies.extend([1.0] * 20)  # keep "a" ranked first
+            started = time.perf_counter()
+            model, _ = await _route(router, client)
+
+        assert model == "b"
+        assert time.perf_counter() - started < 1.0
+        assert fake.cancelled["a"] == 1
+
+    @pytest.mark.asyncio
+    async def test_errors_fall_back_and_demote_the_model(self):
+        fake = FakeOpenRouter(failing_models=("a",))
+        router = ModelRouter([ModelRoute("a"), ModelRoute("b")])
+
+        async with fake.client() as client:
+            first, cards = await _route(router, client)
+            second, _ = await _route(router, client)
+
+        assert (first, second) == ("b", "b")
+        assert len(cards) == 2
+        # One failure is enough to rank "a" behind the healthy model
+        assert fake.models == {"a": 1, "b": 2}
+        assert router.stats["a"].error_rate == 1.0
+
+    @pytest.mark.asyncio
+    async def test_all_models_failing_raises_the_last_error(self):
+        fake = FakeOpenRouter(failing_models=("a", "b"))
+        router = ModelRouter([ModelRoute("a"), ModelRoute("b")])
+
+        async with fake.client() as client:
+            with pytest.raises(httpx.HTTPStatusError):
+                await _route(router, client)
+
+        assert fake.in_flight == {"a": 0, "b": 0}
+
+    @pytest.mark.asyncio
+    async def test_per_model_concurrency_caps(self):
+        fake = FakeOpenRouter(model_latency={"a": 0.02, "b": 0.02}, chunk_delay=0.001)
+        router = ModelRouter([ModelRoute("a", max_concurrent=1), ModelRoute("b", max_concurrent=2)])
+        documents = [_document(f"p{i}", blocks=2) for i in range(12)]
+
+        async with fake.client() as client:
+            cards, report = await llm_service.generate_flashcards(
+                documents, "key", client=client, pack=False, concurrency=8, router=router
+            )
+
+        assert report.failed_requests == 0
+        assert len(cards) == 24
+        assert fake.max_in_flight["a"] == 1
+        assert fake.max_in_flight["b"] == 2
+        assert fake.models["a"] + fake.models["b"] == 12
+
+
+class TestGenerateFromNotion:
+
+    @pytest.mark.asyncio
+    async def test_stores_cards_and_marks_pages_processed(self, init_db_tables, db_session):
+        notion = FakeNotionAPI()
+        pages = notion.populate("db-1", pages=6, depth=2, width=3)
+        config_service.set_config_value(db_session, "notion_database_id", "db-1")
+        config_service.set_config_value(db_session, "openrouter_api_key", "key")
+        config_service.set_config_value(db_session, "telegram_chat_id", "4242")
+        db_session.flush()
+        llm = FakeOpenRouter(cards_per_source=1)
+
+        async with notion.client() as notion_client, llm.client() as llm_client:
+            report = await generation_service.generate_from_notion(
+                db_session, notion_client=notion_client, llm_client=llm_client
+            )
+
+        assert report.documents == 6
+        assert report.requests < 6
+        stored = db_session.query(Flashcard).filter(Flashcard.knowledge_source_type == "notion").all()
+        assert {card.knowledge_source_id for card in stored} == {page["id"] for page in pages}
+        assert all(card.chat_id == 4242 and card.status == "pending" for card in stored)
+        assert all(page["properties"]["isProcessed"]["checkbox"] for page in pages)
+
+    @pytest.mark.asyncio
+    async def test_requires_api_key(self, init_db_tables, db_session):
+        config_service.set_config_value(db_session, "openrouter_api_key", None)
+        db_session.flush()
+
+        with pytest.raises(ValueError):
+            await generation_service.generate_from_notion(db_session)
+
+    @pytest.mark.asyncio
+    async def test_cards_of_failed_pages_are_discarded(self, init_db_tables, db_session):
+        notion = FakeNotionAPI()
+        pages = notion.populate("db-2", pages=3, depth=1, width=2)
+        config_service.set_config_value(db_session, "notion_database_id", "db-2")
+        config_service.set_config_value(db_session, "openrouter_api_key", "key")
+        db_session.flush()
+        failing_title = pages[0]["properties"]["Name"]["title"][0]["plain_text"]
+        # All three pages share one request, which drops half-way through the reply
+        llm = FakeOpenRouter(cards_per_source=2, fail_sources=(failing_title,), fail_mid_stream=True)
+
+        async with notion.client() as notion_client, llm.client() as llm_client:
+            report = await generation_service.generate_from_notion(
+                db_session, notion_client=notion_client, llm_client=llm_client
+            )
+
+        assert report.requests == report.failed_requests == 1
+        assert db_session.query(Flashcard).filter(Flashcard.knowledge_source_id.in_([p["id"] for p in pages])).count() == 0
+        assert not any(page["properties"]["isProcessed"]["checkbox"] for page in pages)
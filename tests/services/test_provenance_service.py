@@ -0,0 +1,122 @@
+import pytest
+from sqlalchemy import insert, select, update
+
+from app.models import Flashcard, FlashcardBlock
+from app.services import config_service, flashcard_service, generation_service, provenance_service, review_service
+from app.services.llm_service import SourceDocument
+from tests.conftest import db_session, init_db_tables
+from tests.fakes.notion_api import FakeNotionAPI
+from tests.fakes.openrouter import FakeOpenRouter
+
+
+def _cards(db_session, statuses: list[str]) -> list[int]:
+    rows = [
+        {"question": f"Q{i}", "answer": "A", "knowledge_source_type": "notion", "knowledge_source_id": "page", "status": status}
+        for i, status in enumerate(statuses)
+    ]
+    return list(db_session.scalars(insert(Flashcard).returning(Flashcard.id), rows))
+
+
+class TestDiffDocument:
+
+    def test_keeps_only_new_and_changed_blocks(self, init_db_tables, db_session):
+        document = SourceDocument("notion", "page", "Page", ["one", "two", "three"], block_ids=["a", "b", "c"])
+        first = provenance_service.diff_document(db_session, document)
+        assert not first.known and first.document.block_ids == ["a", "b", "c"]
+        card_a, card_b, card_c = _cards(db_session, ["pending"] * 3)
+        provenance_service.link_blocks(db_session, [
+            {"flashcard_id": card_a, "block_id": "a"},
+            {"flashcard_id": card_b, "block_id": "b"},
+            {"flashcard_id": card_c, "block_id": "c"},
+        ])
+        provenance_service.apply_diff(db_session, first)
+
+        edited = SourceDocument("notion", "page", "Page", ["one", "TWO", "four"], block_ids=["a", "b", "d"])
+        diff = provenance_service.diff_document(db_session, edited)
+
+        assert diff.known
+        assert diff.document.blocks == ["TWO", "four"] and diff.document.block_ids == ["b", "d"]
+        assert diff.changed_blocks == ["b"] and diff.deleted_blocks == ["c"]
+        assert sorted(diff.stale_card_ids) == [card_b, card_c]
+        assert diff.unchanged == 1
+
+    def test_regenerates_the_unchanged_blocks_of_stale_cards(self, init_db_tables, db_session):
+        document = SourceDocument("notion", "page", "Page", ["one", "two", "three"], block_ids=["a", "b", "c"])
+        first = provenance_service.diff_document(db_session, document)
+        spanning, other = _cards(db_session, ["pending"] * 2)
+        provenance_service.link_blocks(db_session, [
+            {"flashcard_id": spanning, "block_id": "a"},
+            {"flashcard_id": spanning, "block_id": "b"},
+            {"flashcard_id": other, "block_id": "c"},
+        ])
+        provenance_service.apply_diff(db_session, first)
+
+        edited = SourceDocument("notion", "page", "Page", ["one", "TWO", "three"], block_ids=["a", "b", "c"])
+        diff = provenance_service.diff_document(db_session, edited)
+
+        assert diff.stale_card_ids == [spanning]
+        assert diff.document.block_ids == ["a", "b"]
+
+    def test_deleting_pending_cards_spares_sent_ones(self, init_db_tables, db_session):
+        pending, sent = _cards(db_session, ["pending", "sent"])
+        provenance_service.link_blocks(db_session, [{"flashcard_id": pending, "block_id": "x"}, {"flashcard_id": sent, "block_id": "x"}])
+
+        assert flashcard_service.delete_pending_flashcards(db_session, [pending, sent]) == 1
+
+        assert db_session.get(Flashcard, pending) is None
+        assert db_session.scalars(select(FlashcardBlock.flashcard_id)).all() == [sent]
+
+    def test_retiring_deletes_pending_cards_and_keeps_reviewed_ones(self, init_db_tables, db_session):
+        pending, sent = _cards(db_session, ["pending", "sent"])
+        provenance_service.link_blocks(db_session, [{"flashcard_id": pending, "block_id": "x"}, {"flashcard_id": sent, "block_id": "x"}])
+
+        assert provenance_service.retire_flashcards(db_session, [pending, sent]) == 2
+
+        assert db_session.get(Flashcard, pending) is None
+        assert db_session.scalar(select(Flashcard.status).where(Flashcard.id == sent)) == "retired"
+        assert db_session.scalar(select(FlashcardBlock.flashcard_id)) is None
+        assert sent not in {card.id for card in review_service.get_review_queue(db_session)}
+
+
+class TestIncrementalGeneration:
+
+    @pytest.mark.asyncio
+    async def test_edited_page_regenerates_only_changed_blocks(self, init_db_tables, db_session):
+        notion = FakeNotionAPI()
+        pages = notion.populate("db-prov", pages=2, depth=1, width=5)
+        config_service.set_config_value(db_session, "notion_database_id", "db-prov")
+        config_service.set_config_value(db_session, "openrouter_api_key", "key")
+        config_service.set_config_value(db_session, "telegram_chat_id", "4242")
+        db_session.flush()
+        page_id = pages[0]["id"]
+        edited_block, deleted_block = (block["id"] for block in notion.blocks[page_id][:2])
+
+        async def sync(llm: FakeOpenRouter):
+            async with notion.client() as notion_client, llm.client() as llm_client:
+                return await generation_service.generate_from_notion(
+                    db_session, notion_client=notion_client, llm_client=llm_client
+                )
+
+        report = await sync(FakeOpenRouter(cards_per_block=1))
+        assert report.cards == 10
+        cards = dict(db_session.execute(select(FlashcardBlock.block_id, FlashcardBlock.flashcard_id)).all())
+        sent = cards[edited_block]
+        db_session.execute(update(Flashcard).where(Flashcard.id == sent).values(status="sent"))
+
+        notion.edit_block(page_id, edited_block, "An edited paragraph")
+        notion.edit_block(page_id, deleted_block, None)
+        llm = FakeOpenRouter(cards_per_block=1)
+        report = await sync(llm)
+
+        assert llm.blocks == ["An edited paragraph"]
+        assert report.cards == 1 and report.retired_cards == 2
+        # The other page was touched by being marked processed, so it is diffed too, without changes
+        assert report.unchanged_blocks == 3 + 5
+        assert db_session.scalar(select(Flashcard.status).where(Flashcard.id == sent)) == "retired"
+        assert db_session.get(Flashcard, cards[deleted_block]) is None
+        stored = db_session.scalars(select(Flashcard.answer).where(Flashcard.knowledge_source_id == page_id)).all()
+        assert "An edited paragraph" in stored and len(stored) == 5
+
+        llm = FakeOpenRouter(cards_per_block=1)
+        report = await sync(llm)
+        assert llm.request_count == 0 and report.retired_cards == 0
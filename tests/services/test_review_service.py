@@ -0,0 +1,144 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Flashcard, Review
+from app.services import review_service
+from app.services.buffered_writer import BufferedWriter
+from app.services.review_service import ReviewCard
+from tests.conftest import db_session, init_db_tables
+
+NOW = datetime(2025, 1, 1, 12, 0)
+
+
+def _card(**kwargs) -> ReviewCard:
+    return ReviewCard(**{"id": 1, "question": "Q", "answer": "A", "source": "notion", **kwargs})
+
+
+class TestSchedule:
+
+    def test_new_card_intervals_by_grade(self):
+        intervals = {grade: review_service.schedule(_card(), grade, chat_id=1, now=NOW) for grade in review_service.GRADES}
+
+        assert intervals["again"].due_at == NOW + review_service.RELEARN_DELAY
+        assert intervals["hard"].interval_days == 1.0
+        assert intervals["good"].interval_days == 1.0
+        assert intervals["easy"].interval_days == 4.0
+
+    def test_good_grows_interval_by_ease_and_again_resets(self):
+        card = _card(interval_days=10.0, ease=2.5, reps=3)
+
+        good = review_service.schedule(card, "good", chat_id=1, now=NOW)
+        assert (good.interval_days, good.reps) == (25.0, 4)
+        assert good.due_at == NOW + timedelta(days=25)
+
+        again = review_service.schedule(card, "again", chat_id=1, now=NOW)
+        assert (again.interval_days, again.reps, again.ease) == (0.0, 0, 2.3)
+
+    def test_rejects_unknown_grade(self):
+        with pytest.raises(ValueError):
+            review_service.schedule(_card(), "perfect", chat_id=1)
+
+
+class TestReviewQueue:
+
+    def test_due_cards_first_then_new_and_future_excluded(self, init_db_tables, db_session):
+        new = Flashcard(question="new", answer="a", knowledge_source_type="t", knowledge_source_id="s")
+        overdue = Flashcard(question="overdue", answer="a", knowledge_source_type="t", knowledge_source_id="s", due_at=NOW - timedelta(days=2))
+        future = Flashcard(question="future", answer="a", knowledge_source_type="t", knowledge_source_id="s", due_at=NOW + timedelta(days=2))
+        db_session.add_all([new, overdue, future])
+        db_session.commit()
+
+        queue = review_service.get_review_queue(db_session, limit=10, now=NOW)
+
+        assert [card.question for card in queue] == ["overdue", "new"]
+
+
+class TestRecordGrades:
+
+    def test_batch_writes_log_and_latest_schedule(self, init_db_tables, db_session):
+        flashcard = Flashcard(question="Q", answer="A", knowledge_source_type="t", knowledge_source_id="s")
+        db_session.add(flashcard)
+        db_session.commit()
+        card = _card()
+        card.id = flashcard.id
+
+        events = [review_service.schedule(card, grade, chat_id=7, now=NOW) for grade in ("again", "good", "good")]
+        review_service.record_grades(db_session, events)
+
+        db_session.refresh(flashcard)
+        assert db_session.query(Review).filter_by(flashcard_id=flashcard.id).count() == 3
+        assert (flashcard.reps, flashcard.interval_days) == (2, events[-1].interval_days)
+        assert flashcard.due_at == events[-1].due_at
+
+    def test_grades_for_cards_deleted_before_the_flush_are_dropped(self, init_db_tables, db_session):
+        kept = Flashcard(question="Q1", answer="A", knowledge_source_type="t", knowledge_source_id="s")
+        deleted = Flashcard(question="Q2", answer="A", knowledge_source_type="t", knowledge_source_id="s")
+        db_session.add_all([kept, deleted])
+        db_session.commit()
+        events = [
+            review_service.schedule(_card(id=flashcard.id), "good", chat_id=7, now=NOW) for flashcard in (kept, deleted)
+        ]
+        deleted_id = deleted.id
+        db_session.delete(deleted)
+        db_session.commit()
+
+        review_service.record_grades(db_session, events)
+
+        db_session.refresh(kept)
+        assert kept.reps == 1
+        assert [review.flashcard_id for review in db_session.query(Review)] == [kept.id]
+        assert db_session.get(Flashcard, deleted_id) is None
+
+
+class TestBufferedWriter:
+
+    @pytest.mark.asyncio
+    async def test_flushes_when_batch_is_full(self):
+        batches = []
+        writer = BufferedWriter(batches.append, max_items=3, max_delay=60)
+
+        for i in range(7):
+            writer.add(i)
+        await asyncio.sleep(0.05)
+        await writer.close()
+
+        assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+    @pytest.mark.asyncio
+    async def test_flushes_after_delay_and_retries_failures(self):
+        batches = []
+        failures = [RuntimeError("database is locked")]
+
+        def flush(batch):
+            if failures:
+                raise failures.pop()
+            batches.append(batch)
+
+        writer = BufferedWriter(flush, max_items=100, max_delay=0.01)
+        writer.add("a")
+        await asyncio.sleep(0.05)
+        writer.add("b")
+        await asyncio.sleep(0.05)
+
+        assert batches == [["a"], ["b"]]
+        assert writer.pending == 0
+
+    @pytest.mark.asyncio
+    async def test_drops_a_batch_that_keeps_failing(self):
+        batches = []
+
+        def flush(batch):
+            if "bad" in batch:
+                raise RuntimeError("expected to update 1 row(s); 0 were matched")
+            batches.append(batch)
+
+        writer = BufferedWriter(flush, max_items=100, max_delay=0.01, max_retries=2)
+        writer.add("bad")
+        await asyncio.sleep(0.1)
+        writer.add("good")
+        await writer.close()
+
+        assert batches == [["good"]]
+        assert (writer.dropped, writer.flushed) == (1, 1)
@@ -0,0 +1,180 @@
+import asyncio
+
+import pytest
+
+from app.services import generation_service, knowledge_service, sync_service
+from app.services.sync_service import SyncScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _results(*sources) -> dict:
+    """Fetch results for (database_id, total_count, last_edited_time) tuples; a None count is a failed sync."""
+    return {
+        "overall_status": "success",
+        "sources": [
+            {"name": f"Notion: {database_id}", "database_id": database_id, "status": "error", "seconds": 0.1, "error": "boom"}
+            if count is None
+            else {
+                "name": f"Notion: {database_id}",
+                "database_id": database_id,
+                "status": "success",
+                "seconds": 0.1,
+                "data": {"total_count": count, "last_edited_time": edited},
+            }
+            for database_id, count, edited in sources
+        ],
+    }
+
+
+@pytest.fixture
+def fake_fetch(monkeypatch):
+    calls = []
+    in_flight = []
+
+    async def fetch(db, database_ids=None):
+        calls.append(database_ids)
+        in_flight.append(len(calls))
+        assert len(in_flight) == 1, "runs overlapped"
+        await asyncio.sleep(0.05)
+        in_flight.pop()
+        return _results(("a", 1, "t1"), ("b", 0, None))
+
+    monkeypatch.setattr(knowledge_service, "fetch_from_all_sources", fetch)
+    monkeypatch.setattr(sync_service, "get_db_session", lambda: type("Session", (), {"close": lambda self: None})())
+    return calls
+
+
+@pytest.fixture
+def fake_generate(monkeypatch):
+    calls = []
+
+    async def generate(db, database_ids=None):
+        calls.append(database_ids)
+        return generation_service.GenerationReport(cards=len(database_ids))
+
+    monkeypatch.setattr(generation_service, "generate_from_notion", generate)
+    return calls
+
+
+class TestAdaptiveSchedule:
+
+    def test_backs_off_when_idle_and_speeds_up_after_edits(self):
+        clock = FakeClock()
+        scheduler = SyncScheduler(min_interval=60, max_interval=400, jitter=0, clock=clock)
+        intervals = []
+        for edited in ("t1", "t1", "t1", "t1", "t1", "t2", "t2"):
+            scheduler.observe(_results(("a", 3, edited)), 0.5, full=True)
+            intervals.append(scheduler.sources["a"].interval)
+
+        assert intervals == [60, 120, 240, 400, 400, 60, 120]
+        assert scheduler.sources["a"].next_run == clock.now + 120
+        assert scheduler.sources["a"].last_changed is False
+
+    def test_reports_sources_with_a_new_fingerprint(self):
+        scheduler = SyncScheduler(min_interval=60, max_interval=400, jitter=0, clock=FakeClock())
+
+        assert scheduler.observe(_results(("a", 3, "t1"), ("b", None, None)), 0.5, full=True) == {"a"}
+        assert scheduler.observe(_results(("a", 3, "t1"), ("b", 0, "t1")), 0.5, full=True) == {"b"}
+        assert scheduler.observe(_results(("a", 3, "t2"), ("b", 0, "t1")), 0.5, full=True) == {"a"}
+
+    def test_only_due_sources_run_and_failures_back_off(self):
+        clock = FakeClock()
+        scheduler = SyncScheduler(min_interval=60, max_interval=3600, jitter=0, clock=clock)
+        scheduler.observe(_results(("a", 1, "t1"), ("b", 1, "t1")), 0.5, full=True)
+        clock.now += 60
+        scheduler.observe(_results(("a", 2, "t2"), ("b", None, None)), 0.5, full=False)
+
+        assert (scheduler.sources["a"].interval, scheduler.sources["b"].interval) == (60, 120)
+        clock.now += 60
+        assert scheduler.due() == {"a"}
+        # Every source is synced at least once per max_interval
+        clock.now += 3600
+        assert scheduler.due() is None
+
+    def test_jitter_spreads_due_times(self):
+        clock = FakeClock()
+        scheduler = SyncScheduler(min_interval=100, max_interval=100, jitter=0.2, clock=clock)
+        scheduler.observe(_results(*((f"db-{i}", 0, None) for i in range(50))), 0.5, full=True)
+
+        delays = [schedule.next_run - clock.now for schedule in scheduler.sources.values()]
+        assert all(80 <= delay <= 120 for delay in delays)
+        assert len(set(delays)) > 1
+
+
+class TestSingleFlight:
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_run(self, fake_fetch, fake_generate):
+        scheduler = SyncScheduler(min_interval=60, max_interval=3600, jitter=0)
+
+        first, second = await asyncio.gather(scheduler.run(), scheduler.run())
+
+        assert first is second
+        assert fake_fetch == [None]
+        assert scheduler.status()["sources"][0]["last_duration"] == 0.1
+
+    @pytest.mark.asyncio
+    async def test_runs_never_generate(self, fake_fetch, fake_generate):
+        # GET /api/fetch goes through run(): it must stay read-only
+        scheduler = SyncScheduler(min_interval=60, max_interval=3600, jitter=0, generate=True)
+
+        results = await scheduler.run()
+
+        assert fake_generate == []
+        assert "generation" not in results
+
+    @pytest.mark.asyncio
+    async def test_wider_run_waits_for_the_one_in_progress(self, fake_fetch, fake_generate):
+        scheduler = SyncScheduler(min_interval=60, max_interval=3600, jitter=0)
+
+        await asyncio.gather(scheduler.run({"a"}), scheduler.run())
+
+        assert fake_fetch == [{"a"}, None]
+
+    @pytest.mark.asyncio
+    async def test_loop_syncs_and_stops_cleanly(self, fake_fetch, fake_generate):
+        scheduler = SyncScheduler(min_interval=0.01, max_interval=0.02, jitter=0)
+        task = asyncio.create_task(scheduler.loop())
+        async with asyncio.timeout(5):
+            while len(fake_fetch) < 2:
+                await asyncio.sleep(0.01)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert not scheduler.running
+        assert scheduler.last_run_at is not None
+
+    @pytest.mark.asyncio
+    async def test_loop_generates_from_changed_sources_once(self, fake_fetch, fake_generate):
+        scheduler = SyncScheduler(min_interval=0.01, max_interval=0.02, jitter=0, generate=True)
+        task = asyncio.create_task(scheduler.loop())
+        async with asyncio.timeout(5):
+            while len(fake_fetch) < 3:
+                await asyncio.sleep(0.01)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert fake_generate == [{"a", "b"}]
+        assert scheduler.status()["last_generation"] == {"status": "success", "cards": 2, "retired_cards": 0, "failed_sources": 0}
+
+    @pytest.mark.asyncio
+    async def test_loop_does_not_generate_unless_enabled(self, fake_fetch, fake_generate):
+        scheduler = SyncScheduler(min_interval=0.01, max_interval=0.02, jitter=0, generate=False)
+        task = asyncio.create_task(scheduler.loop())
+        async with asyncio.timeout(5):
+            while len(fake_fetch) < 2:
+                await asyncio.sleep(0.01)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert fake_generate == []
@@ -0,0 +1,131 @@
+import csv
+import io
+import json
+import sqlite3
+import zipfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database import init_db
+from app.models import Flashcard
+from app.services import config_service, export_service, import_service
+from tests.conftest import db_session, init_db_tables
+
+
+@pytest.fixture
+def flashcards(init_db_tables, db_session):
+    cards = [
+        Flashcard(question="What is SRS?", answer="Spaced repetition", knowledge_source_type="notion", knowledge_source_id="page-1"),
+        Flashcard(question="Line\nbreak, \"quoted\"", answer="<b>html</b>", knowledge_source_type="notion", knowledge_source_id="page-2"),
+    ]
+    db_session.add_all(cards)
+    db_session.commit()
+    return cards
+
+
+def _records(text: str, fmt: str) -> list[dict]:
+    return list(import_service.read_records(io.BytesIO(text.encode()), fmt))
+
+
+class TestExport:
+
+    def test_csv_round_trips_through_import(self, flashcards, db_session):
+        exported = "".join(export_service.iter_csv(db_session))
+        rows = list(csv.DictReader(io.StringIO(exported)))
+
+        assert [row["question"] for row in rows] == [card.question for card in flashcards]
+
+        report = import_service.import_records(db_session, _records(exported, "csv"))
+        assert report.inserted == 0
+        assert report.duplicates == len(flashcards)
+
+    def test_jsonl_has_one_record_per_card(self, flashcards, db_session):
+        lines = "".join(export_service.iter_jsonl(db_session)).splitlines()
+
+        records = [json.loads(line) for line in lines]
+        assert [record["answer"] for record in records] == [card.answer for card in flashcards]
+        assert set(records[0]) == set(export_service.EXPORT_COLUMNS)
+
+    def test_apkg_contains_anki_collection(self, flashcards, db_session, tmp_path):
+        package = tmp_path / "flashcards.apkg"
+        package.write_bytes(b"".join(export_service.iter_apkg(db_session)))
+
+        with zipfile.ZipFile(package) as archive:
+            assert set(archive.namelist()) == {"collection.anki2", "media"}
+            archive.extract("collection.anki2", tmp_path)
+        conn = sqlite3.connect(Path(tmp_path, "collection.anki2"))
+        notes = conn.execute("SELECT flds FROM notes ORDER BY id").fetchall()
+        cards = conn.execute("SELECT count(*) FROM cards").fetchone()[0]
+        conn.close()
+
+        assert cards == len(flashcards)
+        assert notes[0][0].split("\x1f")[:2] == ["What is SRS?", "Spaced repetition"]
+        assert notes[1][0].split("\x1f")[0] == "Line<br>break, &quot;quoted&quot;"
+
+
+class TestImport:
+
+    def test_skips_duplicates_and_incomplete_rows(self, init_db_tables, db_session):
+        text = "\n".join(json.dumps(record) for record in [
+            {"question": "Q1", "answer": "A1"},
+            {"question": "Q1", "answer": "A1"},
+            {"question": "Q2", "answer": ""},
+            {"question": "Q3", "answer": "A3", "created_at": "2024-05-01T10:00:00+02:00"},
+        ])
+
+        report = import_service.import_records(db_session, _records(text, "jsonl"), default_source="deck.jsonl", chunk_size=2)
+        again = import_service.import_records(db_session, _records(text, "jsonl"))
+
+        assert (report.rows_read, report.inserted, report.duplicates, report.skipped) == (4, 2, 1, 1)
+        assert again.inserted == 0
+        imported = db_session.query(Flashcard).order_by(Flashcard.id).all()
+        assert [card.question for card in imported] == ["Q1", "Q3"]
+        assert imported[0].knowledge_source_id == "deck.jsonl"
+        assert imported[1].created_at.isoformat() == "2024-05-01T08:00:00"
+
+    def test_rejects_unknown_format(self):
+        with pytest.raises(ValueError):
+            _records("", "xml")
+
+    def test_chunks_commit_on_whichever_pooled_connection_they_get(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'flashcards.db'}")
+        init_db(engine)
+        # Two idle connections in the pool, so consecutive chunks can get different ones
+        idle = [engine.connect(), engine.connect()]
+        for conn in idle:
+            conn.close()
+        text = "\n".join(json.dumps({"question": f"Q{i}", "answer": "A"}) for i in range(10))
+        try:
+            with Session(engine) as db:
+                report = import_service.import_records(db, _records(text, "jsonl"), chunk_size=3)
+                assert report.inserted == 10
+                assert db.query(Flashcard).count() == 10
+        finally:
+            engine.dispose()
+
+    def test_cards_go_to_the_configured_chat(self, init_db_tables, db_session):
+        config_service.set_config_value(db_session, "telegram_chat_id", "4242")
+        db_session.commit()
+
+        import_service.import_records(db_session, _records('{"question": "Q", "answer": "A"}', "jsonl"))
+
+        assert db_session.query(Flashcard).one().chat_id == 4242
+
+    @pytest.mark.parametrize(
+        ("content", "fmt", "line"),
+        [
+            (b'{"question": "Q1", "answer": "A1"}\n\n{"question": "Q2", \n', "jsonl", 3),
+            (b'{"question": "Q1", "answer": "A1", "created_at": "yesterday"}\n', "jsonl", 1),
+            (b"question,answer,sent_at\nQ1,A1,\nQ2,A2,2024-13-01\n", "csv", 3),
+            ('{"question": "Q1", "answer": "A1"}\n{"question": "Caf\u00e9", "answer": "A"}\n'.encode("latin-1"), "jsonl", 2),
+        ],
+    )
+    def test_unreadable_lines_are_reported_with_their_number(self, content, fmt, line):
+        with pytest.raises(import_service.ImportFormatError) as excinfo:
+            list(import_service.read_records(io.BytesIO(content), fmt))
+
+        assert excinfo.value.line == line
+        assert str(excinfo.value).startswith(f"Line {line}: ")
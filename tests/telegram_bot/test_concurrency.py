@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+from telegram.ext import Application, CommandHandler
+
+from app.telegram_bot.concurrency import ChatOrderedProcessor
+from tests.fakes.telegram_api import TOKEN, FakeBotAPI, command_update
+
+HANDLER_SECONDS = 0.05
+CHATS = (1, 2, 3, 4)
+
+
+def _application(processor) -> Application:
+    fake = FakeBotAPI()
+    return (
+        Application.builder().token(TOKEN).request(fake).get_updates_request(fake)
+        .updater(None).concurrent_updates(processor).build()
+    )
+
+
+class TestChatOrderedProcessor:
+
+    @pytest.mark.asyncio
+    async def test_chats_run_concurrently_and_each_chat_in_order(self):
+        processor = ChatOrderedProcessor(8)
+        application = _application(processor)
+        handled: list[tuple[int, int]] = []
+        running: dict[int, int] = {}
+        overlaps = []
+        in_flight = []
+
+        async def slow(update, context):
+            chat_id = update.effective_chat.id
+            running[chat_id] = running.get(chat_id, 0) + 1
+            overlaps.append(running[chat_id] > 1)
+            in_flight.append(sum(running.values()))
+            await asyncio.sleep(HANDLER_SECONDS)
+            handled.append((chat_id, int(context.args[0])))
+            running[chat_id] -= 1
+
+        application.add_handler(CommandHandler("slow", slow))
+        updates = [command_update(application.bot, chat_id, f"/slow {n}") for n in range(3) for chat_id in CHATS]
+
+        async with application:
+            await application.start()
+            started = time.perf_counter()
+            for update in updates:
+                await application.update_queue.put(update)
+            async with asyncio.timeout(5):
+                while len(handled) < len(updates):
+                    await asyncio.sleep(0.005)
+            elapsed = time.perf_counter() - started
+            await application.stop()
+
+        for chat_id in CHATS:
+            assert [n for chat, n in handled if chat == chat_id] == [0, 1, 2]
+        assert not any(overlaps)
+        assert max(in_flight) == len(CHATS)
+        # Three rounds of four chats in parallel, not twelve handlers in a row
+        assert elapsed < len(updates) * HANDLER_SECONDS / 2
+        assert processor.active_chats == 0
+
+    @pytest.mark.asyncio
+    async def test_waiting_updates_do_not_hold_shared_slots(self):
+        processor = ChatOrderedProcessor(2)
+        application = _application(processor)
+        handled = []
+
+        async def slow(update, context):
+            await asyncio.sleep(HANDLER_SECONDS)
+            handled.append(update.effective_chat.id)
+
+        application.add_handler(CommandHandler("slow", slow))
+        # A backlog in chat 1 queued ahead of a single update from chat 2
+        updates = [command_update(application.bot, 1, "/slow") for _ in range(5)] + [command_update(application.bot, 2, "/slow")]
+
+        async with application:
+            await application.start()
+            for update in updates:
+                await application.update_queue.put(update)
+            async with asyncio.timeout(5):
+                while len(handled) < len(updates):
+                    await asyncio.sleep(0.005)
+            await application.stop()
+
+        assert handled.index(2) <= 1
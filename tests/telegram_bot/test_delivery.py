@@ -0,0 +1,131 @@
+import asyncio
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import select
+from telegram.error import Forbidden, RetryAfter
+
+from app.config import app_config
+from app.models import Chat, Flashcard
+from app.services.delivery_service import FairScheduler
+from app.telegram_bot import delivery, handlers
+from app.telegram_bot.delivery import deliver
+from tests.conftest import db_session, init_db_tables
+
+
+class TestDeliver:
+
+    @pytest.mark.asyncio
+    async def test_retries_rate_limited_and_drops_blocked_chats(self):
+        scheduler = FairScheduler(global_rate=1000, per_chat_interval=0)
+        for chat in ("ok", "limited", "blocked"):
+            for i in range(2):
+                scheduler.enqueue(chat, f"{chat}-{i}")
+        rate_limited = [RetryAfter(0)]
+        delivered = []
+
+        async def send(chat, message):
+            if chat == "blocked":
+                raise Forbidden("bot was blocked by the user")
+            if chat == "limited" and rate_limited:
+                raise rate_limited.pop()
+
+        report = await deliver(scheduler, send, on_sent=lambda chat, message: delivered.append(message))
+
+        assert sorted(delivered) == ["limited-0", "limited-1", "ok-0", "ok-1"]
+        assert (report.messages, report.failed, report.retried) == (4, 1, 1)
+        assert report.blocked_chats == ["blocked"]
+
+
+CHAT_ID = 77
+
+
+@pytest.fixture
+def digest_bot(init_db_tables, db_session, monkeypatch):
+    monkeypatch.setattr(delivery, "get_db_session", lambda: db_session)
+    monkeypatch.setattr(handlers, "get_db_session", lambda: db_session)
+    monkeypatch.setattr(handlers, "check_chat_id", AsyncMock(return_value=True))
+    monkeypatch.setattr(app_config, "digest_threshold", 10)
+    documents = []
+
+    async def send_document(chat_id, document, filename, caption=None):
+        documents.append((chat_id, filename, caption, document.read().decode()))
+
+    db_session.add(Chat(chat_id=CHAT_ID))
+    db_session.commit()
+    return SimpleNamespace(send_message=AsyncMock(), send_document=send_document, documents=documents)
+
+
+def _add_cards(db_session, count: int, **values) -> list[int]:
+    cards = [
+        Flashcard(question=f"Q{i}", answer=f"A{i}", knowledge_source_type="notion", knowledge_source_id="page", chat_id=CHAT_ID, **values)
+        for i in range(count)
+    ]
+    db_session.add_all(cards)
+    db_session.commit()
+    return [card.id for card in cards]
+
+
+class TestDigestDelivery:
+
+    @pytest.mark.asyncio
+    async def test_large_batch_goes_out_as_one_document(self, digest_bot, db_session):
+        ids = _add_cards(db_session, 25)
+
+        report = await delivery.send_due_flashcards(digest_bot, cards_per_chat=50)
+
+        digest_bot.send_message.assert_not_awaited()
+        [(chat_id, filename, caption, page)] = digest_bot.documents
+        assert (chat_id, filename, caption) == (CHAT_ID, "flashcards.html", "25 new flashcards")
+        assert page.count("<details>") == 25
+        assert report.messages == 1 and report.cards == 25
+        assert set(db_session.scalars(select(Flashcard.status).where(Flashcard.id.in_(ids)))) == {"sent"}
+
+    @pytest.mark.asyncio
+    async def test_summary_digest_is_one_send_document(self, digest_bot, db_session):
+        _add_cards(db_session, 3, status="sent", sent_at=datetime.now(UTC).replace(tzinfo=None))
+        update = SimpleNamespace(effective_chat=SimpleNamespace(id=CHAT_ID), message=SimpleNamespace(reply_text=AsyncMock()))
+
+        await handlers.summary_command(update, SimpleNamespace(args=["today", "digest"], bot=digest_bot))
+
+        update.message.reply_text.assert_not_awaited()
+        [(_, filename, caption, page)] = digest_bot.documents
+        assert filename == "summary-today.html"
+        assert caption == "Flashcards sent for period 'today' (3 total)"
+        assert "<summary>Q2</summary>" in page
+
+
+class TestLeases:
+
+    @pytest.mark.asyncio
+    async def test_leases_are_renewed_through_a_long_run(self, digest_bot, db_session, monkeypatch):
+        monkeypatch.setattr(app_config, "delivery_lease_seconds", 0.3)
+        ids = _add_cards(db_session, 3)
+
+        async def slow_send(chat_id, text):
+            # Outlasts the first lease term several times over
+            await asyncio.sleep(1)
+
+        digest_bot.send_message = slow_send
+        report = await delivery.send_due_flashcards(digest_bot, cards_per_chat=5)
+
+        assert report.cards == 3
+        assert set(db_session.scalars(select(Flashcard.status).where(Flashcard.id.in_(ids)))) == {"sent"}
+
+    @pytest.mark.asyncio
+    async def test_cards_whose_claim_was_taken_over_are_not_counted(self, digest_bot, db_session):
+        ids = _add_cards(db_session, 3)
+
+        async def send_message(chat_id, text):
+            # Another worker took over the first card after its lease expired
+            db_session.get(Flashcard, ids[0]).claimed_by = "worker-2"
+            db_session.commit()
+
+        digest_bot.send_message = send_message
+        report = await delivery.send_due_flashcards(digest_bot, cards_per_chat=5)
+
+        assert report.cards == 2
+        statuses = dict(db_session.execute(select(Flashcard.id, Flashcard.status).where(Flashcard.id.in_(ids))).all())
+        assert statuses == {ids[0]: "claimed", ids[1]: "sent", ids[2]: "sent"}
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.models import Flashcard
+from app.telegram_bot import review
+from tests.conftest import db_session, init_db_tables
+
+CHAT_ID = 42
+
+
+@pytest.fixture
+def card_ids(init_db_tables, db_session, monkeypatch):
+    monkeypatch.setattr(review, "check_chat_id", AsyncMock(return_value=True))
+    monkeypatch.setattr(review, "get_db_session", lambda: db_session)
+    flashcards = [
+        Flashcard(question=f"Q{i}", answer=f"A{i}", knowledge_source_type="notion", knowledge_source_id="page", chat_id=CHAT_ID)
+        for i in range(2)
+    ]
+    db_session.add_all(flashcards)
+    db_session.commit()
+    return [card.id for card in flashcards]
+
+
+@pytest.fixture
+def context():
+    events, card_events = [], []
+    bot_data = {
+        review.WRITER_KEY: SimpleNamespace(add=events.append),
+        review.EVENT_WRITER_KEY: SimpleNamespace(add=card_events.append),
+    }
+    return SimpleNamespace(args=[], chat_data={}, bot_data=bot_data, events=events, card_events=card_events)
+
+
+def _command_update():
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=CHAT_ID), message=SimpleNamespace(reply_text=AsyncMock()))
+
+
+def _callback_update(data: str):
+    query = SimpleNamespace(data=data, answer=AsyncMock(), edit_message_text=AsyncMock())
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=CHAT_ID), callback_query=query)
+
+
+async def _click(context, data: str):
+    update = _callback_update(data)
+    await review.review_callback(update, context)
+    return update.callback_query
+
+
+class TestReviewFlow:
+
+    @pytest.mark.asyncio
+    async def test_reveal_grade_and_finish(self, card_ids, context):
+        update = _command_update()
+        await review.review_command(update, context)
+
+        text = update.message.reply_text.call_args.args[0]
+        assert text.startswith("Q: Q0")
+        first, second = card_ids
+
+        query = await _click(context, f"review:show:{first}")
+        assert "A: A0" in query.edit_message_text.call_args.args[0]
+
+        await _click(context, f"review:again:{first}")
+        await _click(context, f"review:show:{second}")
+        await _click(context, f"review:good:{second}")
+        # The card graded "again" comes back before the session ends
+        await _click(context, f"review:show:{first}")
+        query = await _click(context, f"review:easy:{first}")
+
+        assert query.edit_message_text.call_args.args[0].startswith("Review complete: 3 grade(s)")
+        assert [(e.flashcard_id, e.grade) for e in context.events] == [(first, "again"), (second, "good"), (first, "easy")]
+        assert [(e["flashcard_id"], e["kind"]) for e in context.card_events] == [(first, "shown"), (second, "shown"), (first, "shown")]
+        assert review.SESSION_KEY not in context.chat_data
+
+    @pytest.mark.asyncio
+    async def test_skip_moves_on_without_scheduling(self, card_ids, context):
+        await review.review_command(_command_update(), context)
+        first, second = card_ids
+
+        await _click(context, f"review:skip:{first}")
+        await _click(context, f"review:show:{second}")
+        query = await _click(context, f"review:good:{second}")
+
+        assert query.edit_message_text.call_args.args[0].startswith("Review complete: 1 grade(s) (good 1), 1 skipped.")
+        assert [e.flashcard_id for e in context.events] == [second]
+        assert [(e["flashcard_id"], e["kind"], e["chat_id"]) for e in context.card_events] == [(first, "skipped", CHAT_ID), (second, "shown", CHAT_ID)]
+
+    @pytest.mark.asyncio
+    async def test_stale_button_is_ignored(self, card_ids, context):
+        await review.review_command(_command_update(), context)
+
+        query = await _click(context, f"review:good:{card_ids[1]}")
+
+        query.answer.assert_awaited_once_with("This card is no longer part of an active review.")
+        query.edit_message_text.assert_not_awaited()
+        assert context.events == []
@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.cache import response_cache
+from app.database import get_db
+from app.main import STATIC_DIR, STATIC_GZIP_DIR, app
+from app.staticfiles import precompress
+from tests.conftest import db_session, init_db_tables, test_engine
+
+
+@pytest.fixture
+def client(init_db_tables, db_session):
+    app.dependency_overrides[get_db] = lambda: db_session
+    response_cache.clear()
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+    response_cache.clear()
+
+
+@pytest.fixture
+def statements():
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(test_engine, "before_cursor_execute", record)
+
+
+class TestResponseCache:
+
+    def test_repeat_dashboard_load_runs_no_queries(self, client, statements):
+        first = client.get("/dashboard")
+        queries_for_first = len(statements)
+        second = client.get("/dashboard")
+
+        assert first.status_code == second.status_code == 200
+        assert queries_for_first > 0
+        assert len(statements) == queries_for_first
+        assert second.text == first.text
+        assert second.headers["etag"] == first.headers["etag"]
+
+    def test_matching_etag_returns_304(self, client):
+        etag = client.get("/api/config").headers["etag"]
+
+        response = client.get("/api/config", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_config_write_invalidates_cached_responses(self, client):
+        before = client.get("/api/config")
+
+        client.post("/api/config", data={"notion_database_id": "db-123"}, follow_redirects=False)
+        after = client.get("/api/config", headers={"If-None-Match": before.headers["etag"]})
+
+        assert after.status_code == 200
+        assert after.headers["etag"] != before.headers["etag"]
+        assert after.json()["notion"]["notion_database_id"] == "db-123"
+
+
+class TestPrecompressedStatic:
+
+    def test_gzip_variant_is_served_when_accepted(self, client):
+        precompress(STATIC_DIR, STATIC_GZIP_DIR)
+
+        response = client.get("/static/main.css", headers={"Accept-Encoding": "gzip"})
+        plain = client.get("/static/main.css", headers={"Accept-Encoding": "identity"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"].startswith("text/css")
+        assert "content-encoding" not in plain.headers
+        assert response.content == plain.content
+        assert not list(Path(STATIC_DIR).rglob("*.gz"))
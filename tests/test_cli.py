@@ -0,0 +1,87 @@
+import json
+import subprocess
+import sys
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.cli import main
+from app.database import init_db
+from app.models import Chat, Flashcard
+
+# Modules `srs` must not load before a subcommand asks for them
+HEAVY_MODULES = {"sqlalchemy", "fastapi", "starlette", "telegram", "httpx", "pydantic", "pydantic_settings", "jinja2", "prometheus_client"}
+# Cumulative import time of app.cli; a heavy dependency alone costs several times this
+IMPORT_BUDGET_US = 50_000
+
+
+def _importtime(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds per module, from `python -X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestCli:
+
+    def test_import_does_not_load_heavy_modules(self):
+        times = _importtime("app.cli")
+
+        loaded = {name.split(".")[0] for name in times}
+        assert not loaded & HEAVY_MODULES
+        assert times["app.cli"] < IMPORT_BUDGET_US
+
+    def test_stats_reads_sqlite_directly(self, tmp_path, capsys):
+        path = tmp_path / "flashcards.db"
+        engine = create_engine(f"sqlite:///{path}")
+        init_db(engine)
+        now = datetime.now(UTC).replace(tzinfo=None)
+        with Session(engine) as db:
+            db.add(Chat(chat_id=1))
+            db.add_all([
+                Flashcard(question="q1", answer="a", knowledge_source_type="t", knowledge_source_id="s", chat_id=1, status="sent", due_at=now - timedelta(days=1)),
+                Flashcard(question="q2", answer="a", knowledge_source_type="t", knowledge_source_id="s", chat_id=1),
+                Flashcard(question="q3", answer="a", knowledge_source_type="t", knowledge_source_id="s", chat_id=2, due_at=now + timedelta(days=1)),
+            ])
+            db.commit()
+        engine.dispose()
+
+        assert main(["stats", "--database", str(path), "--json"]) == 0
+        stats = json.loads(capsys.readouterr().out)
+        assert (stats["flashcards"], stats["pending"], stats["sent"]) == (3, 2, 1)
+        assert (stats["due_for_review"], stats["never_reviewed"], stats["active_chats"]) == (1, 1, 1)
+
+        assert main(["stats", "--database", str(path), "--chat", "2", "--json"]) == 0
+        assert json.loads(capsys.readouterr().out)["flashcards"] == 1
+
+    def test_backup_and_restore(self, tmp_path, monkeypatch, capsys):
+        from app import cli
+        from app.config import app_config
+
+        path = tmp_path / "flashcards.db"
+        engine = create_engine(f"sqlite:///{path}")
+        init_db(engine)
+        with Session(engine) as db:
+            db.add(Chat(chat_id=1))
+            db.commit()
+        engine.dispose()
+        monkeypatch.setattr(cli, "DATABASE_URL", f"sqlite:///{path}")
+        monkeypatch.setattr(app_config, "backup_dir", str(tmp_path / "backups"))
+
+        assert main(["backup", "--json"]) == 0
+        snapshot = json.loads(capsys.readouterr().out)["path"]
+        assert main(["restore", "--check", "--json"]) == 0
+        assert json.loads(capsys.readouterr().out) == {"snapshot": snapshot, "ok": True, "problems": []}
+
+        (tmp_path / "damaged.db.gz").write_bytes(b"not gzip")
+        assert main(["restore", str(tmp_path / "damaged.db.gz")]) == 1
+        assert main(["restore"]) == 0
+        assert "restored" in capsys.readouterr().out
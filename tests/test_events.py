@@ -0,0 +1,177 @@
+import asyncio
+import tracemalloc
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, update
+
+from app.events import BATCH_EVENTS, EVENT_HISTORY, EventBus, event_bus
+from app.main import app
+from app.models import Flashcard
+from app.services import live_service
+from tests.conftest import db_session, init_db_tables
+
+CLIENTS = 1000
+
+
+class SSEClient:
+    """Drives GET /api/events through the ASGI app directly, counting events instead of keeping them."""
+
+    def __init__(self, last_event_id: int | None = None):
+        self.last_event_id = last_event_id
+        self.status: int | None = None
+        self.cards = 0
+        self.resyncs = 0
+        self.connected = asyncio.Event()
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self._disconnect = asyncio.Event()
+        self._requested = False
+
+    async def run(self) -> None:
+        headers = [(b"accept", b"text/event-stream")]
+        if self.last_event_id is not None:
+            headers.append((b"last-event-id", str(self.last_event_id).encode()))
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/events", "raw_path": b"/api/events", "query_string": b"",
+            "root_path": "", "headers": headers, "client": ("127.0.0.1", 1), "server": ("test", 80),
+        }
+        await app(scope, self._receive, self._send)
+
+    def disconnect(self) -> None:
+        self._disconnect.set()
+
+    async def _receive(self) -> dict:
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message: dict) -> None:
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message.get("body"):
+            # A client that stops reading blocks the server's send, like a full socket buffer
+            await self.gate.wait()
+            self.cards += message["body"].count(b"event: card\n")
+            self.resyncs += message["body"].count(b"event: resync\n")
+            self.connected.set()
+
+
+async def _wait_for(condition, timeout: float = 10.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+class TestEventBus:
+
+    @pytest.mark.asyncio
+    async def test_delivers_events_and_resyncs_clients_that_fell_behind(self):
+        bus = EventBus(history=4)
+        stream = bus.stream(heartbeat=60)
+        assert (await anext(stream)).startswith(b"retry:")
+
+        bus.publish("card", {"id": 1})
+        assert b'event: card\ndata: {"id":1}' in await anext(stream)
+        for i in range(10):
+            bus.publish("card", {"id": i})
+        assert b"event: resync" in await anext(stream)
+        await stream.aclose()
+        assert bus.subscriber_count == 0
+
+    @pytest.mark.asyncio
+    async def test_reconnect_replays_from_last_event_id(self):
+        bus = EventBus()
+        listener = bus.stream()
+        await anext(listener)
+        first = bus.publish("card", {"id": 1})
+        bus.publish("card", {"id": 2})
+
+        reconnected = bus.stream(last_event_id=first)
+        await anext(reconnected)
+        frames = await anext(reconnected)
+
+        assert b'"id":2' in frames and b'"id":1' not in frames
+        await reconnected.aclose()
+        await listener.aclose()
+
+    def test_publishing_without_listeners_keeps_nothing(self):
+        bus = EventBus()
+        for i in range(1000):
+            bus.publish("card", {"id": i})
+        assert bus.since(0) is None
+        assert bus.since(bus.last_id) == []
+
+
+class TestEventStream:
+
+    @pytest.mark.asyncio
+    async def test_thousand_clients_with_bounded_memory(self):
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            clients = [SSEClient() for _ in range(CLIENTS)]
+            stalled = clients[0]
+            stalled.gate.clear()
+            tasks = [asyncio.create_task(client.run()) for client in clients]
+            await _wait_for(lambda: event_bus.subscriber_count == CLIENTS)
+            await asyncio.gather(*(client.connected.wait() for client in clients[1:]))
+            connected = tracemalloc.get_traced_memory()[0]
+
+            for i in range(100):
+                event_bus.publish("card", {"id": i, "question": f"Q{i}", "answer": "A"})
+            await _wait_for(lambda: all(client.cards == 100 for client in clients[1:]))
+            after_100 = tracemalloc.get_traced_memory()[0]
+
+            # Far more events than the ring keeps, while one client reads nothing
+            published = 100
+            for _ in range(4):
+                for i in range(published, published + EVENT_HISTORY // 2):
+                    event_bus.publish("card", {"id": i, "question": f"Q{i}", "answer": "A"})
+                published += EVENT_HISTORY // 2
+                await _wait_for(lambda: all(client.cards == published for client in clients[1:]), timeout=60)
+            after_many = tracemalloc.get_traced_memory()[0]
+
+            stalled.gate.set()
+            await _wait_for(lambda: stalled.resyncs == 1)
+        finally:
+            tracemalloc.stop()
+            for client in clients:
+                client.disconnect()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert all(client.status == 200 for client in clients)
+        per_client = (connected - baseline) / CLIENTS
+        assert per_client < 64 * 1024, f"{per_client:.0f} bytes per connected client"
+        # Events are shared frames in a bounded ring; a client holds at most its last chunk
+        # (these frames are under 128 bytes), however many events went through
+        assert (after_many - after_100) / CLIENTS < BATCH_EVENTS * 128
+        assert event_bus.subscriber_count == 0
+
+
+class TestChangeWatcher:
+
+    @pytest.mark.asyncio
+    async def test_publishes_cards_added_and_sent_by_other_processes(self, init_db_tables, db_session, monkeypatch):
+        monkeypatch.setattr(live_service, "watermarks", live_service.Watermarks())
+        stream = event_bus.stream(heartbeat=60)
+        await anext(stream)
+        live_service.poll_changes(db_session)  # records the starting point only
+
+        card = {"question": "Q", "answer": "A", "knowledge_source_type": "notion", "knowledge_source_id": "p", "status": "pending"}
+        ids = list(db_session.scalars(insert(Flashcard).returning(Flashcard.id), [card, card]))
+        live_service.poll_changes(db_session)
+        frames = await anext(stream)
+        assert frames.count(b"event: card\n") == 2
+
+        db_session.execute(update(Flashcard).where(Flashcard.id == ids[0]).values(status="sent", sent_at=datetime(2030, 1, 1)))
+        live_service.poll_changes(db_session)
+        frames = await anext(stream)
+        assert frames.count(b"event: status\n") == 1 and f'"id":{ids[0]}'.encode() in frames
+
+        live_service.poll_changes(db_session)
+        assert event_bus.since(event_bus.last_id) == []
+        await stream.aclose()
@@ -0,0 +1,22 @@
+import asyncio
+
+import pytest
+
+from app import profiling
+from app.config import app_config
+
+
+@pytest.mark.asyncio
+async def test_overlapping_cprofile_runs_do_not_fail(monkeypatch, tmp_path):
+    monkeypatch.setattr(app_config, "profiler", "cprofile")
+    monkeypatch.setattr(app_config, "profile_targets", "")
+    monkeypatch.setattr(app_config, "profile_dir", str(tmp_path))
+
+    @profiling.profiled
+    async def handler(n: int) -> int:
+        await asyncio.sleep(0.01)
+        return n
+
+    assert await asyncio.gather(*(handler(n) for n in range(5))) == list(range(5))
+    # Only the first overlapping run is profiled
+    assert len(list(tmp_path.glob("handler-*.prof"))) == 1